@@ -0,0 +1,248 @@
+"""
+   interval index of a gtf or gff3 annotation, built once per annotation file and stored as a compressed .npz named by the
+   md5 of the annotation, so that the per sample coverage queries of the quality assessment (eg the CDS of a perturbed
+   gene, or of the NAT and G418 markers) do not grep the annotation, and merge the features with bedtools, per gene per
+   sample.
+
+   The index holds, for each chromosome and feature type, the features sorted by start as numpy arrays, and for every
+   identifier in the annotation (the values of gene_id, transcript_id, ID, Parent, Name, gene and locus_tag), the merged
+   intervals of each of its feature types and their number of bases. A gene's features are those whose identifiers are
+   the gene, or begin with the gene followed by a character other than a digit -- the transcript CKF44_00001T0 and the
+   CDS CKF44_00001-T1.cds are features of CKF44_00001, CKF44_000010 is not. A locus tag (eg CKF44_00001) which begins an
+   identifier is indexed whether or not it is itself an identifier in the annotation.
+
+   usage: annotation_index = AnnotationIndex(od.annotation_file, os.path.join(od.rnaseq_tmp, 'annotation_index'))
+          cds_interval_list = annotation_index.geneIntervals('CKF44_00001', 'CDS')
+          cds_bases = annotation_index.featureBases('CKF44_00001', 'CDS')
+"""
+import os
+import re
+import tempfile
+from bisect import bisect_left
+import numpy as np
+from rnaseq_tools import utils
+
+# the attributes of a gtf or gff3 line which identify the feature, its gene or its transcript
+IDENTIFIER_ATTRIBUTE_LIST = ['gene_id', 'transcript_id', 'ID', 'Parent', 'Name', 'gene', 'locus_tag']
+# gtf: key "value"; gff3: key=value[,value]
+ATTRIBUTE_REGEX = re.compile(r'(?:^|;)\s*(%s)(?:\s+"([^"]*)"|=([^;]*))' % '|'.join(IDENTIFIER_ATTRIBUTE_LIST))
+# a locus tag at the beginning of an identifier, eg CKF44_00001 of CKF44_00001-t26_1
+LOCUS_TAG_REGEX = re.compile(r'^[A-Za-z0-9]+_\d+(?=\D)')
+
+
+class AnnotationIndex:
+    # increment if the format of the .npz changes
+    annotation_index_version = 1
+
+    def __init__(self, annotation_path, cache_directory=None):
+        """
+            :param annotation_path: path to a gtf or gff3
+            :param cache_directory: directory of the index .npz files, eg rnaseq_tmp/annotation_index. If None, the index
+                                    is built and held only in memory
+            :raises: FileNotFoundError if annotation_path does not exist
+        """
+        self.annotation_path = annotation_path
+        self.annotation_md5 = utils.fileChecksum(annotation_path)
+        self.cache_path = os.path.join(cache_directory, 'annotation_index_%s.npz' % self.annotation_md5) \
+            if cache_directory else None
+        # see buildArrays()
+        self.array_dict = self.loadArrays() if self.cache_path else None
+        if self.array_dict is None:
+            self.array_dict = self.buildArrays(annotation_path)
+            if self.cache_path:
+                try:
+                    self.saveArrays()
+                except OSError:
+                    pass
+        self.chromosome_list = list(self.array_dict['chromosome_names'])
+        self.feature_list = list(self.array_dict['feature_names'])
+        self.identifier_list = list(self.array_dict['identifier_names'])
+        # {(chromosome, feature): (start array, end array, strand array)}, each sorted by start
+        self._feature_interval_dict = {}
+        row_key_array = self.array_dict['row_chromosome'].astype(np.int64) * len(self.feature_list) + \
+            self.array_dict['row_feature']
+        key_list, first_row_array = np.unique(row_key_array, return_index=True)
+        for key, first_row, last_row in zip(key_list, first_row_array, list(first_row_array[1:]) + [len(row_key_array)]):
+            self._feature_interval_dict[(self.chromosome_list[key // len(self.feature_list)],
+                                         self.feature_list[key % len(self.feature_list)])] = \
+                tuple(self.array_dict[column][first_row:last_row] for column in ['row_start', 'row_end', 'row_strand'])
+        # {(identifier, feature): (first, last) of the merged intervals}
+        self._merged_slice_dict = {}
+        merged_offset_array = self.array_dict['merged_offset']
+        for i, (identifier_code, feature_code) in enumerate(zip(self.array_dict['merged_identifier'],
+                                                                self.array_dict['merged_feature'])):
+            self._merged_slice_dict[(self.identifier_list[identifier_code], self.feature_list[feature_code])] = \
+                (merged_offset_array[i], merged_offset_array[i + 1])
+
+    @staticmethod
+    def identifiers(attribute_field):
+        """
+            :param attribute_field: the ninth column of a gtf or gff3 line
+            :returns: set of the values of the IDENTIFIER_ATTRIBUTE_LIST attributes
+        """
+        identifier_set = set()
+        for _, gtf_value, gff_value in ATTRIBUTE_REGEX.findall(attribute_field):
+            for identifier in (gtf_value if gtf_value else gff_value).split(','):
+                if identifier.strip():
+                    identifier_set.add(identifier.strip())
+        return identifier_set
+
+    @staticmethod
+    def geneKeys(identifier_set):
+        """
+            :param identifier_set: identifiers of the features in an annotation
+            :returns: the identifiers, and the locus tags which begin them, eg CKF44_00001 of CKF44_00001-t26_1
+        """
+        gene_key_set = set(identifier_set)
+        for identifier in identifier_set:
+            locus_tag_match = LOCUS_TAG_REGEX.match(identifier)
+            if locus_tag_match:
+                gene_key_set.add(locus_tag_match.group(0))
+        return gene_key_set
+
+    @staticmethod
+    def isGeneIdentifier(gene, identifier):
+        """
+            :param gene: a gene id, eg CKF44_00001
+            :param identifier: an identifier of a feature, eg CKF44_00001T0
+            :returns: True if identifier is gene, or begins with gene followed by a character other than a digit
+        """
+        return identifier == gene or (identifier.startswith(gene) and not identifier[len(gene)].isdigit())
+
+    @classmethod
+    def buildArrays(cls, annotation_path):
+        """
+            parse the annotation
+            :param annotation_path: path to a gtf or gff3
+            :returns: {name: numpy array}. The features (row_*) are sorted by chromosome, feature and start. The merged
+                      intervals (merged_*) of identifier merged_identifier[i] and feature merged_feature[i] are
+                      merged_offset[i]:merged_offset[i + 1] of merged_chromosome, merged_start and merged_end
+        """
+        row_list = []
+        with open(annotation_path, 'r') as annotation_file:
+            for line in annotation_file:
+                if line.startswith('#'):
+                    continue
+                line_split = line.rstrip('\n').split('\t')
+                if len(line_split) < 9:
+                    continue
+                # 0 based half open, as a bed
+                row_list.append((line_split[0], line_split[2], int(line_split[3]) - 1, int(line_split[4]),
+                                 line_split[6], cls.identifiers(line_split[8])))
+        row_list.sort(key=lambda row: row[:4])
+        chromosome_list = sorted({row[0] for row in row_list})
+        feature_list = sorted({row[1] for row in row_list})
+        identifier_list = sorted(cls.geneKeys(set().union(*[row[5] for row in row_list])))
+        chromosome_code_dict = {chromosome: code for code, chromosome in enumerate(chromosome_list)}
+        feature_code_dict = {feature: code for code, feature in enumerate(feature_list)}
+        # {identifier: [row index, ...]}
+        identifier_row_dict = {}
+        for row_index, row in enumerate(row_list):
+            for identifier in row[5]:
+                identifier_row_dict.setdefault(identifier, []).append(row_index)
+        merged_identifier_list, merged_feature_list, merged_offset_list = [], [], [0]
+        merged_interval_list = []
+        for identifier_code, gene in enumerate(identifier_list):
+            # the identifiers which begin with gene are adjacent in the sorted identifier_list
+            gene_row_set = set()
+            for identifier in identifier_list[bisect_left(identifier_list, gene):]:
+                if not identifier.startswith(gene):
+                    break
+                if cls.isGeneIdentifier(gene, identifier):
+                    gene_row_set.update(identifier_row_dict.get(identifier, []))
+            # {feature: [(chromosome, start, end), ...]}
+            gene_feature_dict = {}
+            for row_index in sorted(gene_row_set):
+                chromosome, feature, start, end = row_list[row_index][:4]
+                gene_feature_dict.setdefault(feature, []).append((chromosome, start, end))
+            for feature in sorted(gene_feature_dict):
+                merged_interval_list.extend(utils.mergeIntervals(gene_feature_dict[feature]))
+                merged_identifier_list.append(identifier_code)
+                merged_feature_list.append(feature_code_dict[feature])
+                merged_offset_list.append(len(merged_interval_list))
+        return {'chromosome_names': np.array(chromosome_list, dtype=str),
+                'feature_names': np.array(feature_list, dtype=str),
+                'identifier_names': np.array(identifier_list, dtype=str),
+                'row_chromosome': np.array([chromosome_code_dict[row[0]] for row in row_list], dtype=np.int32),
+                'row_feature': np.array([feature_code_dict[row[1]] for row in row_list], dtype=np.int32),
+                'row_start': np.array([row[2] for row in row_list], dtype=np.int64),
+                'row_end': np.array([row[3] for row in row_list], dtype=np.int64),
+                'row_strand': np.array([row[4] for row in row_list], dtype='<U1'),
+                'merged_identifier': np.array(merged_identifier_list, dtype=np.int32),
+                'merged_feature': np.array(merged_feature_list, dtype=np.int32),
+                'merged_offset': np.array(merged_offset_list, dtype=np.int64),
+                'merged_chromosome': np.array([chromosome_code_dict[interval[0]] for interval in merged_interval_list],
+                                              dtype=np.int32),
+                'merged_start': np.array([interval[1] for interval in merged_interval_list], dtype=np.int64),
+                'merged_end': np.array([interval[2] for interval in merged_interval_list], dtype=np.int64)}
+
+    def loadArrays(self):
+        """
+            :returns: the arrays stored at cache_path, or None if there are none or they are of another version
+        """
+        try:
+            with np.load(self.cache_path, allow_pickle=False) as index_npz:
+                if int(index_npz['version']) != self.annotation_index_version:
+                    return None
+                return {name: index_npz[name] for name in index_npz.files if name != 'version'}
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def saveArrays(self):
+        """
+            write the arrays to cache_path via a temporary file in the same directory
+            :raises: OSError if the cache directory cannot be created or written
+        """
+        utils.mkdirp(os.path.dirname(self.cache_path))
+        tmp_file_descriptor, tmp_path = tempfile.mkstemp(suffix='.npz', dir=os.path.dirname(self.cache_path))
+        try:
+            with os.fdopen(tmp_file_descriptor, 'wb') as tmp_file:
+                np.savez_compressed(tmp_file, version=np.array(self.annotation_index_version), **self.array_dict)
+            os.replace(tmp_path, self.cache_path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+    def geneIntervals(self, gene, feature):
+        """
+            :param gene: a gene id, eg CKF44_00001 or CNAG_NAT
+            :param feature: a feature type, eg CDS
+            :returns: sorted [(chromosome, start, end), ...] of the gene's features of the type, merged (as bedtools merge).
+                      Empty if the gene or feature is not in the annotation
+        """
+        try:
+            first, last = self._merged_slice_dict[(gene, feature)]
+        except KeyError:
+            return []
+        return [(self.chromosome_list[chromosome_code], int(start), int(end)) for chromosome_code, start, end in
+                zip(self.array_dict['merged_chromosome'][first:last], self.array_dict['merged_start'][first:last],
+                    self.array_dict['merged_end'][first:last])]
+
+    def featureBases(self, gene, feature):
+        """
+            :param gene: see geneIntervals()
+            :param feature: see geneIntervals()
+            :returns: the number of bases in the gene's merged features of the type
+        """
+        try:
+            first, last = self._merged_slice_dict[(gene, feature)]
+        except KeyError:
+            return 0
+        return int((self.array_dict['merged_end'][first:last] - self.array_dict['merged_start'][first:last]).sum())
+
+    def featureIntervals(self, chromosome, feature, start=None, end=None):
+        """
+            :param chromosome: a chromosome
+            :param feature: a feature type, eg tRNA
+            :param start: if start and end are passed, only the features which overlap start:end (0 based half open)
+            :param end: see start
+            :returns: (start array, end array, strand array) of the features, sorted by start
+        """
+        try:
+            start_array, end_array, strand_array = self._feature_interval_dict[(chromosome, feature)]
+        except KeyError:
+            return np.array([], dtype=np.int64), np.array([], dtype=np.int64), np.array([], dtype='<U1')
+        if start is None or end is None:
+            return start_array, end_array, strand_array
+        overlap_mask = end_array[:np.searchsorted(start_array, end)] > start
+        return tuple(array[:len(overlap_mask)][overlap_mask] for array in (start_array, end_array, strand_array))
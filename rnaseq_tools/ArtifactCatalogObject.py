@@ -0,0 +1,239 @@
+"""
+   catalog of the files align_count writes for each fastq (bam, bam index, count, novoalign and htseq logs -- see
+   utils.ARTIFACT_SUFFIX_DICT) in the run directories of one or more roots, eg align_count_results
+   (run_0673_samples/align|count|logs) and lts_align_expr (run_673/). The roots are crawled once with os.scandir, and the
+   path, size and mtime of each artifact are stored in a json file. A refresh re-crawls only the run directories whose
+   mtime (or the mtime of a subdirectory) has changed, so that a lookup does not stat the shared filesystem once per file.
+   Note that a file overwritten in place does not change the mtime of its directory -- use refresh(force=True) to
+   re-read the sizes and mtimes of every artifact.
+
+   A run number is matched to a run directory without its leading zeros (673 and '0673' both find run_0673_samples). Run
+   directories whose names are not a run number (eg run_0711_5_0718_7_samples) are found through run_number_alias_dict,
+   eg StandardData._run_numbers_with_zeros
+
+   usage: artifact_catalog = ArtifactCatalog([sd.align_count_results, sd.lts_align_expr],
+                                             os.path.join(sd.rnaseq_tmp, 'artifact_catalog.json'))
+          artifact_catalog.refresh([673, 4011])  # or refresh() to crawl every run directory
+          bam_path = artifact_catalog.artifactPath('sample_1.fastq.gz', 'bam', run_number=673)
+"""
+import os
+import re
+import json
+from rnaseq_tools import utils
+from rnaseq_tools.RunDirectoryIndexObject import RunDirectoryIndex
+
+
+class ArtifactCatalog:
+    # increment if the format of the catalog json changes
+    artifact_catalog_version = 1
+    # eg run_0673_samples, run_673, run_0711_5_0718_7_samples. group 1 is the run number as written in the directory name
+    run_directory_regex = re.compile(r'^run_(.+?)(?:_samples)?$')
+
+    def __init__(self, root_list, catalog_path=None, run_number_alias_dict=None):
+        """
+            :param root_list: directories holding run directories. Where an artifact is in more than one root, lookups
+                              return the first root's first
+            :param catalog_path: json file in which the catalog is stored between processes. If None, the catalog is held
+                                 only in memory
+            :param run_number_alias_dict: {run number: run number as in the run directory name}, eg {711: '0711_5_0718_7'}
+        """
+        self.root_list = [os.path.abspath(root) for root in root_list]
+        self.catalog_path = catalog_path
+        self.run_number_alias_dict = run_number_alias_dict or {}
+        # {root: {run directory name: {'directory_mtime_ns': {relative directory: mtime}, 'artifacts': [[sample name,
+        # artifact type, relative path, size, mtime], ...]}}}
+        self.catalog_dict = self.readCatalog()
+        # {sample name: [artifact dict, ...]}. see sampleIndex()
+        self._sample_index = None
+
+    def readCatalog(self):
+        """
+            :returns: the catalog stored at catalog_path (see __init__()), or an empty catalog if there is none or it was
+                      written by another version
+        """
+        if self.catalog_path is None:
+            return {}
+        try:
+            with open(self.catalog_path) as catalog_file:
+                catalog_json = json.load(catalog_file)
+        except (FileNotFoundError, ValueError):
+            return {}
+        if catalog_json.get('version') != self.artifact_catalog_version:
+            return {}
+        return catalog_json['roots']
+
+    @staticmethod
+    def runKey(run_number):
+        """
+            :param run_number: a run number, eg 673, '0673', 673.0 or '0711_5_0718_7'
+            :returns: the run number as a string without leading zeros, eg '673'
+        """
+        if isinstance(run_number, float) and run_number.is_integer():
+            run_number = int(run_number)
+        return str(run_number).strip().lstrip('0') or '0'
+
+    def runKeys(self, run_number):
+        """
+            :param run_number: a run number, as in the database or a run directory name
+            :returns: the set of run keys (see runKey()) of the run directories which may hold the run
+        """
+        run_key_set = {self.runKey(run_number)}
+        try:
+            run_key_set.add(self.runKey(self.run_number_alias_dict[int(float(run_number))]))
+        except (KeyError, ValueError, TypeError):
+            pass
+        return run_key_set
+
+    def refresh(self, run_number_list=None, force=False):
+        """
+            bring the catalog up to date with the run directories in root_list. A run directory is re-crawled only if it
+            is new, or its mtime or the mtime of one of its subdirectories has changed
+            :param run_number_list: crawl only the run directories of these runs. Default is every run directory -- run
+                                    directories which no longer exist are then removed from the catalog
+            :param force: re-crawl the run directories, whether or not they have changed
+            :returns: list of the run directories which were crawled
+        """
+        run_key_set = None
+        if run_number_list is not None:
+            run_key_set = set()
+            for run_number in run_number_list:
+                run_key_set.update(self.runKeys(run_number))
+        # {(root, run directory name): run directory catalog, or None if the run directory has been removed}
+        update_dict = {}
+        for root in self.root_list:
+            previous_run_dict = self.catalog_dict.get(root, {})
+            try:
+                entry_list = sorted(os.scandir(root), key=lambda entry: entry.name)
+            except (FileNotFoundError, NotADirectoryError, PermissionError):
+                entry_list = []
+            for entry in entry_list:
+                match = self.run_directory_regex.match(entry.name)
+                if not match or not entry.is_dir():
+                    continue
+                if run_key_set is not None and self.runKey(match.group(1)) not in run_key_set:
+                    continue
+                previous_run_catalog = previous_run_dict.get(entry.name)
+                if force or previous_run_catalog is None or \
+                        not self.directoriesUnchanged(entry.path, previous_run_catalog['directory_mtime_ns']):
+                    update_dict[(root, entry.name)] = self.crawlRunDirectory(entry.path)
+            if run_number_list is None:
+                current_run_set = {entry.name for entry in entry_list}
+                for run_directory_name in previous_run_dict:
+                    if run_directory_name not in current_run_set:
+                        update_dict[(root, run_directory_name)] = None
+        if update_dict:
+            self.catalog_dict = self.applyUpdate(self.catalog_dict, update_dict)
+            if self.catalog_path is not None:
+                # merge with the catalog as another process may have stored it since it was read
+                with utils.lockFile(self.catalog_path + '.lock'):
+                    self.catalog_dict = self.applyUpdate(self.readCatalog(), update_dict)
+                    utils.writeJsonAtomically({'version': self.artifact_catalog_version, 'roots': self.catalog_dict},
+                                              self.catalog_path)
+            self._sample_index = None
+        return [os.path.join(root, run_directory_name) for root, run_directory_name in update_dict
+                if update_dict[(root, run_directory_name)] is not None]
+
+    @staticmethod
+    def applyUpdate(catalog_dict, update_dict):
+        """
+            :param catalog_dict: see __init__()
+            :param update_dict: {(root, run directory name): run directory catalog, or None to remove it}
+            :returns: catalog_dict, updated in place
+        """
+        for (root, run_directory_name), run_catalog in update_dict.items():
+            if run_catalog is None:
+                catalog_dict.get(root, {}).pop(run_directory_name, None)
+            else:
+                catalog_dict.setdefault(root, {})[run_directory_name] = run_catalog
+        return catalog_dict
+
+    @staticmethod
+    def directoriesUnchanged(run_directory_path, directory_mtime_dict):
+        """
+            :param run_directory_path: path to a run directory
+            :param directory_mtime_dict: {relative directory: mtime in ns} recorded when the run directory was crawled
+            :returns: True if every directory still exists with the recorded mtime
+        """
+        for relative_directory, mtime_ns in directory_mtime_dict.items():
+            try:
+                if os.stat(os.path.join(run_directory_path, relative_directory)).st_mtime_ns != mtime_ns:
+                    return False
+            except OSError:
+                return False
+        return True
+
+    @staticmethod
+    def crawlRunDirectory(run_directory_path):
+        """
+            :param run_directory_path: path to a run directory, eg align_count_results/run_0673_samples
+            :returns: the run directory catalog {'directory_mtime_ns': {relative directory: mtime}, 'artifacts':
+                      [[sample name, artifact type, path relative to the run directory, size, mtime], ...]}. See
+                      RunDirectoryIndex
+        """
+        run_directory_index = RunDirectoryIndex(run_directory_path)
+        return {'directory_mtime_ns': run_directory_index.directory_mtime_dict,
+                'artifacts': run_directory_index.artifact_list}
+
+    def sampleIndex(self):
+        """
+            :returns: {sample name: [artifact dict, ...]}, in the order of root_list and then run directory name. An
+                      artifact dict has the keys sample, artifact_type, path, size, mtime, root, run_directory and run_key
+        """
+        if self._sample_index is None:
+            self._sample_index = {}
+            for root in self.root_list:
+                for run_directory_name, run_catalog in sorted(self.catalog_dict.get(root, {}).items()):
+                    run_directory_path = os.path.join(root, run_directory_name)
+                    run_key = self.runKey(self.run_directory_regex.match(run_directory_name).group(1))
+                    for sample_name, artifact_type, relative_path, size, mtime in run_catalog['artifacts']:
+                        self._sample_index.setdefault(sample_name, []).append(
+                            {'sample': sample_name, 'artifact_type': artifact_type,
+                             'path': os.path.join(run_directory_path, relative_path), 'size': size, 'mtime': mtime,
+                             'root': root, 'run_directory': run_directory_path, 'run_key': run_key})
+        return self._sample_index
+
+    def artifacts(self, fastq_filename, artifact_type=None, run_number=None, root=None):
+        """
+            :param fastq_filename: fastq filename or path
+            :param artifact_type: a key of utils.ARTIFACT_SUFFIX_DICT, eg 'bam'. Default is every artifact type
+            :param run_number: only artifacts in the run directories of this run. Default is every run
+            :param root: only artifacts in this root. Default is every root
+            :returns: list of artifact dicts (see sampleIndex()) of the sample. Empty if there are none in the catalog
+        """
+        run_key_set = self.runKeys(run_number) if run_number is not None else None
+        root = os.path.abspath(root) if root is not None else None
+        sample_index = self.sampleIndex()
+        for sample_name in RunDirectoryIndex.sampleNames(fastq_filename):
+            artifact_list = [artifact for artifact in sample_index.get(sample_name, [])
+                             if (artifact_type is None or artifact['artifact_type'] == artifact_type) and
+                             (run_key_set is None or artifact['run_key'] in run_key_set) and
+                             (root is None or artifact['root'] == root)]
+            if artifact_list:
+                return artifact_list
+        return []
+
+    def artifactPath(self, fastq_filename, artifact_type, run_number=None, root=None):
+        """
+            :param fastq_filename: see artifacts()
+            :param artifact_type: see artifacts()
+            :param run_number: see artifacts()
+            :param root: see artifacts()
+            :returns: the path of the first matching artifact, or None if there is none in the catalog
+        """
+        artifact_list = self.artifacts(fastq_filename, artifact_type, run_number, root)
+        return artifact_list[0]['path'] if artifact_list else None
+
+    def runDirectory(self, run_number, root=None):
+        """
+            :param run_number: a run number, eg 673 or '0673'
+            :param root: only run directories in this root. Default is every root
+            :returns: the path of the first run directory of the run in the catalog, or None
+        """
+        run_key_set = self.runKeys(run_number)
+        for catalog_root in self.root_list:
+            if root is not None and catalog_root != os.path.abspath(root):
+                continue
+            for run_directory_name in sorted(self.catalog_dict.get(catalog_root, {})):
+                if self.runKey(self.run_directory_regex.match(run_directory_name).group(1)) in run_key_set:
+                    return os.path.join(catalog_root, run_directory_name)
+        return None
@@ -0,0 +1,324 @@
+"""
+   per-sample alignment metrics computed in one pass over a bam file. This replaces the separate samtools/bedtools
+   pipelines which each read the bam (see QualityAssessmentObject.totalrRNA(), totaltRNAncRNA(),
+   calculatePercentFeatureCoverage() and CryptoQualityAssessmentObject.uniqueAmbiguousProteinCodingCount(),
+   calculateIntergenicCoverage()). Each alignment is decoded once, and the counters for every strandedness are kept, so
+   that the result may be read for either a stranded or an unstranded library. The counts follow the pipelines which they
+   replace:
+
+       rRNA:                 alignments overlapping rrna_region (as samtools view <bam> <region>). Unique are those
+                             without ZS:Z:R, primary multi are ZS:Z:R and HI:i:1. In a reverse stranded library, only
+                             forward strand alignments are counted (samtools view -F 16)
+       tRNA/ncRNA:           mapped alignments without ZS:Z:R with at least 90% of their span in an interval of
+                             noncoding_interval_list (bedtools intersect -f .90, with -s in a stranded library). As
+                             bedtools intersect, an alignment is counted once per interval it satisfies
+       ambiguous protein     alignments whose htseq XF tag is __ambiguous and names only CKF44 genes
+       coding:               (samtools view <bam> | grep ambiguous | grep CKF44 | grep -v CNAG)
+       coverage:             the genome wide depth of alignments with mapq >= 10 (samtools depth -aa -Q 10), as a
+                             CoverageCache, and from it the number of bases in each interval set of
+                             coverage_interval_dict covered by at least one alignment
+
+   The bam is read with pysam (see rnaseq_pipeline_environment.yml) if it is installed, and otherwise, several times more
+   slowly, from the output of samtools view. The fallback is logged as a warning
+
+   usage: bam_metrics = BamMetrics(bam_path, rrna_region='CP022322.1:272773-283180',
+                                   noncoding_interval_list=BamMetrics.readGffIntervals(tRNA_ncRNA_gff),
+                                   coverage_interval_dict={'INTERGENIC': BamMetrics.readBedIntervals(intergenic_bed)})
+          bam_metrics.scan()
+          total_rRNA, unique_rRNA, unique_tRNA_ncRNA = bam_metrics.nonCodingRnaCounts('reverse')
+"""
+import re
+import logging
+from array import array
+from bisect import bisect_left
+from rnaseq_tools import utils
+from rnaseq_tools.CoverageCacheObject import CoverageCache
+
+# flags of alignments which samtools depth does not count: unmapped, secondary, qc fail, duplicate
+DEPTH_EXCLUDE_FLAG = 0x4 | 0x100 | 0x200 | 0x400
+# cigar operations which cover a reference base in samtools depth. D and N consume the reference but do not count
+CIGAR_REGEX = re.compile(r'(\d+)([MIDNSHP=X])')
+
+
+class BamMetrics:
+    # the minimum mapq of an alignment counted in coverage (samtools depth -Q)
+    coverage_min_mapq = 10
+    # the fraction of an alignment's span which must overlap a noncoding interval (bedtools intersect -f)
+    noncoding_min_overlap_fraction = .90
+
+    def __init__(self, bam_path, rrna_region=None, noncoding_interval_list=None, coverage_interval_dict=None):
+        """
+            :param bam_path: path to a sorted bam. The htseq annotated bam (with XF tags) is needed for
+                             ambiguous_protein_coding
+            :param rrna_region: the rRNA locus in samtools region format, eg CP022322.1:272773-283180. Default is no rRNA
+                                counts
+            :param noncoding_interval_list: [(chromosome, start, end, strand), ...] of the tRNA and ncRNA, 0 based half
+                                            open. see readGffIntervals()
+            :param coverage_interval_dict: {name: [(chromosome, start, end), ...]} of the interval sets of which to
+                                           measure coverage, eg {'INTERGENIC': ..., 'CKF44_00001': ...}
+        """
+        self.bam_path = bam_path
+        self.rrna_region = self.parseRegion(rrna_region) if rrna_region else None
+        # {chromosome: ([starts], [(start, end, strand)], length of the longest interval)}, sorted by start
+        self._noncoding_interval_dict = self.intervalIndex(noncoding_interval_list or [])
+        self.coverage_interval_dict = coverage_interval_dict or {}
+        self.resetCounters()
+
+    def resetCounters(self):
+        """
+            set the counters to 0
+        """
+        # each {'all': n, 'forward': n} -- forward is the count of alignments on the forward strand
+        self.primary_multi_rrna = {'all': 0, 'forward': 0}
+        self.unique_rrna = {'all': 0, 'forward': 0}
+        # {'unstranded': n, 'stranded': n}
+        self.unique_trna_ncrna = {'unstranded': 0, 'stranded': 0}
+        self.ambiguous_protein_coding = 0
+        self.alignment_count = 0
+        # {name: number of bases in the interval set}, {name: number of those bases covered}. set by scan()
+        self.region_bases_dict = {}
+        self.covered_bases_dict = {}
+        # {chromosome: length} from the bam header
+        self.chromosome_length_dict = {}
+        # the genome wide depth. set by scan()
+        self.coverage_cache = None
+        # {chromosome: array of +1 at the start and -1 at the end of each aligned block}. only during scan()
+        self._depth_diff_dict = {}
+
+    @staticmethod
+    def parseRegion(region):
+        """
+            :param region: samtools region, eg CP022322.1:272773-283180 (1 based, inclusive)
+            :returns: (chromosome, start, end), 0 based half open
+        """
+        chromosome, coordinates = region.rsplit(':', 1)
+        start, end = coordinates.replace(',', '').split('-')
+        return chromosome, int(start) - 1, int(end)
+
+    @staticmethod
+    def intervalIndex(interval_list):
+        """
+            :param interval_list: [(chromosome, start, end, strand), ...]
+            :returns: {chromosome: ([starts], [(start, end, strand)], length of the longest interval)}
+        """
+        interval_index = {}
+        for chromosome, start, end, strand in sorted(interval_list):
+            interval_index.setdefault(chromosome, []).append((start, end, strand))
+        return {chromosome: ([start for start, _, _ in chromosome_interval_list], chromosome_interval_list,
+                             max(end - start for start, end, _ in chromosome_interval_list))
+                for chromosome, chromosome_interval_list in interval_index.items()}
+
+    @staticmethod
+    def readGffIntervals(gff_path, feature=None, name=None):
+        """
+            :param gff_path: path to a gff or gtf
+            :param feature: only lines of this feature type (the third column), eg CDS. Default is every line
+            :param name: only lines which contain this string, eg a gene id (as grep <name> <gff>)
+            :returns: [(chromosome, start, end, strand), ...], 0 based half open
+        """
+        interval_list = []
+        with open(gff_path, 'r') as gff_file:
+            for line in gff_file:
+                if line.startswith('#') or (name is not None and name not in line):
+                    continue
+                line_split = line.rstrip('\n').split('\t')
+                if len(line_split) < 7 or (feature is not None and line_split[2] != feature):
+                    continue
+                interval_list.append((line_split[0], int(line_split[3]) - 1, int(line_split[4]), line_split[6]))
+        return interval_list
+
+    @staticmethod
+    def readBedIntervals(bed_path):
+        """
+            :param bed_path: path to a bed file
+            :returns: [(chromosome, start, end), ...]
+        """
+        interval_list = []
+        with open(bed_path, 'r') as bed_file:
+            for line in bed_file:
+                if line.startswith(('#', 'track', 'browser')) or not line.strip():
+                    continue
+                line_split = line.split('\t')
+                interval_list.append((line_split[0], int(line_split[1]), int(line_split[2])))
+        return interval_list
+
+    def scan(self):
+        """
+            read every alignment of bam_path once, and set the counters and coverage_cache
+            :returns: self
+            :raises: FileNotFoundError if bam_path does not exist, or neither pysam nor samtools is available
+        """
+        try:
+            import pysam
+        except ImportError:
+            import subprocess
+            logging.getLogger(__name__).warning('pysam is not installed -- reading %s from samtools view -h, which is '
+                                                'several times slower. See rnaseq_pipeline_environment.yml'
+                                                % self.bam_path)
+            samtools_view = subprocess.Popen(['samtools', 'view', '-h', self.bam_path], stdout=subprocess.PIPE,
+                                             universal_newlines=True)
+            try:
+                self.scanSamLines(samtools_view.stdout)
+            finally:
+                samtools_view.stdout.close()
+                if samtools_view.wait() != 0:
+                    raise FileNotFoundError('samtools view failed on %s' % self.bam_path)
+            return self
+        with pysam.AlignmentFile(self.bam_path, 'rb') as bam_file:
+            self.beginScan(dict(zip(bam_file.references, bam_file.lengths)))
+            for read in bam_file.fetch(until_eof=True):
+                tag_dict = {tag: read.get_tag(tag) for tag in ('ZS', 'HI', 'XF') if read.has_tag(tag)}
+                self.addAlignment(read.flag, read.reference_name, read.reference_start,
+                                  read.reference_end if read.reference_end is not None else read.reference_start,
+                                  read.mapping_quality, read.get_blocks(), tag_dict)
+        return self.endScan()
+
+    def scanSamLines(self, sam_line_iterable):
+        """
+            scan alignments in SAM text format, eg the output of samtools view -h. The chromosome lengths are read from
+            the @SQ header lines, where present
+            :param sam_line_iterable: iterable of SAM lines
+            :returns: self
+        """
+        self.beginScan()
+        for line in sam_line_iterable:
+            if not line.startswith('@'):
+                self.addSamLine(line)
+            elif line.startswith('@SQ'):
+                field_dict = dict(field.split(':', 1) for field in line.rstrip('\n').split('\t')[1:] if ':' in field)
+                self.chromosome_length_dict[field_dict['SN']] = int(field_dict['LN'])
+        return self.endScan()
+
+    def beginScan(self, chromosome_length_dict=None):
+        """
+            reset the counters
+            :param chromosome_length_dict: {chromosome: length}, eg from the bam header
+        """
+        self.resetCounters()
+        self.chromosome_length_dict = dict(chromosome_length_dict or {})
+
+    def endScan(self):
+        """
+            set coverage_cache from the depth of the aligned blocks, and count the covered bases in each interval set of
+            coverage_interval_dict
+            :returns: self
+        """
+        for chromosome, length in self.chromosome_length_dict.items():
+            self.depthDiff(chromosome, length)
+        metadata_dict = None
+        try:
+            metadata_dict = CoverageCache.bamMetadata(self.bam_path, self.coverage_min_mapq)
+        except FileNotFoundError:
+            pass
+        self.coverage_cache = CoverageCache.fromDepthDiff(self._depth_diff_dict, metadata_dict)
+        self._depth_diff_dict = {}
+        for name, interval_list in self.coverage_interval_dict.items():
+            self.region_bases_dict[name] = sum(end - start for _, start, end in utils.mergeIntervals(interval_list))
+            self.covered_bases_dict[name] = self.coverage_cache.coveredBases(interval_list)
+        return self
+
+    def depthDiff(self, chromosome, end):
+        """
+            :param chromosome: a chromosome
+            :param end: a position on the chromosome
+            :returns: the depth difference array of the chromosome, extended if necessary to hold position end
+        """
+        try:
+            depth_diff = self._depth_diff_dict[chromosome]
+        except KeyError:
+            depth_diff = self._depth_diff_dict[chromosome] = array('i')
+        if len(depth_diff) <= end:
+            depth_diff.frombytes(bytes(depth_diff.itemsize * (
+                max(end, self.chromosome_length_dict.get(chromosome, 0)) + 1 - len(depth_diff))))
+        return depth_diff
+
+    def addSamLine(self, sam_line):
+        """
+            :param sam_line: an alignment line of a SAM file
+        """
+        sam_line_split = sam_line.rstrip('\n').split('\t')
+        flag = int(sam_line_split[1])
+        start = int(sam_line_split[3]) - 1
+        # [(start, end), ...] of the M, = and X operations, as pysam get_blocks()
+        block_list = []
+        end = start
+        if sam_line_split[5] != '*':
+            for length, operation in CIGAR_REGEX.findall(sam_line_split[5]):
+                length = int(length)
+                if operation in 'M=X':
+                    block_list.append((end, end + length))
+                    end += length
+                elif operation in 'DN':
+                    end += length
+        tag_dict = {}
+        for tag in sam_line_split[11:]:
+            if tag[:2] in ('ZS', 'HI', 'XF'):
+                tag_dict[tag[:2]] = int(tag[5:]) if tag[3] == 'i' else tag[5:]
+        self.addAlignment(flag, sam_line_split[2], start, end, int(sam_line_split[4]), block_list, tag_dict)
+
+    def addAlignment(self, flag, chromosome, start, end, mapq, block_list, tag_dict):
+        """
+            update the counters with one alignment
+            :param flag: sam flag
+            :param chromosome: reference name
+            :param start: 0 based leftmost reference position
+            :param end: reference position one past the last aligned base (the end of the span, including D and N)
+            :param mapq: mapping quality
+            :param block_list: [(start, end), ...] of the aligned blocks
+            :param tag_dict: {tag: value} of at least the ZS, HI and XF tags of the alignment, where present
+        """
+        self.alignment_count += 1
+        is_forward = not flag & 0x10
+        is_multi = tag_dict.get('ZS') == 'R'
+        xf_tag = tag_dict.get('XF')
+        if xf_tag is not None and 'ambiguous' in xf_tag and 'CKF44' in xf_tag and 'CNAG' not in xf_tag:
+            self.ambiguous_protein_coding += 1
+        if flag & 0x4:
+            return
+        if self.rrna_region is not None and chromosome == self.rrna_region[0] and \
+                start < self.rrna_region[2] and end > self.rrna_region[1]:
+            if not is_multi:
+                self.unique_rrna['all'] += 1
+                self.unique_rrna['forward'] += is_forward
+            elif tag_dict.get('HI') == 1:
+                self.primary_multi_rrna['all'] += 1
+                self.primary_multi_rrna['forward'] += is_forward
+        if not is_multi and chromosome in self._noncoding_interval_dict and end > start:
+            start_list, interval_list, max_length = self._noncoding_interval_dict[chromosome]
+            min_overlap = self.noncoding_min_overlap_fraction * (end - start)
+            read_strand = '+' if is_forward else '-'
+            for interval_start, interval_end, interval_strand in \
+                    interval_list[bisect_left(start_list, start - max_length):bisect_left(start_list, end)]:
+                if min(end, interval_end) - max(start, interval_start) >= min_overlap:
+                    self.unique_trna_ncrna['unstranded'] += 1
+                    self.unique_trna_ncrna['stranded'] += read_strand == interval_strand
+        if mapq >= self.coverage_min_mapq and not flag & DEPTH_EXCLUDE_FLAG and block_list:
+            depth_diff = self.depthDiff(chromosome, block_list[-1][1])
+            for block_start, block_end in block_list:
+                depth_diff[block_start] += 1
+                depth_diff[block_end] -= 1
+
+    def nonCodingRnaCounts(self, strandedness):
+        """
+            :param strandedness: 'no' or 'reverse', according to the library prep
+            :returns: total_rRNA (unique + primary multi), unique_rRNA and unique_tRNA_ncRNA
+        """
+        if strandedness not in ['no', 'reverse']:
+            raise ValueError('UnrecognizedStrandedness: %s' % strandedness)
+        strand_key = 'forward' if strandedness == 'reverse' else 'all'
+        unique_rrna = self.unique_rrna[strand_key]
+        unique_trna_ncrna = self.unique_trna_ncrna['stranded' if strandedness == 'reverse' else 'unstranded']
+        return unique_rrna + self.primary_multi_rrna[strand_key], unique_rrna, unique_trna_ncrna
+
+    def coverageFraction(self, name, num_bases_in_region=None):
+        """
+            :param name: a key of coverage_interval_dict
+            :param num_bases_in_region: the denominator. Default is the number of bases in the merged intervals
+            :returns: the fraction of bases in the interval set covered by at least one alignment, or None if the interval
+                      set is empty
+            :raises: KeyError if name is not in coverage_interval_dict
+        """
+        num_bases_in_region = num_bases_in_region or self.region_bases_dict[name]
+        if not num_bases_in_region:
+            return None
+        return self.covered_bases_dict[name] / float(num_bases_in_region)
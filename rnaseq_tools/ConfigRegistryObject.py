@@ -0,0 +1,120 @@
+import os
+from collections.abc import Mapping
+from types import MappingProxyType
+
+
+class ConfigSection(Mapping):
+    """
+        immutable view of a single [section] of a .ini file. Keys are case insensitive (as in configparser). Values are
+        typed -- ints and floats are converted on parsing, everything else is a string. The string as written in the file
+        is available from raw() (eg for paths, or for values such as run numbers with leading zeros)
+    """
+
+    def __init__(self, name, raw_dict):
+        """
+            :param name: name of the section, eg StandardData
+            :param raw_dict: {key: value} as read by configparser. keys are expected to already be lower case
+        """
+        self.name = name
+        self._raw_dict = MappingProxyType(dict(raw_dict))
+        self._typed_dict = MappingProxyType({key: ConfigRegistry.convertValue(value) for key, value in raw_dict.items()})
+
+    def __getitem__(self, key):
+        return self._typed_dict[key.lower()]
+
+    def __iter__(self):
+        return iter(self._typed_dict)
+
+    def __len__(self):
+        return len(self._typed_dict)
+
+    def __repr__(self):
+        return 'ConfigSection(%s, %s)' % (self.name, dict(self._typed_dict))
+
+    def raw(self, key):
+        """
+            :param key: a key in the section (case insensitive)
+            :returns: the value of key as the string read from the .ini file
+        """
+        return self._raw_dict[key.lower()]
+
+    def rawItems(self):
+        """
+            :returns: the (key, value) pairs of the section with the values as the strings read from the .ini file
+        """
+        return self._raw_dict.items()
+
+
+class ConfigRegistry:
+    """
+        process wide cache of parsed .ini files (eg rnaseq_pipeline_config.ini, genome_files/<organism>/OrganismData_config.ini).
+        Each file is parsed once per (path, mtime) -- if the file is modified, it is re-parsed on the next request.
+        usage:
+            qual_assess_1_dict = ConfigRegistry.getSection(config_file, 'KN99QualityAssessOne')
+            qual_assess_1_dict['PROTEIN_CODING_TOTAL_THRESHOLD']  # an int
+    """
+    # {absolute path: (mtime_ns, {section name: ConfigSection})}
+    _config_cache = {}
+
+    @classmethod
+    def getConfig(cls, config_file):
+        """
+            parse (or retrieve from the cache) config_file
+            :param config_file: path to a .ini file
+            :raises: FileNotFoundError if config_file does not exist
+            :returns: an immutable mapping {section name: ConfigSection}
+        """
+        config_path = os.path.abspath(config_file)
+        mtime = os.stat(config_path).st_mtime_ns
+        try:
+            cached_mtime, section_dict = cls._config_cache[config_path]
+            if cached_mtime == mtime:
+                return section_dict
+        except KeyError:
+            pass
+        section_dict = cls.parseConfig(config_path)
+        cls._config_cache[config_path] = (mtime, section_dict)
+        return section_dict
+
+    @classmethod
+    def getSection(cls, config_file, section):
+        """
+            :param config_file: path to a .ini file
+            :param section: the [section] header, eg OrganismData
+            :raises: FileNotFoundError if config_file does not exist, KeyError if section is not in config_file
+            :returns: a ConfigSection
+        """
+        return cls.getConfig(config_file)[section]
+
+    @classmethod
+    def clearCache(cls):
+        """
+            forget all parsed files
+        """
+        cls._config_cache = {}
+
+    @staticmethod
+    def parseConfig(config_path):
+        """
+            parse config_path with configparser
+            :param config_path: path to a .ini file
+            :returns: an immutable mapping {section name: ConfigSection}
+        """
+        import configparser
+        config = configparser.ConfigParser()
+        config.read(config_path)
+        return MappingProxyType({section: ConfigSection(section, config[section]) for section in config.sections()})
+
+    @staticmethod
+    def convertValue(value):
+        """
+            convert a config value to an int or float, if possible
+            :param value: a string read from a .ini file
+            :returns: value as int, float or (if neither) the original string
+        """
+        for value_type in (int, float):
+            try:
+                return value_type(value)
+            except ValueError:
+                pass
+        return value
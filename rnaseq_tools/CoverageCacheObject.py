@@ -0,0 +1,182 @@
+"""
+   genome wide read depth of a bam, computed once (see BamMetrics) and stored as a compressed .npz next to the bam, so
+   that every coverage question (intergenic, exonic, per gene CDS, NAT and G418 coverage) is answered from one compact
+   array rather than a samtools depth -aa -Q 10 over the bam per question. The depth is that of samtools depth -Q 10: the
+   number of alignments with mapq >= 10 which are not unmapped, secondary, qc fail or duplicate, and which align (M, = or
+   X) to the base. Depth is stored as uint16, and is capped at 65535.
+
+   A cache records the size and mtime of the bam it was built from, and is not loaded if the bam has changed.
+
+   usage: coverage_cache = CoverageCache.forBam(bam_path)  # loads <bam_path>.coverage.npz, or scans the bam and writes it
+          intergenic_coverage = coverage_cache.coverageFraction(BamMetrics.readBedIntervals(intergenic_bed))
+"""
+import os
+import json
+import tempfile
+import numpy as np
+from rnaseq_tools import utils
+
+
+class CoverageCache:
+    # increment if the format of the .npz changes
+    coverage_cache_version = 1
+    # key of the metadata json in the .npz. Every other key is a chromosome
+    metadata_key = '__metadata__'
+    # the maximum stored depth
+    max_depth = np.iinfo(np.uint16).max
+
+    def __init__(self, depth_dict, metadata_dict=None):
+        """
+            :param depth_dict: {chromosome: uint16 array of the depth at each (0 based) position}
+            :param metadata_dict: {'bam_size', 'bam_mtime_ns', 'min_mapq', 'version'}. see bamMetadata()
+        """
+        self.depth_dict = depth_dict
+        self.metadata_dict = metadata_dict or {}
+        # {chromosome: int64 array, where [i] is the number of covered bases before position i}. see coveredBases()
+        self._prefix_sum_dict = {}
+
+    @staticmethod
+    def cachePath(bam_path):
+        """
+            :param bam_path: path to a bam
+            :returns: path to the bam's coverage cache, eg /path/to/sample_1.bam.coverage.npz
+        """
+        return bam_path + '.coverage.npz'
+
+    @classmethod
+    def bamMetadata(cls, bam_path, min_mapq):
+        """
+            :param bam_path: path to a bam
+            :param min_mapq: the minimum mapq of an alignment counted in the depth
+            :returns: the metadata_dict of a cache built from the bam as it is now
+            :raises: FileNotFoundError if bam_path does not exist
+        """
+        bam_stat = os.stat(bam_path)
+        return {'bam_size': bam_stat.st_size, 'bam_mtime_ns': bam_stat.st_mtime_ns, 'min_mapq': min_mapq,
+                'version': cls.coverage_cache_version}
+
+    @classmethod
+    def fromDepthDiff(cls, depth_diff_dict, metadata_dict=None):
+        """
+            :param depth_diff_dict: {chromosome: sequence of ints, +1 at the start and -1 at the end of every aligned block},
+                                    one longer than the chromosome
+            :param metadata_dict: see __init__()
+            :returns: a CoverageCache
+        """
+        depth_dict = {}
+        for chromosome, depth_diff in depth_diff_dict.items():
+            depth = np.cumsum(np.asarray(depth_diff, dtype=np.int64))[:-1]
+            depth_dict[chromosome] = np.minimum(depth, cls.max_depth).astype(np.uint16)
+        return cls(depth_dict, metadata_dict)
+
+    @classmethod
+    def load(cls, bam_path, min_mapq=10, cache_path=None):
+        """
+            :param bam_path: path to a bam
+            :param min_mapq: see bamMetadata()
+            :param cache_path: default cachePath(bam_path)
+            :returns: the cached CoverageCache of the bam, or None if there is none, or it is of another version, min_mapq
+                      or state of the bam
+        """
+        cache_path = cache_path or cls.cachePath(bam_path)
+        try:
+            with np.load(cache_path, allow_pickle=False) as cache_npz:
+                metadata_dict = json.loads(str(cache_npz[cls.metadata_key]))
+                if metadata_dict != cls.bamMetadata(bam_path, min_mapq):
+                    return None
+                depth_dict = {chromosome: cache_npz[chromosome] for chromosome in cache_npz.files
+                              if chromosome != cls.metadata_key}
+        except (OSError, ValueError, KeyError):
+            return None
+        return cls(depth_dict, metadata_dict)
+
+    def save(self, cache_path):
+        """
+            write the cache to a temporary file in the same directory, and replace cache_path with it, so that a reader
+            never sees a partially written cache
+            :param cache_path: eg cachePath(bam_path)
+            :raises: OSError if the directory is not writable
+        """
+        array_dict = dict(self.depth_dict)
+        array_dict[self.metadata_key] = np.array(json.dumps(self.metadata_dict))
+        tmp_file_descriptor, tmp_path = tempfile.mkstemp(suffix='.npz', dir=os.path.dirname(os.path.abspath(cache_path)))
+        try:
+            with os.fdopen(tmp_file_descriptor, 'wb') as tmp_file:
+                np.savez_compressed(tmp_file, **array_dict)
+            os.replace(tmp_path, cache_path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+    @classmethod
+    def forBam(cls, bam_path, min_mapq=10, logger=None):
+        """
+            :param bam_path: path to a bam
+            :param min_mapq: see bamMetadata()
+            :param logger: if passed, a cache which cannot be written is logged
+            :returns: the CoverageCache of the bam, loaded from cachePath(bam_path) if it is current, or otherwise computed
+                      with BamMetrics and written there
+        """
+        coverage_cache = cls.load(bam_path, min_mapq)
+        if coverage_cache is None:
+            from rnaseq_tools.BamMetricsObject import BamMetrics
+            bam_metrics = BamMetrics(bam_path)
+            bam_metrics.coverage_min_mapq = min_mapq
+            coverage_cache = bam_metrics.scan().coverage_cache
+            coverage_cache.saveNextToBam(bam_path, logger)
+        return coverage_cache
+
+    def saveNextToBam(self, bam_path, logger=None):
+        """
+            save() to cachePath(bam_path). A bam in a read only directory (eg on lts) is not an error -- the cache is then
+            only held in memory
+            :param bam_path: path to the bam the cache was built from
+            :param logger: see forBam()
+            :returns: True if the cache was written
+        """
+        try:
+            self.save(self.cachePath(bam_path))
+        except OSError as error:
+            if logger is not None:
+                logger.info('coverage cache of %s not written: %s' % (bam_path, error))
+            return False
+        return True
+
+    def prefixSum(self, chromosome):
+        """
+            :param chromosome: a chromosome of depth_dict
+            :returns: int64 array one longer than the chromosome, where [i] is the number of covered bases before position i
+        """
+        if chromosome not in self._prefix_sum_dict:
+            prefix_sum = np.zeros(len(self.depth_dict[chromosome]) + 1, dtype=np.int64)
+            np.cumsum(self.depth_dict[chromosome] > 0, out=prefix_sum[1:])
+            self._prefix_sum_dict[chromosome] = prefix_sum
+        return self._prefix_sum_dict[chromosome]
+
+    def coveredBases(self, interval_list):
+        """
+            :param interval_list: [(chromosome, start, end, ...), ...], 0 based half open. Overlapping intervals are merged
+            :returns: the number of bases in the intervals with a depth of at least 1
+        """
+        merged_interval_dict = {}
+        for chromosome, start, end in utils.mergeIntervals(interval_list):
+            merged_interval_dict.setdefault(chromosome, []).append((start, end))
+        covered_bases = 0
+        for chromosome, chromosome_interval_list in merged_interval_dict.items():
+            if chromosome not in self.depth_dict:
+                continue
+            prefix_sum = self.prefixSum(chromosome)
+            interval_array = np.clip(np.array(chromosome_interval_list, dtype=np.int64), 0, len(prefix_sum) - 1)
+            covered_bases += int((prefix_sum[interval_array[:, 1]] - prefix_sum[interval_array[:, 0]]).sum())
+        return covered_bases
+
+    def coverageFraction(self, interval_list, num_bases_in_region=None):
+        """
+            :param interval_list: see coveredBases()
+            :param num_bases_in_region: the denominator. Default is the number of bases in the merged intervals
+            :returns: the fraction of bases in the intervals with a depth of at least 1, or None if there are no bases
+        """
+        num_bases_in_region = num_bases_in_region or sum(end - start for _, start, end in utils.mergeIntervals(interval_list))
+        if not num_bases_in_region:
+            return None
+        return self.coveredBases(interval_list) / float(num_bases_in_region)
@@ -1,5 +1,5 @@
-import configparser
 from rnaseq_tools import utils
+from rnaseq_tools.ConfigRegistryObject import ConfigRegistry
 from rnaseq_tools.CryptoQualityAssessmentObject import CryptoQualityAssessmentObject
 import numpy as np
 import pandas as pd
@@ -20,32 +20,30 @@ class CryptoQualAssessAuditObject(CryptoQualityAssessmentObject):
         # create logger
         self.logger = utils.createStandardObjectChildLogger(self, __name__)
 
-        # extract threshold/status from config file #TODO: move to constructor
-        qual_assess_config = configparser.ConfigParser()
-        qual_assess_config.read(self.config_file)
-        qual_assess_1_dict = qual_assess_config['KN99QualityAssessOne']
+        # extract threshold/status from config file. values are already typed (int/float), see ConfigRegistryObject
+        qual_assess_1_dict = ConfigRegistry.getSection(self.config_file, 'KN99QualityAssessOne')
 
         # extract thresholds #TODO: CLEAN UP TO DICTIONARY, AUTOMATICALLY EXTRACT
-        self.protein_coding_total_threshold = int(qual_assess_1_dict['PROTEIN_CODING_TOTAL_THRESHOLD'])
-        self.not_aligned_total_percent_threshold = float(qual_assess_1_dict['NOT_ALIGNED_TOTAL_PERCENT_THRESHOLD'])
-        self.perturbed_coverage_threshold = float(qual_assess_1_dict['PERTURBED_COVERAGE_THRESHOLD'])
-        self.nat_expected_coverage_threshold = float(qual_assess_1_dict['NAT_EXPECTED_COVERAGE_THRESHOLD'])
-        self.nat_expected_log2cpm_threshold = float(qual_assess_1_dict['NAT_EXPECTED_LOG2CPM_THRESHOLD'])
-        self.nat_unexpected_coverage_threshold = float(qual_assess_1_dict['NAT_UNEXPECTED_COVERAGE_THRESHOLD'])
-        self.nat_unexpected_log2cpm_threshold = float(qual_assess_1_dict['NAT_UNEXPECTED_LOG2CPM_THRESHOLD'])
-        self.g418_log2cpm_threshold = float(qual_assess_1_dict['G418_LOG2CPM_THRESHOLD'])
-        self.overexpression_fow_threshold = float(qual_assess_1_dict['OVEREXPRESSION_FOW_THRESHOLD'])
+        self.protein_coding_total_threshold = qual_assess_1_dict['PROTEIN_CODING_TOTAL_THRESHOLD']
+        self.not_aligned_total_percent_threshold = qual_assess_1_dict['NOT_ALIGNED_TOTAL_PERCENT_THRESHOLD']
+        self.perturbed_coverage_threshold = qual_assess_1_dict['PERTURBED_COVERAGE_THRESHOLD']
+        self.nat_expected_coverage_threshold = qual_assess_1_dict['NAT_EXPECTED_COVERAGE_THRESHOLD']
+        self.nat_expected_log2cpm_threshold = qual_assess_1_dict['NAT_EXPECTED_LOG2CPM_THRESHOLD']
+        self.nat_unexpected_coverage_threshold = qual_assess_1_dict['NAT_UNEXPECTED_COVERAGE_THRESHOLD']
+        self.nat_unexpected_log2cpm_threshold = qual_assess_1_dict['NAT_UNEXPECTED_LOG2CPM_THRESHOLD']
+        self.g418_log2cpm_threshold = qual_assess_1_dict['G418_LOG2CPM_THRESHOLD']
+        self.overexpression_fow_threshold = qual_assess_1_dict['OVEREXPRESSION_FOW_THRESHOLD']
 
         # extract status
-        self.protein_coding_total_bit_status = int(qual_assess_1_dict['PROTEIN_CODING_TOTAL_STATUS'])
-        self.not_aligned_total_percent_bit_status = int(qual_assess_1_dict['NOT_ALIGNED_TOTAL_PERCENT_STATUS'])
-        self.perturbed_coverage_bit_status = int(qual_assess_1_dict['PERTURBED_COVERAGE_STATUS'])
-        self.nat_expected_marker_status = int(qual_assess_1_dict['NAT_EXPECTED_MARKER_STATUS'])
-        self.nat_unexpected_marker_status = int(qual_assess_1_dict['NAT_UNEXPECTED_MARKER_STATUS'])
-        self.g418_expected_marker_status = int(qual_assess_1_dict['G418_EXPECTED_MARKER_STATUS'])
-        self.g418_unexpected_marker_status = int(qual_assess_1_dict['G418_UNEXPECTED_MARKER_STATUS'])
-        self.overexpression_fow_status = int(qual_assess_1_dict['OVEREXPRESSION_FOW_STATUS'])
-        self.no_metadata_marker_status = int(qual_assess_1_dict['NO_METADATA_MARKER_STATUS'])
+        self.protein_coding_total_bit_status = qual_assess_1_dict['PROTEIN_CODING_TOTAL_STATUS']
+        self.not_aligned_total_percent_bit_status = qual_assess_1_dict['NOT_ALIGNED_TOTAL_PERCENT_STATUS']
+        self.perturbed_coverage_bit_status = qual_assess_1_dict['PERTURBED_COVERAGE_STATUS']
+        self.nat_expected_marker_status = qual_assess_1_dict['NAT_EXPECTED_MARKER_STATUS']
+        self.nat_unexpected_marker_status = qual_assess_1_dict['NAT_UNEXPECTED_MARKER_STATUS']
+        self.g418_expected_marker_status = qual_assess_1_dict['G418_EXPECTED_MARKER_STATUS']
+        self.g418_unexpected_marker_status = qual_assess_1_dict['G418_UNEXPECTED_MARKER_STATUS']
+        self.overexpression_fow_status = qual_assess_1_dict['OVEREXPRESSION_FOW_STATUS']
+        self.no_metadata_marker_status = qual_assess_1_dict['NO_METADATA_MARKER_STATUS']
 
         self.auditQualAssessDataframe()
 
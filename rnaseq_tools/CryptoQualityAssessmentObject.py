@@ -1,9 +1,9 @@
 import os
 import sys
-import subprocess
 import pandas as pd
 from rnaseq_tools import utils
 from rnaseq_tools.QualityAssessmentObject import QualityAssessmentObject
+from rnaseq_tools.BamMetricsObject import BamMetrics
 
 # turn off SettingWithCopyWarning in pandas
 pd.options.mode.chained_assignment = None
@@ -11,6 +11,8 @@ pd.options.mode.chained_assignment = None
 # TODO: CALCULATE COVERAGE ONCE, STORE AS BED FILE, USE BED RATHER THAN QUANTIFYING BAM EVERYTIME
 # TODO: EXTRACT FILEPATHS FOR EG LOG2CPM MUCH MORE CLEARLY, ERROR CHECK (put this in QualityAssessObject, eg)
 class CryptoQualityAssessmentObject(QualityAssessmentObject):
+    # see QualityAssessmentObject.readMetricCache()
+    metric_version = 1
 
     def __init__(self, expected_attributes=None, **kwargs):
         # add expected attributes to super._attributes
@@ -34,13 +36,13 @@ class CryptoQualityAssessmentObject(QualityAssessmentObject):
                              'INTERGENIC_COVERAGE', 'NOT_ALIGNED_TOTAL_PERCENT', 'GENOTYPE1_COVERAGE', 'GENOTYPE1_LOG2CPM',
                              'GENOTYPE2_COVERAGE', 'GENOTYPE2_LOG2CPM', 'OVEREXPRESSION_FOW', 'NAT_COVERAGE', 'NAT_LOG2CPM', 'G418_COVERAGE',
                              'G418_LOG2CPM', 'NO_MAP_PERCENT', 'HOMOPOLY_FILTER_PERCENT', 'READ_LENGTH_FILTER_PERCENT',
-                             'TOO_LOW_AQUAL_PERCENT', 'rRNA_PERCENT', 'nctrRNA_PERCENT']
+                             'TOO_LOW_AQUAL_PERCENT', 'rRNA_PERCENT', 'nctrRNA_PERCENT', 'QA_ERROR']
 
         print('Quantifying noncoding rRNA (rRNA, tRNA and ncRNA)')
         # extract rRNA, tRNA and ncRNA quantification for crypto from bam files -- this takes a long time
         ncRNA_df = self.quantifyNonCodingRna(self.qual_assess_df)
-        # merge this into the self.qual_assess_df
-        self.qual_assess_df = pd.merge(self.qual_assess_df, ncRNA_df, on='FASTQFILENAME')
+        # merge this into the self.qual_assess_df. a sample whose bam could not be scanned is kept, see QA_ERROR
+        self.qual_assess_df = pd.merge(self.qual_assess_df, ncRNA_df, how='left', on='FASTQFILENAME')
         print('Quantifying intergenic coverage')
         self.qual_assess_df = self.calculateIntergenicCoverage(self.qual_assess_df)
         # if coverage_check_flag true, check coverage of perturbed genes
@@ -50,6 +52,8 @@ class CryptoQualityAssessmentObject(QualityAssessmentObject):
                 self.qual_assess_df = pd.merge(self.qual_assess_df, coverage_df, how='left', on='FASTQFILENAME')
         except AttributeError:
             self.logger.info('query_df or coverage_check_flag not present -- no coverage check')
+        # store the metrics of the assessed samples, and add the cached rows of the rest. see readMetricCache()
+        self.qual_assess_df = self.mergeCachedMetrics(self.qual_assess_df)
         # format the self.qual_assess_df dataframe
         self.qual_assess_df = self.formatQualAssessDataFrame(self.qual_assess_df)
 
@@ -99,6 +103,8 @@ class CryptoQualityAssessmentObject(QualityAssessmentObject):
         # present EFFECTIVE_UNIQUE_ALIGNMENT as percent of library size (make sure this is the last step
         qual_assess_df['EFFECTIVE_UNIQUE_ALIGNMENT_PERCENT'] = qual_assess_df['EFFECTIVE_UNIQUE_ALIGNMENT'] / \
                                                                qual_assess_df['LIBRARY_SIZE'].astype(float)
+        # the per sample errors, see recordSampleError()
+        qual_assess_df = self.addSampleErrorColumn(qual_assess_df)
         # below is a messy way of ensuring that all expected columns are present, even if there is not a value (eg, if a sample has no over expression)
         for column in self.column_order:
             try:
@@ -115,13 +121,11 @@ class CryptoQualityAssessmentObject(QualityAssessmentObject):
         num_reads_to_ncRNA_dict = {}
         # set threshold to determine strandedness. note that there is an email from holly to yiming mentioning 10.25.2015. That is the best record we have, if htis message remains
         strandedness_date_threshold = pd.to_datetime('10.01.2015')
-        kn99_tRNA_ncRNA_annotations = os.path.join(self.genome_files, 'KN99', 'ncRNA_tRNA_no_rRNA.gff')
         if hasattr(self, 'query_df'):
             for index, row in qual_assess_df.iterrows():
                 try:
                     # extract genotype1
                     genotype = [self.extractInfoFromQuerySheet(row['FASTQFILENAME'], 'genotype1'), None]
-                    #genotype = [list(self.query_df[self.query_df['fastqFileName'].str.contains(row['FASTQFILENAME'] + '.fastq.gz')]['genotype1'])[0]]
                 except ValueError:
                     self.logger.info('genotype cannot be extracted with the fastq filename in this row. Note: if there are null entries in the column fastqFileNames, this is the cause. those need to be remedied or removed in order for this to work: %s' %row)
                 try:
@@ -137,7 +141,7 @@ class CryptoQualityAssessmentObject(QualityAssessmentObject):
                     # use this to extract bam_path
                     try:
                         # bam_file_list is inherited
-                        bam_path = [bam_file for bam_file in self.bam_file_list if fastq_simple_name in bam_file][0]
+                        bam_path = self.bamPath(fastq_simple_name)
                     except IndexError:
                         self.logger.info('%s not in bam_file_list' % fastq_simple_name)
                         continue
@@ -147,19 +151,24 @@ class CryptoQualityAssessmentObject(QualityAssessmentObject):
                     except FileNotFoundError:
                         self.logger.error('bam file not found %s' % bam_path)
                         print('bam file not found: %s' % bam_path)
-                    library_date = list(self.query_df[self.query_df['fastqFileName'].str.contains(row['FASTQFILENAME'] + '.fastq.gz')]['libraryDate'])[0]
-                    row_date_time = pd.to_datetime(library_date)
-                    strandedness = 'no' if row_date_time < strandedness_date_threshold else 'reverse'
-                    total_rRNA, unique_rRNA = self.totalrRNA(bam_path, 'CP022322.1:272773-283180', strandedness)
-                    unique_tRNA_ncRNA = self.totaltRNAncRNA(bam_path, kn99_tRNA_ncRNA_annotations, strandedness)
+                    try:
+                        library_date = self.extractInfoFromQuerySheet(row['FASTQFILENAME'], 'libraryDate')
+                        row_date_time = pd.to_datetime(library_date)
+                        strandedness = 'no' if row_date_time < strandedness_date_threshold else 'reverse'
+                        with utils.timedEvent(self.logger, 'quantify_noncoding_rna', sample=fastq_simple_name):
+                            total_rRNA, unique_rRNA, unique_tRNA_ncRNA = \
+                                self.bamMetrics(fastq_simple_name).nonCodingRnaCounts(strandedness)
+                    except Exception as error:
+                        self.recordSampleError(fastq_simple_name, 'quantify_noncoding_rna', error)
+                        continue
                     num_reads_to_ncRNA_dict.setdefault(fastq_simple_name,
                                                        {'total_rRNA': total_rRNA, 'unique_rRNA': unique_rRNA,
                                                         'total_tRNA_ncRNA': unique_tRNA_ncRNA})
 
-        # create dataframe from num_reads_to_ncRNA_dict
-        ncRNA_df = pd.DataFrame.from_dict(num_reads_to_ncRNA_dict, orient='index').reset_index()
-        # format column headers
-        ncRNA_df.columns = ['FASTQFILENAME', 'TOTAL_rRNA', 'UNIQUE_rRNA', 'UNIQUE_tRNA_ncRNA']
+        # create dataframe from num_reads_to_ncRNA_dict, in the order of qual_assess_df
+        ncRNA_df = pd.DataFrame([[fastq_simple_name] + list(count_dict.values())
+                                 for fastq_simple_name, count_dict in num_reads_to_ncRNA_dict.items()],
+                                columns=['FASTQFILENAME', 'TOTAL_rRNA', 'UNIQUE_rRNA', 'UNIQUE_tRNA_ncRNA'])
 
         return ncRNA_df
 
@@ -276,23 +285,94 @@ class CryptoQualityAssessmentObject(QualityAssessmentObject):
 
     def uniqueAmbiguousProteinCodingCount(self, fastq_simplename):
         """
-            intersect bed file with protein coding coords with an alignment file with the htseq annotations added (in this case, grep out __ambiguous)
+            count the alignments which htseq marked __ambiguous between CKF44 (protein coding) genes only. see bamMetrics()
             :params fastq_simplename: fastq filename minus any path and extention eg /path/to/my_reads_R1.fastq.gz would be my_reads_R1
-            :returns: the number of reads (lines) aligning to protein coding coordinates
+            :returns: the number of reads (lines) aligning to protein coding coordinates, or None if there is no bam
         """
-        # TODO: MAKE THE TRY/CATCH STATEMENT BELOW A FUNCTION AND REPLACE ALL INSTANCES WITH FUNCTION CALL
-
-        # extract bam file from bam_file_list using fastq simple name
         try:
-            bam_file = [bam_file for bam_file in self.bam_file_list if fastq_simplename in bam_file][0]
+            return self.bamMetrics(fastq_simplename).ambiguous_protein_coding
         except IndexError:
             self.logger.debug('bam file not found for %s' % fastq_simplename)  # TODO: improve this logging
 
-        # grep out lines that are ambiguous and map to CKF44 reads (and only CKF44 -- no CNAG)
-        extract_ambiguous_protein_coding_reads_cmd = 'samtools view %s| grep ambiguous | grep CKF44| grep -v CNAG| wc -l' % bam_file
-        ambiguous_protein_coding_count = int(subprocess.getoutput(extract_ambiguous_protein_coding_reads_cmd))
+    def bamMetrics(self, fastq_simple_name):
+        """
+            scan the sample's bam once for the counts used by quantifyNonCodingRna(), uniqueAmbiguousProteinCodingCount(),
+            calculateIntergenicCoverage() and perturbedCheck() -- the rRNA at CP022322.1:272773-283180, the tRNA and ncRNA
+            in genome_files/KN99/ncRNA_tRNA_no_rRNA.gff, and the coverage of the intergenic regions and of the CDS of the
+            markers and the sample's genotypes. The result is kept, so each bam is read once per object. The genome wide
+            depth is written next to the bam for coverageCache(). The bams of the object are usually scanned up front, in
+            a pool of self.workers processes -- see scanBamMetrics()
+            :param fastq_simple_name: fastq filename without path or extension
+            :returns: a scanned BamMetrics
+            :raises: IndexError if the sample is not in bam_file_list. The error of the scan if the bam could not be read
+        """
+        bam_path = self.bamPath(fastq_simple_name)
+        if bam_path not in self._bam_metrics_dict:
+            self.scanBamMetrics([fastq_simple_name])
+        bam_metrics, error = self._bam_metrics_dict[bam_path]
+        if error is not None:
+            raise error
+        return bam_metrics
+
+    def bamMetricsArguments(self, fastq_simple_name):
+        """
+            :param fastq_simple_name: fastq filename without path or extension
+            :returns: (path to the sample's bam, the keyword arguments of its BamMetrics). see bamMetrics()
+            :raises: IndexError if the sample is not in bam_file_list
+        """
+        bam_path = self.bamPath(fastq_simple_name)
+        coverage_interval_dict = {}
+        try:
+            coverage_interval_dict['INTERGENIC'] = BamMetrics.readBedIntervals(
+                os.path.join(self.genome_files, 'KN99', self.intergenic_region_bed))
+        except (AttributeError, FileNotFoundError):
+            self.logger.critical('intergenic region bed not found -- no INTERGENIC_COVERAGE for %s' % fastq_simple_name)
+        gene_list = ['CNAG_NAT', 'CNAG_G418']
+        for genotype_column in ['genotype1', 'genotype2']:
+            try:
+                genotype = self.extractInfoFromQuerySheet(fastq_simple_name, genotype_column)
+            except (KeyError, ValueError):
+                continue
+            if genotype.startswith('CNAG') and genotype != 'CNAG_00000':
+                gene_list.append(genotype.replace('CNAG', 'CKF44'))
+        for gene in gene_list:
+            coverage_interval_dict[gene] = self.featureIntervals('CDS', gene)
+        if 'noncoding' not in self._feature_interval_dict:
+            try:
+                self._feature_interval_dict['noncoding'] = BamMetrics.readGffIntervals(
+                    os.path.join(self.genome_files, 'KN99', 'ncRNA_tRNA_no_rRNA.gff'))
+            except FileNotFoundError:
+                self.logger.critical('genome_files/KN99/ncRNA_tRNA_no_rRNA.gff not found -- UNIQUE_tRNA_ncRNA will be 0')
+                self._feature_interval_dict['noncoding'] = []
+        return bam_path, {'rrna_region': 'CP022322.1:272773-283180',
+                          'noncoding_interval_list': self._feature_interval_dict['noncoding'],
+                          'coverage_interval_dict': coverage_interval_dict}
+
+    def metricKeyInputs(self, count_file):
+        """
+            the log2cpm of the run (see parseGeneCount()), which depends on every sample of the run, the intergenic
+            region bed and ncRNA_tRNA_no_rRNA.gff (see bamMetricsArguments()), and total_intergenic_bases,
+            nat_cds_length and g418_cds_length. see QualityAssessmentObject.readMetricCache()
+            :param count_file: path to the sample's count file, in <run>/count
+            :returns: (list of paths, {config attribute: value}). An attribute which is not set is None
+        """
+        input_path_list = [os.path.join(utils.dirPath(utils.dirPath(count_file)), 'KN99_log2_cpm.csv')]
+        try:
+            input_path_list.extend([os.path.join(self.genome_files, 'KN99', self.intergenic_region_bed),
+                                    os.path.join(self.genome_files, 'KN99', 'ncRNA_tRNA_no_rRNA.gff')])
+        except AttributeError:
+            self.logger.debug('genome_files or intergenic_region_bed not set -- not in the metric cache key')
+        setting_dict = {attribute: getattr(self, attribute, None)
+                        for attribute in ['total_intergenic_bases', 'nat_cds_length', 'g418_cds_length']}
+        return input_path_list, setting_dict
 
-        return ambiguous_protein_coding_count
+    def featureIntervals(self, feature, gene):
+        """
+            :param feature: annotation feature, eg CDS
+            :param gene: gene id in annotation_file, eg CKF44_00001 or CNAG_NAT
+            :returns: [(chromosome, start, end), ...] of the gene's merged features. see AnnotationIndex.geneIntervals()
+        """
+        return self.getAnnotationIndex().geneIntervals(gene, feature)
 
     def calculateIntergenicCoverage(self, qual_assess_df):
         """
@@ -332,13 +412,16 @@ class CryptoQualityAssessmentObject(QualityAssessmentObject):
 
                 # extract intergenic_bases_covered from the bam file
                 try:
-                    bam_file = [bam_file for bam_file in self.bam_file_list if str(row['FASTQFILENAME']) in bam_file][0]
-                except IndexError:
+                    with utils.timedEvent(self.logger, 'intergenic_coverage', sample=row['FASTQFILENAME']):
+                        num_intergenic_bases_covered = \
+                            self.bamMetrics(str(row['FASTQFILENAME'])).covered_bases_dict['INTERGENIC']
+                except (IndexError, KeyError):
                     self.logger.debug(
-                        'bam file not found for %s' % str(row['FASTQFILENAME']))  # TODO: improve this logging
-                intergenic_bases_covered_cmd = 'samtools depth -aa -Q 10 -b %s %s | cut -f3 | grep -v 0 | wc -l' % (
-                intergenic_region_bed_path, bam_file)
-                num_intergenic_bases_covered = int(subprocess.getoutput(intergenic_bases_covered_cmd))
+                        'bam file or intergenic region bed not found for %s' % str(row['FASTQFILENAME']))  # TODO: improve this logging
+                    continue
+                except Exception as error:
+                    self.recordSampleError(str(row['FASTQFILENAME']), 'intergenic_coverage', error)
+                    continue
                 qual_assess_df.loc[index, 'INTERGENIC_COVERAGE'] = num_intergenic_bases_covered / float(
                     total_intergenic_bases)
 
@@ -383,8 +466,8 @@ class CryptoQualityAssessmentObject(QualityAssessmentObject):
                     print(exonic_region_bed_path_error_msg)
 
                 # extract exonic bases covered by at least one read
-                exonic_bases_covered_cmd = 'samtools depth -aa -Q 10 -b %s %s | cut -f3 | grep -v 0 | wc -l' % (exon_region_bed_path, bam_file)
-                num_exonic_bases_covered = int(subprocess.getoutput(exonic_bases_covered_cmd))
+                num_exonic_bases_covered = self.coverageCache(bam_file).coveredBases(
+                    BamMetrics.readBedIntervals(exon_region_bed_path))
 
                 # add to the df
                 exonic_df.loc[index, 'EXONIC_COVERAGE'] = num_exonic_bases_covered / float(total_exon_bases)
@@ -426,9 +509,6 @@ class CryptoQualityAssessmentObject(QualityAssessmentObject):
         nat_bases_in_cds = int(self.nat_cds_length)
         g418_bases_in_cds = int(self.g418_cds_length)
 
-        # set feature over which to take percentage of reads (CDS in this case)
-        feature = 'CDS'
-
         # create columns genotype1_coverage, genotype2_coverage, overexpression_fow (fold over wildtype), NAT_coverage, G418_coverage
         genotype_df['genotype1_coverage'] = None
         genotype_df['genotype2_coverage'] = None
@@ -440,29 +520,26 @@ class CryptoQualityAssessmentObject(QualityAssessmentObject):
         for index, row in genotype_df.iterrows():
             # simple name is like this: run_673_s_4_withindex_sequence_TGAGGTT (no containing directories, no extention)
             fastq_simple_name = utils.pathBaseName(row['fastqFileName'])
-            # get bam files which correspond to query_df fastqFileNames
+            # calculate marker coverages. the bam is scanned once for every coverage -- see bamMetrics()
             try:
-                bam_file = [bam_file for bam_file in self.bam_file_list if fastq_simple_name in bam_file][0]
+                bam_metrics = self.bamMetrics(fastq_simple_name)
             except IndexError:
                 self.logger.info('bam file not found for %s' % fastq_simple_name)  # TODO: improve this logging
                 continue
-
-            # calculate marker coverages
-            print('...calculating NAT coverage for %s' % fastq_simple_name)
-            genotype_df.loc[index, 'NAT_coverage'] = self.calculatePercentFeatureCoverage(feature, 'CNAG_NAT',
-                                                                                          self.annotation_file,
-                                                                                          bam_file, nat_bases_in_cds)
-            print('...calculating G418 coverage for %s' % fastq_simple_name)
-            genotype_df.loc[index, 'G418_coverage'] = self.calculatePercentFeatureCoverage(feature, 'CNAG_G418',
-                                                                                           self.annotation_file,
-                                                                                           bam_file, g418_bases_in_cds)
+            except Exception as error:
+                self.recordSampleError(fastq_simple_name, 'marker_coverage', error)
+                continue
+            with utils.timedEvent(self.logger, 'marker_coverage', sample=fastq_simple_name):
+                print('...calculating NAT coverage for %s' % fastq_simple_name)
+                genotype_df.loc[index, 'NAT_coverage'] = bam_metrics.coverageFraction('CNAG_NAT', nat_bases_in_cds)
+                print('...calculating G418 coverage for %s' % fastq_simple_name)
+                genotype_df.loc[index, 'G418_coverage'] = bam_metrics.coverageFraction('CNAG_G418', g418_bases_in_cds)
 
             # if deletion, calculate coverage. Currently only set to check genotype1. assumes both are deletions if perturbation1 == 'deletion'
             if row['perturbation1'] == "deletion" or row['perturbation1'] == "geneSwap":
                 try:
                     # extract genotype1 TODO: JUST CASE EVERYTHING TO UPPER EARLIER
                     genotype = [self.extractInfoFromQuerySheet(row['fastqFileName'], 'genotype1'), None]
-                    #genotype = [list(self.query_df[self.query_df['fastqFileName'].str.contains(row['FASTQFILENAME'] + '.fastq.gz')]['genotype1'])[0]]
                 except ValueError:
                     self.logger.info('genotype cannot be extracted with the fastq filename in this row. Note: if there are null entries in the column fastqFileNames, this is the cause. those need to be remedied or removed in order for this to work: %s' %row)
                 try:
@@ -478,14 +555,14 @@ class CryptoQualityAssessmentObject(QualityAssessmentObject):
                 if genotype[1] not in [None, 'nan'] and genotype[1].startswith('CNAG'):
                     genotype[1] = genotype[1].replace('CNAG', 'CKF44')
                 print('...checking coverage of %s in %s' % (genotype, fastq_simple_name))
-                genotype_df.loc[index, 'genotype1_coverage'] = self.calculatePercentFeatureCoverage(feature, genotype[0],
-                                                                                                    self.annotation_file,
-                                                                                                    bam_file)
-                # do the same for genotype2 if it exists
-                if genotype[1] not in [None, 'nan']:
-                    genotype_df.loc[index, 'genotype2_coverage'] = self.calculatePercentFeatureCoverage(feature, genotype[1],
-                                                                                                        self.annotation_file,
-                                                                                                        bam_file)
+                with utils.timedEvent(self.logger, 'perturbed_coverage', sample=fastq_simple_name):
+                    try:
+                        genotype_df.loc[index, 'genotype1_coverage'] = bam_metrics.coverageFraction(genotype[0])
+                        # do the same for genotype2 if it exists
+                        if genotype[1] not in [None, 'nan']:
+                            genotype_df.loc[index, 'genotype2_coverage'] = bam_metrics.coverageFraction(genotype[1])
+                    except KeyError:
+                        self.logger.info('%s not a CNAG genotype -- no coverage for %s' % (genotype, fastq_simple_name))
         # return genotype check
         genotype_df.columns = [column_name.upper() for column_name in genotype_df.columns]
         return genotype_df[['FASTQFILENAME', 'GENOTYPE1_COVERAGE', 'GENOTYPE2_COVERAGE', 'NAT_COVERAGE', 'G418_COVERAGE']]
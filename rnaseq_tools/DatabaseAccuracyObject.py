@@ -7,9 +7,77 @@
 import os
 import re
 import difflib
+import json
+import hashlib
+import numpy as np
 from rnaseq_tools import utils
 import subprocess
 from rnaseq_tools.DatabaseObject import DatabaseObject
+from rnaseq_tools.DatabaseSnapshotObject import DatabaseSnapshot
+
+# {regex: compiled regex}. see compileSpecification()
+_compiled_specification_dict = {}
+
+
+def compileSpecification(column_specs_regex):
+    """
+        compile a column specification regex once per process
+        :param column_specs_regex: a regex from metadataSpecificationObject
+        :returns: the compiled regex
+    """
+    try:
+        return _compiled_specification_dict[column_specs_regex]
+    except KeyError:
+        return _compiled_specification_dict.setdefault(column_specs_regex, re.compile(column_specs_regex))
+
+
+def checkSheetColumns(column_specs_dict, sheet_df):
+    """
+        check the column headings and the entries of a database sheet against the specifications. Each column is checked
+        at once with Series.str.match -- the same test as re.match(column_specs_regex, str(entry)) on each cell
+        :param column_specs_dict: eg metadataSpecificationObject().specification_dict['bioSample']['column_specs_dict']
+        :param sheet_df: the sheet as a dataframe
+        :returns: colname_inconsistencies_dict, a dict in structure {specification_heading: nearest_match_to_heading, ...}
+                  row_inconsistencies_dict, a dict in structure {row_index: [columns, with, inconsistent, entries], ...}
+                  unknown_column_list, the column headings which are not in the specifications
+    """
+    colname_inconsistencies_dict = {}
+    unknown_column_list = []
+    checked_column_list = []
+    mismatch_mask_list = []
+    for column_name in sheet_df.columns:
+        try:
+            column_specs_regex = column_specs_dict[column_name]
+        except KeyError:
+            # as with a cell by cell check, a sheet with no rows has no column inconsistencies
+            if len(sheet_df) > 0 and column_name not in unknown_column_list:
+                nearest_match = difflib.get_close_matches(column_name, column_specs_dict.keys())[0]
+                colname_inconsistencies_dict.setdefault(nearest_match, column_name)
+                unknown_column_list.append(column_name)
+        else:
+            # map(str) rather than astype(str) so that empty cells are 'nan', as str() of the cell is
+            column_match = sheet_df[column_name].map(str).str.match(compileSpecification(column_specs_regex))
+            checked_column_list.append(column_name)
+            mismatch_mask_list.append(~column_match.fillna(False).astype(bool).values)
+    row_inconsistencies_dict = {}
+    if mismatch_mask_list:
+        # rows in order, and within a row the columns in the order of the sheet
+        row_position_array, column_position_array = np.nonzero(np.column_stack(mismatch_mask_list))
+        for row_position, column_position in zip(row_position_array, column_position_array):
+            row_inconsistencies_dict.setdefault(str(sheet_df.index[row_position]), []).append(
+                checked_column_list[column_position])
+    return colname_inconsistencies_dict, row_inconsistencies_dict, unknown_column_list
+
+
+def _checkSheetFile(column_specs_dict, sheet_path):
+    """
+        read a database sheet and check it with checkSheetColumns(). Module level so that it may be sent to a process pool
+        (see DatabaseAccuracyObject.checkSheets())
+        :param column_specs_dict: see checkSheetColumns()
+        :param sheet_path: path to a .xlsx, .csv or .tsv
+        :returns: see checkSheetColumns()
+    """
+    return checkSheetColumns(column_specs_dict, utils.readInDataframe(sheet_path))
 
 
 # TODO: more error handling in functions
@@ -37,7 +105,14 @@ class DatabaseAccuracyObject(DatabaseObject):
             pass
         # create specification dict -- see class metadataSpecificationObject below this class
         self.specification_dict = metadataSpecificationObject().specification_dict
+        # {sheet path: result of checkSheetColumns()}. see checkSheets()
+        self.column_check_dict = {}
+        # {sheet path: cached result of checkSheetColumns(), or None for a new sheet} of the sheets re-checked by checkSheets()
+        self.previous_column_check_dict = {}
+        # a cached column check is only used if the specifications have not changed since. see accuracyCacheCurrent()
+        self.specification_hash = hashlib.md5(json.dumps(self.specification_dict, sort_keys=True).encode()).hexdigest()
         # set last_git_change
+        self.last_git_change = None
         try:
             self.last_git_change = self.getLastGitChange()
         except FileNotFoundError:
@@ -124,9 +199,23 @@ class DatabaseAccuracyObject(DatabaseObject):
         if key_columns_only:
             self.accuracy_check_output_file = self.accuracyCheckFilename('keyColumn')
 
+        # check every new or modified sheet up front, in parallel if self.workers > 1. The rest come from the cache
+        self.checkSheets()
         for subdirectory_name, subdirectory_path_list in self.database_dict.items():
             self.subdirectoryReport(subdirectory_name, subdirectory_path_list, key_columns_only)
 
+    def changedOnlyReport(self, key_columns_only=False):
+        """
+            check only the sheets which are new or have changed since they were last checked, and print the findings
+            which have appeared or been resolved in them. The day's report is not rewritten
+            :params key_columns_only: only report inconsistent entries in key columns
+            :returns: the printed lines (see changedSheetReport())
+        """
+        self.checkSheets()
+        lines_to_write = self.changedSheetReport(key_columns_only)
+        print(''.join(lines_to_write) if lines_to_write else 'No sheet has changed since it was last checked')
+        return lines_to_write
+
     def getLastGitChange(self):
         """
 
@@ -180,38 +269,163 @@ class DatabaseAccuracyObject(DatabaseObject):
                      row_inconsistencies_dict, a dict in structure {row_index: column_with_inconsistent_entry, ...}
         """
         self.logger.info('path to sheet is %s' % subdirectory_filepath)
-        # see :return: statement for structure
-        colname_inconsistencies_dict = {}
-        row_inconsistencies_dict = {}
-        # list to store inappropriately formatted column names
-        skip_columns = []
-
-        # read in subdirectory_filepath as dataframe
-        subdirectory_df = utils.readInDataframe(subdirectory_filepath)
-        # loop over rows in dataframe
-        for index, row in subdirectory_df.iterrows():
-            # convert row into a dictionary {column: value, ...}
-            row_dict = dict(row)
-            for column_name, column_entry in row_dict.items():
-                column_entry = str(column_entry)
-                try:
-                    column_specs_regex = subdirectory_specs_dict['column_specs_dict'][column_name]
-                except KeyError:
-                    if column_name not in skip_columns:
-                        if self.logger:
-                            self.logger.info('Column name not found in specs: %s' % column_name)
-                            self.logger.info('row for offending column is: %s' % row)
-                        nearest_match = difflib.get_close_matches(column_name, subdirectory_specs_dict['column_specs_dict'].keys())[0]
-                        colname_inconsistencies_dict.setdefault(nearest_match, column_name)
-                        print('\tCannot check %s in %s. Either the format of the column is incorrect, or it is not in the specifications_dictionary.\n'
-                              '\tThe rest of this column could not be checked. Correct the column name, and re-run.' % (column_name, subdirectory_filepath))
-                        skip_columns.append(column_name)
-                else:
-                    if not re.match(column_specs_regex, column_entry):
-                        row_inconsistencies_dict.setdefault(str(index), []).append(column_name)
+        try:
+            column_check = self.column_check_dict[subdirectory_filepath]
+        except KeyError:
+            column_check = _checkSheetFile(subdirectory_specs_dict['column_specs_dict'], subdirectory_filepath)
+        return self.reportColumnCheck(subdirectory_filepath, column_check)
 
+    def reportColumnCheck(self, subdirectory_filepath, column_check):
+        """
+            log and print the columns of a sheet which could not be checked
+            :param subdirectory_filepath: path to a sheet
+            :param column_check: the result of checkSheetColumns() for the sheet
+            :returns: colname_inconsistencies_dict, row_inconsistencies_dict (see checkColumns())
+        """
+        colname_inconsistencies_dict, row_inconsistencies_dict, unknown_column_list = column_check
+        for column_name in unknown_column_list:
+            self.logger.info('Column name not found in specs: %s' % column_name)
+            print('\tCannot check %s in %s. Either the format of the column is incorrect, or it is not in the specifications_dictionary.\n'
+                  '\tThe rest of this column could not be checked. Correct the column name, and re-run.' % (column_name, subdirectory_filepath))
         return colname_inconsistencies_dict, row_inconsistencies_dict
 
+    def checkSheets(self, subdirectory_list=None):
+        """
+            check the columns (see checkColumns()) of every sheet in the subdirectories, in a pool of self.workers
+            processes (serially if self.workers is 1). The results are stored in column_check_dict, from which
+            checkColumns() reads. With the database snapshot (see DatabaseObject), a sheet whose content and the
+            specifications have not changed since it was last checked is not re-checked (see accuracyCachePath())
+            :param subdirectory_list: subdirectories of database_files to check. Default is all of database_dict
+            :returns: list of the sheets which were checked (new, modified, or all if the cache is not in use)
+        """
+        accuracy_cache_dict = self.readAccuracyCache() if self.use_database_snapshot else {}
+        sheet_list = []
+        new_cache_dict = {}
+        for subdirectory in (subdirectory_list or self.database_dict):
+            for subdirectory_filepath in self.database_dict[subdirectory]:
+                sheet_key = os.path.abspath(subdirectory_filepath)
+                cache_entry = accuracy_cache_dict.get(sheet_key)
+                if self.accuracyCacheCurrent(cache_entry, subdirectory_filepath):
+                    self.column_check_dict[subdirectory_filepath] = self.columnCheckFromCache(cache_entry['column_check'])
+                    # a sheet touched without changing its content (matched by checksum) is stored with its current
+                    # (mtime, size), so that it is not hashed again
+                    file_signature = DatabaseSnapshot.fileSignature(subdirectory_filepath)
+                    if cache_entry['signature'] != file_signature:
+                        new_cache_dict[sheet_key] = dict(cache_entry, signature=file_signature)
+                else:
+                    self.previous_column_check_dict[subdirectory_filepath] = \
+                        self.columnCheckFromCache(cache_entry['column_check']) if cache_entry else None
+                    sheet_list.append((self.specification_dict[subdirectory]['column_specs_dict'], subdirectory_filepath))
+        if self.workers > 1 and len(sheet_list) > 1:
+            from concurrent.futures import ProcessPoolExecutor
+            with ProcessPoolExecutor(max_workers=min(self.workers, len(sheet_list))) as executor:
+                column_check_list = list(executor.map(_checkSheetFile, *zip(*sheet_list)))
+        else:
+            column_check_list = [_checkSheetFile(*sheet) for sheet in sheet_list]
+        for (column_specs_dict, subdirectory_filepath), column_check in zip(sheet_list, column_check_list):
+            self.column_check_dict[subdirectory_filepath] = column_check
+            new_cache_dict[os.path.abspath(subdirectory_filepath)] = {
+                'signature': DatabaseSnapshot.fileSignature(subdirectory_filepath),
+                'checksum': utils.fileChecksum(subdirectory_filepath),
+                'specification_hash': self.specification_hash,
+                # dicts as lists of pairs, as the json is written with sorted keys
+                'column_check': [list(column_check[0].items()), list(column_check[1].items()), column_check[2]]}
+        if self.use_database_snapshot and new_cache_dict:
+            self.writeAccuracyCache(new_cache_dict)
+        self.logger.info('%s sheets checked, %s from the accuracy cache'
+                         % (len(sheet_list), len(self.column_check_dict) - len(sheet_list)))
+        return [subdirectory_filepath for column_specs_dict, subdirectory_filepath in sheet_list]
+
+    def accuracyCachePath(self):
+        """
+            :returns: path to the json of the per sheet column checks, in the database snapshot directory. Each entry is
+                      keyed by the sheet path, and records the (mtime, size) and md5 of the sheet, and the hash of the
+                      specifications, with which it was checked
+        """
+        return os.path.join(self.getDatabaseSnapshot().snapshot_directory, 'accuracy_check_cache.json')
+
+    def readAccuracyCache(self):
+        """
+            :returns: the accuracy cache {sheet path: entry}, see accuracyCachePath()
+        """
+        try:
+            with open(self.accuracyCachePath()) as accuracy_cache_file:
+                return json.load(accuracy_cache_file)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def writeAccuracyCache(self, new_cache_dict):
+        """
+            add entries to the accuracy cache. The cache is re-read under a lock so that concurrent checks do not drop
+            each other's entries
+            :param new_cache_dict: {sheet path: entry}
+        """
+        accuracy_cache_path = self.accuracyCachePath()
+        with utils.lockFile(accuracy_cache_path + '.lock'):
+            accuracy_cache_dict = self.readAccuracyCache()
+            accuracy_cache_dict.update(new_cache_dict)
+            utils.writeJsonAtomically(accuracy_cache_dict, accuracy_cache_path)
+
+    def accuracyCacheCurrent(self, cache_entry, subdirectory_filepath):
+        """
+            :param cache_entry: the accuracy cache entry of the sheet, or None
+            :param subdirectory_filepath: path to the sheet
+            :returns: True if the sheet was checked with the current specifications, and its content has not changed. The
+                      md5 is only computed if the (mtime, size) of the sheet has changed
+        """
+        if not cache_entry or cache_entry['specification_hash'] != self.specification_hash:
+            return False
+        return cache_entry['signature'] == DatabaseSnapshot.fileSignature(subdirectory_filepath) or \
+               cache_entry['checksum'] == utils.fileChecksum(subdirectory_filepath)
+
+    @staticmethod
+    def columnCheckFromCache(cached_column_check):
+        """
+            :param cached_column_check: the column_check of an accuracy cache entry
+            :returns: the column check in the form returned by checkSheetColumns()
+        """
+        return dict(cached_column_check[0]), dict(cached_column_check[1]), list(cached_column_check[2])
+
+    def changedSheetReport(self, key_columns_only=False):
+        """
+            the findings which have appeared or been resolved in the sheets re-checked by the last checkSheets()
+            :param key_columns_only: only report inconsistent entries in key columns
+            :returns: a list of lines. A new sheet is reported with all of its findings
+        """
+        lines_to_write = []
+        for subdirectory_filepath, previous_column_check in self.previous_column_check_dict.items():
+            subdirectory_name = utils.pathBaseName(utils.dirPath(subdirectory_filepath))
+            current_finding_list = self.columnCheckFindings(subdirectory_name, self.column_check_dict[subdirectory_filepath], key_columns_only)
+            previous_finding_list = self.columnCheckFindings(subdirectory_name, previous_column_check, key_columns_only) \
+                if previous_column_check else []
+            new_finding_list = [finding for finding in current_finding_list if finding not in previous_finding_list]
+            resolved_finding_list = [finding for finding in previous_finding_list if finding not in current_finding_list]
+            if previous_column_check is None:
+                lines_to_write.append('New sheet %s:\n' % subdirectory_filepath)
+            elif new_finding_list or resolved_finding_list:
+                lines_to_write.append('Changed sheet %s:\n' % subdirectory_filepath)
+            else:
+                continue
+            lines_to_write.extend('\tNEW: %s\n' % finding for finding in new_finding_list)
+            lines_to_write.extend('\tRESOLVED: %s\n' % finding for finding in resolved_finding_list)
+        return lines_to_write
+
+    def columnCheckFindings(self, subdirectory_name, column_check, key_columns_only=False):
+        """
+            :param subdirectory_name: eg bioSample
+            :param column_check: see checkSheetColumns()
+            :param key_columns_only: only include inconsistent entries in key columns
+            :returns: list of the findings of a column check -- each column heading, and each inconsistent entry
+        """
+        finding_list = ['The specification is: %s, the sheet column is: %s' % (spec_column, sheet_column)
+                        for spec_column, sheet_column in column_check[0].items()]
+        subdir_key_set = set(self.key_column_dict.get(subdirectory_name, []))
+        for row_index, column_heading in column_check[1].items():
+            finding_list.extend('Row %s has an inconsistency in column %s' % (row_index, column_name)
+                                for column_name in column_heading
+                                if not key_columns_only or column_name in subdir_key_set)
+        return finding_list
+
 
 class metadataSpecificationObject:
     def __init__(self):
@@ -11,12 +11,50 @@
                            etc (see constructor)
 """
 import pandas as pd
+import numpy as np
 import os
+import json
+import subprocess
+import tempfile
 from rnaseq_tools import utils
 from rnaseq_tools.StandardDataObject import StandardData
+from rnaseq_tools.DatabaseSnapshotObject import DatabaseSnapshot
+from rnaseq_tools.SampleIndexObject import SampleIndex
+from rnaseq_tools.DatabaseSqliteObject import DatabaseSqlite
+from rnaseq_tools.QueryCacheObject import QueryCache
+
+def _readDatabaseSheet(sheet_path):
+    """
+        read a database sheet and strip whitespace from the column headers. Module level so that it may be sent to a
+        process pool (see DatabaseObject.readDatabaseSheets())
+        :param sheet_path: path to a .xlsx, .csv or .tsv
+        :returns: the sheet as a pandas dataframe
+    """
+    sheet = utils.readInDataframe(sheet_path)
+    sheet.columns = [column_header.strip() for column_header in sheet.columns]
+    return sheet
+
 
 # TODO: more error handling in functions
 class DatabaseObject(StandardData):
+    # columns, in addition to the key columns, indexed in the sqlite materialization of the database. see setDatabaseSqlite()
+    sqlite_index_columns = ['genotype1', 'genotype2', 'runNumber', 'libraryDate', 'treatment', 'timePoint']
+    # dtypes of the merged database columns. see applyDatabaseSchema(). Columns which are not listed are left as read.
+    # The dates are left as they are written in the sheets (eg 09.10.19), which is how a filter json gives them
+    database_column_schema = {'fastqFileName': 'string',
+                              'runNumber': 'Int64', 'librarySampleNumber': 'Int64', 'rnaSampleNumber': 'Int64',
+                              'replicate': 'Int64',
+                              'genotype1': 'category', 'genotype2': 'category', 'perturbation1': 'category',
+                              'perturbation2': 'category', 'treatment': 'category', 'temperature': 'category',
+                              'atmosphere': 'category', 'experimentDesign': 'category', 'strain': 'category',
+                              'marker1': 'category', 'marker2': 'category', 'harvester': 'category',
+                              'rnaPreparer': 'category', 's1Preparer': 'category', 's2Preparer': 'category',
+                              'libraryPreparer': 'category'}
+    # the date columns. These are stored in the sqlite file as YYYY-MM-DD (see setDatabaseSqlite())
+    database_date_columns = ['libraryDate', 'harvestDate', 'rnaDate', 's1cDNADate', 's2cDNADate']
+    # a standardized dataframe (see standardizeDatabaseDataframe()) also has the dates cast to datetime
+    standardized_column_schema = dict(database_column_schema, **dict.fromkeys(database_date_columns, 'date'))
+
     def __init__(self, expected_attributes=None, **kwargs):
         """
             constructor
@@ -70,6 +108,46 @@ class DatabaseObject(StandardData):
         # see setter setKeyColumns()
         self.database_key_columns = []
 
+        # see getDatabaseSnapshot(). Set use_database_snapshot=False to re-read every sheet in database_files
+        try:
+            self.use_database_snapshot = kwargs['use_database_snapshot']
+        except KeyError:
+            self.use_database_snapshot = True
+        try:
+            self.database_snapshot_directory = kwargs['database_snapshot_directory']
+        except KeyError:
+            self.database_snapshot_directory = None
+        self.database_snapshot = None
+        # see getDatabaseSqlite()
+        try:
+            self.database_sqlite_path = kwargs['database_sqlite_path']
+        except KeyError:
+            self.database_sqlite_path = None
+        self.database_sqlite = None
+        # number of processes in which to parse the database sheets. see readDatabaseSheets()
+        try:
+            self.workers = int(kwargs['workers'])
+        except KeyError:
+            self.workers = 1
+        # True if concat_database_dict is exactly as read from database_files (see databaseSnapshotKey())
+        self._concat_database_dict_from_files = False
+        # (id of database_df, databaseFilesKey()) if database_df was merged from database_files. see queryCacheKey()
+        self._database_df_source = None
+        # see getQueryCache(). Set use_query_cache=False to always filter the database
+        try:
+            self.use_query_cache = kwargs['use_query_cache']
+        except KeyError:
+            self.use_query_cache = True
+        try:
+            self.query_cache_directory = kwargs['query_cache_directory']
+        except KeyError:
+            self.query_cache_directory = None
+        try:
+            self.query_cache_max_mb = float(kwargs['query_cache_max_mb'])
+        except KeyError:
+            self.query_cache_max_mb = 256
+        self.query_cache = None
+
     def setDatabaseDict(self):
         """
             create dictionary of filepaths to the various types of metadata sheets
@@ -110,6 +188,10 @@ class DatabaseObject(StandardData):
             create joined data frame from the concatenated files in the subdirectories of the database_directory
             :param accuracy_check: boolean flag to indicate whether the purpose of concatenating the database is checking the string format accuracy. If true, name keys are not cast to uppper
         """
+        # with the snapshot, the cached database_df is brought up to date rather than re-merged. see refresh()
+        if not accuracy_check and self.use_database_snapshot and len(self.concat_database_dict) == 0:
+            self.refresh()
+            return
         # check that database_dict, concat_database_dict and database_key_columns exist
         if len(self.database_dict) == 0:
             self.setDatabaseDict()
@@ -117,47 +199,539 @@ class DatabaseObject(StandardData):
             self.setConcatDatabaseDict()
         if len(self.database_key_columns) == 0:
             self.setKeyColumns()
-        # TODO: CAST ALL KEY COLUMNS TO UPPERCASE PRIOR TO MERGE
-        # merge the first two (fastqFiles and Library) sets of data
-        left_sheet = self.concat_database_dict[self.database_subdirectories[0]]
-        right_sheet = self.concat_database_dict[self.database_subdirectories[1]]
         # if not an accuracy check (default) cast the name column (the second item in the key list) to upper case
+        # TODO: CAST ALL KEY COLUMNS TO UPPERCASE PRIOR TO MERGE
         if not accuracy_check:
-            left_sheet[self.database_key_columns[0][1]] = left_sheet[self.database_key_columns[0][1]].str.upper()
-            right_sheet[self.database_key_columns[0][1]] = right_sheet[self.database_key_columns[0][1]].str.upper()
-        # merge
-        self.database_df = pd.merge(left_sheet, right_sheet, how='left', on=list(self.database_key_columns[0]))
+            self.castKeyNameColumns(self.concat_database_dict)
+        # the merged database_df is in the snapshot if none of the files in database_files have changed. The accuracy
+        # check frame is not cast to the schema, and so is stored under its own name -- refresh() never reuses it
+        snapshot_key = self.databaseSnapshotKey(accuracy_check)
+        frame_name = 'accuracy_check_database_df' if accuracy_check else 'database_df'
+        if snapshot_key is not None:
+            self.database_df = self.getDatabaseSnapshot().loadFrame(frame_name, snapshot_key)
+            if self.database_df is not None:
+                self.logger.debug('database_df read from snapshot %s' % self.database_snapshot_directory)
+                self._database_df_source = (id(self.database_df), snapshot_key)
+                return
+        self.database_df = self.mergeDatabaseSheets(self.concat_database_dict)
+        # the accuracy check reports the values as they are in the sheets
+        if not accuracy_check:
+            self.database_df = self.applyDatabaseSchema(self.database_df, logger=self.logger)
+        if snapshot_key is not None:
+            self.storeDatabaseDataframe(snapshot_key, accuracy_check)
+            self._database_df_source = (id(self.database_df), snapshot_key)
+
+    def castKeyNameColumns(self, concat_database_dict):
+        """
+            cast the name column (the second item in the key list) of each subdirectory table to upper case, in place.
+            The first two sheets are cast on the first key, each subsequent sheet on the key to the sheet before it
+            :param concat_database_dict: {subdirectory: concatenated table}, see setConcatDatabaseDict()
+        """
+        sheet_key_list = [(self.database_subdirectories[0], self.database_key_columns[0])] + \
+                         [(self.database_subdirectories[i + 1], self.database_key_columns[i])
+                          for i in range(len(self.database_subdirectories) - 1)]
+        for subdirectory, database_key_column in sheet_key_list:
+            sheet = concat_database_dict[subdirectory]
+            sheet[database_key_column[1]] = sheet[database_key_column[1]].str.upper()
+
+    def sheetKeyColumns(self, subdirectory_index):
+        """
+            :param subdirectory_index: index of the subdirectory in database_subdirectories
+            :returns: a tuple (the key on which the subdirectory table is merged to the tables before it, a list of all of
+                      its key columns -- that key, and the key to the table after it)
+        """
+        incoming_key_columns = list(self.database_key_columns[max(subdirectory_index - 1, 0)])
+        key_column_list = list(incoming_key_columns)
+        if subdirectory_index < len(self.database_key_columns):
+            key_column_list.extend(column for column in self.database_key_columns[subdirectory_index]
+                                   if column not in key_column_list)
+        return incoming_key_columns, key_column_list
+
+    def mergeDatabaseSheets(self, concat_database_dict, key_columns_only=False, root_key_hashes=None):
+        """
+            left merge the subdirectory tables, in the order of database_subdirectories, on database_key_columns
+            :param concat_database_dict: {subdirectory: concatenated table}, see setConcatDatabaseDict()
+            :param key_columns_only: if True, merge only the key columns of each table. The result has the same rows, in
+                                     the same order, as the full merge
+            :param root_key_hashes: optional. Merge only the rows of the first table whose first key hashes (see
+                                    keyHashes()) to one of these
+            :returns: the merged dataframe
+        """
+        sheet_list = []
+        for i, subdirectory in enumerate(self.database_subdirectories):
+            sheet = concat_database_dict[subdirectory]
+            if key_columns_only:
+                sheet = sheet[self.sheetKeyColumns(i)[1]]
+            sheet_list.append(sheet)
+        if root_key_hashes is not None:
+            root_mask = self.keyHashes(sheet_list[0], self.database_key_columns[0]).isin(root_key_hashes).values
+            sheet_list[0] = sheet_list[0][root_mask]
+        # merge the first two (fastqFiles and Library) sets of data
+        merged_df = pd.merge(sheet_list[0], sheet_list[1], how='left', on=list(self.database_key_columns[0]))
         # merge the subsequent sheets on the columns identified in key_cols
         for i in range(1, len(self.database_subdirectories) - 1):
-            # store the following for readability
-            subdirectory = self.database_subdirectories[i + 1]
-            database_key_column = self.database_key_columns[i]
-            next_df = self.concat_database_dict[subdirectory]
-            if not accuracy_check:
-                next_df[database_key_column[1]] = next_df[database_key_column[1]].str.upper() # cast name column to upper
-            # keep merging the next sheet to self.database_df
-            self.database_df = pd.merge(self.database_df, self.concat_database_dict[subdirectory], how='left',
-                                        on=list(database_key_column))
+            merged_df = pd.merge(merged_df, sheet_list[i + 1], how='left', on=list(self.database_key_columns[i]))
+        return merged_df.reset_index(drop=True)
+
+    def storeDatabaseDataframe(self, snapshot_key, accuracy_check=False):
+        """
+            store database_df in the snapshot, with the git commit of database_files and the snapshot key of each
+            subdirectory table. see refresh()
+            :param snapshot_key: see databaseFilesKey()
+            :param accuracy_check: see setDatabaseDataframe(). The accuracy check frame is stored as
+                                   accuracy_check_database_df, without the refresh metadata
+        """
+        if accuracy_check:
+            self.getDatabaseSnapshot().storeFrame('accuracy_check_database_df', snapshot_key, self.database_df)
+        else:
+            refresh_metadata = {'commit': self.gitHeadCommit(), 'accuracy_check': False,
+                                'concat_key_dict': {subdirectory: DatabaseSnapshot.snapshotKey(file_list)
+                                                    for subdirectory, file_list in self.database_dict.items()}}
+            self.getDatabaseSnapshot().storeFrame('database_df', snapshot_key, self.database_df,
+                                                  metadata=refresh_metadata)
+        self.getDatabaseSnapshot().writeIndex()
+
+    def refresh(self):
+        """
+            bring database_df up to date with database_files. git is asked which files have changed since the commit
+            recorded with the database_df in the snapshot. Only those sheets are re-read, and only the rows of the
+            database which descend (by the merge keys) from a row which has changed are re-merged. If there is no
+            database_df in the snapshot, or database_files is not a git repository, the database is merged in full
+            :returns: list of the subdirectories which were re-merged (empty if database_df was current)
+        """
+        if len(self.database_dict) == 0:
+            self.setDatabaseDict()
+        database_snapshot = self.getDatabaseSnapshot()
+        database_key = self.databaseFilesKey()
+        self.database_df = database_snapshot.loadFrame('database_df', database_key)
+        # the database_df of the previous refresh, and the tables of the changed subdirectories from which it was merged
+        previous_df = None
+        previous_concat_dict = {}
+        changed_subdirectory_list = None
+        refresh_metadata = database_snapshot.frameMetadata('database_df')
+        # a database_df stored before the metadata recorded accuracy_check may not have been cast to the schema
+        if self.database_df is None and refresh_metadata and refresh_metadata.get('commit') and \
+                refresh_metadata.get('accuracy_check') is False:
+            changed_file_list = self.gitChangedFiles(refresh_metadata['commit'])
+            if changed_file_list is not None:
+                changed_subdirectory_list = self.changedSubdirectories(changed_file_list)
+                previous_df = database_snapshot.loadFrame('database_df')
+                for subdirectory in changed_subdirectory_list:
+                    previous_concat_dict[subdirectory] = database_snapshot.loadFrame(
+                        'concat_%s' % subdirectory, refresh_metadata['concat_key_dict'].get(subdirectory) or 'missing')
+        # only the sheets which have changed since they were last read are parsed
+        self.setConcatDatabaseDict()
+        if len(self.database_key_columns) == 0:
+            self.setKeyColumns()
+        self.castKeyNameColumns(self.concat_database_dict)
+        if self.database_df is not None:
+            self.logger.debug('database_df read from snapshot %s' % self.database_snapshot_directory)
+            self._database_df_source = (id(self.database_df), database_key)
+            return []
+        if previous_df is not None and all(sheet is not None for sheet in previous_concat_dict.values()):
+            previous_concat_dict = {subdirectory: previous_concat_dict.get(subdirectory, sheet)
+                                    for subdirectory, sheet in self.concat_database_dict.items()}
+            self.castKeyNameColumns(previous_concat_dict)
+            self.database_df = self.updateDatabaseDataframe(previous_df, previous_concat_dict, changed_subdirectory_list)
+        if self.database_df is None:
+            self.logger.info('merging the full database')
+            changed_subdirectory_list = list(self.database_subdirectories)
+            self.database_df = self.applyDatabaseSchema(self.mergeDatabaseSheets(self.concat_database_dict),
+                                                        logger=self.logger)
+        else:
+            self.logger.info('database refreshed. Changed subdirectories: %s' % changed_subdirectory_list)
+        self.storeDatabaseDataframe(database_key)
+        self._database_df_source = (id(self.database_df), database_key)
+        return changed_subdirectory_list
+
+    def updateDatabaseDataframe(self, previous_df, previous_concat_dict, changed_subdirectory_list):
+        """
+            re-merge the rows of previous_df which descend from a row of a changed subdirectory table. The result has the
+            rows, in the same order, of a full merge of concat_database_dict
+            :param previous_df: the database_df merged from previous_concat_dict
+            :param previous_concat_dict: {subdirectory: the table from which previous_df was merged}, name columns cast
+            :param changed_subdirectory_list: the subdirectories which differ between previous_concat_dict and
+                                              concat_database_dict
+            :returns: the updated database_df, or None if it cannot be updated (eg a key column has been added)
+        """
+        if len(changed_subdirectory_list) == 0:
+            return previous_df
+        try:
+            root_key_hashes, previous_root_mask, current_root_mask = self.affectedRootKeys(previous_concat_dict,
+                                                                                          changed_subdirectory_list)
+        except KeyError as err:
+            self.logger.info('database cannot be refreshed in place: %s' % err)
+            return None
+        if len(previous_root_mask) != len(previous_df) or (~previous_root_mask).sum() != (~current_root_mask).sum():
+            return None
+        remerged_df = self.mergeDatabaseSheets(self.concat_database_dict, root_key_hashes=root_key_hashes)
+        if len(remerged_df) != current_root_mask.sum():
+            return None
+        # the rows are placed where a full merge would put them. Categorical columns are re-cast on the combined frame
+        update_df = pd.concat([previous_df[~previous_root_mask], remerged_df], ignore_index=True)
+        update_df.index = np.concatenate([np.flatnonzero(~current_root_mask), np.flatnonzero(current_root_mask)])
+        update_df = update_df.sort_index().reset_index(drop=True)
+        for column in update_df.columns:
+            if isinstance(update_df[column].dtype, pd.CategoricalDtype):
+                update_df[column] = update_df[column].astype(object)
+        return self.applyDatabaseSchema(update_df, logger=self.logger)
+
+    def affectedRootKeys(self, previous_concat_dict, changed_subdirectory_list):
+        """
+            find the rows of the first subdirectory table (the roots of the merge) whose merged rows differ between
+            previous_concat_dict and concat_database_dict. A root is affected if any row it is merged with, by key, has
+            been added, removed or changed in a subdirectory in changed_subdirectory_list
+            :param previous_concat_dict: {subdirectory: table}, name columns cast (see castKeyNameColumns())
+            :param changed_subdirectory_list: subdirectories which have changed
+            :raises: KeyError if a key column is not in a previous table
+            :returns: a tuple (hashes of the first key of the affected roots, a boolean array marking the rows of the
+                      previous merge which descend from them, the same for the current merge)
+        """
+        previous_chain_df = self.mergeDatabaseSheets(previous_concat_dict, key_columns_only=True)
+        current_chain_df = self.mergeDatabaseSheets(self.concat_database_dict, key_columns_only=True)
+        root_key_hash_set = set()
+        for subdirectory in changed_subdirectory_list:
+            incoming_key_columns = self.sheetKeyColumns(self.database_subdirectories.index(subdirectory))[0]
+            previous_sheet = previous_concat_dict[subdirectory]
+            current_sheet = self.concat_database_dict[subdirectory]
+            column_list = list(dict.fromkeys(list(current_sheet.columns) + list(previous_sheet.columns)))
+            previous_sheet = previous_sheet.reindex(columns=column_list)
+            current_sheet = current_sheet.reindex(columns=column_list)
+            previous_row_hashes = self.keyHashes(previous_sheet, column_list)
+            current_row_hashes = self.keyHashes(current_sheet, column_list)
+            changed_row_df = pd.concat([previous_sheet[~previous_row_hashes.isin(current_row_hashes).values],
+                                        current_sheet[~current_row_hashes.isin(previous_row_hashes).values]])
+            changed_key_hashes = self.keyHashes(changed_row_df, incoming_key_columns)
+            for chain_df in [previous_chain_df, current_chain_df]:
+                descendant_mask = self.keyHashes(chain_df, incoming_key_columns).isin(changed_key_hashes).values
+                root_key_hash_set.update(self.keyHashes(chain_df[descendant_mask], self.database_key_columns[0]))
+        root_key_hashes = list(root_key_hash_set)
+        return root_key_hashes, \
+               self.keyHashes(previous_chain_df, self.database_key_columns[0]).isin(root_key_hashes).values, \
+               self.keyHashes(current_chain_df, self.database_key_columns[0]).isin(root_key_hashes).values
+
+    @staticmethod
+    def keyHashes(df, column_list):
+        """
+            :param df: a dataframe
+            :param column_list: columns of df
+            :returns: a series of a hash of the values in column_list of each row. Values are compared as strings
+        """
+        return pd.util.hash_pandas_object(df[list(column_list)].astype(str), index=False)
+
+    def databaseGit(self, git_argument_list, text=True):
+        """
+            run a git command in database_directory
+            :param git_argument_list: eg ['rev-parse', 'HEAD']
+            :param text: if False, return stdout as bytes
+            :returns: stdout of the command, or None if it fails (eg database_directory is not a git repository)
+        """
+        try:
+            git_process = subprocess.run(['git', '-C', self.database_directory] + git_argument_list,
+                                         stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=text)
+        except FileNotFoundError:
+            return None
+        if git_process.returncode != 0:
+            self.logger.debug('git %s failed: %s' % (' '.join(git_argument_list), git_process.stderr))
+            return None
+        return git_process.stdout
+
+    def gitHeadCommit(self):
+        """
+            :returns: the commit hash of HEAD in database_files, or None if it is not a git repository
+        """
+        head_commit = self.databaseGit(['rev-parse', 'HEAD'])
+        return head_commit.strip() if head_commit else None
+
+    def gitChangedFiles(self, commit):
+        """
+            :param commit: a commit (or any revision, eg HEAD~3) in database_files
+            :returns: list of files, relative to database_directory, which differ between commit and the working tree
+                      (including files which are not tracked). None if git cannot make the comparison
+        """
+        diff_output = self.databaseGit(['diff', '--name-only', '--relative', commit, '--'])
+        if diff_output is None:
+            return None
+        untracked_output = self.databaseGit(['ls-files', '--others', '--exclude-standard']) or ''
+        return sorted(set(diff_output.splitlines()) | set(untracked_output.splitlines()))
+
+    def changedSubdirectories(self, changed_file_list):
+        """
+            :param changed_file_list: list of files relative to database_directory, see gitChangedFiles()
+            :returns: the subdirectories, in the order of database_subdirectories, in which a file has changed
+        """
+        changed_directory_set = {os.path.normpath(file).split(os.sep)[0] for file in changed_file_list}
+        return [subdirectory for subdirectory in self.database_subdirectories if subdirectory in changed_directory_set]
+
+    def readSubdirectoryAtCommit(self, subdirectory, commit):
+        """
+            concatenate the sheets of a subdirectory as they were at commit (see setConcatDatabaseDict())
+            :param subdirectory: a database subdirectory, eg bioSample
+            :param commit: a commit in database_files
+            :returns: the concatenated table. Empty if the subdirectory did not exist at commit
+        """
+        file_output = self.databaseGit(['ls-tree', '--name-only', commit, '--', subdirectory + '/']) or ''
+        sheet_list = []
+        with tempfile.TemporaryDirectory() as tmp_directory:
+            for file in file_output.splitlines():
+                basename = os.path.basename(file)
+                if basename.startswith(('~', '._', '.~')):
+                    continue
+                tmp_sheet_path = os.path.join(tmp_directory, basename)
+                with open(tmp_sheet_path, 'wb') as tmp_sheet:
+                    tmp_sheet.write(self.databaseGit(['show', '%s:./%s' % (commit, file)], text=False))
+                sheet_list.append(_readDatabaseSheet(tmp_sheet_path))
+        if len(sheet_list) == 0:
+            return pd.DataFrame(columns=self.concat_database_dict[subdirectory].columns)
+        return pd.concat(sheet_list, ignore_index=True)
+
+    def deltaSince(self, commit):
+        """
+            the rows of the merged database which have changed since a commit of database_files
+            :param commit: a commit (or any revision, eg HEAD~3) in database_files
+            :raises: ValueError('NotADatabaseCommit') if git cannot compare commit to database_files
+            :returns: a dataframe of the rows which are new or changed since commit (column databaseDelta is 'added'), and
+                      the rows as they were at commit which have been removed or changed ('removed')
+        """
+        changed_file_list = self.gitChangedFiles(commit)
+        if changed_file_list is None:
+            raise ValueError('NotADatabaseCommit: %s' % commit)
+        if len(self.concat_database_dict) == 0:
+            self.setDatabaseDataframe()
+        changed_subdirectory_list = self.changedSubdirectories(changed_file_list)
+        previous_concat_dict = dict(self.concat_database_dict)
+        for subdirectory in changed_subdirectory_list:
+            previous_concat_dict[subdirectory] = self.readSubdirectoryAtCommit(subdirectory, commit)
+        self.castKeyNameColumns(previous_concat_dict)
+        try:
+            root_key_hashes = self.affectedRootKeys(previous_concat_dict, changed_subdirectory_list)[0]
+        except KeyError:
+            # eg a key column was added since commit -- compare the whole database
+            root_key_hashes = None
+        delta_df_list = []
+        previous_rows_df = self.applyDatabaseSchema(
+            self.mergeDatabaseSheets(previous_concat_dict, root_key_hashes=root_key_hashes))
+        current_rows_df = self.applyDatabaseSchema(
+            self.mergeDatabaseSheets(self.concat_database_dict, root_key_hashes=root_key_hashes))
+        column_list = list(dict.fromkeys(list(current_rows_df.columns) + list(previous_rows_df.columns)))
+        previous_row_hashes = self.keyHashes(previous_rows_df.reindex(columns=column_list), column_list)
+        current_row_hashes = self.keyHashes(current_rows_df.reindex(columns=column_list), column_list)
+        for delta, rows_df, row_hashes, other_row_hashes in [('added', current_rows_df, current_row_hashes, previous_row_hashes),
+                                                              ('removed', previous_rows_df, previous_row_hashes, current_row_hashes)]:
+            delta_df = rows_df[~row_hashes.isin(other_row_hashes).values].copy()
+            delta_df['databaseDelta'] = delta
+            delta_df_list.append(delta_df)
+        return pd.concat(delta_df_list, ignore_index=True)
 
     def setConcatDatabaseDict(self):
         """
             creates concatenated dataframe from all files in a given list of paths to database subdirectories
             structure {subdirectory: concatenated_table_of_all_files_in_database/subdirectory/*}
+            sheets are parsed in a pool of self.workers processes (see readDatabaseSheets())
+        """
+        # the concatenated table is in the snapshot if none of the files in the subdirectory have changed
+        snapshot_key_dict = {}
+        for subdirectory, file_list in self.database_dict.items():
+            if self.use_database_snapshot:
+                snapshot_key_dict[subdirectory] = DatabaseSnapshot.snapshotKey(file_list)
+                concat_df = self.getDatabaseSnapshot().loadFrame('concat_%s' % subdirectory,
+                                                                 snapshot_key_dict[subdirectory])
+                if concat_df is not None:
+                    self.concat_database_dict[subdirectory] = concat_df
+        # read the sheets of the remaining subdirectories in one batch
+        sheet_dict = self.readDatabaseSheets([file for subdirectory, file_list in self.database_dict.items()
+                                              if subdirectory not in self.concat_database_dict for file in file_list])
+        for subdirectory, file_list in self.database_dict.items():
+            if subdirectory in self.concat_database_dict:
+                continue
+            # concat (rbind) the sheets in the order of database_dict in one step, and reset index so it is sequential
+            self.concat_database_dict[subdirectory] = pd.concat([sheet_dict[file] for file in file_list], ignore_index=True)
+            if self.use_database_snapshot:
+                self.getDatabaseSnapshot().storeFrame('concat_%s' % subdirectory, snapshot_key_dict[subdirectory],
+                                                      self.concat_database_dict[subdirectory])
+        if self.use_database_snapshot:
+            self.getDatabaseSnapshot().writeIndex()
+        self._concat_database_dict_from_files = True
+
+    def readDatabaseSheets(self, file_list):
+        """
+            read the database sheets in file_list, with the column headers stripped of whitespace. Sheets which have not
+            changed since they were last read come from the snapshot. The rest are parsed in a pool of self.workers
+            processes (serially if self.workers is 1)
+            :param file_list: list of paths to database sheets
+            :returns: a dict {path: sheet dataframe}
+        """
+        sheet_dict = {}
+        parse_file_list = []
+        for file in file_list:
+            sheet = self.getDatabaseSnapshot().loadSheet(file) if self.use_database_snapshot else None
+            if sheet is None:
+                parse_file_list.append(file)
+            else:
+                sheet_dict[file] = sheet
+        # executor.map returns the sheets in the order of parse_file_list
+        if self.workers > 1 and len(parse_file_list) > 1:
+            from concurrent.futures import ProcessPoolExecutor
+            with ProcessPoolExecutor(max_workers=min(self.workers, len(parse_file_list))) as executor:
+                parsed_sheet_list = list(executor.map(_readDatabaseSheet, parse_file_list))
+        else:
+            parsed_sheet_list = [_readDatabaseSheet(file) for file in parse_file_list]
+        for file, sheet in zip(parse_file_list, parsed_sheet_list):
+            if self.use_database_snapshot:
+                self.getDatabaseSnapshot().storeSheet(file, sheet)
+            sheet_dict[file] = sheet
+        for file in file_list:
+            sheet_dict[file].columns = [column_header.strip() for column_header in sheet_dict[file].columns]
+            self.logger.debug('columns of %s are %s' % (file, sheet_dict[file].columns))
+        return sheet_dict
+
+    def getDatabaseSnapshot(self):
+        """
+            the on disk snapshot of the database sheets and tables. Default location is rnaseq_tmp/database_snapshot
+            :returns: a DatabaseSnapshot (see DatabaseSnapshotObject)
+        """
+        if self.database_snapshot is None:
+            if self.database_snapshot_directory is None:
+                self.database_snapshot_directory = os.path.join(self.rnaseq_tmp, 'database_snapshot')
+            self.database_snapshot = DatabaseSnapshot(self.database_snapshot_directory)
+        return self.database_snapshot
+
+    def databaseSnapshotKey(self, accuracy_check=False):
+        """
+            :param accuracy_check: see setDatabaseDataframe()
+            :returns: the snapshot key of database_df -- every file in database_dict, the order of the subdirectories and
+                      accuracy_check. None if the snapshot is not in use, or concat_database_dict was not read from
+                      database_dict by setConcatDatabaseDict() (or has since been modified)
+        """
+        if not self.use_database_snapshot or not self._concat_database_dict_from_files:
+            return None
+        return self.databaseFilesKey(accuracy_check)
+
+    def databaseFilesKey(self, accuracy_check=False):
+        """
+            :param accuracy_check: see setDatabaseDataframe()
+            :returns: snapshot key (see DatabaseSnapshot.snapshotKey()) of every file in database_dict, the order of the
+                      subdirectories and accuracy_check
+        """
+        file_list = [file for file_list in self.database_dict.values() for file in file_list]
+        return DatabaseSnapshot.snapshotKey(file_list, self.database_subdirectories, accuracy_check)
+
+    def getQueryCache(self):
+        """
+            the on disk cache of query results. Default location is rnaseq_tmp/query_cache
+            :returns: a QueryCache (see QueryCacheObject)
+        """
+        if self.query_cache is None:
+            if self.query_cache_directory is None:
+                self.query_cache_directory = os.path.join(self.rnaseq_tmp, 'query_cache')
+            self.query_cache = QueryCache(self.query_cache_directory, int(self.query_cache_max_mb * 2**20))
+        return self.query_cache
+
+    def queryCacheKey(self, query_type, query):
+        """
+            :param query_type: see QueryCache.queryKey()
+            :param query: see QueryCache.queryKey()
+            :returns: the query cache key of a query of the database in database_files. None if the cache is not in use, or
+                      database_df has been set other than by merging database_files (eg passed to the constructor)
+        """
+        if not self.use_query_cache:
+            return None
+        if self.database_df is None:
+            if len(self.database_dict) == 0:
+                self.setDatabaseDict()
+            database_key = self.databaseFilesKey()
+        elif self._database_df_source is not None and self._database_df_source[0] == id(self.database_df):
+            database_key = self._database_df_source[1]
+        else:
+            return None
+        return QueryCache.queryKey(database_key, query_type, query)
+
+    def getDatabaseSqlite(self):
+        """
+            the sqlite materialization of the database. Default location is rnaseq_tmp/database_snapshot/database.sqlite
+            :returns: a DatabaseSqlite (see DatabaseSqliteObject)
+        """
+        if self.database_sqlite is None:
+            if self.database_sqlite_path is None:
+                self.database_sqlite_path = os.path.join(self.getDatabaseSnapshot().snapshot_directory, 'database.sqlite')
+            self.database_sqlite = DatabaseSqlite(self.database_sqlite_path)
+        return self.database_sqlite
+
+    def setDatabaseSqlite(self):
+        """
+            materialize each subdirectory table and the merged database_df (table database) in the sqlite file, indexed on
+            the key columns (see setKeyColumns()) and sqlite_index_columns. The database_date_columns are stored as
+            YYYY-MM-DD, so that a range of dates compares as dates. A table is only rewritten if a file from which it is
+            built has changed -- if nothing in database_files has changed, no sheet is read
+            :returns: the DatabaseSqlite
         """
-        # create dataframe from first file in file_list in given key(subdirectory) of database_dict
+        if len(self.database_dict) == 0:
+            self.setDatabaseDict()
+        database_sqlite = self.getDatabaseSqlite()
+        database_key = self.databaseFilesKey()
+        if database_sqlite.tableKey('database') == database_key:
+            return database_sqlite
+        if self.database_df is None:
+            self.setDatabaseDataframe()
+        # index each key column, each pair of key columns, and the columns most often queried
+        key_column_list = [list(database_key_column) for database_key_column in self.database_key_columns]
+        index_column_list = sorted({column for key_columns in key_column_list for column in key_columns}) + \
+                            [tuple(key_columns) for key_columns in key_column_list] + self.sqlite_index_columns
         for subdirectory, file_list in self.database_dict.items():
-            self.concat_database_dict[subdirectory] = utils.readInDataframe(file_list[0])
-            column_list = self.concat_database_dict[subdirectory].columns
-            column_list = [column_header.strip() for column_header in column_list]
-            self.concat_database_dict[subdirectory].columns = column_list
-            # keep appending (cbind) dataframes to the bottom
-            for file in file_list[1:]:
-                # read in next file in list as next_sheet
-                next_sheet = utils.readInDataframe(file)
-                self.logger.debug('columns of %s are %s' %(file, next_sheet.columns))
-                self.concat_database_dict[subdirectory] = self.concat_database_dict[subdirectory].append(next_sheet)
-            # reset index so it is sequential
-            self.concat_database_dict[subdirectory].reset_index(inplace=True, drop=True)
+            if database_sqlite.storeTable(subdirectory, DatabaseSnapshot.snapshotKey(file_list),
+                                          self.concat_database_dict[subdirectory], index_column_list,
+                                          self.database_date_columns):
+                self.logger.info('%s written to %s' % (subdirectory, database_sqlite.sqlite_path))
+        database_sqlite.storeTable('database', database_key, self.database_df, index_column_list,
+                                   self.database_date_columns)
+        self.logger.info('database written to %s' % database_sqlite.sqlite_path)
+        return database_sqlite
+
+    def queryDatabaseSqlite(self, sql, parameter_list=None):
+        """
+            run a sql query against the sqlite materialization of the database (see setDatabaseSqlite()). The merged
+            database is the table database, each subdirectory is a table of the same name (eg fastqFiles)
+            :param sql: a sql statement, eg SELECT * FROM database WHERE runNumber = 4011
+            :param parameter_list: values for the ? placeholders in sql
+            :returns: the result as a pandas dataframe
+        """
+        return self.setDatabaseSqlite().query(sql, parameter_list)
+
+    def filterDatabaseSqlite(self, filter_dict=None):
+        """
+            filter the database by the json at filter_json_path with a sql query. In addition to the {column: value} and
+            {column: [list, of, values]} of filterDatabaseDataframe(), the json may use the operators in, not in, between,
+            like, not like, =, !=, <, <=, > and >=. Dates may be written as in the sheets (eg 09.10.19) or as YYYY-MM-DD.
+            See DatabaseSqliteObject
+            :param filter_dict: optional filter, in the form of the json, used in place of filter_json_path (eg a request
+                                to the DatabaseServer)
+            :raises: FileNotFoundError('NoFilterJson') if neither filter_dict nor filter_json_path is set, KeyError if a
+                     column of the filter is not in the database, ValueError if a date of the filter is not a date
+        """
+        if filter_dict is None:
+            if self.filter_json_path is None:
+                raise FileNotFoundError('NoFilterJson')
+            with open(self.filter_json_path) as filter_json_file:
+                filter_dict = json.load(filter_json_file)
+        # the result depends on how the sqlite file is written
+        query_cache_key = self.queryCacheKey('sqlite', {'filter': filter_dict,
+                                                        'sqlite_version': DatabaseSqlite.sqlite_version})
+        if query_cache_key is not None:
+            self.filtered_database_df = self.getQueryCache().load(query_cache_key)
+            if self.filtered_database_df is not None:
+                self.logger.debug('filtered_database_df read from query cache %s' % self.query_cache_directory)
+                return
+        # sqlite reads a quoted identifier which is not a column as a string, which would match no rows rather than fail
+        database_column_set = set(self.queryDatabaseSqlite("SELECT name FROM pragma_table_info('database')")['name'])
+        unknown_column_list = [column for column in filter_dict if column not in database_column_set]
+        if unknown_column_list:
+            raise KeyError('FilterColumnNotInDatabase: %s' % unknown_column_list)
+        where_clause, parameter_list = DatabaseSqlite.filterJsonToSql(filter_dict, self.database_date_columns)
+        self.logger.debug('the filter created from the json is %s %s' % (where_clause, parameter_list))
+        self.filtered_database_df = self.queryDatabaseSqlite('SELECT * FROM database WHERE %s' % where_clause,
+                                                             parameter_list)
+        if query_cache_key is not None:
+            self.getQueryCache().store(query_cache_key, self.filtered_database_df)
 
     def setKeyColumns(self):
         """
@@ -198,6 +772,7 @@ class DatabaseObject(StandardData):
         """
         try:
             self.concat_database_dict['fastqFiles'].dropna(subset=['fastqFileName'], inplace=True)
+            self._concat_database_dict_from_files = False
         except KeyError:
             self.logger.error('Unable to drop rows from concat_database_dict[\'fastqFiles\']. '
                               'Check that it exists as both a subdirectory and a dataframe')
@@ -208,16 +783,24 @@ class DatabaseObject(StandardData):
             Please note: this has limited capability. More complicated filtering should be done using a DatabaseObject
             and the pandas sql-like filtering commands
             see https://pandas.pydata.org/docs/getting_started/comparison/comparison_with_sql.html
+            The result is cached (see getQueryCache()) -- if the filter has been run against the same database_files
+            before, the database is not merged
         """
+        if self.filter_json is None:
+            self.setFilterJson()
+            self.logger.debug(self.filter_json)
+        query_cache_key = self.queryCacheKey('dataframe', self.filter_json.to_dict())
+        if query_cache_key is not None:
+            self.filtered_database_df = self.getQueryCache().load(query_cache_key)
+            if self.filtered_database_df is not None:
+                self.logger.debug('filtered_database_df read from query cache %s' % self.query_cache_directory)
+                return
         try:
             if self.database_df is None:
                 raise ValueError('DatabaseDataframeNotSet')
         except ValueError:
             self.setDatabaseDataframe()
         finally:
-            if self.filter_json is None:
-                self.setFilterJson()
-                self.logger.debug(self.filter_json)
             # begin a string to store the query formula
             filter_str = '('
             # loop through columns in json query (i.e. 'timePoint' and 'treatment')
@@ -228,14 +811,19 @@ class DatabaseObject(StandardData):
             self.logger.debug('the filter created from the json_dict is %s' % filter_str)
             # use the filter_str formula to filter the dataframe
             self.filtered_database_df = self.database_df.query(filter_str)
+        if query_cache_key is not None:
+            self.getQueryCache().store(query_cache_key, self.filtered_database_df)
 
-    @staticmethod  #TODO: THIS NEEDS TO BE CHANGED SO THAT THE STANDARD FASTQFILENAME --> SAMPLE WITH JUST THE BASENAME OF THE SAMPLE, NO PATH OR EXTENSION
+    @staticmethod
     def standardizeDatabaseDataframe(rnaseq_metadata_df, **kwargs):
         """
             convert a dataframe containing sample info to a 'standard form' -- capitalized column headings and FASTQFILENAME
-            is just the sample name -- no path, no extension
+            is just the sample name -- no path, no extension. Columns are cast according to standardized_column_schema
             :param rnaseq_metadata_df: pandas dataframe of the rnaseq_metadata
-            :param kwargs: arbitrary keyword arguments. provided to pass logger
+            :param kwargs: arbitrary keyword arguments. Currently handles:
+                               logger: a logger
+                               leading_zero_dict: see StandardData._run_numbers_with_zeros. If passed, a column
+                                                  RUN_DIRECTORY_NUMBER is added (see runNumberWithZeros())
             :returns: the dataframe with column variables cast to uppercase and fastqFileName converted to SAMPLE
         """
         try:
@@ -244,15 +832,71 @@ class DatabaseObject(StandardData):
         except AttributeError:
             print('standardizeDatabaseDataframe takes a dataframe, not a filepath, as an argument')
 
-        # loop through rows
-        for index, row in rnaseq_metadata_df.iterrows():
-            # replace fastqfilename one by one so as to extract the run number appropriately
-            fastq_file_path = rnaseq_metadata_df.loc[index, 'FASTQFILENAME']
-            fastq_basename = utils.pathBaseName(fastq_file_path)
-            rnaseq_metadata_df.loc[index, 'FASTQFILENAME'] = utils.pathBaseName(fastq_basename)
+        # strip the containing directories and all extensions from the whole column (see utils.pathBaseName)
+        rnaseq_metadata_df['FASTQFILENAME'] = rnaseq_metadata_df['FASTQFILENAME'].str.replace(r'^.*/', '', regex=True)\
+                                                                                .str.replace(r'\..*$', '', regex=True)
+        rnaseq_metadata_df = DatabaseObject.applyDatabaseSchema(rnaseq_metadata_df,
+                                                                DatabaseObject.standardized_column_schema,
+                                                                logger=kwargs.get('logger'))
+        if kwargs.get('leading_zero_dict') and 'RUNNUMBER' in rnaseq_metadata_df.columns:
+            rnaseq_metadata_df['RUN_DIRECTORY_NUMBER'] = DatabaseObject.runNumberWithZeros(
+                rnaseq_metadata_df['RUNNUMBER'], kwargs['leading_zero_dict'])
 
         return rnaseq_metadata_df
 
+    @staticmethod
+    def applyDatabaseSchema(rnaseq_metadata_df, schema=None, logger=None):
+        """
+            cast the columns of rnaseq_metadata_df which are in schema (matched case insensitively) to the dtype in the
+            schema. A date or nullable int column is left as it is if any (non empty) value cannot be converted
+            :param rnaseq_metadata_df: a database dataframe
+            :param schema: {column: 'string', 'category', 'date' or 'Int64'}. Default DatabaseObject.database_column_schema
+            :param logger: optional logger to record columns which could not be cast
+            :returns: rnaseq_metadata_df with the columns cast
+        """
+        schema_dict = {column.upper(): dtype for column, dtype in (schema or DatabaseObject.database_column_schema).items()}
+        for column in rnaseq_metadata_df.columns:
+            dtype = schema_dict.get(str(column).upper())
+            if dtype is None:
+                continue
+            series = rnaseq_metadata_df[column]
+            if dtype == 'date':
+                converted_series = utils.convertDateColumn(series)
+            elif dtype == 'Int64':
+                converted_series = utils.convertNullableIntColumn(series)
+            else:
+                converted_series = series.astype(dtype)
+            if converted_series is None:
+                if logger:
+                    logger.debug('column %s cannot be cast to %s -- left as %s' % (column, dtype, series.dtype))
+            else:
+                rnaseq_metadata_df[column] = converted_series
+        return rnaseq_metadata_df
+
+    @staticmethod
+    def runNumberWithZeros(run_number_series, leading_zero_dict):
+        """
+            the run numbers as they appear in the run directories (eg run_0673_samples). Each value is converted on its own
+            :param run_number_series: the runNumber column (nullable int, or float if read in with empty values)
+            :param leading_zero_dict: see StandardData._run_numbers_with_zeros
+            :returns: a series of the same index. Run numbers in leading_zero_dict are mapped, the rest are cast to str
+                      (4422.0 --> 4422). A value which is not a whole number is cast to str as it is. An empty value is
+                      None -- the caller should skip that row
+        """
+        def runDirectoryNumber(run_number):
+            if pd.isna(run_number):
+                return None
+            try:
+                int_run_number = int(float(run_number))
+            except (TypeError, ValueError):
+                return str(run_number)
+            if int_run_number != float(run_number):
+                return str(run_number)
+            return str(leading_zero_dict.get(int_run_number, int_run_number))
+
+        return pd.Series([runDirectoryNumber(run_number) for run_number in run_number_series],
+                         index=run_number_series.index, dtype=object)
+
     @staticmethod
     def writeDatabaseDataframeToTmp(rnaseq_metadata_df, **kwargs):
         """
@@ -300,10 +944,14 @@ class DatabaseObject(StandardData):
                                leading_zero_dict: see StandardData._run_numbers_with_zeros
             :returns: a value extracted from a certain column of a certain row
         """
-        # extract row of interest based on filter value
-        row = rnaseq_metadata_df[rnaseq_metadata_df[filter_column] == filter_value]
-        # extract value of interest from row
-        extracted_value = row[extract_column].values[0]
+        # a lookup by sample (the standardized FASTQFILENAME) is in the SampleIndex of the dataframe
+        if filter_column == 'FASTQFILENAME':
+            extracted_value = SampleIndex.forDataframe(rnaseq_metadata_df, filter_column).value(filter_value, extract_column)
+        else:
+            # extract row of interest based on filter value
+            row = rnaseq_metadata_df[rnaseq_metadata_df[filter_column] == filter_value]
+            # extract value of interest from row
+            extracted_value = row[extract_column].values[0]
         # if leading_zero_dict (see StandardData) passed to kwargs, if the extracted value is a runNumber in the leading_zero_dict, then return with a leading 0
         try:
             if kwargs['leading_zero_dict']:  # TODO: casting this to an int is a bit ugly -- may be a point of weakness
@@ -314,6 +962,56 @@ class DatabaseObject(StandardData):
 
         return extracted_value
 
+    def keyIntegrityReport(self):
+        """
+            check the keys on which each pair of adjacent subdirectory tables is merged (see setKeyColumns()), eg
+            bioSample --> rnaSample on harvestDate, harvester and bioSampleNumber. Name columns are cast to upper case
+            first, as they are for the merge. Two problems are reported, one row per key:
+                duplicate_parent_key: the key is on more than one row of the parent table. Each child row with the key
+                                      is repeated in the merged database for each parent row (inflated_rows)
+                orphan_child_key: the key is on a child row, but on no parent row. The child row is not in the merged
+                                  database
+            :returns: a dataframe with columns parent, child, issue, key, parent_rows, child_rows, inflated_rows
+        """
+        if len(self.database_dict) == 0:
+            self.setDatabaseDict()
+        if len(self.concat_database_dict) == 0:
+            self.setConcatDatabaseDict()
+        if len(self.database_key_columns) == 0:
+            self.setKeyColumns()
+        self.castKeyNameColumns(self.concat_database_dict)
+        report_df_list = []
+        for i, database_key_column in enumerate(self.database_key_columns):
+            key_column_list = list(database_key_column)
+            parent, child = self.database_subdirectories[i], self.database_subdirectories[i + 1]
+            parent_key_df = self.concat_database_dict[parent][key_column_list]
+            child_key_df = self.concat_database_dict[child][key_column_list]
+            parent_key_hashes = self.keyHashes(parent_key_df, key_column_list)
+            child_key_hashes = self.keyHashes(child_key_df, key_column_list)
+            parent_count = parent_key_hashes.value_counts()
+            child_count = child_key_hashes.value_counts()
+            # one row per key, with the key as it appears first in the table
+            key_df = pd.concat([parent_key_df.assign(key_hash=parent_key_hashes.values),
+                                child_key_df.assign(key_hash=child_key_hashes.values)]).drop_duplicates('key_hash')
+            key_df = key_df.set_index('key_hash')
+            for issue, key_hash_index in [('duplicate_parent_key', parent_count.index[parent_count.values > 1]),
+                                          ('orphan_child_key', child_count.index.difference(parent_count.index))]:
+                if len(key_hash_index) == 0:
+                    continue
+                key_list = [', '.join('%s=%s' % key_pair for key_pair in zip(key_column_list, key_values))
+                            for key_values in key_df.loc[key_hash_index, key_column_list].itertuples(index=False)]
+                issue_df = pd.DataFrame({'parent': parent, 'child': child, 'issue': issue, 'key': key_list,
+                                         'parent_rows': parent_count.reindex(key_hash_index, fill_value=0).values,
+                                         'child_rows': child_count.reindex(key_hash_index, fill_value=0).values})
+                issue_df['inflated_rows'] = (issue_df['parent_rows'] - 1).clip(lower=0) * issue_df['child_rows']
+                report_df_list.append(issue_df)
+        report_df = pd.concat(report_df_list, ignore_index=True) if report_df_list else \
+            pd.DataFrame(columns=['parent', 'child', 'issue', 'key', 'parent_rows', 'child_rows', 'inflated_rows'])
+        self.logger.info('key integrity: %s duplicate parent keys (%s inflated rows), %s orphaned child keys'
+                         % ((report_df['issue'] == 'duplicate_parent_key').sum(), report_df['inflated_rows'].sum(),
+                            (report_df['issue'] == 'orphan_child_key').sum()))
+        return report_df
+
     @staticmethod
     def uniqueKeys(key_columns, database_subdirectory_concat_df):
         """
@@ -321,10 +1019,9 @@ class DatabaseObject(StandardData):
             :param key_columns: key columns (see DatabaseObject.setKeyColumns())
             :param database_subdirectory_concat_df: see DatabaseObject.setConcatDatabaseDict()
         """
-        # make a tuple of the key columns and store them as pandas series
-        key_tuples = database_subdirectory_concat_df[key_columns].apply(tuple, axis=1)
-        num_keys = key_tuples.size
-        num_unique_keys = key_tuples.unique().size
+        # see keyIntegrityReport() for a non interactive check of every subdirectory
+        num_keys = len(database_subdirectory_concat_df)
+        num_unique_keys = num_keys - database_subdirectory_concat_df[key_columns].duplicated().sum()
         print(
             "\nThe number of unique keys is {}. The number of rows is {}. If these are equal, the keys are unique.".format(
                 num_keys, num_unique_keys))
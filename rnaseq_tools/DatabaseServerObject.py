@@ -0,0 +1,207 @@
+"""
+   a resident query server for the metadata database. The merged database_df (see DatabaseObject) is held in memory,
+   and filter json or sql requests are answered over a unix domain socket -- so that a client does not pay the python,
+   pandas and database load start up on every query (see queryDB.py --serve and --client). Before a request, the
+   snapshot key of database_files is checked (at most once every reload_interval seconds), and the database is refreshed
+   (see DatabaseObject.refresh()) if a sheet has changed. A filter is answered by DatabaseObject.filterDatabaseSqlite(),
+   so that the server and queryDB.py -j return the same rows.
+
+   protocol: the client sends one json line, and the server replies with one json line, followed (if the status is ok)
+   by the result until the connection is closed
+       request:  {"filter": {filter json, see DatabaseSqliteObject}, "format": "csv" or "arrow"}
+                 {"sql": "SELECT ... FROM database", "parameters": [...], "format": "csv"}
+                 {"command": "ping", "reload" or "shutdown"}
+       response: {"status": "ok", "rows": 12, "format": "csv", "database_key": "..."} or {"status": "error", "error": "..."}
+
+   usage: server: DatabaseServer(DatabaseObject(...), '/tmp/queryDB_user.sock').serve()
+          client: header_dict = DatabaseServer.request('/tmp/queryDB_user.sock', {'filter': {'runNumber': [4011]}}, sys.stdout.buffer)
+
+   This module imports only the standard library at load, so that a client starts quickly
+"""
+import os
+import io
+import json
+import socket
+import getpass
+import tempfile
+import threading
+import time
+import socketserver
+
+
+class DatabaseServer:
+    # bytes per read/write on the socket
+    chunk_size = 2**16
+
+    def __init__(self, database_object, socket_path=None, reload_interval=5):
+        """
+            :param database_object: a DatabaseObject. Its database_df is (re)loaded from database_files by loadDatabase()
+            :param socket_path: path of the unix domain socket. Default see defaultSocketPath()
+            :param reload_interval: seconds between checks of database_files for a change. see reloadIfChanged()
+        """
+        self.database_object = database_object
+        self.socket_path = socket_path or self.defaultSocketPath()
+        self.reload_interval = reload_interval
+        self.logger = database_object.logger
+        # snapshot key of database_files when database_df was loaded, and the time it was last checked. see
+        # reloadIfChanged()
+        self.database_key = None
+        self._database_key_checked = None
+        # requests are answered one at a time (UnixStreamServer is not threaded), so a reload is never interleaved with
+        # a query
+        self._server = None
+
+    @staticmethod
+    def defaultSocketPath():
+        """
+            :returns: /tmp/queryDB_<user>.sock -- unix socket paths are limited to ~100 characters, too short for most
+                      paths in rnaseq_tmp
+        """
+        return os.path.join(tempfile.gettempdir(), 'queryDB_%s.sock' % getpass.getuser())
+
+    def loadDatabase(self):
+        """
+            re-list database_files and bring database_df up to date (see DatabaseObject.refresh()). Only sheets which have
+            changed are re-read
+        """
+        self.database_object.database_dict = {}
+        self.database_object.concat_database_dict = {}
+        self.database_object.database_key_columns = []
+        self.database_object.setDatabaseDict()
+        self.database_key = self.database_object.databaseFilesKey()
+        self._database_key_checked = time.monotonic()
+        self.database_object.refresh()
+        self.logger.info('database loaded: %s rows' % len(self.database_object.database_df))
+
+    def reloadIfChanged(self):
+        """
+            reload the database if a file in database_files has been added, removed or changed since it was loaded.
+            database_files is listed and stat'd at most once every reload_interval seconds -- a burst of requests is
+            answered from the database as it was at the first of them
+            :returns: True if the database was reloaded
+        """
+        if self._database_key_checked is not None and \
+                time.monotonic() - self._database_key_checked < self.reload_interval:
+            return False
+        self._database_key_checked = time.monotonic()
+        self.database_object.database_dict = {}
+        self.database_object.setDatabaseDict()
+        if self.database_object.databaseFilesKey() == self.database_key:
+            return False
+        self.loadDatabase()
+        return True
+
+    def handleRequest(self, request_dict):
+        """
+            :param request_dict: see module docstring
+            :raises: ValueError if the request is not recognized
+            :returns: a tuple (response header dict, result bytes or None)
+        """
+        command = request_dict.get('command')
+        if command == 'shutdown':
+            threading.Thread(target=self._server.shutdown).start()
+            return {'status': 'ok', 'command': command}, None
+        if command == 'reload':
+            self.loadDatabase()
+        else:
+            self.reloadIfChanged()
+        if command in ['ping', 'reload']:
+            return {'status': 'ok', 'command': command, 'database_key': self.database_key,
+                    'rows': len(self.database_object.database_df)}, None
+        if 'filter' in request_dict:
+            self.database_object.filterDatabaseSqlite(request_dict['filter'])
+            result_df = self.database_object.filtered_database_df
+        elif 'sql' in request_dict:
+            result_df = self.database_object.queryDatabaseSqlite(request_dict['sql'], request_dict.get('parameters'))
+        else:
+            raise ValueError('UnrecognizedRequest: %s' % request_dict)
+        result_format = request_dict.get('format', 'csv')
+        return {'status': 'ok', 'rows': len(result_df), 'format': result_format, 'database_key': self.database_key}, \
+               self.serializeFrame(result_df, result_format)
+
+    @staticmethod
+    def serializeFrame(result_df, result_format):
+        """
+            :param result_df: a dataframe
+            :param result_format: 'csv', or 'arrow' (the arrow ipc file format, ie feather v2. Requires pyarrow)
+            :raises: ValueError if the format is not recognized
+            :returns: result_df as bytes
+        """
+        if result_format == 'csv':
+            return result_df.to_csv(index=False).encode()
+        if result_format == 'arrow':
+            result_buffer = io.BytesIO()
+            result_df.reset_index(drop=True).to_feather(result_buffer)
+            return result_buffer.getvalue()
+        raise ValueError('UnrecognizedFormat: %s' % result_format)
+
+    def serve(self):
+        """
+            load the database and answer requests on socket_path until a shutdown request (or KeyboardInterrupt). The
+            socket is readable and writable only by the user
+        """
+        database_server = self
+
+        class RequestHandler(socketserver.StreamRequestHandler):
+            def handle(self):
+                try:
+                    request_dict = json.loads(self.rfile.readline().decode())
+                    header_dict, result_bytes = database_server.handleRequest(request_dict)
+                except Exception as err:
+                    database_server.logger.error('request failed: %s' % err)
+                    header_dict, result_bytes = {'status': 'error', 'error': '%s: %s' % (type(err).__name__, err)}, None
+                self.wfile.write((json.dumps(header_dict) + '\n').encode())
+                if result_bytes is not None:
+                    self.wfile.write(result_bytes)
+
+        self.loadDatabase()
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+        old_umask = os.umask(0o077)
+        try:
+            self._server = socketserver.UnixStreamServer(self.socket_path, RequestHandler)
+        finally:
+            os.umask(old_umask)
+        self.logger.info('queryDB server listening on %s' % self.socket_path)
+        try:
+            self._server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self._server.server_close()
+            if os.path.exists(self.socket_path):
+                os.remove(self.socket_path)
+
+    @classmethod
+    def request(cls, socket_path, request_dict, output_stream=None):
+        """
+            send a request to a running server, and stream the result to output_stream
+            :param socket_path: path of the server's unix domain socket
+            :param request_dict: see module docstring
+            :param output_stream: a binary file-like object, eg open(path, 'wb') or sys.stdout.buffer. If None, the
+                                  result is returned in the header dict under 'result'
+            :raises: ConnectionError if the server cannot be reached, or replies with an error
+            :returns: the response header dict
+        """
+        client_socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            try:
+                client_socket.connect(socket_path)
+            except (FileNotFoundError, ConnectionRefusedError) as err:
+                raise ConnectionError('NoQueryServer: %s (%s). Start one with queryDB.py --serve' % (socket_path, err))
+            client_socket.sendall((json.dumps(request_dict) + '\n').encode())
+            response_file = client_socket.makefile('rb')
+            header_dict = json.loads(response_file.readline().decode())
+            if header_dict['status'] != 'ok':
+                raise ConnectionError('QueryServerError: %s' % header_dict['error'])
+            result_chunk_list = []
+            for chunk in iter(lambda: response_file.read(cls.chunk_size), b''):
+                if output_stream is None:
+                    result_chunk_list.append(chunk)
+                else:
+                    output_stream.write(chunk)
+            if output_stream is None:
+                header_dict['result'] = b''.join(result_chunk_list)
+            return header_dict
+        finally:
+            client_socket.close()
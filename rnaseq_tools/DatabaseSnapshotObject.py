@@ -0,0 +1,186 @@
+"""
+   on disk cache of the metadata database (see DatabaseObject). Two levels are cached in snapshot_directory:
+       sheets: each .xlsx/.csv/.tsv in database_files, keyed by (path, mtime, size). Only sheets which have changed since
+               they were last read are re-parsed
+       frames: the concatenated table of each database subdirectory, and the merged database_df, keyed by
+               snapshotKey() of the source files from which they are built
+
+   frames are stored in feather format if pyarrow is installed, and pickled otherwise (or if a frame cannot be written
+   as feather, eg a column with mixed types)
+
+   usage: snapshot = DatabaseSnapshot(os.path.join(sd.rnaseq_tmp, 'database_snapshot'))
+          sheet_df = snapshot.readSheet('/path/to/database_files/bioSample/bioSample_1.xlsx')
+          snapshot.writeIndex()
+"""
+import os
+import json
+import hashlib
+from rnaseq_tools import utils
+
+
+class DatabaseSnapshot:
+    # increment if the content of the cached frames changes (eg how the subdirectory tables are concatenated)
+    snapshot_version = 2
+    index_filename = 'snapshot_index.json'
+
+    def __init__(self, snapshot_directory):
+        """
+            :param snapshot_directory: directory in which to store the snapshot. Created if it does not exist
+        """
+        self.snapshot_directory = snapshot_directory
+        utils.mkdirp(self.snapshot_directory)
+        self.index_path = os.path.join(self.snapshot_directory, self.index_filename)
+        self.index_dict = self.readIndex()
+
+    def readIndex(self):
+        """
+            :returns: the snapshot index {'sheets': {source path: entry}, 'frames': {frame name: entry}}
+        """
+        try:
+            with open(self.index_path) as index_file:
+                index_dict = json.load(index_file)
+            if index_dict.get('version') != self.snapshot_version:
+                raise ValueError('SnapshotVersionChanged')
+        except (FileNotFoundError, ValueError):
+            index_dict = {'version': self.snapshot_version, 'sheets': {}, 'frames': {}}
+        return index_dict
+
+    def writeIndex(self):
+        """
+            write the snapshot index. The index is re-read first so that concurrent writers only lose their own entries
+        """
+        with utils.lockFile(self.index_path + '.lock'):
+            current_index_dict = self.readIndex()
+            for level in ['sheets', 'frames']:
+                current_index_dict[level].update(self.index_dict[level])
+            utils.writeJsonAtomically(current_index_dict, self.index_path)
+            self.index_dict = current_index_dict
+
+    @staticmethod
+    def fileSignature(file_path):
+        """
+            :param file_path: path to a file
+            :returns: [mtime in ns, size in bytes] of file_path
+        """
+        file_stat = os.stat(file_path)
+        return [file_stat.st_mtime_ns, file_stat.st_size]
+
+    @classmethod
+    def snapshotKey(cls, file_path_list, *args):
+        """
+            :param file_path_list: list of source files
+            :param args: anything else on which the cached object depends (eg the order of the database subdirectories)
+            :returns: a hex digest of the (path, mtime, size) of each file in file_path_list, and args
+        """
+        key_list = [cls.snapshot_version, [[os.path.abspath(file_path)] + cls.fileSignature(file_path)
+                                           for file_path in sorted(file_path_list)], [str(arg) for arg in args]]
+        return hashlib.md5(json.dumps(key_list).encode()).hexdigest()
+
+    def readSheet(self, sheet_path):
+        """
+            read a database sheet, from the snapshot if the sheet has not changed since it was last read
+            :param sheet_path: path to a .xlsx, .csv or .tsv
+            :returns: the sheet as a pandas dataframe
+        """
+        sheet_df = self.loadSheet(sheet_path)
+        if sheet_df is None:
+            sheet_df = utils.readInDataframe(sheet_path)
+            self.storeSheet(sheet_path, sheet_df)
+        return sheet_df
+
+    def loadSheet(self, sheet_path):
+        """
+            :param sheet_path: path to a .xlsx, .csv or .tsv
+            :returns: the sheet from the snapshot, or None if it is not in the snapshot or has changed since it was stored
+        """
+        sheet_path = os.path.abspath(sheet_path)
+        return self.loadFrame(self.sheetFrameName(sheet_path), self.snapshotKey([sheet_path]), level='sheets',
+                              source=sheet_path)
+
+    def storeSheet(self, sheet_path, sheet_df):
+        """
+            store a sheet read from sheet_path in the snapshot. Call writeIndex() to save the index
+            :param sheet_path: path to a .xlsx, .csv or .tsv
+            :param sheet_df: the sheet as a pandas dataframe
+        """
+        sheet_path = os.path.abspath(sheet_path)
+        self.storeFrame(self.sheetFrameName(sheet_path), self.snapshotKey([sheet_path]), sheet_df, level='sheets',
+                        source=sheet_path)
+
+    @staticmethod
+    def sheetFrameName(sheet_path):
+        """
+            :param sheet_path: absolute path to a database sheet
+            :returns: the name of the snapshot frame of the sheet
+        """
+        return 'sheet_%s' % hashlib.md5(sheet_path.encode()).hexdigest()
+
+    def loadFrame(self, frame_name, frame_key=None, level='frames', source=None):
+        """
+            :param frame_name: name of the frame, eg database_df
+            :param frame_key: see snapshotKey(). If None, the frame is returned whatever its key (eg the database_df from
+                              which DatabaseObject.refresh() updates)
+            :param level: 'sheets' or 'frames'
+            :param source: the index key of the entry. Default is frame_name
+            :returns: the cached dataframe, or None if it is not in the snapshot or frame_key does not match
+        """
+        import pandas as pd
+        entry = self.index_dict[level].get(source or frame_name)
+        if entry is None or (frame_key is not None and entry['key'] != frame_key):
+            return None
+        frame_path = os.path.join(self.snapshot_directory, entry['file'])
+        try:
+            if entry['format'] == 'feather':
+                return pd.read_feather(frame_path)
+            else:
+                return pd.read_pickle(frame_path)
+        except (FileNotFoundError, EOFError, ImportError, ValueError, OSError):
+            return None
+
+    def storeFrame(self, frame_name, frame_key, frame_df, level='frames', source=None, metadata=None):
+        """
+            write frame_df to the snapshot and record it in the index. Call writeIndex() to save the index
+            :param frame_name: name of the frame, used as the file name
+            :param frame_key: see snapshotKey()
+            :param frame_df: a dataframe with a default (range) index
+            :param level: 'sheets' or 'frames'
+            :param source: the index key of the entry. Default is frame_name
+            :param metadata: optional json serializable dict stored with the entry. see frameMetadata()
+        """
+        frame_format = 'pickle'
+        tmp_suffix = '.%s.tmp' % os.getpid()
+        if self.featherAvailable():
+            frame_path = os.path.join(self.snapshot_directory, frame_name + '.feather')
+            try:
+                frame_df.reset_index(drop=True).to_feather(frame_path + tmp_suffix)
+                frame_format = 'feather'
+            except (ValueError, TypeError, ImportError) as err:
+                # eg pyarrow.lib.ArrowTypeError (a TypeError) on a column of mixed str and int
+                print('...%s cannot be stored as feather (%s). Storing as pickle' % (frame_name, err))
+        if frame_format == 'pickle':
+            frame_path = os.path.join(self.snapshot_directory, frame_name + '.pkl')
+            frame_df.to_pickle(frame_path + tmp_suffix)
+        os.replace(frame_path + tmp_suffix, frame_path)
+        self.index_dict[level][source or frame_name] = {'key': frame_key, 'file': os.path.basename(frame_path),
+                                                       'format': frame_format, 'metadata': metadata}
+
+    def frameMetadata(self, frame_name, level='frames', source=None):
+        """
+            :param frame_name: name of the frame, eg database_df
+            :param level: 'sheets' or 'frames'
+            :param source: the index key of the entry. Default is frame_name
+            :returns: the metadata stored with the frame (see storeFrame()), or None
+        """
+        entry = self.index_dict[level].get(source or frame_name)
+        return entry.get('metadata') if entry else None
+
+    @staticmethod
+    def featherAvailable():
+        """
+            :returns: True if pyarrow (required by pandas for feather) can be imported
+        """
+        try:
+            import pyarrow
+        except ImportError:
+            return False
+        return True
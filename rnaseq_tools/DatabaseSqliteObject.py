@@ -0,0 +1,178 @@
+"""
+   the metadata database (see DatabaseObject) materialized in a local SQLite file. Each table is stored with the snapshot
+   key (see DatabaseSnapshot.snapshotKey()) of the files from which it was built, and is only rewritten when that key
+   changes.
+
+   filter json (see queryDB.py -j) operators. A list is shorthand for in, a scalar for =. Date columns (see
+   DatabaseObject.database_date_columns) are stored as YYYY-MM-DD text, so that ranges compare as dates. The dates of a
+   filter may be written either way (eg 09.10.19 or 2019-09-10) -- they are parsed as the stored dates are, except for
+   like and not like, which match the stored text:
+       {"runNumber": [3993, 4011],
+        "genotype1": {"like": "CNAG_05%"},
+        "libraryDate": {"between": ["2019-01-01", "12.31.19"]},
+        "timePoint": {">=": 30, "<": 180},
+        "treatment": {"not in": ["37C.CO2"]}}
+
+   usage: database_sqlite = DatabaseSqlite('/path/to/database.sqlite')
+          where_clause, parameter_list = DatabaseSqlite.filterJsonToSql({'runNumber': [3993, 4011]})
+          query_df = database_sqlite.query('SELECT * FROM database WHERE %s' % where_clause, parameter_list)
+"""
+import os
+import re
+import sqlite3
+from rnaseq_tools import utils
+
+
+class DatabaseSqlite:
+    # table of {table name: snapshot key}
+    meta_table = 'snapshot_meta'
+    # part of the key of every table. Increment when the way a table is written changes (2: dates as YYYY-MM-DD)
+    sqlite_version = 2
+    # {json operator: sql operator}. see filterJsonToSql()
+    comparison_operator_dict = {'=': '=', '==': '=', '!=': '!=', '<': '<', '<=': '<=', '>': '>', '>=': '>=',
+                                'like': 'LIKE', 'not like': 'NOT LIKE'}
+
+    def __init__(self, sqlite_path):
+        """
+            :param sqlite_path: path to the sqlite file. Created if it does not exist
+        """
+        self.sqlite_path = sqlite_path
+        utils.mkdirp(os.path.dirname(os.path.abspath(self.sqlite_path)))
+
+    def connect(self):
+        """
+            :returns: a sqlite3 connection to sqlite_path, with the meta table created if necessary
+        """
+        connection = sqlite3.connect(self.sqlite_path)
+        connection.execute('CREATE TABLE IF NOT EXISTS %s (name TEXT PRIMARY KEY, key TEXT)' % self.meta_table)
+        return connection
+
+    def tableKey(self, table_name):
+        """
+            :param table_name: name of a table, eg database
+            :returns: the snapshot key with which table_name was stored, or None if it is not in the sqlite file or was
+                      written by another sqlite_version
+        """
+        connection = self.connect()
+        try:
+            row = connection.execute('SELECT key FROM %s WHERE name = ?' % self.meta_table, (table_name,)).fetchone()
+        finally:
+            connection.close()
+        if row is None or not row[0].startswith('%s:' % self.sqlite_version):
+            return None
+        return row[0].split(':', 1)[1]
+
+    def storeTable(self, table_name, table_key, table_df, index_column_list=None, date_column_list=None):
+        """
+            (re)write table_name from table_df, if table_key differs from the key with which it was stored
+            :param table_name: name of the table
+            :param table_key: see DatabaseSnapshot.snapshotKey()
+            :param table_df: a pandas dataframe
+            :param index_column_list: list of columns, or tuples of columns (a composite index), to index. Those not in
+                                      table_df are skipped
+            :param date_column_list: columns stored as YYYY-MM-DD text. see isoDates()
+            :returns: True if the table was written, False if it was current
+        """
+        with utils.lockFile(self.sqlite_path + '.lock'):
+            if self.tableKey(table_name) == table_key:
+                return False
+            connection = self.connect()
+            try:
+                # to_sql commits the table. The meta table is updated last so that an interrupted write is redone
+                date_column_list = [column for column in date_column_list or [] if column in table_df.columns]
+                if date_column_list:
+                    table_df = table_df.copy()
+                    for column in date_column_list:
+                        try:
+                            table_df[column] = self.isoDates(table_df[column])
+                        except ValueError:
+                            # a column with a value which is not a date is stored as it is in the sheets
+                            pass
+                table_df.to_sql(table_name, connection, if_exists='replace', index=False)
+                for index_columns in index_column_list or []:
+                    if isinstance(index_columns, str):
+                        index_columns = (index_columns,)
+                    if not set(index_columns).issubset(table_df.columns):
+                        continue
+                    index_name = re.sub(r'\W', '_', 'idx_%s_%s' % (table_name, '_'.join(index_columns)))
+                    connection.execute('CREATE INDEX IF NOT EXISTS %s ON %s (%s)' % (
+                        self.quoteIdentifier(index_name), self.quoteIdentifier(table_name),
+                        ', '.join(self.quoteIdentifier(column) for column in index_columns)))
+                connection.execute('INSERT OR REPLACE INTO %s (name, key) VALUES (?, ?)' % self.meta_table,
+                                   (table_name, '%s:%s' % (self.sqlite_version, table_key)))
+                connection.commit()
+            finally:
+                connection.close()
+        return True
+
+    def query(self, sql, parameter_list=None):
+        """
+            :param sql: a sql statement, eg SELECT * FROM database WHERE runNumber = 4011
+            :param parameter_list: values for the ? placeholders in sql
+            :returns: the result as a pandas dataframe
+        """
+        import pandas as pd
+        connection = self.connect()
+        try:
+            return pd.read_sql_query(sql, connection, params=parameter_list or [])
+        finally:
+            connection.close()
+
+    @staticmethod
+    def isoDates(date_list):
+        """
+            :param date_list: a list or series of dates, eg 09.10.19, 2019-09-10 or datetimes. Parsed by
+                              utils.convertDateColumn()
+            :returns: a list of the dates as YYYY-MM-DD, with empty values None
+            :raises: ValueError if a (non empty) value is not a date
+        """
+        import pandas as pd
+        date_series = pd.Series(list(date_list), dtype=object)
+        converted_series = utils.convertDateColumn(date_series)
+        if converted_series is None:
+            raise ValueError('UnrecognizedDate: %s' % list(date_series[date_series.notna()]))
+        return [None if pd.isna(date) else date.strftime('%Y-%m-%d') for date in converted_series]
+
+    @staticmethod
+    def quoteIdentifier(identifier):
+        """
+            :param identifier: a table, column or index name
+            :returns: identifier quoted for sqlite
+        """
+        return '"%s"' % str(identifier).replace('"', '""')
+
+    @classmethod
+    def filterJsonToSql(cls, filter_dict, date_column_list=None):
+        """
+            translate a filter json (see module docstring) into a sql WHERE clause. The clauses for each column are ANDed
+            :param filter_dict: {column: value, list of values or {operator: value}}
+            :param date_column_list: columns stored as YYYY-MM-DD (see storeTable()). Their values, other than those of
+                                     like and not like, are converted by isoDates()
+            :raises: ValueError if an operator is not recognized, or a value of a date column is not a date
+            :returns: a tuple (where clause with ? placeholders, list of parameters)
+        """
+        clause_list = []
+        parameter_list = []
+        for column, condition in filter_dict.items():
+            quoted_column = cls.quoteIdentifier(column)
+            if not isinstance(condition, dict):
+                condition = {'in': condition} if isinstance(condition, list) else {'=': condition}
+            for operator, value in condition.items():
+                operator = operator.lower().strip()
+                if column in (date_column_list or []) and operator not in ['like', 'not like']:
+                    value = cls.isoDates(value) if isinstance(value, list) else cls.isoDates([value])[0]
+                if operator in ['in', 'not in']:
+                    value_list = value if isinstance(value, list) else [value]
+                    clause_list.append('%s %s (%s)' % (quoted_column, operator.upper(), ', '.join('?' * len(value_list))))
+                    parameter_list.extend(value_list)
+                elif operator == 'between':
+                    if not (isinstance(value, list) and len(value) == 2):
+                        raise ValueError('BetweenRequiresTwoValues: %s' % column)
+                    clause_list.append('%s BETWEEN ? AND ?' % quoted_column)
+                    parameter_list.extend(value)
+                elif operator in cls.comparison_operator_dict:
+                    clause_list.append('%s %s ?' % (quoted_column, cls.comparison_operator_dict[operator]))
+                    parameter_list.append(value)
+                else:
+                    raise ValueError('UnrecognizedFilterOperator: %s' % operator)
+        return ' AND '.join(clause_list) or '1', parameter_list
@@ -69,23 +69,20 @@ class IgvObject(OrganismData):
         """
         wildtype_dict = {}
 
-        for index, row in self.wildtype_df.iterrows():
+        artifact_catalog = self.getArtifactCatalog(list(self.wildtype_df['runNumber'].dropna().unique()))
+        run_number_list = list(DatabaseObject.runNumberWithZeros(self.wildtype_df['runNumber'], self._run_numbers_with_zeros))
+        for (index, row), run_number in zip(self.wildtype_df.iterrows(), run_number_list):
             fastq_filename = row.fastqFileName
-            bam_filename = utils.convertFastqFilename(fastq_filename, 'bam')
-            run_number = row.runNumber # TODO: this is copied code - either put in function or use utils.extractFromQuerySheet
-            try:
-                run_num_with_zero = self._run_numbers_with_zeros[run_number]
-            except KeyError:
-                pass
-            else:
-                run_number = run_num_with_zero
+            if run_number is None:
+                self.logger.warning('%s has no runNumber -- skipped' % fastq_filename)
+                continue
             treatment = utils.extractInfoFromQuerySheet(self.wildtype_df, fastq_filename, 'treatment')
             timepoint = utils.extractInfoFromQuerySheet(self.wildtype_df, fastq_filename, 'timePoint')
-            bam_file_fullpath = os.path.join(self.align_count_results, 'run_%s_samples/align'%run_number, bam_filename)
-            try:
-                if not os.path.exists(bam_file_fullpath):
-                    raise FileNotFoundError('control sample %s not found' %bam_file_fullpath)
-            except FileNotFoundError:
+            bam_file_fullpath = artifact_catalog.artifactPath(fastq_filename, 'bam', row.runNumber,
+                                                              root=self.align_count_results)
+            if bam_file_fullpath is None:
+                bam_file_fullpath = os.path.join(self.align_count_results, 'run_%s_samples/align'%run_number,
+                                                 utils.convertFastqFilename(fastq_filename, 'bam'))
                 error_msg = 'control sample not in %s. %s DNE' %(self.align_count_results, bam_file_fullpath)
                 self.logger.critical(error_msg)
                 print(error_msg)
@@ -102,25 +99,22 @@ class IgvObject(OrganismData):
         setattr(self, 'igv_snapshot_dict', {})
         igv_sample_dict = {}
 
-        for index, row in self.sample_df.iterrows():
+        artifact_catalog = self.getArtifactCatalog(list(self.sample_df['runNumber'].dropna().unique()))
+        run_number_list = list(DatabaseObject.runNumberWithZeros(self.sample_df['runNumber'], self._run_numbers_with_zeros))
+        for (index, row), run_number in zip(self.sample_df.iterrows(), run_number_list):
+            if run_number is None:
+                self.logger.warning('%s has no runNumber -- skipped' % row.fastqFileName)
+                continue
             # extract relevant info from query row
             sample_name = utils.pathBaseName(row.fastqFileName)
-            bam_file = utils.convertFastqFilename(row.fastqFileName, 'bam')
             treatment = str(row.treatment)
             timepoint = str(row.timePoint)
             treatment_timepoint = "%s_%s" %(treatment,timepoint) #NOTE: this is setup specifically for KN99 -- needs to be generalized
-            run_number = row.runNumber
-            try:
-                run_num_with_zero = self._run_numbers_with_zeros[run_number]
-            except KeyError:
-                pass
-            else:
-                run_number = run_num_with_zero
-            bamfile_fullpath = os.path.join(self.align_count_results, 'run_%s_samples/align' %run_number, bam_file)
-            try:
-                if not os.path.exists(bamfile_fullpath):
-                    raise FileNotFoundError('%s DNE' %bamfile_fullpath)
-            except FileNotFoundError:
+            bamfile_fullpath = artifact_catalog.artifactPath(row.fastqFileName, 'bam', row.runNumber,
+                                                             root=self.align_count_results)
+            if bamfile_fullpath is None:
+                bamfile_fullpath = os.path.join(self.align_count_results, 'run_%s_samples/align' %run_number,
+                                                utils.convertFastqFilename(row.fastqFileName, 'bam'))
                 error_msg = 'bamfile does not exist at %s' %bamfile_fullpath
                 self.logger.critical(error_msg)
                 print(error_msg)
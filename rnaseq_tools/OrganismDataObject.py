@@ -1,10 +1,9 @@
 from rnaseq_tools import utils
 from rnaseq_tools.StandardDataObject import StandardData
+from rnaseq_tools.ConfigRegistryObject import ConfigRegistry
 from itertools import repeat
-import pandas as pd
 import sys
 import os
-import configparser
 
 
 class OrganismData(StandardData):
@@ -29,6 +28,8 @@ class OrganismData(StandardData):
             # set OrganismData config found in rnaseq_pipeline/genome_files/<organism>/OrganismData_config.ini
             self.organism_config_file = os.path.join(self.organism_directory, 'OrganismData_config.ini')
             if self.organism in self._configured_organisms_list:
+                # extract (if necessary) and check only this organism's genome_files
+                self._session.ensureOrganismGenomeFiles(self.organism)
                 self.setOrganismData()
             else:
                 print('\n{self.organism} is not configured. You will have to set the OrganismData attributes manually. '
@@ -43,24 +44,30 @@ class OrganismData(StandardData):
         self.logger = utils.createStandardObjectChildLogger(self, __name__)
 
     def setOrganismData(self):
-        # read configuration file at path stored in organism_config_file
-        # read config file
-        config = configparser.ConfigParser()
-        config.read(self.organism_config_file)
-        # set attributes for StandardData
+        # read configuration file at path stored in organism_config_file (parsed once per process, see ConfigRegistryObject)
         try:
-            for key, value in config[self.self_type].items():
-                if key in self._no_file_organism_attributes['strings']:
-                    setattr(self, key, str(value))
-                elif key in self._no_file_organism_attributes['ints']:
-                    setattr(self, key, int(value))
-                else:
-                    setattr(self, key, os.path.join(self.organism_directory, value))
-        except KeyError:
+            organism_config_dict = ConfigRegistry.getSection(self.organism_config_file, self.self_type)
+        except (KeyError, FileNotFoundError):
             sys.exit('Check the contents of your genomes_files. \n'
                   'It is probable that they were erased by the evil scratch garbage collector. \n'
                   'If so, delete the whole genome_files and re-launch. As long as you are not in interactive, \n'
                   'it will re download in full')
+        # set attributes for StandardData
+        for key, value in organism_config_dict.rawItems():
+            if key in self._no_file_organism_attributes['strings']:
+                setattr(self, key, value)
+            elif key in self._no_file_organism_attributes['ints']:
+                setattr(self, key, organism_config_dict[key])
+            else:
+                setattr(self, key, os.path.join(self.organism_directory, value))
+
+    def getAnnotationIndex(self, annotation_path=None):
+        """
+            the interval index of the organism's annotation. See SessionContext.getAnnotationIndex()
+            :param annotation_path: default annotation_file (see OrganismData_config.ini)
+            :returns: an AnnotationIndex
+        """
+        return self._session.getAnnotationIndex(annotation_path or self.annotation_file)
 
     def createOrganismDataLogger(self):
         """
@@ -80,6 +87,7 @@ class OrganismData(StandardData):
             :param gene_list: see the OrganismData_config.ini in genome_files/<organism>
             :returns: A count matrix of all genes (rows) by all samples (columns)
         """
+        import pandas as pd
         # instantiate count_df with columns gene_id, <sample_name_1...>, <sample_name_2...>
         count_df = pd.DataFrame(columns=['gene_id'])
         # add gene names to column gene_id
@@ -108,6 +116,7 @@ class OrganismData(StandardData):
             :returns: A list with structure [ fastqFileName, [list_of_conditions for the wt] ]
             :throws: FileNotFoundError if no wt found, even only matching condition
         """
+        import pandas as pd
         # fill database nas w/ -1
         wt_by_condition = pd.read_csv(self.wt_by_condition_path)
         wt_by_condition = wt_by_condition.fillna(-1)
@@ -1,19 +1,44 @@
 import os
-import subprocess
 import re
-import configparser
+import json
 import pandas as pd
 import sys
 from rnaseq_tools import utils
+from rnaseq_tools import alignment_log_tools
 from rnaseq_tools.DatabaseObject import DatabaseObject
 from rnaseq_tools.OrganismDataObject import OrganismData
+from rnaseq_tools.ConfigRegistryObject import ConfigRegistry
+from rnaseq_tools.SampleIndexObject import SampleIndex
+from rnaseq_tools.BamMetricsObject import BamMetrics
+from rnaseq_tools.CoverageCacheObject import CoverageCache
+from rnaseq_tools.SampleMetricCacheObject import SampleMetricCache
 import abc
 
 # turn off SettingWithCopyWarning in pandas
 pd.options.mode.chained_assignment = None
 
 
+def _scanBamMetrics(bam_path, bam_metrics_kwargs):
+    """
+        scan a bam (see BamMetrics.scan()) and write its genome wide depth next to it. Module level so that it may be run
+        in a process pool (see QualityAssessmentObject.scanBamMetrics())
+        :param bam_path: path to a bam
+        :param bam_metrics_kwargs: the keyword arguments of BamMetrics, other than bam_path
+        :returns: (the scanned BamMetrics, without its coverage_cache, None), or (None, the exception) if the scan failed
+    """
+    try:
+        bam_metrics = BamMetrics(bam_path, **bam_metrics_kwargs).scan()
+    except Exception as error:
+        return None, error
+    bam_metrics.coverage_cache.saveNextToBam(bam_path)
+    bam_metrics.coverage_cache = None
+    return bam_metrics, None
+
+
 class QualityAssessmentObject(OrganismData):
+    # version of the per sample metrics, part of the key of the metric cache (see readMetricCache()). Increment in a
+    # child whenever a metric changes. None if the metrics of the organism are not cached
+    metric_version = None
 
     def __init__(self, expected_attributes=None, **kwargs):
         # add expected attributes to super._attributes
@@ -56,25 +81,61 @@ class QualityAssessmentObject(OrganismData):
             self.logger.critical('%s  --> query_path not valid' % self.query_path)
         except AttributeError:
             pass
+        # number of processes in which to scan the bams. see scanBamMetrics()
         try:
-            print('...extracting alignment information from novoalign logs')
-            align_log_df = self.parseAlignmentLogs()
-        except AttributeError:
-            print("no novoalign files found")
+            self.workers = int(kwargs['workers'])
+        except KeyError:
+            self.workers = 1
+        # {fastq simple name: [error, ...]} of the steps which failed for a sample. see recordSampleError()
+        self._sample_error_dict = {}
+        # {bam path: (scanned BamMetrics, None) or (None, error)} and {'noncoding': [intervals]}. see scanBamMetrics()
+        self._bam_metrics_dict = {}
+        self._feature_interval_dict = {}
+        # (bam path, CoverageCache) of the last coverageCache()
+        self._coverage_cache = None
+        # path to the per sample metric cache, eg run_673_sequence_quality_metrics.json. None if the metrics are not
+        # cached. With force, every sample is assessed (and the cache rewritten). see readMetricCache()
         try:
-            print('...extracting count information from htseq count files')
-            if self.organism == 'KN99':
-                count_summary_df = self.parseCountFiles(count_ambiguous_unique=True)
-            else:
-                count_summary_df = self.parseCountFiles()
-        except AttributeError:
-            print('no count files found')
+            self.metric_cache_path = kwargs['metric_cache_path']
+        except KeyError:
+            self.metric_cache_path = None
         try:
-            print('...compiling alignment and count information')
-            self.qual_assess_df = self.compileAlignCountMetadata(align_log_df, count_summary_df)
-            self.formatLibrarySizeColumns()
-        except UnboundLocalError:
-            print('no log summary or count summary')
+            self.force = kwargs['force']
+        except KeyError:
+            self.force = False
+        self._metric_cache = None
+        # {sample name: key in the metric cache} and {sample name: cached metrics}. see readMetricCache()
+        self._metric_key_dict = {}
+        self._cached_metric_dict = {}
+        if self.metric_version is not None and self.metric_cache_path:
+            self.readMetricCache()
+        if self._cached_metric_dict and not self.count_file_list:
+            print('...the metrics of every sample are cached in %s' % self.metric_cache_path)
+            self.qual_assess_df = pd.DataFrame(columns=['FASTQFILENAME'])
+        else:
+            try:
+                print('...extracting alignment information from novoalign logs')
+                align_log_df = self.parseAlignmentLogs()
+            except AttributeError:
+                print("no novoalign files found")
+            try:
+                print('...extracting count information from htseq count files')
+                if self.organism == 'KN99':
+                    # scan every bam up front, in parallel if self.workers > 1. The per sample steps read the results
+                    self.scanBamMetrics([utils.pathBaseName(count_file).replace('_read_count', '')
+                                         for count_file in self.count_file_list])
+                    count_summary_df = self.parseCountFiles(count_ambiguous_unique=True)
+                else:
+                    count_summary_df = self.parseCountFiles()
+            except AttributeError:
+                print('no count files found')
+            try:
+                print('...compiling alignment and count information')
+                self.qual_assess_df = self.compileAlignCountMetadata(align_log_df, count_summary_df)
+                self.formatLibrarySizeColumns()
+                self.qual_assess_df = self.addSampleErrorColumn(self.qual_assess_df)
+            except UnboundLocalError:
+                print('no log summary or count summary')
 
     def formatLibrarySizeColumns(self):
         """
@@ -96,19 +157,16 @@ class QualityAssessmentObject(OrganismData):
                                                                'LIBRARY_SIZE'].astype('float')
 
     def extractInfoFromQuerySheet(self, sample_name, extract_column):
-        """ TODO: REMOVE THIS AND REPLACE WITH FUNCTION IN UTILS IN OTHER CODE
-                  PUT INTO UTILS 20201220, BUT HAVE NOT REPLACED THE CODE EVERYWHERE
-            //TODO: YES. THAT IS A GOOD IDEA. THIS IS HARD TO FIND WHEN COME ACROSS IN CHILDREN
-            //TODO: PASS DF IN THE FUNCTION?
+        """
             extract information from query sheet given sample_name from qual_assess_df (which is the basename, no ext, of the fastq.gz)
+            the lookup is in the SampleIndex of query_df, which is built on the first call
             :param sample_name: name of sample -- basename of fastq.gz, no containing directory, no extension
             :param extract_column: column from which to extract a value from the query_df based on sample_name
+            :raises: IndexError if sample_name is not in query_df, KeyError if extract_column is not in query_df
             :returns: value extracted from query_df based on sample name and extract column
         """
         try:
-            extract_value = \
-            list(self.query_df[self.query_df['fastqFileName'].str.contains(sample_name + '.fastq.gz')][extract_column])[
-                0]
+            extract_value = SampleIndex.forDataframe(self.query_df).value(sample_name, extract_column)
         except AttributeError:
             self.logger.error("failure in extractInfoFromQuerySheet. sample_name: %s extract_column: %s" % (
             sample_name, extract_column))
@@ -118,22 +176,15 @@ class QualityAssessmentObject(OrganismData):
 
     def parseAlignmentLogs(self):
         """
-
+            parse the novoalign logs in novoalign_log_list. see alignment_log_tools.novoalignLogDataframe(). A log which
+            cannot be parsed is recorded (see recordSampleError()), and the sample kept with NaN counts
+            :returns: a dataframe with columns FASTQFILENAME, LIBRARY_SIZE, UNIQUE_ALIGNMENT, MULTI_MAP, NO_MAP,
+                      HOMOPOLY_FILTER and READ_LENGTH_FILTER
         """
-        # instantiate dataframe
-        align_df = pd.DataFrame()
-
-        # extract metadata from novoalign log files
-        for log_file in self.novoalign_log_list:
-            # extract fastq filename
-            fastq_basename = utils.pathBaseName(log_file).replace('_novoalign', '')
-            # set sample name in library_metadata_dict
-            library_metadata_dict = {"FASTQFILENAME": fastq_basename}
-            print('...extracting information from novoalign log for %s' % fastq_basename)
-            library_metadata_dict.update(self.parseAlignmentLog(log_file))
-            align_df = align_df.append(pd.Series(library_metadata_dict), ignore_index=True)
-
-        return align_df
+        print('...extracting information from %i novoalign logs' % len(self.novoalign_log_list))
+        return alignment_log_tools.novoalignLogDataframe(
+            self.novoalign_log_list, logger=self.logger,
+            error_callback=lambda sample_name, error: self.recordSampleError(sample_name, 'parse_novoalign_log', error))
 
     def parseCountFiles(self, count_ambiguous_unique=False):
         """
@@ -141,8 +192,8 @@ class QualityAssessmentObject(OrganismData):
             :param count_ambiguous_unique: boolean flag indicating whether to call uniqueAmbiguousProteinCodingCount()
             :returns: a dataframe containing the files according to their suffix
         """
-        # instantiate dataframe
-        htseq_count_df = pd.DataFrame()
+        # list of library_metadata_dicts, one per count file. The dataframe is built once at the end
+        library_metadata_list = []
 
         # extract metadata from count files
         for count_file in self.count_file_list:
@@ -151,13 +202,178 @@ class QualityAssessmentObject(OrganismData):
             # set sample name in library_metadata_dict
             library_metadata_dict = {"FASTQFILENAME": fastq_basename}
             print('...extracting count information from count file for %s' % fastq_basename)
-            library_metadata_dict.update(self.parseGeneCount(count_file))
-            if count_ambiguous_unique:
-                library_metadata_dict['AMBIGUOUS_UNIQUE_PROTEIN_CODING_READS'] = self.uniqueAmbiguousProteinCodingCount(
-                    fastq_basename)
-            htseq_count_df = htseq_count_df.append(pd.Series(library_metadata_dict), ignore_index=True)
+            # a count file which cannot be parsed is recorded, and the sample kept, rather than stopping the others
+            try:
+                with utils.timedEvent(self.logger, 'parse_count_file', sample=fastq_basename):
+                    library_metadata_dict.update(self.parseGeneCount(count_file))
+                    if count_ambiguous_unique:
+                        library_metadata_dict['AMBIGUOUS_UNIQUE_PROTEIN_CODING_READS'] = \
+                            self.uniqueAmbiguousProteinCodingCount(fastq_basename)
+            except Exception as error:
+                self.recordSampleError(fastq_basename, 'parse_count_file', error)
+            library_metadata_list.append(library_metadata_dict)
+
+        return pd.DataFrame(library_metadata_list)
+
+    def readMetricCache(self):
+        """
+            look up the samples of count_file_list in the metric cache at metric_cache_path (see SampleMetricCacheObject).
+            A sample's key is the path, size and mtime of its bam, count file and novoalign log and of the files of
+            metricKeyInputs(), the md5 of annotation_file, its row of query_df, the config values of metricKeyInputs()
+            and metric_version. The files of the samples whose cached metrics are
+            current are removed from bam_file_list, count_file_list and novoalign_log_list, so that only the new and
+            changed samples are assessed. mergeCachedMetrics() adds the cached rows back. With force, no cached row is
+            used
+        """
+        self._metric_cache = SampleMetricCache(self.metric_cache_path)
+        try:
+            annotation_md5 = utils.fileChecksum(self.annotation_file)
+        except (AttributeError, FileNotFoundError):
+            annotation_md5 = None
+        novoalign_log_dict = {alignment_log_tools.novoalignLogSampleName(novoalign_log): novoalign_log
+                              for novoalign_log in reversed(self.novoalign_log_list)}
+        cached_path_set = set()
+        for count_file in self.count_file_list:
+            sample_name = utils.pathBaseName(count_file).replace('_read_count', '')
+            try:
+                bam_path = self.bamPath(sample_name)
+            except IndexError:
+                bam_path = None
+            try:
+                query_row_dict = SampleIndex.forDataframe(self.query_df).record(sample_name)
+            except (AttributeError, IndexError):
+                query_row_dict = None
+            input_path_list, setting_dict = self.metricKeyInputs(count_file)
+            sample_key = SampleMetricCache.sampleKey([bam_path, count_file, novoalign_log_dict.get(sample_name)] +
+                                                     input_path_list, annotation_md5, query_row_dict,
+                                                     self.metric_version, setting_dict)
+            self._metric_key_dict[sample_name] = sample_key
+            metric_row_dict = None if self.force else self._metric_cache.metrics(sample_name, sample_key)
+            if metric_row_dict is not None:
+                self._cached_metric_dict[sample_name] = metric_row_dict
+                cached_path_set.update([bam_path, count_file, novoalign_log_dict.get(sample_name)])
+        self.logger.info('%s of %s samples are in the metric cache %s'
+                         % (len(self._cached_metric_dict), len(self._metric_key_dict), self.metric_cache_path))
+        print('...%s of %s samples are in the metric cache' % (len(self._cached_metric_dict), len(self._metric_key_dict)))
+        self.bam_file_list = [bam_file for bam_file in self.bam_file_list if bam_file not in cached_path_set]
+        self.count_file_list = [count_file for count_file in self.count_file_list if count_file not in cached_path_set]
+        self.novoalign_log_list = [novoalign_log for novoalign_log in self.novoalign_log_list
+                                   if novoalign_log not in cached_path_set]
+
+    def metricKeyInputs(self, count_file):
+        """
+            the inputs of a sample's metrics other than its own bam, count file and novoalign log. see readMetricCache()
+            :param count_file: path to the sample's count file
+            :returns: (list of paths, eg the log2cpm of the run, {config attribute: value} used in the metrics)
+        """
+        return [], {}
 
-        return htseq_count_df
+    def mergeCachedMetrics(self, qual_assess_df):
+        """
+            store the metrics of the assessed samples which have no QA_ERROR in the metric cache, and add the cached rows
+            of the others. see readMetricCache()
+            :param qual_assess_df: the qual_assess_df of the assessed samples, before it is formatted
+            :returns: qual_assess_df of every sample, in the order of count_file_list. qual_assess_df if the metrics are
+                      not cached
+        """
+        if self._metric_cache is None:
+            return qual_assess_df
+        # through json, so that the values of the assessed and of the cached samples are of the same types
+        metric_row_list = json.loads(qual_assess_df.to_json(orient='records'))
+        for metric_row_dict in metric_row_list:
+            sample_name = metric_row_dict['FASTQFILENAME']
+            if sample_name in self._metric_key_dict and not metric_row_dict.get('QA_ERROR'):
+                self._metric_cache.storeMetrics(sample_name, self._metric_key_dict[sample_name], metric_row_dict)
+        try:
+            self._metric_cache.write()
+        except OSError as error:
+            self.logger.info('metric cache %s not written: %s' % (self.metric_cache_path, error))
+        metric_row_list.extend(self._cached_metric_dict.values())
+        sample_order_dict = {sample_name: order for order, sample_name in enumerate(self._metric_key_dict)}
+        metric_row_list.sort(key=lambda metric_row_dict: sample_order_dict.get(metric_row_dict['FASTQFILENAME'],
+                                                                               len(sample_order_dict)))
+        return pd.DataFrame(metric_row_list, columns=list(qual_assess_df.columns) +
+                            sorted({column for metric_row_dict in metric_row_list for column in metric_row_dict} -
+                                   set(qual_assess_df.columns)))
+
+    def recordSampleError(self, fastq_simple_name, step, error):
+        """
+            log a step which failed for one sample. The sample is kept, with the error in its QA_ERROR column (see
+            addSampleErrorColumn()), rather than the error stopping the assessment of the other samples
+            :param fastq_simple_name: fastq filename without path or extension
+            :param step: the step which failed, eg parse_count_file
+            :param error: the exception
+        """
+        error_message = '%s: %s' % (type(error).__name__, error)
+        self.logger.error('%s failed for %s -- %s' % (step, fastq_simple_name, error_message))
+        print('%s failed for %s -- %s' % (step, fastq_simple_name, error_message))
+        # an error (eg of the bam scan) which is raised again in a later step is recorded once
+        sample_error_list = self._sample_error_dict.setdefault(fastq_simple_name, [])
+        if error_message not in sample_error_list:
+            sample_error_list.append(error_message)
+
+    def addSampleErrorColumn(self, qual_assess_df):
+        """
+            :param qual_assess_df: a qual_assess_df with the column FASTQFILENAME
+            :returns: qual_assess_df with the column QA_ERROR -- the errors recorded for the sample (see
+                      recordSampleError()) separated by '; ', or None
+        """
+        qual_assess_df['QA_ERROR'] = ['; '.join(self._sample_error_dict[fastq_simple_name])
+                                      if fastq_simple_name in self._sample_error_dict else None
+                                      for fastq_simple_name in qual_assess_df['FASTQFILENAME']]
+        return qual_assess_df
+
+    def bamPath(self, fastq_simple_name):
+        """
+            the bam of a sample in bam_file_list. The bam's name must be the sample name followed by a bam suffix (see
+            utils.ARTIFACT_SUFFIX_DICT) or .bam, so that eg sample_1 is not matched to the bam of sample_10
+            :param fastq_simple_name: fastq filename without path or extension
+            :returns: path to the sample's bam
+            :raises: IndexError if the sample has no bam in bam_file_list
+        """
+        bam_filename_list = [utils.convertFastqFilename(fastq_simple_name, bam_type) for bam_type in ['bam', 'sorted_bam']] + \
+                            [fastq_simple_name + '.bam']
+        return [bam_file for bam_file in self.bam_file_list if os.path.basename(bam_file) in bam_filename_list][0]
+
+    def scanBamMetrics(self, fastq_simple_name_list):
+        """
+            scan the bams of the samples which have not yet been scanned, in a pool of self.workers processes (serially
+            if self.workers is 1). The results are stored in _bam_metrics_dict, from which bamMetrics() reads. A sample
+            whose bam cannot be scanned is recorded (see recordSampleError()) rather than stopping the others
+            :param fastq_simple_name_list: fastq filenames without path or extension
+        """
+        scan_list = []
+        for fastq_simple_name in fastq_simple_name_list:
+            try:
+                bam_path, bam_metrics_kwargs = self.bamMetricsArguments(fastq_simple_name)
+            except IndexError:
+                self.logger.info('%s not in bam_file_list' % fastq_simple_name)
+                continue
+            if bam_path not in self._bam_metrics_dict and bam_path not in [scan[1] for scan in scan_list]:
+                scan_list.append((fastq_simple_name, bam_path, bam_metrics_kwargs))
+        print('...scanning %i bams' % len(scan_list))
+        # executor.map returns the results in the order of scan_list
+        with utils.timedEvent(self.logger, 'scan_bam_metrics', num_bams=len(scan_list), workers=self.workers):
+            if self.workers > 1 and len(scan_list) > 1:
+                from concurrent.futures import ProcessPoolExecutor
+                with ProcessPoolExecutor(max_workers=min(self.workers, len(scan_list))) as executor:
+                    scan_result_list = list(executor.map(_scanBamMetrics, [scan[1] for scan in scan_list],
+                                                         [scan[2] for scan in scan_list]))
+            else:
+                scan_result_list = [_scanBamMetrics(bam_path, bam_metrics_kwargs)
+                                    for _, bam_path, bam_metrics_kwargs in scan_list]
+        for (fastq_simple_name, bam_path, _), (bam_metrics, error) in zip(scan_list, scan_result_list):
+            if error is not None:
+                self.recordSampleError(fastq_simple_name, 'bam_metrics', error)
+            self._bam_metrics_dict[bam_path] = (bam_metrics, error)
+
+    def bamMetricsArguments(self, fastq_simple_name):
+        """
+            :param fastq_simple_name: fastq filename without path or extension
+            :returns: (path to the sample's bam, the keyword arguments of its BamMetrics). see scanBamMetrics()
+            :raises: IndexError if the sample is not in bam_file_list
+        """
+        raise NotImplementedError('AbstractMethodMustBeOverwrittenByOrganismSpecificQA')
 
     def compileAlignCountMetadata(self, align_df, htseq_count_df):
         """
@@ -201,39 +417,9 @@ class QualityAssessmentObject(OrganismData):
             :param alignment_log_file_path: the filepath to a novoalign alignment log
             :returns: a dictionary of the parsed data of the input file
         """
-        library_metadata_dict = {}
-        alignment_regex_dict = {'LIBRARY_SIZE': r"(?<=Read Sequences:\s)\s*\d*",
-                                'UNIQUE_ALIGNMENT': r"(?<=Unique Alignment:\s)\s*\d*",
-                                'MULTI_MAP': r"(?<=Multi Mapped:\s)\s*\d*",
-                                'NO_MAP': r"(?<=No Mapping Found:\s)\s*\d*",
-                                'HOMOPOLY_FILTER': r"(?<=Homopolymer Filter:\s)\s*\d*",
-                                'READ_LENGTH_FILTER': r"(?<=Read Length:\s)\s*\d*"}
-
-        # open the log path
-        alignment_file = open(alignment_log_file_path, 'r')
-        alignment_file_text = alignment_file.read()
-        # loop over alignment_regex dict and enter values extracted from alignment_file into alignment_metadata_dict
-        for alignment_category, regex_pattern in alignment_regex_dict.items():
-            # extract the value corresponding to the alignment_category regex (see alignment_regex_dict)
-            try:
-                extracted_value = int(re.findall(regex_pattern, alignment_file_text)[0])
-            except ValueError:
-                msg = 'problem with file %s' % alignment_log_file_path
-                self.logger.info(msg)
-                print(msg)
-            except IndexError:
-                print('No %s in %s. Value set to 0' % (alignment_category, alignment_log_file_path))
-                extracted_value = 0
-            # check that the value is both an int and not 0
-            if isinstance(extracted_value, int):
-                library_metadata_dict.setdefault(alignment_category, extracted_value)
-            else:
-                print('cannot find %s in %s' % (alignment_category, alignment_log_file_path))
-
-        # close the alignment_file and return
-        alignment_file.close()
-
-        return library_metadata_dict
+        library_metadata_dict = alignment_log_tools.parseNovoalignLog(alignment_log_file_path)._asdict()
+        del library_metadata_dict['FASTQFILENAME']
+        return dict(library_metadata_dict)
 
     @abc.abstractmethod
     def parseGeneCount(self, htseq_counts_path):
@@ -275,7 +461,7 @@ class QualityAssessmentObject(OrganismData):
         try:
             self.logger.debug(
                 'samtools cmd to extract primary multi alignment reads to rRNA: %s' % cmd_primary_multi_alignment_rRNA)
-            num_primary_alignment_rRNA = int(subprocess.getoutput(cmd_primary_multi_alignment_rRNA))
+            num_primary_alignment_rRNA = int(utils.getSubprocessOutput(cmd_primary_multi_alignment_rRNA))
         except ValueError:
             sys.exit('You must first index the alignment files with samtools index')
 
@@ -286,7 +472,7 @@ class QualityAssessmentObject(OrganismData):
         else:
             cmd_unique_rRNA = 'samtools view %s %s | grep -v ZS:Z:R | wc -l' % (bam_path, rRNA_region)
         self.logger.debug('samtools cmd to extract unique alignment reads to rRNA: %s' % cmd_unique_rRNA)
-        unique_rRNA = int(subprocess.getoutput(cmd_unique_rRNA))
+        unique_rRNA = int(utils.getSubprocessOutput(cmd_unique_rRNA))
 
         # add for total rRNA
         total_rRNA = num_primary_alignment_rRNA + unique_rRNA
@@ -314,7 +500,7 @@ class QualityAssessmentObject(OrganismData):
         self.logger.info('bedtools cmd: %s' % bedtools_cmd)
 
         # extract unique_alignments to nc and t RNA
-        unique_align_tRNA_ncRNA = int(subprocess.getoutput(bedtools_cmd))
+        unique_align_tRNA_ncRNA = int(utils.getSubprocessOutput(bedtools_cmd))
 
         return unique_align_tRNA_ncRNA
 
@@ -337,13 +523,16 @@ class QualityAssessmentObject(OrganismData):
         """
         raise NotImplementedError('AbstractMethodMustBeOverwrittenByOrganismSpecificQA')
 
-    def createCoverageBedFile(self, bam_file):
+    def coverageCache(self, bam_file):
         """
-             TODO: coverage is currently calculated separately for every function that needs it. Instead, calculate
-             coverage over entire genome, store as bed in rnaseq_pipeline/tmp, and use it as input to any function requiring
-             coverage calc
+            the genome wide depth of bam_file (samtools depth -Q 10), computed once and stored next to the bam as
+            <bam_file>.coverage.npz. The most recently used cache is kept in memory
+            :param bam_file: path to a bam
+            :returns: a CoverageCache
         """
-        raise NotImplementedError
+        if self._coverage_cache is None or self._coverage_cache[0] != bam_file:
+            self._coverage_cache = (bam_file, CoverageCache.forBam(bam_file, BamMetrics.coverage_min_mapq, self.logger))
+        return self._coverage_cache[1]
 
     def calculatePercentFeatureCoverage(self, feature, genotype, annotation_path, bam_file, num_bases_in_region=None, read_strand=None):
         """
@@ -358,19 +547,12 @@ class QualityAssessmentObject(OrganismData):
         """
         if read_strand not in [None, "forward", "reverse"]:
             raise ValueError('UnrecognizedReadStrand')
-        if not num_bases_in_region:
-            # extract number of bases in CDS of given gene. Credit: https://www.biostars.org/p/68283/#390427
-            num_bases_in_region_cmd = "grep %s %s | grep %s | bedtools merge | awk -F\'\t\' \'BEGIN{SUM=0}{ SUM+=$3-$2 }END{print SUM}\'" % (
-                genotype, annotation_path, feature)
-            self.logger.info(' num bases in region cmd: %s' % num_bases_in_region_cmd)
-            num_bases_in_region = int(subprocess.getoutput(num_bases_in_region_cmd))
-        # extract number of bases with depth != 0
-        num_bases_depth_not_zero_cmd = "grep %s %s | grep %s | gff2bed | samtools depth -aa -Q 10 -b - %s | cut -f3 | grep -v 0 | wc -l" % (
-            genotype, annotation_path, feature, bam_file)
-        self.logger.info(' num bases depth not zero over region cmd: %s' % num_bases_depth_not_zero_cmd)
-        num_bases_in_cds_with_one_or_more_read = int(subprocess.getoutput(num_bases_depth_not_zero_cmd))
-
-        return num_bases_in_cds_with_one_or_more_read / float(num_bases_in_region)
+        # the gene's merged features, and their number of bases, from the index of the annotation
+        annotation_index = self.getAnnotationIndex(annotation_path)
+        feature_interval_list = annotation_index.geneIntervals(genotype, feature)
+        num_bases_in_region = num_bases_in_region or annotation_index.featureBases(genotype, feature)
+        self.logger.info(' %i %s intervals of %s in %s' % (len(feature_interval_list), feature, genotype, annotation_path))
+        return self.coverageCache(bam_file).coverageFraction(feature_interval_list, num_bases_in_region)
 
     def extractLog2cpm(self, gene, fastq_simple_name, log2cpm_csv_path):
         """
@@ -537,19 +719,17 @@ class QualityAssessmentObject(OrganismData):
                 '%s not found -- check genome_files/organism subdir. Possibly delete genome_files and let the script re-download (make sure it is accessible)' % organism_config_file)
             raise FileNotFoundError('ConfigFileNotFound')
         # read in organism config file
-        organism_config = configparser.ConfigParser()
-        organism_config.read(organism_config_file)
-        organism_config_dict = organism_config['OrganismData']
+        organism_config_dict = ConfigRegistry.getSection(organism_config_file, 'OrganismData')
         # set annotation file
-        annotation_file = os.path.join(self.genome_files, organism, organism_config_dict['annotation_file'])
+        annotation_file = os.path.join(self.genome_files, organism, organism_config_dict.raw('annotation_file'))
         if not os.path.isfile(annotation_file):
             self.logger.critical('the annotation file %s not valid filepath' % annotation_file)
             raise FileNotFoundError('AnnotationFileNotFound')
         # set igv genome
         try:
-            igv_genome = os.path.join(self.genome_files, organism, organism_config_dict['igv_genome'])
+            igv_genome = os.path.join(self.genome_files, organism, organism_config_dict.raw('igv_genome'))
         except KeyError:  # this is for KN99
-            igv_genome = os.path.join(self.genome_files, organism, organism_config_dict['igv_stranded_genome'])
+            igv_genome = os.path.join(self.genome_files, organism, organism_config_dict.raw('igv_stranded_genome'))
         if not os.path.isfile(igv_genome):
             self.logger.critical('igv_genome path %s not valid' % igv_genome)
             raise FileNotFoundError('IgvGenomeNotFound')
@@ -560,14 +740,19 @@ class QualityAssessmentObject(OrganismData):
         # the name is a remnant of the usage of the repo specific in the docstring above. To turn this dict into an actual bed entry, just join the list with \t
         # Here, this is used to create the igvBatchScript rather than going through the extra step of writing a bed.
         bed_entry_dict = {}
-        for index, row in metadata_df.iterrows():
+        # the bam files are looked up in the catalog of align_count_results rather than stat'd one by one
+        artifact_catalog = self.getArtifactCatalog(list(metadata_df['runNumber'].dropna().unique()))
+        # run numbers as they appear in the run directories, eg 0673
+        run_number_list = list(DatabaseObject.runNumberWithZeros(metadata_df['runNumber'], self._run_numbers_with_zeros))
+        for (index, row), run_num in zip(metadata_df.iterrows(), run_number_list):
+            if run_num is None:
+                self.logger.warning('%s has no runNumber -- skipped' % row['fastqFileName'])
+                continue
             genotype_list = utils.extractGenotypeList(row,
                                                       convert_CNAG_to_CKF44=True)  # last argument to convert CNAG to CKF44
             if genotype_list[0] != 'CKF44_00000' and genotype_list[0] is not None:
-                run_num = str(self.extractRunNumber(int(float(row["runNumber"]))))  # TODO: this will hopefully be improved when database is integrated w/sql. no idea why runNumber column now comes out with inconsistent type. should just be string
                 self.logger.debug("runnumber extracted by igv func: %s" % run_num)
                 fastq_simple_name = utils.pathBaseName(row["fastqFileName"])
-                alignment_run_directory_path = os.path.join(self.align_count_results, "run_%s_samples/align" % run_num)
                 try:
                     print("...looking for wildtype reference for %s" % fastq_simple_name)
                     wt_reference_list = self.getWildtypeReference(row)
@@ -580,23 +765,16 @@ class QualityAssessmentObject(OrganismData):
                         raise FileNotFoundError
                 except FileNotFoundError:
                     self.logger.critical("path to wildtype reference DNE: %s" % wt_reference_bam_path)
-                try:
-                    if not os.path.isdir(alignment_run_directory_path):
-                        raise NotADirectoryError("alignment_dir_DNE")
-                except NotADirectoryError:
-                    self.logger.critical("%s DNE" % alignment_run_directory_path)
-                bam_file_path = os.path.join(alignment_run_directory_path,
-                                             fastq_simple_name + "_sorted_aligned_reads_with_annote.bam")
-                try:
-                    if not os.path.isfile(bam_file_path):
-                        raise FileNotFoundError("bamDNE")
-                except FileNotFoundError:
+                if artifact_catalog.runDirectory(row['runNumber'], root=self.align_count_results) is None:
+                    self.logger.critical("%s DNE" % os.path.join(self.align_count_results, "run_%s_samples/align" % run_num))
+                bam_file_path = artifact_catalog.artifactPath(row['fastqFileName'], 'bam', row['runNumber'],
+                                                              root=self.align_count_results)
+                if bam_file_path is None:
+                    bam_file_path = os.path.join(self.align_count_results, "run_%s_samples/align" % run_num,
+                                                 utils.convertFastqFilename(row['fastqFileName'], 'bam'))
                     self.logger.critical("%s DNE" % bam_file_path)
-                try:
-                    if not (os.path.isfile(os.path.join(alignment_run_directory_path,
-                                                        fastq_simple_name + "_sorted_aligned_reads_with_annote.bam.bai"))):
-                        raise FileNotFoundError("baiDNE")
-                except FileNotFoundError:
+                elif artifact_catalog.artifactPath(row['fastqFileName'], 'bam_index', row['runNumber'],
+                                                   root=self.align_count_results) is None:
                     self.logger.critical("%s index DNE" % bam_file_path)
 
                 # create this dictionary to error check and exit if there is a problem. Do not go onto creating batchfiles until this step has passed.
@@ -741,17 +919,17 @@ class QualityAssessmentObject(OrganismData):
             if gene is not None and gene != "CNAG_00000":
                 # get first column corresponding to given gene, take uniq value as chromosome
                 extract_chr_cmd = 'grep %s %s | cut -f1 | uniq' % (gene, annotation_file)
-                chromosome_identifier = subprocess.getoutput(extract_chr_cmd)
+                chromosome_identifier = utils.getSubprocessOutput(extract_chr_cmd)
 
                 # get the list of all start coordinates associated with a feature, sort, and take smallest
                 extract_start_coord_cmd = 'grep %s %s | cut -f4 | sort -n | head -1' % (gene, annotation_file)
-                start_coord = int(subprocess.getoutput(extract_start_coord_cmd))
+                start_coord = int(utils.getSubprocessOutput(extract_start_coord_cmd))
                 start_coord_with_offset = start_coord - gene_offset  # add offset to widen window on igv_viewer
                 if start_coord_with_offset < 1:
                     start_coord_with_offset = 1
                 # sort stop coordinates of all features of given gene, take largest
                 extract_stop_coord_cmd = 'grep %s %s | cut -f5 | sort -n | tail -1' % (gene, annotation_file)
-                stop_coord = int(subprocess.getoutput(extract_stop_coord_cmd))
+                stop_coord = int(utils.getSubprocessOutput(extract_stop_coord_cmd))
                 stop_coord_with_offset = stop_coord + gene_offset  # add offset to widen window on igv_viewer
 
                 # enter {gene: bed_line} to dict -- not the final \t allows to add the bam_file_simplename later
@@ -781,7 +959,7 @@ class QualityAssessmentObject(OrganismData):
 
         # write sbatch job. see https://htcfdocs.readthedocs.io/en/latest/runningjobs/
         line_count_cmd = 'cat %s | wc -l' % lookup_file_path
-        line_count = int(subprocess.getoutput(line_count_cmd))
+        line_count = int(utils.getSubprocessOutput(line_count_cmd))
         sbatch_array_line = "--array=1-{}%{}".format(line_count, min(line_count,
                                                                      20))  # this has to be 1 at a time since the WT may be the same for multiple samples
         job = '#!/bin/bash\n\n' \
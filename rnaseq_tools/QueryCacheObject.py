@@ -0,0 +1,110 @@
+"""
+   on disk cache of the results of database queries (see DatabaseObject.filterDatabaseDataframe() and
+   filterDatabaseSqlite()). A result is keyed by the snapshot key of database_files (see
+   DatabaseObject.databaseFilesKey()) and the canonical form of the query -- so the same filter json run against an
+   unchanged database is read from the cache, without merging the database. When the cache is larger than
+   max_size_bytes, the least recently used results are removed
+
+   usage: query_cache = QueryCache(os.path.join(sd.rnaseq_tmp, 'query_cache'))
+          query_key = QueryCache.queryKey(database_key, 'dataframe', {'runNumber': [3993, 4011]})
+          filtered_df = query_cache.load(query_key)
+          if filtered_df is None: ... query_cache.store(query_key, filtered_df)
+"""
+import os
+import json
+import time
+import hashlib
+from rnaseq_tools import utils
+
+
+class QueryCache:
+    # increment if the content of the cached results changes (eg how a filter is applied)
+    query_cache_version = 1
+    index_filename = 'query_cache_index.json'
+
+    def __init__(self, cache_directory, max_size_bytes=256 * 2**20):
+        """
+            :param cache_directory: directory in which to store the results. Created if it does not exist
+            :param max_size_bytes: size of the cache above which the least recently used results are removed
+        """
+        self.cache_directory = cache_directory
+        utils.mkdirp(self.cache_directory)
+        self.index_path = os.path.join(self.cache_directory, self.index_filename)
+        self.max_size_bytes = max_size_bytes
+
+    @classmethod
+    def queryKey(cls, database_key, query_type, query):
+        """
+            :param database_key: snapshot key of the database files, see DatabaseObject.databaseFilesKey()
+            :param query_type: how the query is run, eg 'dataframe' or 'sqlite'
+            :param query: a json serializable query, eg the filter json as a dict. Keys are sorted, so the order in which
+                          the columns of a filter are written does not matter
+            :returns: a hex digest identifying the result
+        """
+        key_list = [cls.query_cache_version, database_key, query_type, query]
+        return hashlib.md5(json.dumps(key_list, sort_keys=True, default=str).encode()).hexdigest()
+
+    def readIndex(self):
+        """
+            :returns: the cache index {query key: {'file': filename, 'size': bytes, 'last_access': time}}
+        """
+        try:
+            with open(self.index_path) as index_file:
+                return json.load(index_file)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def load(self, query_key):
+        """
+            :param query_key: see queryKey()
+            :returns: the cached result as a dataframe, or None if it is not in the cache
+        """
+        import pandas as pd
+        with utils.lockFile(self.index_path + '.lock'):
+            index_dict = self.readIndex()
+            if query_key not in index_dict:
+                return None
+            try:
+                result_df = pd.read_pickle(os.path.join(self.cache_directory, index_dict[query_key]['file']))
+            except (FileNotFoundError, EOFError, ValueError, OSError):
+                del index_dict[query_key]
+                result_df = None
+            else:
+                index_dict[query_key]['last_access'] = time.time()
+            utils.writeJsonAtomically(index_dict, self.index_path)
+        return result_df
+
+    def store(self, query_key, result_df):
+        """
+            store a result, and remove the least recently used results if the cache is then larger than max_size_bytes
+            :param query_key: see queryKey()
+            :param result_df: the result of the query
+        """
+        result_filename = query_key + '.pkl'
+        result_path = os.path.join(self.cache_directory, result_filename)
+        tmp_suffix = '.%s.tmp' % os.getpid()
+        result_df.to_pickle(result_path + tmp_suffix)
+        os.replace(result_path + tmp_suffix, result_path)
+        with utils.lockFile(self.index_path + '.lock'):
+            index_dict = self.readIndex()
+            index_dict[query_key] = {'file': result_filename, 'size': os.path.getsize(result_path),
+                                     'last_access': time.time()}
+            self.evict(index_dict)
+            utils.writeJsonAtomically(index_dict, self.index_path)
+
+    def evict(self, index_dict):
+        """
+            remove the least recently used results, in place, until the cache is no larger than max_size_bytes. Call with
+            the index lock held
+            :param index_dict: the cache index, see readIndex()
+        """
+        cache_size = sum(entry['size'] for entry in index_dict.values())
+        for query_key in sorted(index_dict, key=lambda key: index_dict[key]['last_access']):
+            if cache_size <= self.max_size_bytes:
+                break
+            entry = index_dict.pop(query_key)
+            cache_size -= entry['size']
+            try:
+                os.remove(os.path.join(self.cache_directory, entry['file']))
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,152 @@
+"""
+   index of the files align_count wrote for each sample in a run directory (eg align_count_results/run_0673_samples,
+   with subdirectories align, count and logs). The run directory is walked once with os.scandir, and each file is
+   classified by the suffixes in utils.ARTIFACT_SUFFIX_DICT (see utils.convertFastqFilename()), so that the bam, count
+   and log files of the samples in a query sheet, and which of them are missing, are found without a recursive glob per
+   file type.
+
+   usage: run_directory_index = RunDirectoryIndex('/path/to/run_0673_samples')
+          incomplete_sample_dict = run_directory_index.incompleteSamples(list(query_df.fastqFileName))
+          bam_file_list = run_directory_index.artifactList('bam', list(query_df.fastqFileName))
+"""
+import os
+from rnaseq_tools import utils
+
+
+class RunDirectoryIndex:
+    # extensions removed from a fastq filename to get the sample name of its artifacts
+    fastq_extension_list = ['.fastq.gz', '.fq.gz', '.fastq', '.fq']
+    # the artifacts a sample needs for quality assessment. see incompleteSamples()
+    required_artifact_list = ['bam', 'bam_index', 'count', 'novoalign_log', 'htseq_log']
+    # [(artifact suffix, artifact type)], longest suffix first, so that eg .bam.bai is not taken for .bam
+    suffix_list = sorted(((suffix, artifact_type) for artifact_type, suffix in utils.ARTIFACT_SUFFIX_DICT.items()),
+                         key=lambda suffix_type: len(suffix_type[0]), reverse=True)
+
+    def __init__(self, run_directory_path):
+        """
+            :param run_directory_path: path to a run directory. Every subdirectory is searched
+            :raises: NotADirectoryError if run_directory_path is not a directory
+        """
+        if not os.path.isdir(run_directory_path):
+            raise NotADirectoryError('RunDirectoryDoesNotExist: %s' % run_directory_path)
+        self.run_directory_path = run_directory_path
+        # {directory relative to run_directory_path: mtime in ns}
+        self.directory_mtime_dict = {}
+        # [[sample name, artifact type, path relative to run_directory_path, size, mtime], ...], sorted
+        self.artifact_list = []
+        # {sample name: {artifact type: path}}
+        self.sample_dict = {}
+        self.crawl()
+
+    def crawl(self):
+        """
+            walk run_directory_path, and set directory_mtime_dict, artifact_list and sample_dict. Files which are not
+            an artifact (see utils.ARTIFACT_SUFFIX_DICT) are ignored
+        """
+        self.directory_mtime_dict = {}
+        artifact_list = []
+        relative_directory_list = ['.']
+        while relative_directory_list:
+            relative_directory = relative_directory_list.pop()
+            directory_path = os.path.normpath(os.path.join(self.run_directory_path, relative_directory))
+            try:
+                self.directory_mtime_dict[relative_directory] = os.stat(directory_path).st_mtime_ns
+                entry_list = list(os.scandir(directory_path))
+            except OSError:
+                continue
+            for entry in entry_list:
+                relative_path = os.path.normpath(os.path.join(relative_directory, entry.name))
+                if entry.is_dir():
+                    relative_directory_list.append(relative_path)
+                    continue
+                for suffix, artifact_type in self.suffix_list:
+                    if entry.name.endswith(suffix):
+                        entry_stat = entry.stat()
+                        artifact_list.append([entry.name[:-len(suffix)], artifact_type, relative_path,
+                                              entry_stat.st_size, entry_stat.st_mtime])
+                        break
+        self.artifact_list = sorted(artifact_list)
+        self.sample_dict = {}
+        for sample_name, artifact_type, relative_path, _, _ in self.artifact_list:
+            self.sample_dict.setdefault(sample_name, {}).setdefault(
+                artifact_type, os.path.join(self.run_directory_path, relative_path))
+
+    @classmethod
+    def sampleNames(cls, fastq_filename):
+        """
+            :param fastq_filename: fastq filename or path, eg /path/to/sample_1.txt.fastq.gz
+            :returns: list of the names under which the sample's artifacts may be written -- the basename without the
+                      fastq extension (align_count removes only that, eg sample_1.txt), then without any extension (as
+                      utils.convertFastqFilename(), eg sample_1)
+        """
+        file_name = os.path.basename(str(fastq_filename).strip())
+        sample_name_list = [next((file_name[:-len(extension)] for extension in cls.fastq_extension_list
+                                  if file_name.endswith(extension)), file_name)]
+        if utils.fileBaseName(file_name) not in sample_name_list:
+            sample_name_list.append(utils.fileBaseName(file_name))
+        return sample_name_list
+
+    def sampleArtifacts(self, fastq_filename):
+        """
+            :param fastq_filename: fastq filename or path
+            :returns: {artifact type: path} of the sample. Empty if the sample has no artifact in the run directory
+        """
+        for sample_name in self.sampleNames(fastq_filename):
+            if sample_name in self.sample_dict:
+                return self.sample_dict[sample_name]
+        return {}
+
+    def artifactPath(self, fastq_filename, artifact_type):
+        """
+            :param fastq_filename: fastq filename or path
+            :param artifact_type: a key of utils.ARTIFACT_SUFFIX_DICT, eg 'bam'
+            :returns: the path of the sample's artifact, or None if it is not in the run directory
+        """
+        return self.sampleArtifacts(fastq_filename).get(artifact_type)
+
+    def artifactList(self, artifact_type, fastq_filename_list=None):
+        """
+            :param artifact_type: a key of utils.ARTIFACT_SUFFIX_DICT, eg 'count'
+            :param fastq_filename_list: only the artifacts of these samples (eg the fastqFileName column of a query
+                                        sheet). Default is every sample in the run directory
+            :returns: list of the paths of the artifacts of artifact_type
+        """
+        if fastq_filename_list is None:
+            artifact_dict_list = [self.sample_dict[sample_name] for sample_name in sorted(self.sample_dict)]
+        else:
+            artifact_dict_list = [self.sampleArtifacts(fastq_filename) for fastq_filename in fastq_filename_list]
+        return [artifact_dict[artifact_type] for artifact_dict in artifact_dict_list if artifact_type in artifact_dict]
+
+    def sampleList(self, fastq_filename_list=None):
+        """
+            :param fastq_filename_list: see artifactList()
+            :returns: the items of fastq_filename_list (default, the sample names) with at least one artifact in the run
+                      directory
+        """
+        if fastq_filename_list is None:
+            return sorted(self.sample_dict)
+        return [fastq_filename for fastq_filename in fastq_filename_list if self.sampleArtifacts(fastq_filename)]
+
+    def completeness(self, fastq_filename_list=None, required_artifact_list=None):
+        """
+            :param fastq_filename_list: see artifactList()
+            :param required_artifact_list: default required_artifact_list, ie has bam, bai, count, novoalign and htseq log
+            :returns: {fastq filename (or sample name): {artifact type: True if present}} of the samples with at least
+                      one artifact in the run directory
+        """
+        required_artifact_list = required_artifact_list or self.required_artifact_list
+        return {fastq_filename: {artifact_type: artifact_type in self.sampleArtifacts(fastq_filename)
+                                 for artifact_type in required_artifact_list}
+                for fastq_filename in self.sampleList(fastq_filename_list)}
+
+    def incompleteSamples(self, fastq_filename_list=None, required_artifact_list=None):
+        """
+            the samples with some, but not all, of the required artifacts. A sample in fastq_filename_list with no artifact
+            in the run directory is taken to be in another run
+            :param fastq_filename_list: see artifactList()
+            :param required_artifact_list: see completeness()
+            :returns: {fastq filename (or sample name): [missing artifact types]}
+        """
+        return {fastq_filename: [artifact_type for artifact_type, is_present in artifact_dict.items() if not is_present]
+                for fastq_filename, artifact_dict in self.completeness(fastq_filename_list, required_artifact_list).items()
+                if not all(artifact_dict.values())}
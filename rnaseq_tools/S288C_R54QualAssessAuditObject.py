@@ -1,5 +1,5 @@
-import configparser
 from rnaseq_tools import utils
+from rnaseq_tools.ConfigRegistryObject import ConfigRegistry
 from rnaseq_tools.S288C_R64QualityAssessmentObject import S288C_R64QualityAssessmentObject
 import numpy as np
 
@@ -19,18 +19,16 @@ class S288C_R54QualAssessAuditObject(S288C_R64QualityAssessmentObject):
         # create logger
         self.logger = utils.createStandardObjectChildLogger(self, __name__)
 
-        # extract threshold/status from config file #TODO: move to constructor
-        qual_assess_config = configparser.ConfigParser()
-        qual_assess_config.read(self.config_file)
-        qual_assess_1_dict = qual_assess_config['S288C_R64QualityAssessOne']
+        # extract threshold/status from config file. values are already typed (int/float), see ConfigRegistryObject
+        qual_assess_1_dict = ConfigRegistry.getSection(self.config_file, 'S288C_R64QualityAssessOne')
 
         # extract thresholds #TODO: CLEAN UP TO DICTIONARY, AUTOMATICALLY EXTRACT
-        self.library_size_threshold = int(qual_assess_1_dict['LIBRARY_SIZE_THRESHOLD'])
-        self.not_aligned_total_percent_threshold = float(qual_assess_1_dict['NOT_ALIGNED_TOTAL_PERCENT_THRESHOLD'])
+        self.library_size_threshold = qual_assess_1_dict['LIBRARY_SIZE_THRESHOLD']
+        self.not_aligned_total_percent_threshold = qual_assess_1_dict['NOT_ALIGNED_TOTAL_PERCENT_THRESHOLD']
 
         # extract status
-        self.library_size_bit_status = int(qual_assess_1_dict['LIBRARY_SIZE_STATUS'])
-        self.not_aligned_total_percent_bit_status = int(qual_assess_1_dict['NOT_ALIGNED_TOTAL_PERCENT_STATUS'])
+        self.library_size_bit_status = qual_assess_1_dict['LIBRARY_SIZE_STATUS']
+        self.not_aligned_total_percent_bit_status = qual_assess_1_dict['NOT_ALIGNED_TOTAL_PERCENT_STATUS']
 
         self.auditQualAssessDataframe()
 
@@ -0,0 +1,110 @@
+"""
+   index of a query sheet (or any metadata dataframe with a fastqFileName column) by sample name -- the basename of the
+   fastq file with no containing directory and no extension. Built once per dataframe, so that a lookup does not scan
+   the sheet.
+
+   usage: sample_index = SampleIndex.forDataframe(query_df)
+          genotype1 = sample_index.value('run_673_s_4_withindex_sequence_TGAGGTT', 'genotype1')
+          record = sample_index.record('/path/to/run_673_s_4_withindex_sequence_TGAGGTT.fastq.gz')
+"""
+import weakref
+from rnaseq_tools import utils
+
+
+class SampleIndex:
+    # {id(dataframe): (weak reference to the dataframe, SampleIndex)}. see forDataframe()
+    _index_cache = {}
+
+    def __init__(self, query_df, fastq_column='fastqFileName'):
+        """
+            :param query_df: a dataframe with one row per fastq file
+            :param fastq_column: the column holding the fastq filename (with or without path and extension)
+            :raises: KeyError if fastq_column is not in query_df
+        """
+        self.fastq_column = fastq_column
+        self.column_list = list(query_df.columns)
+        # {sample name: {column: value}}. If a sample is in the sheet more than once, the first row is used (as the
+        # str.contains lookups this replaces did)
+        self.record_dict = {}
+        for record in query_df.to_dict('records'):
+            fastq_filename = record[fastq_column]
+            if isinstance(fastq_filename, str):
+                self.record_dict.setdefault(self.normalizeSampleName(fastq_filename), record)
+        # {sample name as passed to record(): sample name in record_dict, or None}. see findSampleName()
+        self._partial_match_dict = {}
+
+    @classmethod
+    def forDataframe(cls, query_df, fastq_column='fastqFileName'):
+        """
+            return the SampleIndex of query_df, building it on the first request. Note that the index reflects query_df
+            when the index is built -- assign a new dataframe rather than modifying the fastq column in place
+            :param query_df: a dataframe with one row per fastq file
+            :param fastq_column: the column holding the fastq filename
+            :returns: a SampleIndex
+        """
+        cache_key = (id(query_df), fastq_column)
+        try:
+            query_df_ref, sample_index = cls._index_cache[cache_key]
+            if query_df_ref() is query_df:
+                return sample_index
+        except KeyError:
+            pass
+        sample_index = cls(query_df, fastq_column)
+        cls._index_cache[cache_key] = (weakref.ref(query_df, lambda ref: cls._index_cache.pop(cache_key, None)),
+                                       sample_index)
+        return sample_index
+
+    @staticmethod
+    def normalizeSampleName(fastq_filename):
+        """
+            :param fastq_filename: eg /path/to/my_reads_R1.fastq.gz
+            :returns: the sample name, eg my_reads_R1
+        """
+        return utils.pathBaseName(str(fastq_filename).strip())
+
+    def __contains__(self, sample_name):
+        try:
+            self.findSampleName(sample_name)
+        except IndexError:
+            return False
+        return True
+
+    def __len__(self):
+        return len(self.record_dict)
+
+    def findSampleName(self, sample_name):
+        """
+            :param sample_name: sample name, fastq filename or path to a fastq file
+            :raises: IndexError if the sample is not in the index (as the list(...)[0] lookups this replaces did)
+            :returns: the sample name in the index. If there is no exact match, the first sample (in the order of the
+                      sheet) whose name ends with sample_name, as str.contains(sample_name + '.fastq.gz') would find
+        """
+        normalized_sample_name = self.normalizeSampleName(sample_name)
+        if normalized_sample_name in self.record_dict:
+            return normalized_sample_name
+        # the result of the scan, including a miss (None), is cached
+        if normalized_sample_name not in self._partial_match_dict:
+            self._partial_match_dict[normalized_sample_name] = next(
+                (indexed_sample_name for indexed_sample_name in self.record_dict
+                 if indexed_sample_name.endswith(normalized_sample_name)), None)
+        if self._partial_match_dict[normalized_sample_name] is None:
+            raise IndexError('SampleNotInQuerySheet: %s' % sample_name)
+        return self._partial_match_dict[normalized_sample_name]
+
+    def record(self, sample_name):
+        """
+            :param sample_name: sample name, fastq filename or path to a fastq file
+            :raises: IndexError if the sample is not in the index
+            :returns: a dict {column: value} of the sample's row. Values keep their dataframe types (eg runNumber is an
+                      int, an empty cell is nan)
+        """
+        return self.record_dict[self.findSampleName(sample_name)]
+
+    def value(self, sample_name, column):
+        """
+            :param sample_name: sample name, fastq filename or path to a fastq file
+            :param column: a column of the dataframe
+            :raises: IndexError if the sample is not in the index, KeyError if column is not in the dataframe
+            :returns: the value of column in the sample's row
+        """
+        return self.record(sample_name)[column]
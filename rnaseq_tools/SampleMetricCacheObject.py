@@ -0,0 +1,107 @@
+"""
+   per sample cache of the quality assessment metrics (the row of each sample in qual_assess_df before it is formatted
+   and audited), stored as a json next to the quality summary of a run, eg run_673_sequence_quality_metrics.json, so
+   that re-running quality_assess_1.py after samples are added to a run, or after the thresholds in
+   [KN99QualityAssessOne] change, reads the bam, count file and novoalign log only of the new or changed samples.
+
+   A sample's row is current if its key is unchanged -- the path, size and mtime of its bam, count file and novoalign log,
+   and of the other files from which the metrics are calculated (eg the log2cpm of the run), the md5 of the annotation,
+   the sample's row of the query sheet, the config values used in the metrics, and the metric version of the quality
+   assessment object (see QualityAssessmentObject.metric_version and metricKeyInputs()).
+
+   usage: metric_cache = SampleMetricCache('/path/to/run_673_sequence_quality_metrics.json')
+          sample_key = SampleMetricCache.sampleKey([bam_path, count_path, novoalign_log_path],
+                                                   annotation_md5=utils.fileChecksum(annotation_file),
+                                                   query_row_dict=query_row_dict, metric_version=1,
+                                                   setting_dict={'nat_cds_length': 1000})
+          metric_row_dict = metric_cache.metrics('sample_1', sample_key)  # None if there is no current row
+          metric_cache.storeMetrics('sample_1', sample_key, metric_row_dict)
+          metric_cache.write()
+"""
+import os
+import json
+from rnaseq_tools import utils
+
+
+class SampleMetricCache:
+    # increment if the format of the cache json changes
+    sample_metric_cache_version = 1
+
+    def __init__(self, cache_path):
+        """
+            :param cache_path: path to the cache json, eg run_673_sequence_quality_metrics.json
+        """
+        self.cache_path = cache_path
+        # {sample name: {'key': sample key, 'metrics': {column: value}}}
+        self.sample_dict = self.readCache()
+
+    def readCache(self):
+        """
+            :returns: the samples stored at cache_path, or an empty dict if there is no cache or it was written by another
+                      version
+        """
+        try:
+            with open(self.cache_path) as cache_file:
+                cache_json = json.load(cache_file)
+        except (FileNotFoundError, ValueError):
+            return {}
+        if cache_json.get('version') != self.sample_metric_cache_version:
+            return {}
+        return cache_json['samples']
+
+    @staticmethod
+    def fileKey(path):
+        """
+            :param path: path to an input of the metrics, or None
+            :returns: [absolute path, size, mtime in ns], or [path, None, None] if the file does not exist
+        """
+        if path is None:
+            return [None, None, None]
+        try:
+            path_stat = os.stat(path)
+        except FileNotFoundError:
+            return [os.path.abspath(path), None, None]
+        return [os.path.abspath(path), path_stat.st_size, path_stat.st_mtime_ns]
+
+    @classmethod
+    def sampleKey(cls, path_list, annotation_md5=None, query_row_dict=None, metric_version=None, setting_dict=None):
+        """
+            :param path_list: the inputs of the sample's metrics, eg [bam path, count file path, novoalign log path]
+            :param annotation_md5: md5 of the annotation from which feature coverages are calculated
+            :param query_row_dict: the sample's row of the query sheet. The values are stored as strings
+            :param metric_version: version of the code which calculates the metrics
+            :param setting_dict: the config values used in the metrics, eg {'nat_cds_length': 1000}. Stored as strings
+            :returns: a json serializable key. A cached row is current if the key is equal
+        """
+        return {'files': [cls.fileKey(path) for path in path_list],
+                'annotation_md5': annotation_md5,
+                'query': {column: str(value) for column, value in (query_row_dict or {}).items()},
+                'metric_version': metric_version,
+                'settings': {name: str(value) for name, value in (setting_dict or {}).items()}}
+
+    def metrics(self, sample_name, sample_key):
+        """
+            :param sample_name: fastq filename without path or extension
+            :param sample_key: see sampleKey()
+            :returns: the cached {column: value} of the sample, or None if there is none or the key has changed
+        """
+        try:
+            sample_entry = self.sample_dict[sample_name]
+        except KeyError:
+            return None
+        return sample_entry['metrics'] if sample_entry['key'] == sample_key else None
+
+    def storeMetrics(self, sample_name, sample_key, metric_row_dict):
+        """
+            :param sample_name: fastq filename without path or extension
+            :param sample_key: see sampleKey()
+            :param metric_row_dict: {column: value}. Values must be json serializable, eg from DataFrame.to_json()
+        """
+        self.sample_dict[sample_name] = {'key': sample_key, 'metrics': metric_row_dict}
+
+    def write(self):
+        """
+            write the cache to cache_path. see utils.writeJsonAtomically()
+        """
+        utils.writeJsonAtomically({'version': self.sample_metric_cache_version, 'samples': self.sample_dict},
+                                  self.cache_path)
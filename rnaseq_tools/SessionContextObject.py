@@ -0,0 +1,529 @@
+from rnaseq_tools import utils
+from rnaseq_tools.ConfigRegistryObject import ConfigRegistry
+import os
+import stat
+import shutil
+import getpass  # see https://www.saltycrane.com/blog/2011/11/how-get-username-home-directory-and-hostname-python/
+import json
+
+
+class SessionContext:
+    """
+        process wide context shared by StandardData and all of its children. The first StandardData (or child) constructed
+        with a given config_file creates the SessionContext; every subsequent object in the same process re-uses it.
+        The standard directory structure in $USER/rnaseq_pipeline is resolved lazily -- a path is created/checked (mkdirp,
+        git clone of database_files, soft links to lts, genome_files) the first time it is accessed, and
+        the result is cached for the remainder of the process.
+    """
+    # SessionContext instances, keyed by (config_file, interactive, logger_level, overrides). see getSession()
+    _sessions = {}
+
+    # list of organisms with configured subdirectory in genome_files
+    configured_organisms_list = ['H99', 'KN99', 'S288C_R64']
+
+    # used in checkGenomefiles() and in OrganismDataObject
+    no_file_organism_attributes = {'strings': ['organism_genome_file', 'feature_type'],
+                                   'ints': ['total_exon_bases', 'total_intergenic_bases', 'nat_cds_length', 'g418_cds_length']}  # NOTE: reading in the config seems to cast these to lower?
+
+    # written to genome_files by checkGenomeFiles(). Increment the version if the format of the manifest changes
+    genome_files_manifest_filename = 'genome_files_manifest.json'
+    genome_files_manifest_version = 1
+
+    # subdirectories of user_rnaseq_pipeline_directory. each is set as an attribute of the same name on first access
+    process_directories = ['reports', 'align_count_results', 'query', 'sbatch_log', 'job_scripts', 'rnaseq_tmp',
+                           'experiments', 'scratch_sequence']  # TODO: MAKE SBATCH_LOG LIKE LOG WITH YEAR_MONTH_DAY SUBDIR
+
+    # directories soft linked from lts_rnaseq_data
+    lts_dirs_to_softlink = ['lts_align_expr', 'lts_sequence']
+
+    # {attribute: name of the method that resolves it}. see __getattr__()
+    _resolver_dict = dict([('user_scratch', '_resolveUserScratch'),
+                           ('user_rnaseq_pipeline_directory', '_resolveUserRnaseqPipelineDirectory'),
+                           ('log_dir', '_resolveLogDir'),
+                           ('log_file_path', '_resolveLogDir'),
+                           ('json_log_file_path', '_resolveLogDir'),
+                           ('logger', '_resolveLogger'),
+                           ('database_files', '_resolveDatabaseFiles'),
+                           ('genome_files', '_resolveGenomeFiles')] +
+                          [(directory, '_resolveProcessDirectory') for directory in process_directories] +
+                          [(directory, '_resolveLtsDirectories') for directory in lts_dirs_to_softlink])
+
+    @classmethod
+    def getSession(cls, config_file, interactive=False, logger_level='INFO', override_dict=None):
+        """
+            return the SessionContext for config_file, creating it if this is the first request in the process
+            :param config_file: path to the rnaseq_pipeline_config.ini
+            :param interactive: if True, lts_align_expr and lts_sequence will not be soft linked
+            :param logger_level: level of the StandardData logger
+            :param override_dict: see sessionOverrides()
+            :returns: a SessionContext shared by every object constructed with the same arguments
+        """
+        override_dict = override_dict or {}
+        session_key = (os.path.abspath(config_file), bool(interactive), logger_level,
+                       tuple(sorted(override_dict.items())))
+        try:
+            return cls._sessions[session_key]
+        except KeyError:
+            session = cls(config_file, interactive=interactive, logger_level=logger_level, override_dict=override_dict)
+            cls._sessions[session_key] = session
+            return session
+
+    @classmethod
+    def sessionOverrides(cls, config_file, kwargs):
+        """
+            the keyword arguments of a StandardData object which replace a value of the [StandardData] section of
+            config_file, or a path resolved by the session (eg rnaseq_tmp). These are set on the session, so that the
+            paths derived from them (eg rnaseq_tmp/artifact_catalog.json) follow the override
+            :param config_file: path to the rnaseq_pipeline_config.ini
+            :param kwargs: the keyword arguments of a StandardData object
+            :returns: {attribute: value}
+        """
+        session_attribute_set = set(cls._resolver_dict).union(
+            ConfigRegistry.getSection(config_file, 'StandardData').keys())
+        return {attribute: value for attribute, value in kwargs.items()
+                if attribute in session_attribute_set and isinstance(value, (str, int, float))}
+
+    @classmethod
+    def clearSessions(cls):
+        """
+            forget all cached sessions. The next getSession() will re-read the config file and re-resolve paths
+        """
+        cls._sessions = {}
+
+    def __init__(self, config_file, interactive=False, logger_level='INFO', override_dict=None):
+        """
+            read the [StandardData] section of config_file. No filesystem paths are touched here -- see __getattr__()
+            :param config_file: path to the rnaseq_pipeline_config.ini
+            :param interactive: if True, lts_align_expr and lts_sequence will not be soft linked
+            :param logger_level: level of the StandardData logger
+            :param override_dict: {attribute: value} set in place of the config file value or resolved path. see
+                                  sessionOverrides()
+        """
+        self.config_file = config_file
+        self.interactive = interactive
+        self.logger_level = logger_level
+        self.year_month_day = utils.yearMonthDay()
+        # get user name and set as _user (may be overwritten in config file)
+        self._user = getpass.getuser()
+        # load config file
+        utils.configure(self, self.config_file, 'StandardData')
+        # these may be set in the config file, but are only the source of the path that is resolved on first access
+        self._configured_user_scratch = self.__dict__.pop('user_scratch', None)
+        self._genome_files_source = self.__dict__.pop('genome_files', None)
+        # an override of a resolved path (eg rnaseq_tmp) is not resolved again -- see __getattr__()
+        for attribute, value in (override_dict or {}).items():
+            setattr(self, attribute, value)
+        # organisms whose genome_files have been set and checked in this session. see ensureOrganismGenomeFiles()
+        self._ensured_organisms = set()
+        # see getArtifactCatalog()
+        self._artifact_catalog = None
+        # {annotation path: AnnotationIndex}. see getAnnotationIndex()
+        self._annotation_index_dict = {}
+
+    def __getattr__(self, name):
+        """
+            called only if name has not yet been resolved. Resolve it, cache it as an attribute and return it
+            :param name: name of the attribute
+            :raises: AttributeError if name is not a path managed by SessionContext
+        """
+        try:
+            resolver = type(self)._resolver_dict[name]
+        except KeyError:
+            raise AttributeError('%s has no attribute %s' % (type(self).__name__, name))
+        getattr(self, resolver)(name)
+        return self.__dict__[name]
+
+    def resolveAll(self):
+        """
+            eagerly resolve every path managed by SessionContext, and set and check the genome_files of every configured
+            organism (equivalent of the old standardDirectoryStructure())
+        """
+        for attribute in self._resolver_dict.keys():
+            getattr(self, attribute)
+        for organism in self.configured_organisms_list:
+            self.ensureOrganismGenomeFiles(organism)
+
+    def _resolveUserScratch(self, name):
+        # offer method to set user_scratch in config file
+        if self._configured_user_scratch:
+            self.user_scratch = self._configured_user_scratch
+            utils.mkdirp(self.user_scratch)
+        else:
+            # set attribute user_scratch (this is where rnaseq_pipeline and all subordinate folders/files will be
+            self.user_scratch = os.path.join(self.mblab_scratch, self._user)
+
+    def _resolveUserRnaseqPipelineDirectory(self, name):
+        # if it does not already exist, create user_rnaseq_pipeline in user_scratch and set attribute
+        user_rnaseq_pipeline_directory = '{}/rnaseq_pipeline'.format(self.user_scratch)
+        utils.mkdirp(user_rnaseq_pipeline_directory)
+        self.user_rnaseq_pipeline_directory = user_rnaseq_pipeline_directory
+
+    def _resolveProcessDirectory(self, name):
+        path = os.path.join(self.user_rnaseq_pipeline_directory, name)
+        # this will only create the path if it dne
+        utils.mkdirp(path)
+        setattr(self, name, path)
+
+    def _resolveLogDir(self, name):
+        # distinguish the log directory ($USER/rnaseq_pipeline/log)
+        log_dir = os.path.join(self.user_rnaseq_pipeline_directory, 'log/%s' % self.year_month_day)
+        utils.mkdirp(log_dir)
+        self.log_dir = log_dir
+        # from the daily log file ($USER/rnaseq_pipeline/log/<year-month-day>)
+        self.log_file_path = os.path.join(self.log_dir, '%s.log' % self.year_month_day)
+        # machine readable log of the structured (timed) events, if json_log = true in the [StandardData] config
+        if str(self.__dict__.get('json_log', '')).lower() in ['true', 'yes', '1']:
+            self.json_log_file_path = os.path.join(self.log_dir, '%s.jsonl' % self.year_month_day)
+        else:
+            self.json_log_file_path = None
+
+    def _resolveLogger(self, name):
+        try:
+            self.logger = utils.createLogger(self.log_file_path, 'rnaseq_tools.StandardDataObject', self.logger_level,
+                                             json_log_file_path=self.json_log_file_path)
+        except NameError:
+            print('cannot set logger without specifying log_file_path in StandardDataObject/child and self.standardDirectoryStructure()')
+            exit(1)
+
+    def _resolveDatabaseFiles(self, name):
+        database_files_path = os.path.join(self.user_rnaseq_pipeline_directory, 'database_files')
+        try:
+            if not os.path.isdir(database_files_path):
+                raise NotADirectoryError('DatabaseFilesNotFound: %s' % database_files_path)
+        except NotADirectoryError:
+            cmd = 'git clone https://github.com/BrentLab/database_files.git %s' % database_files_path
+            utils.executeSubProcess(cmd)
+        finally:
+            self.database_files = database_files_path
+
+    def _resolveLtsDirectories(self, name):
+        if self.interactive:
+            print('Remember you will not be able to access lts_align_expr or lts_sequence in an interactive session on htcf')
+            for directory in self.lts_dirs_to_softlink:
+                setattr(self, directory, os.path.join(self.user_rnaseq_pipeline_directory, directory))
+        else:
+            # check for directories to be soft linked from /lts/mblab/Crypto/rnaseq_pipeline (self.lts_rnaseq_data)
+            try:
+                utils.softLinkAndSetAttr(self, self.lts_dirs_to_softlink, self.lts_rnaseq_data,
+                                         self.user_rnaseq_pipeline_directory)
+            except FileNotFoundError:
+                print('WARNING: The source of %s does not exist and are not accessible. In the future, it is better to include the flag\n'
+                      'interactive=True in the constructor of a StandardData object when you are in an interactive session.' % self.lts_dirs_to_softlink)
+                for directory in self.lts_dirs_to_softlink:
+                    setattr(self, directory, os.path.join(self.user_rnaseq_pipeline_directory, directory))
+
+    def _resolveGenomeFiles(self, name):
+        # genome_files in user_rnaseq_pipeline_directory holds a soft link per organism to the shared genome_files cache.
+        # organism subdirectories are populated on demand -- see ensureOrganismGenomeFiles()
+        genome_files_path = os.path.join(self.user_rnaseq_pipeline_directory, 'genome_files')
+        utils.mkdirp(genome_files_path)
+        self.genome_files = genome_files_path
+
+    def ensureOrganismGenomeFiles(self, organism):
+        """
+            make sure genome_files/<organism> exists (see setGenomeFiles()) and check it against the manifest. Only organism
+            is extracted and checked, eg an OrganismData object for KN99 does not touch S288C_R64 or H99
+            :param organism: a configured organism
+        """
+        if organism in self._ensured_organisms:
+            return
+        self.setGenomeFiles([organism])
+        # check that all files present in the OrganismDataConfig.ini file in the subdirectories of genome_files exist
+        try:
+            self.checkGenomeFiles(organism_list=[organism])
+        except NotADirectoryError:
+            print('Genome Files are incomplete. Delete genome_files completely and re-run StandardDataObject or child '
+                  'to re-download genome_files.\nNote: this cannot be done from an interactive session on HTCF.')
+        except FileNotFoundError:
+            print('Genome Files are incomplete. Delete genome_files completely and re-run StandardDataObject or child '
+                  'to re-download genome_files.\nNote: this cannot be done from an interactive session on HTCF.')
+        else:
+            self._ensured_organisms.add(organism)
+
+    def setGenomeFiles(self, organism_list=None):
+        """
+            soft link genome_files/<organism> in user_rnaseq_pipeline_directory to the shared, read only genome_files cache
+            in mblab_shared/genome_files/<pipeline_version>, populating the cache first if necessary. The cache is
+            populated from genome_files.zip in lts_rnaseq_data/<pipeline_version>, or, if config_file has
+            genome_files = https://..., from the zip file at that path. If mblab_shared is not configured or not writable,
+            the organism is extracted directly into the user genome_files.
+            An existing genome_files/<organism> directory (eg from a previous full unzip) is left as is
+            :param organism_list: organisms to set. Default is all configured organisms
+        """
+        if organism_list is None:
+            organism_list = self.configured_organisms_list
+        for organism in organism_list:
+            user_organism_path = os.path.join(self.genome_files, organism)
+            if os.path.exists(user_organism_path):
+                continue
+            # a link to a shared cache which has since been removed (eg by the scratch garbage collector)
+            if os.path.islink(user_organism_path):
+                os.remove(user_organism_path)
+            shared_genome_files = self.sharedGenomeFilesPath()
+            if shared_genome_files is None:
+                self._populateGenomeFiles(organism, self.genome_files, read_only=False)
+            else:
+                shared_organism_path = self._populateGenomeFiles(organism, shared_genome_files, read_only=True)
+                if shared_organism_path is not None:
+                    try:
+                        os.symlink(shared_organism_path, user_organism_path)
+                    except FileExistsError:
+                        # another task of the same user linked it first
+                        pass
+
+    def getArtifactCatalog(self, run_number_alias_dict=None):
+        """
+            the catalog of the align_count output in align_count_results and lts_align_expr, shared by every StandardData
+            object of the session. Stored in rnaseq_tmp/artifact_catalog.json. See ArtifactCatalogObject
+            :param run_number_alias_dict: see ArtifactCatalog. Used when the catalog is first created
+            :returns: an ArtifactCatalog. Call its refresh() before a lookup
+        """
+        if self._artifact_catalog is None:
+            from rnaseq_tools.ArtifactCatalogObject import ArtifactCatalog
+            self._artifact_catalog = ArtifactCatalog([self.align_count_results, self.lts_align_expr],
+                                                     os.path.join(self.rnaseq_tmp, 'artifact_catalog.json'),
+                                                     run_number_alias_dict)
+        return self._artifact_catalog
+
+    def getAnnotationIndex(self, annotation_path):
+        """
+            the interval index of an annotation, built once per process and stored in rnaseq_tmp/annotation_index by the
+            md5 of the annotation. See AnnotationIndexObject
+            :param annotation_path: path to a gtf or gff3
+            :returns: an AnnotationIndex
+            :raises: FileNotFoundError if annotation_path does not exist
+        """
+        if annotation_path not in self._annotation_index_dict:
+            from rnaseq_tools.AnnotationIndexObject import AnnotationIndex
+            self._annotation_index_dict[annotation_path] = AnnotationIndex(
+                annotation_path, os.path.join(self.rnaseq_tmp, 'annotation_index'))
+        return self._annotation_index_dict[annotation_path]
+
+    def sharedGenomeFilesPath(self):
+        """
+            the versioned shared genome_files cache, mblab_shared/genome_files/<pipeline_version>
+            :returns: path to the shared cache, or None if mblab_shared is not configured or the cache cannot be created
+        """
+        mblab_shared = getattr(self, 'mblab_shared', None)
+        if not mblab_shared:
+            return None
+        shared_genome_files = os.path.join(mblab_shared, 'genome_files', self.pipeline_version)
+        try:
+            os.makedirs(shared_genome_files, exist_ok=True)
+        except OSError:
+            self.logger.warning('shared genome_files cache %s cannot be created. genome_files will be extracted to %s'
+                                % (shared_genome_files, self.genome_files))
+            return None
+        return shared_genome_files
+
+    def _populateGenomeFiles(self, organism, genome_files_root, read_only=True):
+        """
+            extract genome_files/<organism> from genome_files.zip to genome_files_root/<organism>, if it does not already
+            exist. Concurrent callers are serialized by a lock file; the organism is extracted to a temporary directory
+            which is renamed into place, so a partially extracted organism is never visible
+            :param organism: a configured organism
+            :param genome_files_root: directory in which to create <organism>
+            :param read_only: if True, the extracted files and directories are made read only
+            :returns: path to genome_files_root/<organism>, or None if genome_files.zip is not accessible
+        """
+        organism_path = os.path.join(genome_files_root, organism)
+        if os.path.isdir(organism_path):
+            return organism_path
+        with utils.lockFile(os.path.join(genome_files_root, '.%s.lock' % organism)):
+            # another process may have populated the organism while this one waited on the lock
+            if os.path.isdir(organism_path):
+                return organism_path
+            zipped_genome_files_path = self._genomeFilesZip(genome_files_root)
+            if zipped_genome_files_path is None:
+                return None
+            self.logger.info('extracting %s from %s to %s' % (organism, zipped_genome_files_path, organism_path))
+            tmp_organism_path = os.path.join(genome_files_root, '.%s.%s.tmp' % (organism, os.getpid()))
+            try:
+                utils.extractZipSubdirectory(zipped_genome_files_path, 'genome_files/%s/' % organism, tmp_organism_path,
+                                             read_only=read_only)
+                os.rename(tmp_organism_path, organism_path)
+            except FileNotFoundError:
+                self.logger.warning('%s is not in %s' % (organism, zipped_genome_files_path))
+                return None
+            finally:
+                if os.path.isdir(tmp_organism_path):
+                    shutil.rmtree(tmp_organism_path, onerror=self._removeReadOnly)
+        return organism_path
+
+    @staticmethod
+    def _removeReadOnly(function, path, exc_info):
+        """
+            onerror of shutil.rmtree -- make the path, and the directory holding it, writable and try again. The files
+            of a partially extracted organism may already be read only (see utils.extractZipSubdirectory())
+            :param function: the function which failed, eg os.unlink
+            :param path: the path it failed on
+            :param exc_info: see shutil.rmtree()
+        """
+        for writable_path in [os.path.dirname(path), path]:
+            os.chmod(writable_path, os.stat(writable_path).st_mode | stat.S_IWUSR)
+        function(path)
+
+    def _genomeFilesZip(self, genome_files_root):
+        """
+            locate genome_files.zip. If config_file has genome_files = https://..., the zip is downloaded once to
+            genome_files_root (under a lock file). Otherwise, it is lts_rnaseq_data/<pipeline_version>/genome_files.zip,
+            which is not accessible from an interactive session on htcf
+            :param genome_files_root: directory in which to store a downloaded genome_files.zip
+            :returns: path to genome_files.zip, or None if it is not accessible
+        """
+        # if the config_file has an entry genome_files = 'https://...' (link to the hosted genome files in /lts -- it is important that there be a single source for genome_files)
+        if self._genome_files_source and self._genome_files_source.startswith('https'):
+            zipped_genome_files_path = os.path.join(genome_files_root, 'genome_files.zip')
+            with utils.lockFile(os.path.join(genome_files_root, '.genome_files_zip.lock')):
+                if not os.path.isfile(zipped_genome_files_path):
+                    tmp_zip_path = '%s.%s.tmp' % (zipped_genome_files_path, os.getpid())
+                    download_genome_files_cmd = 'wget -O %s %s' % (tmp_zip_path, self._genome_files_source)
+                    utils.executeSubProcess(download_genome_files_cmd)
+                    os.rename(tmp_zip_path, zipped_genome_files_path)
+            return zipped_genome_files_path
+        # if the interactive flag is set to True (interactive session on htcf), /lts is not accessible
+        if self.interactive:
+            print('genome_files cannot be extracted from %s in an interactive session on htcf' % self.lts_rnaseq_data)
+            return None
+        zipped_genome_files_path = os.path.join(self.lts_rnaseq_data, self.pipeline_version, 'genome_files.zip')
+        if not os.path.isfile(zipped_genome_files_path):
+            self.logger.warning('%s does not exist' % zipped_genome_files_path)
+            return None
+        return zipped_genome_files_path
+
+    def checkGenomeFiles(self, verify=False, organism_list=None):
+        """
+            check genome_files against genome_files/genome_files_manifest.json, which lists each file named in
+            genome_files/<organism>/OrganismData_config.ini with its size and mtime (and md5 checksum, once verified).
+            If the mtimes of the organism subdirectories and their OrganismData_config.ini files match the manifest, the
+            genome_files are considered valid without reading the config files or stat-ing the genome files. Otherwise,
+            every file is checked for existence, size and mtime, and the manifest rewritten. A file whose size or mtime
+            differs from the manifest is hashed again, and one which is not in the manifest only if verify is set. The
+            manifest is read and rewritten under a lock file, as several tasks may check at once
+            :param verify: if True, skip the manifest shortcut and hash every file (eg check_genome_files.py
+                           --verify-genome-files). A file whose size and mtime match the manifest but whose checksum does
+                           not raises a ValueError
+            :param organism_list: organisms to check. Default is all configured organisms
+            :raises: NotADirectoryError if an organism subdirectory is missing, FileNotFoundError if a file is missing
+            :returns: the genome_files manifest as a dictionary
+        """
+        if organism_list is None:
+            organism_list = self.configured_organisms_list
+        manifest = self.readGenomeFilesManifest()
+        if not verify and self.genomeFilesManifestIsCurrent(manifest, organism_list):
+            return manifest
+
+        with utils.lockFile(os.path.join(self.genome_files, '.%s.lock' % self.genome_files_manifest_filename)):
+            # another process may have rewritten the manifest while this one waited on the lock
+            manifest = self.readGenomeFilesManifest()
+            if not verify and self.genomeFilesManifestIsCurrent(manifest, organism_list):
+                return manifest
+            updated_manifest = {'manifest_version': self.genome_files_manifest_version,
+                                'organisms': dict(manifest.get('organisms', {}))}
+            for organism in organism_list:
+                previous_organism_manifest = manifest.get('organisms', {}).get(organism, {})
+                updated_manifest['organisms'][organism] = self._checkOrganismGenomeFiles(organism, previous_organism_manifest, verify)
+            updated_manifest['validated'] = '%s_%s' % (utils.yearMonthDay(), utils.hourMinuteSecond())
+
+            utils.writeJsonAtomically(updated_manifest, os.path.join(self.genome_files, self.genome_files_manifest_filename))
+        return updated_manifest
+
+    def readGenomeFilesManifest(self):
+        """
+            read genome_files/genome_files_manifest.json
+            :returns: the manifest as a dictionary, or an empty dictionary if it does not exist or cannot be read
+        """
+        manifest_path = os.path.join(self.genome_files, self.genome_files_manifest_filename)
+        try:
+            with open(manifest_path, 'r') as manifest_file:
+                manifest = json.load(manifest_file)
+        except (FileNotFoundError, ValueError):
+            return {}
+        if manifest.get('manifest_version') != self.genome_files_manifest_version:
+            return {}
+        return manifest
+
+    def genomeFilesManifestIsCurrent(self, manifest, organism_list=None):
+        """
+            cheap validation of the manifest -- compare the mtime of each configured organism subdirectory and its
+            OrganismData_config.ini to those recorded in the manifest. Adding, removing or renaming a file in a subdirectory
+            changes the directory mtime
+            :param manifest: a manifest returned by readGenomeFilesManifest()
+            :param organism_list: organisms to check. Default is all configured organisms
+            :returns: True if the manifest describes the current genome_files, False otherwise
+        """
+        if organism_list is None:
+            organism_list = self.configured_organisms_list
+        try:
+            for organism in organism_list:
+                organism_manifest = manifest['organisms'][organism]
+                organism_genome_files_subdir_path = os.path.join(self.genome_files, organism)
+                if os.stat(organism_genome_files_subdir_path).st_mtime_ns != organism_manifest['directory_mtime']:
+                    return False
+                organism_config_file_path = os.path.join(organism_genome_files_subdir_path, 'OrganismData_config.ini')
+                if os.stat(organism_config_file_path).st_mtime_ns != organism_manifest['config_mtime']:
+                    return False
+        except (KeyError, OSError):
+            return False
+        return True
+
+    def _checkOrganismGenomeFiles(self, organism, previous_organism_manifest, verify=False):
+        """
+            check that each file in genome_files/<organism>/OrganismData_config.ini exists and record it in the manifest
+            :param organism: a configured organism
+            :param previous_organism_manifest: the entry for organism in the previous manifest. The md5 of a file whose
+                                               size and mtime are unchanged is kept, and a file whose size or mtime
+                                               has changed is hashed again. A file which is not in it (eg on the first
+                                               check) is not hashed
+            :param verify: hash every file and compare to previous_organism_manifest
+            :raises: NotADirectoryError, FileNotFoundError, ValueError (see checkGenomeFiles())
+            :returns: the manifest entry for organism
+        """
+        # list of attributes not to be checked for file existence as they are not files
+        no_check_organism_attribute_list = self.no_file_organism_attributes.values()
+        # flatten list
+        no_check_organism_attribute_list = [x for sublist in no_check_organism_attribute_list for x in sublist]
+        # check if directory exists
+        organism_genome_files_subdir_path = os.path.join(self.genome_files, organism)
+        if not os.path.isdir(organism_genome_files_subdir_path):
+            self.logger.warning('%s does not exist in genome_files' % organism_genome_files_subdir_path)
+            raise NotADirectoryError('ConfiguredOrganismSubdirectoryNotPresentInGenomeFiles')
+        # check if the organism config file exists
+        organism_config_file_path = os.path.join(organism_genome_files_subdir_path, 'OrganismData_config.ini')
+        if not os.path.isfile(organism_config_file_path):
+            self.logger.warning('The OrganismData_config.ini file does not exist for %s' % organism)
+            raise FileNotFoundError('OrganismDataConfigFileNotFound')
+        # record the mtimes before the files are checked. If anything changes during the check, the next check is a full one
+        organism_manifest = {'directory_mtime': os.stat(organism_genome_files_subdir_path).st_mtime_ns,
+                             'config_mtime': os.stat(organism_config_file_path).st_mtime_ns,
+                             'files': {}}
+        previous_file_manifest = previous_organism_manifest.get('files', {})
+        # read in config file as dictionary {genome_file_attribute: filename, ...} eg {novoalign_index: KN99_novoalign.nix}
+        organism_config_dict = ConfigRegistry.getSection(organism_config_file_path, 'OrganismData')
+        for organism_attribute, filename in organism_config_dict.rawItems():
+            # skip attributes that do not have a corresponding filename
+            if organism_attribute in no_check_organism_attribute_list:  # TODO: just make it so no int values are checked?
+                continue
+            organism_attribute_filepath = os.path.join(organism_genome_files_subdir_path, filename)
+            if not os.path.isfile(organism_attribute_filepath):
+                self.logger.warning('%s not found in %s subdirectory of genome_files' % (organism_attribute, organism))
+                raise FileNotFoundError('OrganismFileNotFound: %s for %s' % (organism_attribute, organism))
+            file_stat = os.stat(organism_attribute_filepath)
+            file_entry = {'filename': filename, 'size': file_stat.st_size, 'mtime': file_stat.st_mtime_ns}
+            previous_file_entry = previous_file_manifest.get(organism_attribute, {})
+            unchanged = all(previous_file_entry.get(key) == value for key, value in file_entry.items())
+            if verify:
+                self.logger.info('computing checksum of %s' % organism_attribute_filepath)
+                file_entry['md5'] = utils.fileChecksum(organism_attribute_filepath)
+                if unchanged and previous_file_entry.get('md5') not in [None, file_entry['md5']]:
+                    self.logger.warning('%s in %s subdirectory of genome_files does not match the manifest checksum' % (filename, organism))
+                    raise ValueError('GenomeFileChecksumMismatch: %s for %s' % (organism_attribute, organism))
+            elif unchanged:
+                if 'md5' in previous_file_entry:
+                    file_entry['md5'] = previous_file_entry['md5']
+            elif previous_file_entry:
+                self.logger.info('%s has changed -- computing checksum' % organism_attribute_filepath)
+                file_entry['md5'] = utils.fileChecksum(organism_attribute_filepath)
+            organism_manifest['files'][organism_attribute] = file_entry
+
+        return organism_manifest
@@ -1,8 +1,7 @@
 from rnaseq_tools import utils
 import os
 import sys
-import getpass  # see https://www.saltycrane.com/blog/2011/11/how-get-username-home-directory-and-hostname-python/
-import configparser
+from rnaseq_tools.SessionContextObject import SessionContext
 
 class StandardData:
     """
@@ -18,13 +17,13 @@ class StandardData:
     def __init__(self, expected_attributes=None, *args, **kwargs):
         """
             initialize StandardDataFormat with arbitrary number of keyword arguments.
+            The directory structure is not checked here -- it is held by a process wide SessionContext which resolves
+            paths (user_rnaseq_pipeline_directory, genome_files, log_file_path, ...) on first access and caches them for
+            every StandardData object constructed afterwards. See __getattr__()
             :param expected_attributes: a list of other attributes (intended use is for sub classes to add expected attributes)
             :param kwargs: arbitrary number/length keyword arguments. key = value will be set as class attributes
         """
         self.self_type = 'StandardData'
-        # these will be filled in the standardDataStructure() call at the end of the constructor
-        self.log_dir = None
-        self.log_file_path = None
 
         # list of StandardData object expected attributes. This is the file structure necessary for the rnaseq pipeline
         self._attributes = ['lts_rnaseq_data', 'pipeline_version', 'mblab_scratch', 'scratch_database_files',
@@ -38,11 +37,10 @@ class StandardData:
                                         779: '0779', 711: '0711_5_0718_7', 718: '0711_5_0718_7', 711507187: '0711_5_0718_7', 6290618: '0629_0618'}
 
         # list of organisms with configured subdirectory in genome_files
-        self._configured_organisms_list = ['H99', 'KN99', 'S288C_R64']
+        self._configured_organisms_list = SessionContext.configured_organisms_list
 
         # used in checkGenomefiles() and in OrganismDataObject
-        self._no_file_organism_attributes = {'strings': ['organism_genome_file', 'feature_type'],
-                                             'ints': ['total_exon_bases', 'total_intergenic_bases', 'nat_cds_length', 'g418_cds_length']} # NOTE: reading in the config seems to cast these to lower?
+        self._no_file_organism_attributes = SessionContext.no_file_organism_attributes
 
         # set year_month_day
         self.year_month_day = utils.yearMonthDay()
@@ -51,9 +49,6 @@ class StandardData:
         if isinstance(expected_attributes, list):
             self._attributes.extend(expected_attributes)
 
-        # get user name and set as _user
-        self._user = getpass.getuser()
-
         # set debug level -- all SD objects may adjust by passing logger_level argument in constructor
         try:
             self.logger_level = kwargs['logger_level']
@@ -78,163 +73,76 @@ class StandardData:
                 sys.exit('Default path to the htcf config not valid. Either specify, or check the path to, config_file = /path/to/config/file in your call to StandardDataObject or Child')
             else:
                 utils.setAttributes(self, kwargs)
-                # load config file
-                utils.configure(self, self.config_file, self.self_type)
 
         # set interactive (flag for interactive session on htcf) to false if not already set. If True, StandardDataObject and child will not try to softlink to lts (long term storage)
         if not hasattr(self, 'interactive'):
             self.interactive = False
 
-        # set/check standardDirectoryStructure
-        self.standardDirectoryStructure()
+        # attach the process wide session. config_file is read, and the standard directory structure resolved, only once per process.
+        # kwargs which override a config value or resolved path (eg rnaseq_tmp) are passed on, so that the paths the
+        # session derives from them (eg rnaseq_tmp/artifact_catalog.json) follow the override
+        self._session = SessionContext.getSession(self.config_file, interactive=self.interactive,
+                                                  logger_level=self.logger_level,
+                                                  override_dict=SessionContext.sessionOverrides(self.config_file, kwargs))
 
-    def standardDirectoryStructure(self):
+    def __getattr__(self, name):
         """
-            checks for and creates if necessary the expected directory structure in /scratch/mblab/$USER/rnaseq_pipeline
+            called only when name is not set on the instance itself. Defer to the SessionContext, which holds the config
+            file values and lazily resolves the standard directory structure (see SessionContextObject)
+            :param name: name of the attribute
+            :raises: AttributeError if neither the instance nor the session has the attribute
         """
-        # offer method to set user_scratch in config file
+        if name.startswith('__') or name == '_session':
+            raise AttributeError(name)
         try:
-            if not os.path.isdir(self.user_scratch):
-                raise NotADirectoryError('UserScratchDirectoryNotPresent')
-        except AttributeError:
-            # set attribute user_scratch (this is where rnaseq_pipeline and all subordinate folders/files will be
-            user_scratch = os.path.join(self.mblab_scratch, self._user)
-            setattr(self, 'user_scratch', user_scratch)
-        except NotADirectoryError:
-            utils.mkdirp(self.user_scratch)
-
-        # if it does not already exist, create user_rnaseq_pipeline in user_scratch and set attribute
-        setattr(self, 'user_rnaseq_pipeline_directory', '{}/rnaseq_pipeline'.format(self.user_scratch))
-        utils.mkdirp(self.user_rnaseq_pipeline_directory)
-
-        # create necessary subdirectories in rnaseq_pipeline
-        process_directories = ['reports', 'align_count_results', 'query', 'sbatch_log', 'log/%s' % self.year_month_day, 'job_scripts',
-                               'rnaseq_tmp', 'experiments', 'scratch_sequence']  # TODO: MAKE SBATCH_LOG LIKE LOG WITH YEAR_MONTH_DAY SUBDIR
-        for directory in process_directories:
-            # store path
-            path = os.path.join(self.user_rnaseq_pipeline_directory, directory)
-            # this will only create the path if it dne
-            utils.mkdirp(path)
-            # set attr to directory (the names in process_directories) unless log, which is treated specially
-            if directory == 'log/%s' % self.year_month_day:
-                # distinguish the log directory ($USER/rnaseq_pipeline/log)
-                self.log_dir = os.path.join(self.user_rnaseq_pipeline_directory, 'log/%s' % self.year_month_day)
-                utils.mkdirp(self.log_dir)
-                # from the daily log file ($USER/rnaseq_pipeline/log/<year-month-day>)
-                self.log_file_path = os.path.join(self.log_dir, '%s.log' % self.year_month_day)
-                self.createStandardDataLogger()
-            else:
-                setattr(self, directory, path)
+            session = self.__dict__['_session']
+        except KeyError:
+            raise AttributeError(name)
+        return getattr(session, name)
 
-        try:
-            database_files_path = os.path.join(self.user_rnaseq_pipeline_directory, 'database_files')
-            if not os.path.isdir(database_files_path):
-                raise NotADirectoryError('DatabaseFilesNotFound: %s' %database_files_path)
-        except NotADirectoryError:
-            cmd = 'git clone https://github.com/BrentLab/database_files.git %s' %database_files_path
-            utils.executeSubProcess(cmd)
-        finally:
-            setattr(self, 'database_files', database_files_path)
-
-        if self.interactive:
-            print('Remember you will not be able to access lts_align_expr or lts_sequence in an interactive session on htcf')
-        else:
-            # check for directories to be soft linked from /lts/mblab/Crypto/rnaseq_pipeline (self.lts_rnaseq_data)
-            lts_dirs_to_softlink = ['lts_align_expr', 'lts_sequence']
-            try:
-                utils.softLinkAndSetAttr(self, lts_dirs_to_softlink, self.lts_rnaseq_data,
-                                         self.user_rnaseq_pipeline_directory)
-            except FileNotFoundError:
-                print('WARNING: The source of %s does not exist and are not accessible. In the future, it is better to include the flag\n'
-                      'interactive=True in the constructor of a StandardData object when you are in an interactive session.' %lts_dirs_to_softlink)
-                setattr(self, 'lts_align_expr', os.path.join(self.user_rnaseq_pipeline_directory, 'lts_align_expr'))
-                setattr(self, 'lts_sequence', os.path.join(self.user_rnaseq_pipeline_directory, 'lts_sequence'))
-            # TODO: priority figure out how to do this without pulling from /lts. put link to genome_files.zip in config maybe
-
-        # unzip genome files from /lts/mblab/Crypto/rnaseq_data/1.0/genome_files to self.user_rnaseq_pipeline_directory
-        self.setGenomeFiles()
-        # check that all files present in the OrganismDataConfig.ini file in the subdirectories of genome_files exist
-        try:
-            self.checkGenomeFiles()
-        except NotADirectoryError:
-            print('Genome Files are incomplete. Delete genome_files completely and re-run StandardDataObject or child '
-                  'to re-download genome_files.\nNote: this cannot be done from an interactive session on HTCF.')
-        except FileNotFoundError:
-            print('Genome Files are incomplete. Delete genome_files completely and re-run StandardDataObject or child '
-                  'to re-download genome_files.\nNote: this cannot be done from an interactive session on HTCF.')
-
-    def setGenomeFiles(self):
-        """
-            set genome_files path and download, if genome_files  DNE. If config_file has genome_files = https://...
-            Then the zip file will be downloaded from that path
-            TODO: error checking if the config_file https path doesn't work
-        """
-        # if genome_files is set in config file
-        if hasattr(self, 'genome_files'):
-            # if the config_file has an entry genome_files = 'https://...' (link to the hosted genome files in /lts -- it is important that there be a single source for genome_files)
-            if self.genome_files.startswith('https'):
-                # and the file genome_files DNE in user_rnaseq_pipeline_directory, download from path
-                if not os.path.isdir(os.path.join(self.user_rnaseq_pipeline_directory, 'genome_files')):
-                    zipped_genome_files_path = os.path.join(self.user_rnaseq_pipeline_directory, 'genome_files.zip')
-                    download_genome_files_cmd = 'wget -O %s %s' %(zipped_genome_files_path, self.genome_files)
-                    utils.executeSubProcess(download_genome_files_cmd)
-                    unzip_genome_files_cmd = 'unzip %s -d %s && rm %s' %(zipped_genome_files_path, self.user_rnaseq_pipeline_directory,
-                                                                         zipped_genome_files_path)
-                    utils.executeSubProcess(unzip_genome_files_cmd)
-
-        # set path of self.genome_files to subdir of user_rnaseq_pipeline directory
-        setattr(self, 'genome_files', os.path.join(self.user_rnaseq_pipeline_directory, 'genome_files'))
-
-        # if the file DNE and interactive flag is set to False (not in interactive session on  htcf), then download from /lts
-        if not (self.interactive or os.path.exists(self.genome_files)):
-            genome_files_full_path = os.path.join(self.lts_rnaseq_data, self.pipeline_version, 'genome_files.zip')
-            cmd = 'unzip {} -d {}'.format(genome_files_full_path, self.user_rnaseq_pipeline_directory)
-            utils.executeSubProcess(cmd)
-
-    def checkGenomeFiles(self):  # NOTE: need to update OrganismDataObject to expect this function TODO: IMPROVE ERROR CHECKING AND LOGGING. CLUNKY CURRENTLY.
-        """
-            read in OrganismDataConfig.ini from each expected subdir of genome_files and check if the path is valid.
-            If it is not, ask user to check genome_files and/or delete genome_files and allow StandardDataObject
-            to re-download to update paths
-        """
-        # list of attributes not to be checked for file existence as they are not files
-        no_check_organism_attribute_list = self._no_file_organism_attributes.values()
-        # flatten list
-        no_check_organism_attribute_list = [x for sublist in no_check_organism_attribute_list for x in sublist]
-        for organism in self._configured_organisms_list:
-            # check if directory exists
-            organism_genome_files_subdir_path = os.path.join(self.genome_files, organism)
-            if not os.path.isdir(organism_genome_files_subdir_path):
-                self.logger.warning('%s does not exist in genome_files' %organism_genome_files_subdir_path)
-                raise NotADirectoryError('ConfiguredOrganismSubdirectoryNotPresentInGenomeFiles')
-            # check if the organism config file exists
-            organism_config_file_path = os.path.join(organism_genome_files_subdir_path, 'OrganismData_config.ini')
-            if not os.path.isfile(organism_config_file_path):
-                self.logger.warning('The OrganismData_config.ini file does not exist for %s' % organism)
-                raise FileNotFoundError('OrganismDataConfigFileNotFound')
-            # if it does, read it in
-            else:
-                # read in config file as dictionary {genome_file_attribute: filename, ...} eg {novoalign_index: KN99_novoalign.nix}
-                organism_config_dict = configparser.ConfigParser()
-                organism_config_dict.read(organism_config_file_path)
-                for organism_attribute, filename in organism_config_dict['OrganismData'].items():
-                    # skip attributes that do not have a corresponding filename
-                    if organism_attribute in no_check_organism_attribute_list:  # TODO: just make it so no int values are checked?
-                        continue
-                    organism_attribute_filepath = os.path.join(organism_genome_files_subdir_path, filename)
-                    if not os.path.isfile(organism_attribute_filepath):
-                        self.logger.warning('%s not found in %s subdirectory of genome_files' % (organism_attribute, organism))
-                        raise FileNotFoundError('OrganismFileNotFound: %s for %s' %(organism_attribute, organism))
+    def standardDirectoryStructure(self):
+        """
+            checks for and creates if necessary the expected directory structure in /scratch/mblab/$USER/rnaseq_pipeline.
+            This is done lazily on attribute access; calling this resolves every path in the session immediately
+        """
+        self._session.resolveAll()
+
+    def setGenomeFiles(self, organism_list=None):
+        """
+            soft link genome_files/<organism> to the shared genome_files cache, populating the cache if necessary.
+            See SessionContext.setGenomeFiles()
+            :param organism_list: organisms to set. Default is all configured organisms
+        """
+        self._session.setGenomeFiles(organism_list)
+
+    def checkGenomeFiles(self, verify=False):
+        """
+            check that the files listed in each genome_files/<organism>/OrganismData_config.ini exist against the
+            genome_files manifest. See SessionContext.checkGenomeFiles()
+            :param verify: if True, re-hash every file in genome_files rather than trusting the manifest
+            :raises: NotADirectoryError, FileNotFoundError if genome_files is incomplete. ValueError on checksum mismatch
+            :returns: the genome_files manifest as a dictionary
+        """
+        return self._session.checkGenomeFiles(verify=verify)
+
+    def getArtifactCatalog(self, run_number_list=None):
+        """
+            the catalog of the bam, count and log files of each fastq in align_count_results and lts_align_expr. See
+            SessionContext.getArtifactCatalog()
+            :param run_number_list: refresh the catalog of these runs (see ArtifactCatalog.refresh()). If None, the
+                                    catalog is returned as last refreshed
+            :returns: an ArtifactCatalog
+        """
+        artifact_catalog = self._session.getArtifactCatalog(self._run_numbers_with_zeros)
+        if run_number_list is not None:
+            artifact_catalog.refresh(run_number_list)
+        return artifact_catalog
 
     def createStandardDataLogger(self):
         """
             function to create StandardData logger
         """
-        try:
-            setattr(self, 'logger', utils.createLogger(self.log_file_path, __name__, self.logger_level))
-        except NameError:
-            print('cannot set logger without specifying log_file_path in StandardDataObject/child and self.standardDirectoryStructure()')
-            exit(1)
+        setattr(self, 'logger', self._session.logger)
 
     def extractRunNumber(self, run_number):
         """
@@ -0,0 +1,135 @@
+"""
+   parse the alignment summary at the end of a novoalign log, eg
+
+       #     Read Sequences:  9824012
+       #   Unique Alignment:  8937821 (91.0%)
+       #       Multi Mapped:   418127 ( 4.3%)
+       #   No Mapping Found:   425843 ( 4.3%)
+       #        Read Length:    33022 ( 0.3%)
+       #   Homopolymer Filter:   9199 ( 0.1%)
+
+   each log is read once and scanned with a single compiled pattern. Used by QualityAssessmentObject.parseAlignmentLogs()
+   and quality_assess_2.assessMappingQuality()
+
+   usage: align_df = alignment_log_tools.novoalignLogDataframe(novoalign_log_list)
+"""
+import re
+import os
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from rnaseq_tools import utils
+
+# {novoalign log label: column name}. The first occurrence of each label in a log is used
+NOVOALIGN_LOG_FIELD_DICT = {'Read Sequences': 'LIBRARY_SIZE',
+                            'Unique Alignment': 'UNIQUE_ALIGNMENT',
+                            'Multi Mapped': 'MULTI_MAP',
+                            'No Mapping Found': 'NO_MAP',
+                            'Homopolymer Filter': 'HOMOPOLY_FILTER',
+                            'Read Length': 'READ_LENGTH_FILTER'}
+
+NOVOALIGN_LOG_REGEX = re.compile(r'(%s):\s+(\d+)' % '|'.join(re.escape(label) for label in NOVOALIGN_LOG_FIELD_DICT))
+
+# one row of the alignment dataframe. Counts are ints, and 0 where the label is not in the log
+NovoalignLogRecord = namedtuple('NovoalignLogRecord', ['FASTQFILENAME'] + list(NOVOALIGN_LOG_FIELD_DICT.values()))
+
+
+def novoalignLogSampleName(novoalign_log_path):
+    """
+        :param novoalign_log_path: path to a novoalign log, eg /path/to/sample_1_novoalign.log
+        :returns: the sample name, eg sample_1
+    """
+    return utils.pathBaseName(novoalign_log_path).replace('_novoalign', '')
+
+
+def parseNovoalignLog(novoalign_log_path, logger=None):
+    """
+        :param novoalign_log_path: path to a novoalign log
+        :param logger: if passed, the parse is timed with utils.timedEvent() as event parse_novoalign_log
+        :returns: a NovoalignLogRecord
+        :raises: FileNotFoundError if the log does not exist
+    """
+    sample_name = novoalignLogSampleName(novoalign_log_path)
+    if logger is None:
+        return _parseNovoalignLog(novoalign_log_path, sample_name)
+    with utils.timedEvent(logger, 'parse_novoalign_log', sample=sample_name):
+        return _parseNovoalignLog(novoalign_log_path, sample_name)
+
+
+def _parseNovoalignLog(novoalign_log_path, sample_name):
+    """
+        see parseNovoalignLog()
+    """
+    with open(novoalign_log_path, 'r') as novoalign_log:
+        novoalign_log_text = novoalign_log.read()
+    field_dict = {}
+    for match in NOVOALIGN_LOG_REGEX.finditer(novoalign_log_text):
+        field_dict.setdefault(NOVOALIGN_LOG_FIELD_DICT[match.group(1)], int(match.group(2)))
+        if len(field_dict) == len(NOVOALIGN_LOG_FIELD_DICT):
+            break
+    for column_name in NOVOALIGN_LOG_FIELD_DICT.values():
+        if column_name not in field_dict:
+            print('No %s in %s. Value set to 0' % (column_name, novoalign_log_path))
+            field_dict[column_name] = 0
+    return NovoalignLogRecord(FASTQFILENAME=sample_name, **field_dict)
+
+
+def _parseNovoalignLogOrError(novoalign_log_path, logger=None):
+    """
+        :param novoalign_log_path: path to a novoalign log
+        :param logger: see parseNovoalignLog()
+        :returns: (NovoalignLogRecord, None), or (a NovoalignLogRecord with the counts None, the exception) if the log
+                  could not be parsed. see parseNovoalignLogs()
+    """
+    try:
+        return parseNovoalignLog(novoalign_log_path, logger), None
+    except Exception as error:
+        return NovoalignLogRecord(novoalignLogSampleName(novoalign_log_path),
+                                  *[None] * len(NOVOALIGN_LOG_FIELD_DICT)), error
+
+
+def parseNovoalignLogs(novoalign_log_path_list, workers=None, logger=None, error_callback=None):
+    """
+        parse novoalign logs in a thread pool. The parse is bound by reading the logs, which are often on a network
+        filesystem, so threads rather than processes are used
+        :param novoalign_log_path_list: list of paths to novoalign logs
+        :param workers: number of threads. Default is min(32, cpu count + 4), as ThreadPoolExecutor
+        :param logger: see parseNovoalignLog()
+        :param error_callback: if passed, a log which cannot be parsed (eg it does not exist) is passed to
+                               error_callback(sample name, exception), and its record is kept with the counts None.
+                               Otherwise the error is raised
+        :returns: list of NovoalignLogRecords, in the order of novoalign_log_path_list
+        :raises: the error of the first log which cannot be parsed, if there is no error_callback
+    """
+    novoalign_log_path_list = list(novoalign_log_path_list)
+    if workers is None:
+        workers = min(32, (os.cpu_count() or 1) + 4)
+    if workers <= 1 or len(novoalign_log_path_list) <= 1:
+        parse_result_list = [_parseNovoalignLogOrError(log_path, logger) for log_path in novoalign_log_path_list]
+    else:
+        with ThreadPoolExecutor(max_workers=min(workers, len(novoalign_log_path_list))) as executor:
+            parse_result_list = list(executor.map(lambda log_path: _parseNovoalignLogOrError(log_path, logger),
+                                                  novoalign_log_path_list))
+    # the errors are handled here, rather than in the threads, so that error_callback is called from this thread
+    novoalign_log_record_list = []
+    for novoalign_log_record, error in parse_result_list:
+        if error is not None:
+            if error_callback is None:
+                raise error
+            error_callback(novoalign_log_record.FASTQFILENAME, error)
+        novoalign_log_record_list.append(novoalign_log_record)
+    return novoalign_log_record_list
+
+
+def novoalignLogDataframe(novoalign_log_path_list, workers=None, logger=None, error_callback=None):
+    """
+        :param novoalign_log_path_list: see parseNovoalignLogs()
+        :param workers: see parseNovoalignLogs()
+        :param logger: see parseNovoalignLog()
+        :param error_callback: see parseNovoalignLogs(). The counts of a log which cannot be parsed are NaN
+        :returns: a dataframe with columns FASTQFILENAME, LIBRARY_SIZE, UNIQUE_ALIGNMENT, MULTI_MAP, NO_MAP,
+                  HOMOPOLY_FILTER and READ_LENGTH_FILTER, one row per log
+    """
+    # imported here so that importing alignment_log_tools does not pull in pandas
+    import pandas as pd
+    return pd.DataFrame.from_records(parseNovoalignLogs(novoalign_log_path_list, workers, logger, error_callback),
+                                     columns=NovoalignLogRecord._fields)
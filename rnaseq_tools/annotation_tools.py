@@ -1,12 +1,12 @@
 import re
-from Bio import SeqIO
-import pandas as pd
 import os
 
 def parseGtf_new(gtf_file, genome_fasta):
     """
         new gtf parser, written for NOIseq. eventually just use this for all uses
     """
+    # imported here so that importing annotation_tools does not pull in Biopython
+    from Bio import SeqIO
     genome_dict = {}
     for seq_record in SeqIO.parse(genome_fasta, 'fasta'):
         genome_dict.setdefault(seq_record.name, seq_record.seq)
@@ -84,6 +84,7 @@ def noiseqDataframe(parsed_gtf_dict, output_dir):
         gtf data for R noiseq package. see https://www.bioconductor.org/packages/release/bioc/vignettes/NOISeq/inst/doc/NOISeq.pdf
         for explanation of dataframes
     """
+    import pandas as pd
     mylength_dict = {}
     mygc_dict = {}
     mybiotypes_dict = {}
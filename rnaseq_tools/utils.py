@@ -1,17 +1,29 @@
 import os
 import re
-import pandas as pd
 from glob import glob
-import numpy as np
 from itertools import combinations, product
-import yaml
 import sys
-import subprocess
-import configparser
 import time
 import logging
-import logging.config
 import math
+import hashlib
+import json
+import contextlib
+import fcntl
+# NOTE: heavy dependencies (pandas, numpy, yaml, configparser, subprocess, ...) are imported in the functions that use
+# them. Every tool imports utils, and most do not need them. See tests/test_import_time.py
+
+# the QueueListener started by configureQueuedLogging(). logging is configured once per process
+_queue_listener = None
+
+# {artifact type: suffix appended to the fastq basename} of the files written by align_count for each fastq. see
+# convertFastqFilename() and ArtifactCatalogObject
+ARTIFACT_SUFFIX_DICT = {'bam': '_sorted_aligned_reads_with_annote.bam',
+                        'bam_index': '_sorted_aligned_reads_with_annote.bam.bai',
+                        'sorted_bam': '_sorted_aligned_reads.bam',
+                        'count': '_read_count.tsv',
+                        'novoalign_log': '_novoalign.log',
+                        'htseq_log': '_htseq.log'}
 
 
 def getRunNumber(fastq_path):
@@ -36,6 +48,7 @@ def decomposeStatus2Bit(status):
         :param status: an int from the status column of the .csv output of quality_assess_2
         :returns: a list of powers of 2 representing the bit
     """
+    import numpy as np
     if status == 0:
         return None
     decomp = []
@@ -89,6 +102,7 @@ def loadConfig(json_file):
         :param json_file: the config for the rnaseq_pipeline, in particular, is found in templates/qc_config.yaml
         :returns: the read-in json object
     """
+    import yaml
     with open(json_file) as json_data:
         d = yaml.safe_load(json_data)
     return d
@@ -184,17 +198,19 @@ def readInDataframe(path_to_csv_tsv_or_excel):
         :param path_to_csv_tsv_or_excel: path to a .csv, .tsv .xlsx
         :returns: a pandas dataframe
     """
+    import pandas as pd
     if not (path_to_csv_tsv_or_excel.endswith('csv') or
             path_to_csv_tsv_or_excel.endswith('tsv') or
             path_to_csv_tsv_or_excel.endswith('xlsx')):
         raise ValueError('UnrecognizedFileExtension')
     try:
-        if checkCSV(path_to_csv_tsv_or_excel):
-            return pd.read_csv(path_to_csv_tsv_or_excel)
-        elif checkTSV(path_to_csv_tsv_or_excel):
-            return pd.read_csv(path_to_csv_tsv_or_excel, sep='\t')
-        elif checkExcel(path_to_csv_tsv_or_excel):
-            return pd.read_excel(path_to_csv_tsv_or_excel)
+        with timedEvent(logging.getLogger(__name__), 'file_parse', path=path_to_csv_tsv_or_excel):
+            if checkCSV(path_to_csv_tsv_or_excel):
+                return pd.read_csv(path_to_csv_tsv_or_excel)
+            elif checkTSV(path_to_csv_tsv_or_excel):
+                return pd.read_csv(path_to_csv_tsv_or_excel, sep='\t')
+            elif checkExcel(path_to_csv_tsv_or_excel):
+                return pd.read_excel(path_to_csv_tsv_or_excel)
     except FileNotFoundError:
         raise FileNotFoundError('PathToColumnarDataDNE')
 
@@ -285,25 +301,136 @@ def executeSubProcess(cmd):
         executes command, sys.exit with message if the subprocess fails
         :param cmd: the full command to be run
     """
-    exit_status = subprocess.call(cmd, shell=True)
+    import subprocess
+    with timedEvent(logging.getLogger(__name__), 'subprocess', cmd=cmd):
+        exit_status = subprocess.call(cmd, shell=True)
     if exit_status == 1:
         raise IOError('%s failed to execute. check the code' % cmd)
 
 
+def getSubprocessOutput(cmd, sample=None):
+    """
+        run cmd in a shell and return its stdout (subprocess.getoutput), logging the command and its duration as a
+        structured subprocess event (see logEvent())
+        :param cmd: the full command to be run
+        :param sample: optional sample identifier to record with the event
+        :returns: the output of cmd, stripped of the trailing newline
+    """
+    import subprocess
+    with timedEvent(logging.getLogger(__name__), 'subprocess', sample=sample, cmd=cmd):
+        return subprocess.getoutput(cmd)
+
+
+def fileChecksum(file_path, block_size=2**20):
+    """
+        md5 checksum of a file, read in blocks so that large files (eg novoalign indicies) are not read into memory
+        :param file_path: path to a file
+        :param block_size: number of bytes to read at a time
+        :returns: the hex digest of the file contents
+    """
+    md5 = hashlib.md5()
+    with open(file_path, 'rb') as file:
+        for block in iter(lambda: file.read(block_size), b''):
+            md5.update(block)
+    return md5.hexdigest()
+
+
+def mergeIntervals(interval_list):
+    """
+        :param interval_list: [(chromosome, start, end, ...), ...], 0 based half open, eg from a bed
+        :returns: sorted [(chromosome, start, end), ...] with overlapping intervals merged (as bedtools merge)
+    """
+    merged_interval_list = []
+    for interval in sorted(interval_list):
+        chromosome, start, end = interval[:3]
+        if merged_interval_list and merged_interval_list[-1][0] == chromosome and start <= merged_interval_list[-1][2]:
+            merged_interval_list[-1] = (chromosome, merged_interval_list[-1][1], max(end, merged_interval_list[-1][2]))
+        else:
+            merged_interval_list.append((chromosome, start, end))
+    return merged_interval_list
+
+
+def writeJsonAtomically(json_dict, output_path):
+    """
+        write json_dict to output_path via a temporary file in the same directory and os.replace, so that concurrent
+        readers (eg other tasks of an array job) never see a partially written file
+        :param json_dict: a json serializable dictionary
+        :param output_path: path to the json file
+    """
+    tmp_path = '%s.%s.tmp' % (output_path, os.getpid())
+    with open(tmp_path, 'w') as file:
+        json.dump(json_dict, file, indent=1, sort_keys=True)
+    os.replace(tmp_path, output_path)
+
+
+@contextlib.contextmanager
+def lockFile(lock_file_path):
+    """
+        context manager holding an exclusive (flock) lock on lock_file_path for the duration of the with block. Used to
+        serialize work on shared files (eg populating the shared genome_files cache) across processes and users.
+        usage: with utils.lockFile('/path/to/.lock'): ...
+        :param lock_file_path: path to the lock file. Created if it does not exist
+    """
+    with open(lock_file_path, 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield lock_file_path
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def extractZipSubdirectory(zip_path, member_prefix, output_directory, read_only=False):
+    """
+        stream only those members of a zip archive whose name begins with member_prefix into output_directory. The
+        member_prefix is stripped, eg member_prefix genome_files/KN99/ extracts genome_files/KN99/KN99.gff to
+        output_directory/KN99.gff. Nothing else in the archive is read.
+        :param zip_path: path to a .zip file
+        :param member_prefix: path prefix, with a trailing /, of the members to extract
+        :param output_directory: directory in which to write the extracted files. Created if it does not exist
+        :param read_only: if True, remove write permission from the extracted files and directories
+        :raises: FileNotFoundError if no member of the zip file starts with member_prefix
+        :returns: the number of files extracted
+    """
+    import shutil
+    import zipfile
+    extracted_file_count = 0
+    mkdirp(output_directory)
+    with zipfile.ZipFile(zip_path) as zip_file:
+        for member in zip_file.infolist():
+            if not member.filename.startswith(member_prefix) or member.filename == member_prefix:
+                continue
+            output_path = os.path.join(output_directory, member.filename[len(member_prefix):])
+            if member.is_dir():
+                mkdirp(output_path)
+                continue
+            mkdirp(os.path.dirname(output_path))
+            with zip_file.open(member) as source, open(output_path, 'wb') as target:
+                shutil.copyfileobj(source, target)
+            # retain the executable bit of the archived file (eg novoalign indicies)
+            executable_bits = (member.external_attr >> 16) & 0o111
+            os.chmod(output_path, (0o444 if read_only else 0o644) | executable_bits)
+            extracted_file_count += 1
+    if extracted_file_count == 0:
+        raise FileNotFoundError('NoZipMembersFound: %s in %s' % (member_prefix, zip_path))
+    if read_only:
+        for directory_path, _, _ in os.walk(output_directory):
+            os.chmod(directory_path, 0o555)
+    return extracted_file_count
+
+
 def configure(object_instance, config_file, config_header, prefix=''):
     """
         reads and sets the attributes in a config_file.ini in type output by configparser.
+        config_file is parsed once per process (and again only if it is modified). See ConfigRegistryObject
         :param object_instance: an object to be configured
         :param config_file: a .ini
         :param config_header: the [header] in the .ini file to read (config format created by configparser).
         :param prefix:
         The function will loop through these key, value pairs and set attributes accordingly
     """
-    # read config file
-    config = configparser.ConfigParser()
-    config.read(config_file)
+    from rnaseq_tools.ConfigRegistryObject import ConfigRegistry
     # set attributes for StandardData
-    for key, value in config[config_header].items():
+    for key, value in ConfigRegistry.getSection(config_file, config_header).rawItems():
         setattr(object_instance, key, os.path.join(prefix,
                                                    value))  # by default, values are read in as strings. Currently, all filepaths, so this is good
 
@@ -422,7 +549,7 @@ def userInputCorrectAttributeName(message, my_object, old_attribute_name, *args)
     return my_object
 
 
-def createLogger(log_file_path, logger_name, logger_level, logging_conf=None):
+def createLogger(log_file_path, logger_name, logger_level, logging_conf=None, json_log_file_path=None):
     """
     create logger in filemode append and format name-levelname-message with package/module __name__ (best practice from logger tutorial)
     :param log_file_path: name of the file in which to log.
@@ -430,6 +557,7 @@ def createLogger(log_file_path, logger_name, logger_level, logging_conf=None):
                      (__name__ is a special variable in python)
     :param logger_level: at what level to publish to log file see logger docs
     :param logging_conf: path to logging configuration file
+    :param json_log_file_path: optional path to a json lines log of the structured events. see logEvent()
     :returns: an instance of the configured logger
     """
     try:
@@ -438,21 +566,123 @@ def createLogger(log_file_path, logger_name, logger_level, logging_conf=None):
         print('log directory %s not found and therefore can\'t create log_file here.' % log_directory_path)
     # a config file is passed, load it
     if logging_conf:
-        logging.config.fileConfig(logging_conf)  # should include at least what is below
-    # if it is not, configure as follows
+        import logging.config as logging_config
+        logging_config.fileConfig(logging_conf)  # should include at least what is below
+    # if it is not, configure as follows (once per process -- see configureQueuedLogging)
     else:
-        # create log for the year-month-day
-        logging.basicConfig(
-            filename='%s' % log_file_path,
-            filemode='a',
-            format='%(name)s-%(levelname)s-%(asctime)s-%(message)s',
-            datefmt='%I:%M:%S %p',  # set 'datefmt' to hour-minute-second AM/PM
-            level=logger_level
-        )
+        configureQueuedLogging(log_file_path, logger_level, json_log_file_path=json_log_file_path)
     # return an instance of the configured logger
     return logging.getLogger(logger_name)
 
 
+class JsonLinesFormatter(logging.Formatter):
+    """
+        format a log record as one line of json. Structured events (see logEvent()) add their fields to the line, eg
+        {"time": ..., "logger": ..., "level": "INFO", "message": ..., "event": "subprocess", "duration": 0.52, "sample": ...}
+    """
+
+    def format(self, record):
+        log_dict = {'time': self.formatTime(record, '%Y-%m-%dT%H:%M:%S'),
+                    'logger': record.name,
+                    'level': record.levelname,
+                    'message': record.getMessage()}
+        log_dict.update(getattr(record, 'event_dict', {}))
+        return json.dumps(log_dict, default=str)
+
+
+def configureQueuedLogging(log_file_path, logger_level, json_log_file_path=None):
+    """
+        attach a QueueHandler to the root logger, and start a QueueListener which writes the queued records to
+        log_file_path (and, optionally, json_log_file_path) in a background thread. Callers only put records on an in
+        memory queue, so that logging in the per sample loops does not block on writes to network scratch. This is done
+        once per process -- subsequent calls do nothing (as logging.basicConfig did before)
+        :param log_file_path: path to the daily log file
+        :param logger_level: at what level to publish to the log file(s)
+        :param json_log_file_path: optional path to a json lines log file. see JsonLinesFormatter
+    """
+    global _queue_listener
+    if _queue_listener is not None:
+        return
+    import atexit
+    import queue
+    from logging.handlers import QueueHandler, QueueListener
+
+    file_handler = logging.FileHandler(log_file_path, mode='a')
+    file_handler.setFormatter(logging.Formatter(fmt='%(name)s-%(levelname)s-%(asctime)s-%(message)s',
+                                                datefmt='%I:%M:%S %p'))  # hour-minute-second AM/PM
+    handler_list = [file_handler]
+    if json_log_file_path:
+        json_handler = logging.FileHandler(json_log_file_path, mode='a')
+        json_handler.setFormatter(JsonLinesFormatter())
+        handler_list.append(json_handler)
+
+    log_queue = queue.Queue(-1)
+    root_logger = logging.getLogger()
+    root_logger.addHandler(QueueHandler(log_queue))
+    root_logger.setLevel(logger_level)
+    _queue_listener = QueueListener(log_queue, *handler_list, respect_handler_level=True)
+    _queue_listener.start()
+    # write whatever is left on the queue on exit
+    atexit.register(stopQueuedLogging)
+
+
+def stopQueuedLogging():
+    """
+        flush the log queue, stop the QueueListener started by configureQueuedLogging() and close its file handlers
+    """
+    global _queue_listener
+    if _queue_listener is None:
+        return
+    _queue_listener.stop()
+    for handler in _queue_listener.handlers:
+        handler.close()
+    for handler in list(logging.getLogger().handlers):
+        if handler.__class__.__name__ == 'QueueHandler':
+            logging.getLogger().removeHandler(handler)
+    _queue_listener = None
+
+
+def logEvent(logger, event, duration=None, sample=None, level=logging.INFO, **kwargs):
+    """
+        log a structured event. In the plain text log this is a line of key=value pairs. In the json lines log (see
+        configureQueuedLogging) the fields are written as json keys
+        :param logger: a logger, eg self.logger
+        :param event: name of the event, eg subprocess, file_parse, parse_novoalign_log
+        :param duration: duration of the event in seconds
+        :param sample: sample identifier, eg the fastq basename
+        :param level: logging level of the event. Default INFO
+        :param kwargs: any other fields to record, eg cmd=cmd
+    """
+    event_dict = {'event': event, 'duration': duration, 'sample': sample}
+    event_dict.update(kwargs)
+    message = ' '.join('%s=%s' % (key, value) for key, value in event_dict.items() if value is not None)
+    logger.log(level, message, extra={'event_dict': event_dict})
+
+
+@contextlib.contextmanager
+def timedEvent(logger, event, sample=None, **kwargs):
+    """
+        time the body of a with statement and log it with logEvent(). status is 'ok', or 'error' if the body raised
+        usage:
+            with utils.timedEvent(self.logger, 'parse_novoalign_log', sample=fastq_basename):
+                ...
+        :param logger: a logger, eg self.logger
+        :param event: name of the event
+        :param sample: sample identifier, eg the fastq basename
+        :param kwargs: any other fields to record
+    """
+    start_time = time.perf_counter()
+    status = 'ok'
+    try:
+        yield
+    except BaseException:
+        status = 'error'
+        raise
+    finally:
+        logEvent(logger, event, duration=round(time.perf_counter() - start_time, 6), sample=sample, status=status,
+                 level=logging.INFO if status == 'ok' else logging.ERROR, **kwargs)
+
+
 def createStandardObjectChildLogger(StandardDataObjectChild, name):
     """
         create logger for StandardDataObjectChild
@@ -463,7 +693,8 @@ def createStandardObjectChildLogger(StandardDataObjectChild, name):
     logger_directory_path = dirPath(StandardDataObjectChild.log_file_path)
     if os.path.isdir(logger_directory_path):
         try:
-            logger = createLogger(StandardDataObjectChild.log_file_path, name, StandardDataObjectChild.logger_level)
+            logger = createLogger(StandardDataObjectChild.log_file_path, name, StandardDataObjectChild.logger_level,
+                                  json_log_file_path=getattr(StandardDataObjectChild, 'json_log_file_path', None))
         except AttributeError:
             print('StandardDataObject constructor not yet run -- logger_level attribute not set.\n'
                   'Must run StandardDataObject constructor first (see another StandardDataObject constructor)')
@@ -628,52 +859,65 @@ def convertFastqFilename(fastq_filename, filetype):
     """
         given a fastq filename, return a bam filename with a given suffix
         :param fastq_filename: a fastqFilename or path with a fastqfilename
-        :param filetype: one of ['bam', 'count', 'novoalign_log']
+        :param filetype: a key of ARTIFACT_SUFFIX_DICT, eg 'bam', 'count' or 'novoalign_log'
         :returns: the file with .fastq.gz removed and the filetype suffix added name
                   (eg sample1_sorted_alignment_with_annote.bam for filetype 'bam')
     """
-    suffix_dict = {'bam': '_sorted_aligned_reads_with_annote.bam',
-                   'count': '_read_count.tsv',
-                   'novoalign_log': '_novoalign.log'}
     fastq_basename = pathBaseName(fastq_filename)
-    return fastq_basename + suffix_dict[filetype]
+    return fastq_basename + ARTIFACT_SUFFIX_DICT[filetype]
 
-def extractInfoFromQuerySheet(query_df, fastq_filename, extract_column):
+def extractInfoFromQuerySheet(query_df, sample_name, extract_column):
     """
         extract information from query sheet given sample_name from qual_assess_df (which is the basename, no ext, of the fastq.gz)
+        the lookup is in the SampleIndex of query_df (see SampleIndexObject), which is built on the first call
         :param query_df: a query dataframe from which info will be extracted
-        :param fastq_filename: fastq filename used to identify a sample
+        :param sample_name: name of sample -- basename of fastq.gz, or the fastq filename/path
         :param extract_column: column from which to extract a value from the query_df based on sample_name
+        :raises: AttributeError if query_df is not a dataframe, IndexError if sample_name is not in query_df, KeyError if
+                 extract_column is not in query_df
         :returns: value extracted from query_df based on sample name and extract column
     """
-    # remove rows containing NaN in fastqFileName
-    tmp_query_df = query_df[~query_df.fastqFileName.isnull()]
+    from rnaseq_tools.SampleIndexObject import SampleIndex
+    extract_value = SampleIndex.forDataframe(query_df).value(sample_name, extract_column)
+    return str(extract_value)
+
+
+def convertDateColumn(series):
+    """
+        convert a column of dates (eg libraryDate) to datetime64
+        :param series: a pandas series of dates, as strings or datetimes
+        :returns: the converted series, or None if any non empty value cannot be parsed as a date
+    """
+    import pandas as pd
     try:
-        extract_value = list(tmp_query_df[tmp_query_df['fastqFileName'].str.contains(fastq_filename)][extract_column])[0]
-    except AttributeError:
-        print('You must pass a query df')
+        converted_series = pd.to_datetime(series, errors='coerce', format='mixed')
+    except (TypeError, ValueError):
+        # format='mixed' was added in pandas 2.0
+        converted_series = pd.to_datetime(series, errors='coerce')
+    if converted_series.isna().sum() != series.isna().sum():
+        return None
+    return converted_series
 
-    return str(extract_value)
 
-def extractInfoFromQuerySheet(query_df, sample_name, extract_column):
-        """ TODO: THIS WAS REMOVED FROM ORGANISMDATA OR QUALITY ASSESSMENT...DON'T REMEMBER...BUT IT NEEDS TO BE UPDATED IN THE REST OF THE CODEBASE TO USE THIS IN UTILS NOW (AND HANDLE ERRORS IN CALLING SCRIPT)
-            extract information from query sheet given sample_name from qual_assess_df (which is the basename, no ext, of the fastq.gz)
-            :param sample_name: name of sample -- basename of fastq.gz, no containing directory, no extension
-            :param extract_column: column from which to extract a value from the query_df based on sample_name
-            :returns: value extracted from query_df based on sample name and extract column
-        """
-        try:
-            extract_value = list(query_df[query_df['fastqFileName'].str.contains(sample_name + '.fastq.gz')][extract_column])[
-                0]
-        except AttributeError:
-            raise AttributeError # TODO: CLEAN THIS -- I JUST REMOVED THE LOGGER STATEMENT WHILE DEBUGGING IGVSHOTS
-        else:
-            return str(extract_value)
+def convertNullableIntColumn(series):
+    """
+        convert a column of integers which may have empty values, and so may have been read in as float (eg runNumber
+        4422.0), to the pandas nullable integer type Int64
+        :param series: a pandas series
+        :returns: the converted series, or None if any non empty value is not a whole number
+    """
+    import pandas as pd
+    numeric_series = pd.to_numeric(series, errors='coerce')
+    if numeric_series.isna().sum() != series.isna().sum() or not (numeric_series.dropna() % 1 == 0).all():
+        return None
+    return numeric_series.astype('Int64')
+
 
 def extractGenotypeList(query_df_row, genotype_columns=["genotype1", "genotype2"], convert_CNAG_to_CKF44=False):
     """
         for use in a loop over rows of a metadata_df
     """
+    import numpy as np
     genotype_list = query_df_row[genotype_columns].values
     if np.isnan(genotype_list[1]):
         genotype_list[1] = None
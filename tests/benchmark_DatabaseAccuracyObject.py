@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+"""
+   time the column check of DatabaseAccuracyObject on a database_files tree -- the cell by cell check that
+   checkColumns() used to do, against checkSheetColumns() serially and in a process pool. The results are
+   asserted to be the same
+
+   usage: python tests/benchmark_DatabaseAccuracyObject.py -d /scratch/mblab/database-files -w 8
+"""
+import sys
+import os
+import re
+import time
+import difflib
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from rnaseq_tools import utils
+from rnaseq_tools.DatabaseAccuracyObject import metadataSpecificationObject, checkSheetColumns, _checkSheetFile
+
+
+def rowLoopCheckColumns(column_specs_dict, sheet_df):
+    """
+        the cell by cell check of the previous DatabaseAccuracyObject.checkColumns(), for comparison
+    """
+    colname_inconsistencies_dict = {}
+    row_inconsistencies_dict = {}
+    skip_columns = []
+    for index, row in sheet_df.iterrows():
+        for column_name, column_entry in dict(row).items():
+            try:
+                column_specs_regex = column_specs_dict[column_name]
+            except KeyError:
+                if column_name not in skip_columns:
+                    nearest_match = difflib.get_close_matches(column_name, column_specs_dict.keys())[0]
+                    colname_inconsistencies_dict.setdefault(nearest_match, column_name)
+                    skip_columns.append(column_name)
+            else:
+                if not re.match(column_specs_regex, str(column_entry)):
+                    row_inconsistencies_dict.setdefault(str(index), []).append(column_name)
+    return colname_inconsistencies_dict, row_inconsistencies_dict, skip_columns
+
+
+def main(argv):
+    args = parseArgs(argv)
+    specification_dict = metadataSpecificationObject().specification_dict
+    sheet_list = []
+    for subdirectory in specification_dict:
+        for sheet_path in utils.extractTopmostFiles(os.path.join(args.database_files, subdirectory)):
+            if not os.path.basename(sheet_path).startswith(('~', '._', '.~')):
+                sheet_list.append((specification_dict[subdirectory]['column_specs_dict'], sheet_path))
+    # the sheets are read once, so that only the check is timed
+    sheet_df_list = [utils.readInDataframe(sheet_path) for column_specs_dict, sheet_path in sheet_list]
+    print('%s sheets, %s rows' % (len(sheet_list), sum(len(sheet_df) for sheet_df in sheet_df_list)))
+
+    timing_dict = {}
+    result_dict = {}
+    for name, check_function in [('row loop', rowLoopCheckColumns), ('vectorized', checkSheetColumns)]:
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            result_dict[name] = [check_function(column_specs_dict, sheet_df)
+                                 for (column_specs_dict, sheet_path), sheet_df in zip(sheet_list, sheet_df_list)]
+        timing_dict[name] = (time.perf_counter() - start) / args.repeat
+    assert result_dict['row loop'] == result_dict['vectorized'], 'the vectorized check differs from the row loop'
+
+    # read and check, as DatabaseAccuracyObject.checkSheets() does
+    if args.workers > 1:
+        start = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=args.workers) as executor:
+            parallel_result_list = list(executor.map(_checkSheetFile, *zip(*sheet_list)))
+        timing_dict['read + vectorized, %s workers' % args.workers] = time.perf_counter() - start
+        assert parallel_result_list == result_dict['vectorized']
+    start = time.perf_counter()
+    [_checkSheetFile(*sheet) for sheet in sheet_list]
+    timing_dict['read + vectorized, serial'] = time.perf_counter() - start
+
+    for name, seconds in timing_dict.items():
+        print('%-35s %.4f s' % (name, seconds))
+    print('vectorized speedup over the row loop: %.1fx' % (timing_dict['row loop'] / timing_dict['vectorized']))
+
+
+def parseArgs(argv):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-d', '--database_files',
+                        default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'test_data', 'mblab.shared', 'database_files'),
+                        help='[OPTIONAL] topmost directory of the metadata database. Default is the copy in tests/test_data')
+    parser.add_argument('-w', '--workers', type=int, default=os.cpu_count(),
+                        help='[OPTIONAL] number of processes for the parallel check. Default is the number of cpus')
+    parser.add_argument('-r', '--repeat', type=int, default=3,
+                        help='[OPTIONAL] number of times to repeat each in memory check. Default 3')
+
+    return parser.parse_args(argv[1:])
+
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -0,0 +1,81 @@
+import unittest
+import os
+import tempfile
+import subprocess
+from rnaseq_tools import utils
+from rnaseq_tools.SessionContextObject import SessionContext
+
+# {subdirectory: (header, [rows])} -- each sheet shares its first two columns with the sheet before it. The name
+# columns are upper case, as setDatabaseDataframe() casts them to upper case on only one side of some merges
+DATABASE_SHEET_DICT = {'bioSample': ('harvestDate,harvester,genotype1', ['1.1.20,CM,CNAG_00001', '1.2.20,CM,CNAG_00002']),
+                       'rnaSample': ('harvestDate,harvester,rnaDate,rnaPreparer', ['1.1.20,CM,1.3.20,AB', '1.2.20,CM,1.3.20,AB']),
+                       's1cDNASample': ('rnaDate,rnaPreparer,s1cDNADate,s1Preparer', ['1.3.20,AB,1.4.20,CD']),
+                       's2cDNASample': ('s1cDNADate,s1Preparer,s2cDNADate,s2Preparer', ['1.4.20,CD,1.5.20,EF']),
+                       'library': ('s2cDNADate,s2Preparer,libraryDate,libraryPreparer', ['1.5.20,EF,1.6.20,GH']),
+                       'fastqFiles': ('libraryDate,libraryPreparer,fastqFileName,runNumber', ['1.6.20,GH,sample_1.fastq.gz,1'])}
+
+
+class TempConfigTestCase(unittest.TestCase):
+    """
+        test case with a config file, mblab_scratch and database_files in a temporary directory. The sessions are
+        cleared, and the log file closed, before and after each test. Set database_sheet_dict in a subclass to write
+        one sheet per row
+    """
+    database_sheet_dict = {}
+
+    def setUp(self):
+        SessionContext.clearSessions()
+        # the log file is opened once per process (see utils.configureQueuedLogging()) -- open it in this tmp_dir
+        utils.stopQueuedLogging()
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.mblab_scratch = os.path.join(self.tmp_dir.name, 'scratch')
+        self.config_file = os.path.join(self.tmp_dir.name, 'rnaseq_pipeline_config.ini')
+        with open(self.config_file, 'w') as config_file:
+            config_file.write('[StandardData]\n'
+                              'lts_rnaseq_data = %s\n'
+                              'pipeline_version = v1.0\n'
+                              'mblab_scratch = %s\n'
+                              'mblab_shared = %s\n'
+                              'user_scratch = %s\n' % (os.path.join(self.tmp_dir.name, 'lts'), self.mblab_scratch,
+                                                       os.path.join(self.mblab_scratch, 'mblab.shared'),
+                                                       os.path.join(self.mblab_scratch, 'test_user')))
+        # avoid the git clone of database_files
+        self.database_files = os.path.join(self.mblab_scratch, 'test_user', 'rnaseq_pipeline', 'database_files')
+        utils.mkdirp(self.database_files)
+        for subdirectory, (header, row_list) in self.database_sheet_dict.items():
+            utils.mkdirp(os.path.join(self.database_files, subdirectory))
+            for i, row in enumerate(row_list):
+                self.writeSheet(subdirectory, i, header, row)
+
+    def tearDown(self):
+        SessionContext.clearSessions()
+        utils.stopQueuedLogging()
+        # the shared genome_files cache is read only
+        utils.executeSubProcess('chmod -R u+w %s' % self.tmp_dir.name)
+        self.tmp_dir.cleanup()
+
+    def writeSheet(self, subdirectory, sheet_number, header, row):
+        """
+            write a sheet with a header and a single row to database_files/<subdirectory>
+            :param subdirectory: a database_files subdirectory, eg bioSample
+            :param sheet_number: number appended to the sheet name
+            :param header: comma separated column names
+            :param row: comma separated values
+            :returns: path to the sheet
+        """
+        sheet_path = os.path.join(self.database_files, subdirectory, '%s_%s.csv' % (subdirectory, sheet_number))
+        with open(sheet_path, 'w') as sheet_file:
+            sheet_file.write('%s\n%s\n' % (header, row))
+        return sheet_path
+
+    def gitCommit(self, message):
+        """
+            commit all of database_files, creating the repository if necessary
+            :param message: commit message
+            :returns: the commit hash
+        """
+        for git_argument_list in [['init', '-q'], ['add', '-A'],
+                                  ['-c', 'user.name=test', '-c', 'user.email=test@test', 'commit', '-q', '-m', message]]:
+            subprocess.run(['git', '-C', self.database_files] + git_argument_list, check=True)
+        return subprocess.run(['git', '-C', self.database_files, 'rev-parse', 'HEAD'], check=True,
+                              stdout=subprocess.PIPE, universal_newlines=True).stdout.strip()
@@ -0,0 +1,69 @@
+import unittest
+import os
+import tempfile
+from unittest.mock import patch
+from rnaseq_tools.AnnotationIndexObject import AnnotationIndex
+
+KN99_2_GENES_GTF = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'test_data', 'KN99_2_genes.gtf')
+
+# the CDS of a gff3 are features of the gene through the transcript (Parent). CKF44_000010 is another gene, and the NAT
+# marker is identified by gene=
+KN99_GFF3 = ('##gff-version 3\n'
+             'CP022321.1\tEuPathDB\tgene\t101\t1000\t.\t+\t.\tID=CKF44_00001;Name=CKF44_00001\n'
+             'CP022321.1\tEuPathDB\tmRNA\t101\t1000\t.\t+\t.\tID=CKF44_00001-t26_1;Parent=CKF44_00001\n'
+             'CP022321.1\tEuPathDB\tCDS\t101\t300\t.\t+\t0\tID=CKF44_00001-t26_1-p1-CDS1;Parent=CKF44_00001-t26_1\n'
+             'CP022321.1\tEuPathDB\tCDS\t251\t400\t.\t+\t1\tID=CKF44_00001-t26_1-p1-CDS2;Parent=CKF44_00001-t26_1\n'
+             'CP022321.1\tEuPathDB\tCDS\t901\t1000\t.\t+\t2\tID=CKF44_00001-t26_1-p1-CDS3;Parent=CKF44_00001-t26_1\n'
+             'CP022321.1\tEuPathDB\tCDS\t2001\t2100\t.\t-\t0\tID=CKF44_000010-t26_1-p1-CDS1;Parent=CKF44_000010-t26_1\n'
+             'CNAG_NAT\tcassette\tgene\t1\t573\t.\t+\t.\tgene=CNAG_NAT;\n'
+             'CNAG_NAT\tcassette\tCDS\t1\t573\t.\t+\t0\tgene=CNAG_NAT;\n')
+
+
+class MyTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.cache_directory = os.path.join(self.tmp_dir.name, 'annotation_index')
+        self.gff3_path = os.path.join(self.tmp_dir.name, 'KN99.gff')
+        with open(self.gff3_path, 'w') as gff3_file:
+            gff3_file.write(KN99_GFF3)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_gtf(self):
+        annotation_index = AnnotationIndex(KN99_2_GENES_GTF)
+        self.assertListEqual(annotation_index.geneIntervals('CNAG_00001', 'CDS'),
+                             [('chr1', 11062, 11307), ('chr1', 11422, 11501)])
+        self.assertEqual(annotation_index.featureBases('CNAG_00001', 'CDS'), 245 + 79)
+        self.assertEqual(annotation_index.featureBases('CNAG_00002', 'CDS'), 104 + 85 + 119 + 169 + 45)
+        self.assertListEqual(annotation_index.geneIntervals('CNAG_99999', 'CDS'), [])
+        self.assertEqual(annotation_index.featureBases('CNAG_00001', 'five_prime_UTR'), 0)
+        start_array, end_array, strand_array = annotation_index.featureIntervals('chr1', 'CDS', 13000, 13200)
+        self.assertListEqual(list(start_array), [12991, 13136])
+        self.assertListEqual(list(strand_array), ['+', '+'])
+
+    def test_gff3AndCache(self):
+        annotation_index = AnnotationIndex(self.gff3_path, self.cache_directory)
+        # the overlapping CDS are merged, and CKF44_000010 is not a feature of CKF44_00001
+        self.assertListEqual(annotation_index.geneIntervals('CKF44_00001', 'CDS'),
+                             [('CP022321.1', 100, 400), ('CP022321.1', 900, 1000)])
+        self.assertEqual(annotation_index.featureBases('CKF44_00001', 'CDS'), 400)
+        self.assertEqual(annotation_index.featureBases('CKF44_000010', 'CDS'), 100)
+        self.assertEqual(annotation_index.featureBases('CNAG_NAT', 'CDS'), 573)
+        self.assertListEqual(os.listdir(self.cache_directory), ['annotation_index_%s.npz' % annotation_index.annotation_md5])
+        # the index is read from the cache rather than the annotation re-parsed
+        with patch.object(AnnotationIndex, 'buildArrays') as mock_build:
+            cached_annotation_index = AnnotationIndex(self.gff3_path, self.cache_directory)
+            mock_build.assert_not_called()
+        self.assertListEqual(cached_annotation_index.geneIntervals('CKF44_00001', 'CDS'),
+                             annotation_index.geneIntervals('CKF44_00001', 'CDS'))
+        # an edited annotation has another md5, and so another index
+        with open(self.gff3_path, 'a') as gff3_file:
+            gff3_file.write('CNAG_G418\tcassette\tCDS\t1\t795\t.\t+\t0\tgene=CNAG_G418;\n')
+        self.assertEqual(AnnotationIndex(self.gff3_path, self.cache_directory).featureBases('CNAG_G418', 'CDS'), 795)
+        self.assertEqual(len(os.listdir(self.cache_directory)), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
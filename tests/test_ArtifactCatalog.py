@@ -0,0 +1,88 @@
+import unittest
+import os
+import tempfile
+from unittest.mock import patch
+from rnaseq_tools import utils
+from rnaseq_tools.ArtifactCatalogObject import ArtifactCatalog
+
+
+class MyTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.align_count_results = os.path.join(self.tmp_dir.name, 'align_count_results')
+        self.lts_align_expr = os.path.join(self.tmp_dir.name, 'lts_align_expr')
+        self.catalog_path = os.path.join(self.tmp_dir.name, 'artifact_catalog.json')
+        # align_count_results/run_####_samples/align|count|logs, lts_align_expr/run_####/
+        for run_directory, sample_list in [('run_0673_samples', ['sample_1', 'sample_2.txt']),
+                                           ('run_0711_5_0718_7_samples', ['sample_3']),
+                                           ('run_4011_samples', ['sample_4'])]:
+            for subdirectory, artifact_type_list in [('align', ['bam', 'bam_index', 'sorted_bam']),
+                                                     ('count', ['count']),
+                                                     ('logs', ['novoalign_log', 'htseq_log'])]:
+                utils.mkdirp(os.path.join(self.align_count_results, run_directory, subdirectory))
+                for sample in sample_list:
+                    for artifact_type in artifact_type_list:
+                        self.touch(self.align_count_results, run_directory, subdirectory,
+                                   sample + utils.ARTIFACT_SUFFIX_DICT[artifact_type])
+        utils.mkdirp(os.path.join(self.lts_align_expr, 'run_673'))
+        self.touch(self.lts_align_expr, 'run_673', 'sample_1_read_count.tsv')
+        self.touch(self.align_count_results, 'run_0673_samples', 'align', 'not_an_artifact.txt')
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    @staticmethod
+    def touch(*path_list):
+        with open(os.path.join(*path_list), 'w') as artifact_file:
+            artifact_file.write('artifact')
+
+    def artifactCatalog(self):
+        return ArtifactCatalog([self.align_count_results, self.lts_align_expr], self.catalog_path,
+                               run_number_alias_dict={711: '0711_5_0718_7'})
+
+    def test_lookup(self):
+        artifact_catalog = self.artifactCatalog()
+        self.assertEqual(len(artifact_catalog.refresh()), 4)
+        bam_path = os.path.join(self.align_count_results, 'run_0673_samples', 'align',
+                                'sample_1_sorted_aligned_reads_with_annote.bam')
+        # the run number is matched with or without the leading zero, and the fastq name with or without path and extension
+        for run_number in [673, '0673', 673.0]:
+            self.assertEqual(artifact_catalog.artifactPath('/path/to/sample_1.fastq.gz', 'bam', run_number), bam_path)
+        self.assertEqual(artifact_catalog.artifacts('sample_1.fastq.gz', 'bam')[0]['size'], len('artifact'))
+        self.assertEqual(len(artifact_catalog.artifacts('sample_1.fastq.gz', run_number=673)), 7)
+        self.assertIsNone(artifact_catalog.artifactPath('sample_1.fastq.gz', 'bam', 4011))
+        # align_count_results is the first root, lts_align_expr is searched with root=
+        self.assertEqual(artifact_catalog.artifactPath('sample_1.fastq.gz', 'count', 673, root=self.lts_align_expr),
+                         os.path.join(self.lts_align_expr, 'run_673', 'sample_1_read_count.tsv'))
+        # only the fastq extension is removed from the names of older samples
+        self.assertEqual(os.path.basename(artifact_catalog.artifactPath('sample_2.txt.fastq.gz', 'count')),
+                         'sample_2.txt_read_count.tsv')
+        # a run directory which is not named by the run number is found by its alias
+        self.assertEqual(artifact_catalog.runDirectory(711, root=self.align_count_results),
+                         os.path.join(self.align_count_results, 'run_0711_5_0718_7_samples'))
+        self.assertIsNotNone(artifact_catalog.artifactPath('sample_3.fastq.gz', 'novoalign_log', 711))
+        self.assertIsNone(artifact_catalog.runDirectory(9999))
+
+    def test_refreshIsIncremental(self):
+        self.artifactCatalog().refresh([673])
+        # the catalog is read from catalog_path, and the unchanged run directories are not crawled
+        artifact_catalog = self.artifactCatalog()
+        with patch.object(ArtifactCatalog, 'crawlRunDirectory') as mock_crawl:
+            self.assertListEqual(artifact_catalog.refresh(['0673']), [])
+            mock_crawl.assert_not_called()
+        self.assertIsNotNone(artifact_catalog.artifactPath('sample_1.fastq.gz', 'bam', 673))
+        # a new file is found by re-crawling only its run directory
+        self.touch(self.align_count_results, 'run_0673_samples', 'count', 'sample_5_read_count.tsv')
+        self.assertListEqual(artifact_catalog.refresh(), [os.path.join(self.align_count_results, 'run_0673_samples'),
+                                                          os.path.join(self.align_count_results, 'run_0711_5_0718_7_samples'),
+                                                          os.path.join(self.align_count_results, 'run_4011_samples')])
+        self.assertIsNotNone(artifact_catalog.artifactPath('sample_5.fastq.gz', 'count', 673))
+        # a removed run directory is dropped by a full refresh
+        os.rename(os.path.join(self.align_count_results, 'run_4011_samples'), os.path.join(self.tmp_dir.name, 'run_4011'))
+        self.assertListEqual(artifact_catalog.refresh(), [])
+        self.assertIsNone(self.artifactCatalog().runDirectory(4011))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+import unittest
+import os
+import tempfile
+from unittest.mock import patch
+from rnaseq_tools.BamMetricsObject import BamMetrics
+
+# CP022322.1:272773-283180 is the KN99 rRNA locus. chr1:1001-1100 (+) and chr1:2001-2100 (-) are a tRNA and an ncRNA
+NONCODING_GFF = ('##gff-version 3\n'
+                 'chr1\tncbi\ttRNA\t1001\t1100\t.\t+\t.\tID=tRNA_1\n'
+                 'chr1\tncbi\tncRNA\t2001\t2100\t.\t-\t.\tID=ncRNA_1\n')
+ANNOTATION_GFF = ('chr2\tncbi\tgene\t101\t400\t.\t+\t.\tID=CKF44_00001\n'
+                  'chr2\tncbi\tCDS\t101\t200\t.\t+\t0\tParent=CKF44_00001\n'
+                  'chr2\tncbi\tCDS\t301\t400\t.\t+\t0\tParent=CKF44_00001\n'
+                  'chr2\tncbi\tCDS\t1001\t1100\t.\t+\t0\tParent=CKF44_00002\n')
+
+
+def samLine(name, flag, chromosome, position, mapq, cigar, *tag_list):
+    return '\t'.join([name, str(flag), chromosome, str(position), str(mapq), cigar, '*', '0', '0', '*', '*'] +
+                     list(tag_list)) + '\n'
+
+
+SAM_LINE_LIST = ['@HD\tVN:1.0\tSO:coordinate\n',
+                 # rRNA: a unique forward and reverse, a primary multi forward (HI:i:1), and a secondary (HI:i:12)
+                 samLine('r1', 0, 'CP022322.1', 272800, 255, '50M', 'NH:i:1', 'XF:Z:__no_feature'),
+                 samLine('r2', 16, 'CP022322.1', 280000, 255, '50M', 'NH:i:1', 'XF:Z:__no_feature'),
+                 samLine('r3', 0, 'CP022322.1', 283170, 3, '50M', 'ZS:Z:R', 'HI:i:1', 'XF:Z:__alignment_not_unique'),
+                 samLine('r4', 0, 'CP022322.1', 275000, 3, '50M', 'ZS:Z:R', 'HI:i:12', 'XF:Z:__alignment_not_unique'),
+                 # ends before the rRNA locus
+                 samLine('r5', 0, 'CP022322.1', 272000, 255, '50M', 'NH:i:1'),
+                 # tRNA: 95 of 100 bases overlap, forward. 80 of 100 bases do not count. a multi map does not count
+                 samLine('r6', 0, 'chr1', 1006, 255, '100M'),
+                 samLine('r7', 0, 'chr1', 1021, 255, '100M'),
+                 samLine('r8', 0, 'chr1', 1001, 3, '100M', 'ZS:Z:R', 'HI:i:1'),
+                 # ncRNA: within the interval, on the forward strand -- counted only if unstranded
+                 samLine('r9', 0, 'chr1', 2011, 255, '50M'),
+                 # htseq ambiguous between protein coding genes only, and between a CKF44 and a CNAG gene
+                 samLine('r10', 0, 'chr2', 101, 255, '20M80N30M', 'XF:Z:__ambiguous[CKF44_00001+CKF44_00002]'),
+                 samLine('r11', 0, 'chr2', 161, 255, '50M', 'XF:Z:__ambiguous[CKF44_00001+CNAG_NAT]'),
+                 # coverage: low mapq and unmapped do not count
+                 samLine('r12', 0, 'chr2', 351, 5, '50M'),
+                 samLine('r13', 4, 'chr2', 351, 255, '50M')]
+
+
+class MyTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.noncoding_gff = os.path.join(self.tmp_dir.name, 'ncRNA_tRNA_no_rRNA.gff')
+        self.annotation_gff = os.path.join(self.tmp_dir.name, 'annotation.gff')
+        self.intergenic_bed = os.path.join(self.tmp_dir.name, 'intergenic.bed')
+        for path, text in [(self.noncoding_gff, NONCODING_GFF), (self.annotation_gff, ANNOTATION_GFF),
+                           (self.intergenic_bed, 'track name=intergenic\nchr2\t0\t100\nchr2\t50\t150\n')]:
+            with open(path, 'w') as output_file:
+                output_file.write(text)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_scanSamLines(self):
+        self.assertListEqual(BamMetrics.readGffIntervals(self.annotation_gff, 'CDS', 'CKF44_00001'),
+                             [('chr2', 100, 200, '+'), ('chr2', 300, 400, '+')])
+        bam_metrics = BamMetrics('sample_1.bam', rrna_region='CP022322.1:272773-283180',
+                                 noncoding_interval_list=BamMetrics.readGffIntervals(self.noncoding_gff),
+                                 coverage_interval_dict={
+                                     'INTERGENIC': BamMetrics.readBedIntervals(self.intergenic_bed),
+                                     'CKF44_00001': BamMetrics.readGffIntervals(self.annotation_gff, 'CDS', 'CKF44_00001')})
+        bam_metrics.scanSamLines(SAM_LINE_LIST)
+        self.assertEqual(bam_metrics.alignment_count, len(SAM_LINE_LIST) - 1)
+        # (total rRNA, unique rRNA, unique tRNA/ncRNA)
+        self.assertTupleEqual(bam_metrics.nonCodingRnaCounts('no'), (3, 2, 2))
+        self.assertTupleEqual(bam_metrics.nonCodingRnaCounts('reverse'), (2, 1, 1))
+        self.assertEqual(bam_metrics.ambiguous_protein_coding, 1)
+        # the intergenic intervals overlap -- 150 bases, of which r10 covers 101-120
+        self.assertEqual(bam_metrics.region_bases_dict['INTERGENIC'], 150)
+        self.assertEqual(bam_metrics.covered_bases_dict['INTERGENIC'], 20)
+        # CKF44_00001 CDS: 200 bases. r10 covers 101-120 and 201-230 (the N is not covered), r11 covers 161-210
+        self.assertEqual(bam_metrics.covered_bases_dict['CKF44_00001'], 20 + 40)
+        self.assertAlmostEqual(bam_metrics.coverageFraction('CKF44_00001'), 60 / 200.0)
+        self.assertAlmostEqual(bam_metrics.coverageFraction('CKF44_00001', 600), .1)
+        with self.assertRaises(ValueError):
+            bam_metrics.nonCodingRnaCounts('forward')
+        # a second scan starts from 0
+        bam_metrics.scanSamLines(SAM_LINE_LIST[:2])
+        self.assertTupleEqual(bam_metrics.nonCodingRnaCounts('no'), (1, 1, 0))
+
+    def test_samtoolsFallbackIsLogged(self):
+        # without pysam, the bam is read from samtools view, which fails here as the bam does not exist
+        with patch.dict('sys.modules', {'pysam': None}), \
+                self.assertLogs('rnaseq_tools.BamMetricsObject', 'WARNING') as log_context, \
+                self.assertRaises(FileNotFoundError):
+            BamMetrics(os.path.join(self.tmp_dir.name, 'sample_1.bam')).scan()
+        self.assertIn('pysam is not installed', log_context.output[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
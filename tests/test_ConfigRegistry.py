@@ -0,0 +1,56 @@
+import unittest
+import os
+import tempfile
+from unittest.mock import patch
+from rnaseq_tools.ConfigRegistryObject import ConfigRegistry
+
+REPO_CONFIG = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'config', 'rnaseq_pipeline_config.ini')
+
+
+class MyTestCase(unittest.TestCase):
+
+    def setUp(self):
+        ConfigRegistry.clearCache()
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.config_file = os.path.join(self.tmp_dir.name, 'config.ini')
+        with open(self.config_file, 'w') as config_file:
+            config_file.write('[OrganismData]\ngenome = KN99.fasta\ntotal_exon_bases = 100\nrun = 0641\n')
+
+    def tearDown(self):
+        ConfigRegistry.clearCache()
+        self.tmp_dir.cleanup()
+
+    def test_typedSections(self):
+        qual_assess_1_dict = ConfigRegistry.getSection(REPO_CONFIG, 'KN99QualityAssessOne')
+        self.assertEqual(qual_assess_1_dict['PROTEIN_CODING_TOTAL_THRESHOLD'], 1000000)
+        self.assertIsInstance(qual_assess_1_dict['PROTEIN_CODING_TOTAL_THRESHOLD'], int)
+        self.assertEqual(qual_assess_1_dict['not_aligned_total_percent_threshold'], .07)
+        self.assertEqual(ConfigRegistry.getSection(REPO_CONFIG, 'StandardData')['pipeline_version'], 'v1.0')
+        # the string as written is retained
+        self.assertEqual(ConfigRegistry.getSection(self.config_file, 'OrganismData').raw('run'), '0641')
+
+    def test_immutable(self):
+        organism_config_dict = ConfigRegistry.getSection(self.config_file, 'OrganismData')
+        with self.assertRaises(TypeError):
+            organism_config_dict['genome'] = 'other.fasta'
+        with self.assertRaises(TypeError):
+            ConfigRegistry.getConfig(self.config_file)['OrganismData'] = None
+
+    def test_parsedOncePerMtime(self):
+        ConfigRegistry.getSection(self.config_file, 'OrganismData')
+        with patch('rnaseq_tools.ConfigRegistryObject.ConfigRegistry.parseConfig') as mock_parse:
+            ConfigRegistry.getSection(self.config_file, 'OrganismData')
+            mock_parse.assert_not_called()
+        config_stat = os.stat(self.config_file)
+        with open(self.config_file, 'a') as config_file:
+            config_file.write('total_intergenic_bases = 200\n')
+        os.utime(self.config_file, ns=(config_stat.st_atime_ns, config_stat.st_mtime_ns + 10**9))
+        self.assertEqual(ConfigRegistry.getSection(self.config_file, 'OrganismData')['total_intergenic_bases'], 200)
+
+    def test_missingSection(self):
+        with self.assertRaises(KeyError):
+            ConfigRegistry.getSection(self.config_file, 'KN99QualityAssessOne')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+import unittest
+import os
+import tempfile
+from unittest.mock import patch
+from rnaseq_tools.BamMetricsObject import BamMetrics
+from rnaseq_tools.CoverageCacheObject import CoverageCache
+
+
+def samLine(name, flag, chromosome, position, mapq, cigar):
+    return '\t'.join([name, str(flag), chromosome, str(position), str(mapq), cigar, '*', '0', '0', '*', '*']) + '\n'
+
+
+SAM_LINE_LIST = ['@HD\tVN:1.0\tSO:coordinate\n',
+                 '@SQ\tSN:chr1\tLN:1000\n',
+                 '@SQ\tSN:chr2\tLN:500\n',
+                 # chr1: 101-150 twice, 181-200 and 301-320 around a 100 base intron. a mapq 5 and a secondary do not count
+                 samLine('r1', 0, 'chr1', 101, 255, '50M'),
+                 samLine('r2', 16, 'chr1', 101, 255, '50M'),
+                 samLine('r3', 0, 'chr1', 181, 255, '20M100N20M'),
+                 samLine('r4', 0, 'chr1', 501, 5, '50M'),
+                 samLine('r5', 256, 'chr1', 601, 255, '50M')]
+
+
+class MyTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.bam_path = os.path.join(self.tmp_dir.name, 'sample_1_sorted_aligned_reads_with_annote.bam')
+        with open(self.bam_path, 'wb') as bam_file:
+            bam_file.write(b'not really a bam')
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_depthAndCoverage(self):
+        coverage_cache = BamMetrics(self.bam_path).scanSamLines(SAM_LINE_LIST).coverage_cache
+        # chr2 has no alignments, but is the length in the header
+        self.assertListEqual(sorted(coverage_cache.depth_dict), ['chr1', 'chr2'])
+        self.assertEqual(len(coverage_cache.depth_dict['chr2']), 500)
+        depth = coverage_cache.depth_dict['chr1']
+        self.assertListEqual([int(depth[position]) for position in [99, 100, 149, 150, 199, 200, 299, 300, 319, 320, 520, 620]],
+                             [0, 2, 2, 0, 1, 0, 0, 1, 1, 0, 0, 0])
+        self.assertEqual(coverage_cache.coveredBases([('chr1', 0, 1000)]), 50 + 20 + 20)
+        # overlapping intervals are counted once, and intervals past the end of the chromosome are clipped
+        self.assertEqual(coverage_cache.coveredBases([('chr1', 90, 130), ('chr1', 120, 160, '+'), ('chr1', 990, 2000),
+                                                      ('chr3', 0, 100)]), 50)
+        self.assertAlmostEqual(coverage_cache.coverageFraction([('chr1', 100, 200)]), .7)
+        self.assertAlmostEqual(coverage_cache.coverageFraction([('chr1', 100, 200)], 700), .1)
+        self.assertIsNone(coverage_cache.coverageFraction([]))
+
+    def test_cacheNextToBam(self):
+        coverage_cache = BamMetrics(self.bam_path).scanSamLines(SAM_LINE_LIST).coverage_cache
+        self.assertTrue(coverage_cache.saveNextToBam(self.bam_path))
+        self.assertTrue(os.path.isfile(self.bam_path + '.coverage.npz'))
+        # forBam() loads the cache rather than scanning the bam
+        with patch.object(BamMetrics, 'scan') as mock_scan:
+            loaded_coverage_cache = CoverageCache.forBam(self.bam_path)
+            mock_scan.assert_not_called()
+        self.assertEqual(loaded_coverage_cache.coveredBases([('chr1', 0, 1000)]), 90)
+        self.assertDictEqual(loaded_coverage_cache.metadata_dict, coverage_cache.metadata_dict)
+        # a cache of another min mapq, or of a bam which has since changed, is not loaded
+        self.assertIsNone(CoverageCache.load(self.bam_path, min_mapq=0))
+        with open(self.bam_path, 'ab') as bam_file:
+            bam_file.write(b' realigned')
+        self.assertIsNone(CoverageCache.load(self.bam_path))
+        self.assertIsNone(CoverageCache.load(os.path.join(self.tmp_dir.name, 'no_such.bam')))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+import unittest
+import os
+from unittest.mock import patch
+import pandas as pd
+from rnaseq_tools import utils
+from rnaseq_tools.DatabaseAccuracyObject import DatabaseAccuracyObject, metadataSpecificationObject, checkSheetColumns
+from temp_config import TempConfigTestCase
+
+
+class MyTestCase(TempConfigTestCase):
+
+    def setUp(self):
+        super().setUp()
+        utils.mkdirp(os.path.join(self.database_files, 'bioSample'))
+        for i, harvester in enumerate(['J.PLAGGENBERG', 'jplaggenberg', 'C.MATEUSIAK']):
+            with open(os.path.join(self.database_files, 'bioSample', 'bioSample_%s_01.0%s.20.csv' % (harvester, i)), 'w') as sheet:
+                sheet.write('harvestDate,harvester,biosampleNumber,timePoint\n'
+                            '01.0%s.20,%s,1,30\n1.6.20,%s,2,\n' % (i, harvester, harvester))
+
+    def databaseAccuracyObject(self, **kwargs):
+        return DatabaseAccuracyObject(config_file=self.config_file, interactive=True, database_files=self.database_files,
+                                      database_subdirectories=['bioSample'], **kwargs)
+
+    def test_checkSheetColumns(self):
+        column_specs_dict = metadataSpecificationObject().specification_dict['bioSample']['column_specs_dict']
+        sheet_df = pd.DataFrame({'harvestDate': ['01.06.20', '1.6.20', None],
+                                 'harvester': ['J.PLAGGENBERG', 'jplaggenberg', 'C.MATEUSIAK'],
+                                 'biosampleNumber': [1, 2, 3],
+                                 'timePoint': [30, None, 'x']})
+        colname_inconsistencies_dict, row_inconsistencies_dict, unknown_column_list = \
+            checkSheetColumns(column_specs_dict, sheet_df)
+        self.assertDictEqual(colname_inconsistencies_dict, {'bioSampleNumber': 'biosampleNumber'})
+        # empty cells are checked as the string 'nan' (or 'None'), as str() of the cell is
+        self.assertDictEqual(row_inconsistencies_dict, {'1': ['harvestDate', 'harvester', 'timePoint'],
+                                                        '2': ['harvestDate', 'timePoint']})
+        self.assertListEqual(unknown_column_list, ['biosampleNumber'])
+        # a sheet with no rows has nothing to report
+        self.assertTupleEqual(checkSheetColumns(column_specs_dict, sheet_df.iloc[0:0]), ({}, {}, []))
+
+    def test_checkSheetsWorkersMatchSerial(self):
+        dba = self.databaseAccuracyObject(use_database_snapshot=False)
+        dba.checkSheets()
+        dba_parallel = self.databaseAccuracyObject(use_database_snapshot=False, workers=2)
+        dba_parallel.checkSheets()
+        self.assertEqual(len(dba.column_check_dict), 3)
+        self.assertDictEqual(dba.column_check_dict, dba_parallel.column_check_dict)
+        for sheet_path in dba.database_dict['bioSample']:
+            self.assertTupleEqual(dba.checkColumns(dba.specification_dict['bioSample'], sheet_path),
+                                  dba.column_check_dict[sheet_path][:2])
+
+    def test_onlyChangedSheetsAreChecked(self):
+        dba = self.databaseAccuracyObject()
+        self.assertEqual(len(dba.checkSheets()), 3)
+        dba.report()
+        with open(dba.accuracy_check_output_file) as report_file:
+            full_report = report_file.read()
+        # unchanged sheets come from the cache, and the report is the same
+        dba_cached = self.databaseAccuracyObject()
+        with patch('rnaseq_tools.utils.readInDataframe') as mock_read:
+            dba_cached.report()
+            mock_read.assert_not_called()
+        with open(dba_cached.accuracy_check_output_file) as report_file:
+            self.assertEqual(report_file.read(), full_report)
+        # a sheet touched without changing its content is not re-checked
+        sheet_path = sorted(dba.database_dict['bioSample'])[0]
+        os.utime(sheet_path, ns=(0, 0))
+        self.assertListEqual(self.databaseAccuracyObject().checkSheets(), [])
+        # and its new (mtime, size) is written to the cache, so that the next check does not hash it
+        with patch('rnaseq_tools.utils.fileChecksum') as mock_checksum:
+            self.assertListEqual(self.databaseAccuracyObject().checkSheets(), [])
+            mock_checksum.assert_not_called()
+        # fix the lower case harvester in one sheet -- only that sheet is re-checked, and the fix is the only delta
+        sheet_path = [path for path in dba.database_dict['bioSample'] if 'jplaggenberg' in path][0]
+        with open(sheet_path, 'w') as sheet:
+            sheet.write('harvestDate,harvester,biosampleNumber,timePoint\n01.01.20,J.PLAGGENBERG,1,30\n1.6.20,J.PLAGGENBERG,2,\n')
+        dba_changed = self.databaseAccuracyObject()
+        with patch('builtins.print'):
+            lines_to_write = dba_changed.changedOnlyReport()
+        self.assertListEqual(list(dba_changed.previous_column_check_dict), [sheet_path])
+        self.assertListEqual(lines_to_write, ['Changed sheet %s:\n' % sheet_path,
+                                              '\tRESOLVED: Row 0 has an inconsistency in column harvester\n',
+                                              '\tRESOLVED: Row 1 has an inconsistency in column harvester\n'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,11 +1,14 @@
 import unittest
 import os
+import json
 import pandas as pd
 import logging
 import sys
 from unittest.mock import patch
 from rnaseq_tools import utils
 from rnaseq_tools.DatabaseObject import DatabaseObject
+from rnaseq_tools.DatabaseSqliteObject import DatabaseSqlite
+from temp_config import TempConfigTestCase, DATABASE_SHEET_DICT
 
 
 class MyTestCase(unittest.TestCase):
@@ -51,5 +54,179 @@ class MyTestCase(unittest.TestCase):
         pass
 
 
+class DatabaseFilesTestCase(TempConfigTestCase):
+    database_sheet_dict = DATABASE_SHEET_DICT
+
+    def databaseObject(self, **kwargs):
+        return DatabaseObject(config_file=self.config_file, interactive=True, database_files=self.database_files, **kwargs)
+
+    def test_workersMatchSerial(self):
+        # add sheets so that each subdirectory has more than one file to parse
+        for subdirectory, (header, row_list) in DATABASE_SHEET_DICT.items():
+            self.writeSheet(subdirectory, len(row_list), header, row_list[0])
+        db = self.databaseObject(use_database_snapshot=False)
+        db.setDatabaseDataframe()
+        db_parallel = self.databaseObject(use_database_snapshot=False, workers=2)
+        db_parallel.setDatabaseDataframe()
+        for subdirectory in db.database_subdirectories:
+            self.assertTrue(db.concat_database_dict[subdirectory].equals(db_parallel.concat_database_dict[subdirectory]))
+        self.assertTrue(db.database_df.equals(db_parallel.database_df))
+
+    def test_standardizeDatabaseDataframe(self):
+        metadata_df = pd.DataFrame({'fastqFileName': ['/lts/run_673_samples/sample_1.fastq.gz', 'sample_2.fastq.gz', None],
+                                    'runNumber': [673.0, 4422.0, None],
+                                    'libraryDate': ['1.6.20', '2020-01-07', None],
+                                    'genotype1': ['CNAG_00001', 'CNAG_00001', 'CNAG_00002']})
+        standardized_df = DatabaseObject.standardizeDatabaseDataframe(
+            metadata_df, leading_zero_dict=self.databaseObject()._run_numbers_with_zeros)
+        self.assertListEqual(list(standardized_df['FASTQFILENAME'][:2]), ['sample_1', 'sample_2'])
+        self.assertEqual(str(standardized_df['RUNNUMBER'].dtype), 'Int64')
+        self.assertEqual(str(standardized_df['GENOTYPE1'].dtype), 'category')
+        self.assertTrue(pd.api.types.is_datetime64_any_dtype(standardized_df['LIBRARYDATE']))
+        self.assertListEqual(list(standardized_df['RUN_DIRECTORY_NUMBER']), ['0673', '4422', None])
+        # each run number is converted on its own -- a value which is not a run number does not affect the others
+        run_number_series = pd.Series([673.0, 'not_a_run', None, 4422])
+        self.assertListEqual(list(DatabaseObject.runNumberWithZeros(run_number_series, {673: '0673'})),
+                             ['0673', 'not_a_run', None, '4422'])
+        # the dates in the merged database are left as they are written in the sheets
+        database_df = DatabaseObject.applyDatabaseSchema(pd.DataFrame({'libraryDate': ['1.6.20', '09.10.19']}))
+        self.assertListEqual(list(database_df['libraryDate']), ['1.6.20', '09.10.19'])
+        # a column with a value which is not a whole number is left as it is
+        odd_df = DatabaseObject.applyDatabaseSchema(pd.DataFrame({'runNumber': ['4422', 'not_a_run']}))
+        self.assertListEqual(list(odd_df['runNumber']), ['4422', 'not_a_run'])
+
+    def test_refreshRemergesOnlyChangedRows(self):
+        first_commit = self.gitCommit('first')
+        self.assertListEqual(self.databaseObject().refresh(), list(DATABASE_SHEET_DICT))
+        # add a sample to the last sheet, and change the harvester of the second biosample
+        self.writeSheet('fastqFiles', 1, DATABASE_SHEET_DICT['fastqFiles'][0], '1.6.20,GH,sample_2.fastq.gz,673')
+        self.writeSheet('bioSample', 1, DATABASE_SHEET_DICT['bioSample'][0], '1.2.20,CM,CNAG_00003')
+        self.gitCommit('second')
+        db = self.databaseObject()
+        with patch('rnaseq_tools.utils.readInDataframe', wraps=utils.readInDataframe) as mock_read:
+            self.assertListEqual(db.refresh(), ['bioSample', 'fastqFiles'])
+            self.assertEqual(mock_read.call_count, 2)
+        db_full = self.databaseObject(use_database_snapshot=False)
+        db_full.setDatabaseDataframe()
+        self.assertTrue(db.database_df.equals(db_full.database_df))
+        # nothing has changed since the refresh
+        self.assertListEqual(self.databaseObject().refresh(), [])
+        # only the new and changed rows are in the delta. Both biosamples merge to every fastq file
+        delta_df = self.databaseObject().deltaSince(first_commit)
+        self.assertListEqual(sorted(zip(delta_df['databaseDelta'], delta_df['genotype1'], delta_df['fastqFileName'])),
+                             [('added', 'CNAG_00001', 'sample_2.fastq.gz'), ('added', 'CNAG_00003', 'sample_1.fastq.gz'),
+                              ('added', 'CNAG_00003', 'sample_2.fastq.gz'), ('removed', 'CNAG_00002', 'sample_1.fastq.gz')])
+        with self.assertRaises(ValueError):
+            self.databaseObject().deltaSince('not_a_commit')
+
+    def test_accuracyCheckNotReusedByRefresh(self):
+        self.writeSheet('bioSample', 1, DATABASE_SHEET_DICT['bioSample'][0], '1.2.20,cm,CNAG_00002')
+        self.gitCommit('first')
+        accuracy_db = self.databaseObject()
+        accuracy_db.setDatabaseDataframe(accuracy_check=True)
+        self.assertListEqual(list(accuracy_db.database_df['harvester']), ['CM', 'cm'])
+        # the accuracy check frame is neither cast to upper case nor to the schema
+        db = self.databaseObject()
+        db.setDatabaseDataframe()
+        db_full = self.databaseObject(use_database_snapshot=False)
+        db_full.setDatabaseDataframe()
+        self.assertListEqual(list(db.database_df['harvester']), ['CM', 'CM'])
+        self.assertEqual(str(db.database_df['runNumber'].dtype), 'Int64')
+        self.assertTrue(db.database_df.equals(db_full.database_df))
+
+    def test_keyIntegrityReport(self):
+        # a second biosample with the key of the first (the harvester is cast to upper case), and a fastq file whose
+        # library is not in the library sheet
+        self.writeSheet('bioSample', 2, DATABASE_SHEET_DICT['bioSample'][0], '1.2.20,cm,CNAG_00009')
+        self.writeSheet('fastqFiles', 1, DATABASE_SHEET_DICT['fastqFiles'][0], '9.9.20,GH,sample_9.fastq.gz,9')
+        report_df = self.databaseObject().keyIntegrityReport()
+        self.assertListEqual(list(report_df.columns), ['parent', 'child', 'issue', 'key', 'parent_rows', 'child_rows',
+                                                       'inflated_rows'])
+        self.assertListEqual(report_df[['parent', 'issue', 'key', 'inflated_rows']].values.tolist(),
+                             [['bioSample', 'duplicate_parent_key', 'harvestDate=1.2.20, harvester=CM', 1],
+                              ['rnaSample', 'duplicate_parent_key', 'rnaDate=1.3.20, rnaPreparer=AB', 1],
+                              ['library', 'orphan_child_key', 'libraryDate=9.9.20, libraryPreparer=GH', 0]])
+
+    def test_sqliteFilter(self):
+        db = self.databaseObject()
+        db.setDatabaseDataframe()
+        filter_json_path = os.path.join(self.tmp_dir.name, 'filter.json')
+        with open(filter_json_path, 'w') as filter_json_file:
+            json.dump({'genotype1': {'like': 'CNAG_0000%', 'not in': ['CNAG_00001']}, 'rnaPreparer': ['AB', 'XY'],
+                       'runNumber': {'between': [0, 2]}, 'harvestDate': ['1.1.20', '1.2.20']}, filter_json_file)
+        db_sql = self.databaseObject(filter_json_path=filter_json_path)
+        db_sql.filterDatabaseSqlite()
+        self.assertListEqual(list(db_sql.filtered_database_df['genotype1']), ['CNAG_00002'])
+        self.assertListEqual(list(db_sql.filtered_database_df.columns), list(db.database_df.columns))
+        # the key columns and the commonly queried columns are indexed
+        index_list = list(db_sql.queryDatabaseSqlite("SELECT name FROM sqlite_master WHERE type = 'index' "
+                                                     "AND tbl_name = 'database'")['name'])
+        self.assertIn('idx_database_harvestDate_harvester', index_list)
+        self.assertIn('idx_database_runNumber', index_list)
+        plan = db_sql.queryDatabaseSqlite('EXPLAIN QUERY PLAN SELECT * FROM database WHERE runNumber = ?', [1])
+        self.assertIn('idx_database_runNumber', ' '.join(plan['detail']))
+        with self.assertRaises(ValueError):
+            DatabaseSqlite.filterJsonToSql({'genotype1': {'regex': 'CNAG'}})
+
+    def test_sqliteRebuiltOnlyWhenDatabaseFilesChange(self):
+        self.databaseObject().setDatabaseSqlite()
+        db = self.databaseObject()
+        with patch('rnaseq_tools.utils.readInDataframe') as mock_read, \
+                patch('rnaseq_tools.DatabaseSqliteObject.DatabaseSqlite.storeTable') as mock_store:
+            self.assertEqual(len(db.queryDatabaseSqlite('SELECT * FROM fastqFiles')), 1)
+            mock_read.assert_not_called()
+            mock_store.assert_not_called()
+        self.writeSheet('fastqFiles', 1, DATABASE_SHEET_DICT['fastqFiles'][0], '1.6.20,GH,sample_2.fastq.gz,2')
+        db = self.databaseObject()
+        store_table = db.getDatabaseSqlite().storeTable
+        written_table_list = []
+
+        def recordWrittenTable(table_name, *args):
+            if store_table(table_name, *args):
+                written_table_list.append(table_name)
+
+        with patch.object(db.getDatabaseSqlite(), 'storeTable', side_effect=recordWrittenTable):
+            self.assertEqual(len(db.queryDatabaseSqlite('SELECT * FROM fastqFiles')), 2)
+        # only the changed subdirectory and the merged database are rewritten
+        self.assertListEqual(written_table_list, ['fastqFiles', 'database'])
+        self.assertEqual(len(db.queryDatabaseSqlite('SELECT * FROM database')), 4)
+
+
+class ExampleFilterJsonTestCase(TempConfigTestCase):
+    # the columns of templates/example_json.json. Only sample_1 and sample_3 match every filter
+    database_sheet_dict = {'bioSample': ('harvestDate,harvester,experimentDesign',
+                                         ['09.10.19,CM,Timecourse', '09.13.19,CM,otherDesign', '08.21.20,CM,24hourinduction']),
+                           'library': ('harvestDate,harvester,libraryDate,libraryPreparer',
+                                       ['09.10.19,CM,09.20.19,GH', '09.13.19,CM,09.21.19,GH', '08.21.20,CM,08.25.20,GH']),
+                           'fastqFiles': ('libraryDate,libraryPreparer,fastqFileName,runNumber',
+                                          ['09.20.19,GH,sample_1.fastq.gz,3993', '09.21.19,GH,sample_2.fastq.gz,4011',
+                                           '08.25.20,GH,sample_3.fastq.gz,4588'])}
+
+    def test_exampleJson(self):
+        filter_json_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'templates',
+                                        'example_json.json')
+        db = DatabaseObject(config_file=self.config_file, interactive=True, database_files=self.database_files,
+                            database_subdirectories=list(self.database_sheet_dict), filter_json_path=filter_json_path,
+                            use_query_cache=False)
+        db.filterDatabaseDataframe()
+        self.assertListEqual(sorted(db.filtered_database_df['fastqFileName']), ['sample_1.fastq.gz', 'sample_3.fastq.gz'])
+        db.filterDatabaseSqlite()
+        self.assertListEqual(sorted(db.filtered_database_df['fastqFileName']), ['sample_1.fastq.gz', 'sample_3.fastq.gz'])
+
+    def test_sqliteDateRange(self):
+        db = DatabaseObject(config_file=self.config_file, interactive=True, database_files=self.database_files,
+                            database_subdirectories=list(self.database_sheet_dict), use_query_cache=False)
+        # as text, 09.21.19 sorts after 08.25.20 -- the dates are stored as YYYY-MM-DD so that they compare as dates
+        db.filterDatabaseSqlite({'libraryDate': {'between': ['09.01.19', '2019-12-31']}})
+        self.assertListEqual(sorted(db.filtered_database_df['fastqFileName']), ['sample_1.fastq.gz', 'sample_2.fastq.gz'])
+        self.assertListEqual(sorted(db.filtered_database_df['libraryDate']), ['2019-09-20', '2019-09-21'])
+        db.filterDatabaseSqlite({'libraryDate': {'>': '09.20.19'}})
+        self.assertListEqual(sorted(db.filtered_database_df['fastqFileName']), ['sample_2.fastq.gz', 'sample_3.fastq.gz'])
+        db.filterDatabaseSqlite({'harvestDate': {'like': '2019-09%'}})
+        self.assertListEqual(sorted(db.filtered_database_df['fastqFileName']), ['sample_1.fastq.gz', 'sample_2.fastq.gz'])
+        with self.assertRaises(ValueError):
+            db.filterDatabaseSqlite({'libraryDate': {'<': 'not a date'}})
+
+
 if __name__ == '__main__':
     unittest.main()
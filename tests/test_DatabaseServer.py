@@ -0,0 +1,78 @@
+import unittest
+import os
+import io
+import time
+import threading
+import pandas as pd
+from rnaseq_tools.DatabaseObject import DatabaseObject
+from rnaseq_tools.DatabaseServerObject import DatabaseServer
+from temp_config import TempConfigTestCase
+
+# {subdirectory: (header, [rows])} -- see tests/temp_config.py
+DATABASE_SHEET_DICT = {'bioSample': ('harvestDate,harvester,genotype1,timePoint', ['1.1.20,CM,CNAG_00001,30', '1.2.20,CM,CNAG_00002,90']),
+                       'library': ('harvestDate,harvester,libraryDate,libraryPreparer', ['1.1.20,CM,1.6.20,GH', '1.2.20,CM,1.7.20,GH']),
+                       'fastqFiles': ('libraryDate,libraryPreparer,fastqFileName,runNumber', ['1.6.20,GH,sample_1.fastq.gz,1', '1.7.20,GH,sample_2.fastq.gz,2'])}
+
+
+class MyTestCase(TempConfigTestCase):
+    database_sheet_dict = DATABASE_SHEET_DICT
+
+    def databaseObject(self):
+        return DatabaseObject(config_file=self.config_file, interactive=True, database_files=self.database_files,
+                              database_subdirectories=list(DATABASE_SHEET_DICT), use_query_cache=False)
+
+    def test_filterMatchesFilterDatabaseSqlite(self):
+        database_server = DatabaseServer(self.databaseObject(), reload_interval=3600)
+        database_server.loadDatabase()
+        db = self.databaseObject()
+        for filter_dict in [{'runNumber': [2]},
+                            {'genotype1': {'like': 'cnag_%1'}},
+                            {'timePoint': {'>=': 30, '<': 90}},
+                            {'harvestDate': ['1.2.20']},
+                            {'fastqFileName': {'not in': ['sample_1.fastq.gz']}}]:
+            with self.subTest(filter_dict=filter_dict):
+                header_dict, result_bytes = database_server.handleRequest({'filter': filter_dict})
+                db.filterDatabaseSqlite(filter_dict)
+                self.assertEqual(header_dict['rows'], len(db.filtered_database_df))
+                self.assertEqual(result_bytes, db.filtered_database_df.to_csv(index=False).encode())
+        # database_files is not checked again within reload_interval, unless a reload is requested
+        with open(os.path.join(self.database_files, 'fastqFiles', 'fastqFiles_1.csv'), 'a') as sheet_file:
+            sheet_file.write('1.7.20,GH,sample_3.fastq.gz,3\n')
+        self.assertEqual(database_server.handleRequest({'command': 'ping'})[0]['rows'], 2)
+        self.assertEqual(database_server.handleRequest({'command': 'reload'})[0]['rows'], 3)
+
+    def test_serveReloadsChangedDatabase(self):
+        socket_path = os.path.join(self.tmp_dir.name, 'queryDB.sock')
+        database_server = DatabaseServer(self.databaseObject(), socket_path, reload_interval=0)
+        server_thread = threading.Thread(target=database_server.serve)
+        server_thread.start()
+        try:
+            for _ in range(100):
+                if os.path.exists(socket_path):
+                    break
+                time.sleep(.1)
+            self.assertEqual(os.stat(socket_path).st_mode & 0o077, 0)
+            self.assertEqual(DatabaseServer.request(socket_path, {'command': 'ping'})['rows'], 2)
+            result_stream = io.BytesIO()
+            header_dict = DatabaseServer.request(socket_path, {'filter': {'genotype1': ['CNAG_00002']}}, result_stream)
+            self.assertEqual(header_dict['rows'], 1)
+            result_stream.seek(0)
+            self.assertListEqual(list(pd.read_csv(result_stream)['fastqFileName']), ['sample_2.fastq.gz'])
+            # a row added to a sheet is in the next response
+            with open(os.path.join(self.database_files, 'fastqFiles', 'fastqFiles_1.csv'), 'a') as sheet_file:
+                sheet_file.write('1.7.20,GH,sample_3.fastq.gz,3\n')
+            header_dict = DatabaseServer.request(socket_path, {'sql': 'SELECT fastqFileName FROM database WHERE runNumber > ?',
+                                                               'parameters': [1]})
+            self.assertEqual(header_dict['result'].decode().split(), ['fastqFileName', 'sample_2.fastq.gz', 'sample_3.fastq.gz'])
+            with self.assertRaises(ConnectionError):
+                DatabaseServer.request(socket_path, {'filter': {'notAColumn': [1]}})
+        finally:
+            DatabaseServer.request(socket_path, {'command': 'shutdown'})
+            server_thread.join(10)
+        self.assertFalse(os.path.exists(socket_path))
+        with self.assertRaises(ConnectionError):
+            DatabaseServer.request(socket_path, {'command': 'ping'})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,42 @@
+import unittest
+import os
+from unittest.mock import patch
+from rnaseq_tools import utils
+from rnaseq_tools.DatabaseObject import DatabaseObject
+from temp_config import TempConfigTestCase, DATABASE_SHEET_DICT
+
+
+class MyTestCase(TempConfigTestCase):
+    database_sheet_dict = DATABASE_SHEET_DICT
+
+    def databaseObject(self, **kwargs):
+        return DatabaseObject(config_file=self.config_file, interactive=True, database_files=self.database_files, **kwargs)
+
+    def test_snapshotMatchesSourceFiles(self):
+        db = self.databaseObject(use_database_snapshot=False)
+        db.setDatabaseDataframe()
+        db_snapshot = self.databaseObject()
+        db_snapshot.setDatabaseDataframe()
+        self.assertEqual(len(db.database_df), 2)
+        self.assertTrue(db.database_df.equals(db_snapshot.database_df))
+        # second read of the unchanged database does not parse any sheet
+        db_cached = self.databaseObject()
+        with patch('rnaseq_tools.utils.readInDataframe') as mock_read:
+            db_cached.setDatabaseDataframe()
+            mock_read.assert_not_called()
+        self.assertTrue(db.database_df.equals(db_cached.database_df))
+        self.assertEqual(list(db_cached.database_df['harvester']), ['CM', 'CM'])
+
+    def test_onlyChangedSheetsAreRead(self):
+        self.databaseObject().setDatabaseDataframe()
+        changed_sheet = self.writeSheet('bioSample', 1, DATABASE_SHEET_DICT['bioSample'][0], '1.2.20,CM,CNAG_00003')
+        os.utime(changed_sheet, ns=(0, 0))
+        db = self.databaseObject()
+        with patch('rnaseq_tools.utils.readInDataframe', wraps=utils.readInDataframe) as mock_read:
+            db.setDatabaseDataframe()
+            mock_read.assert_called_once_with(changed_sheet)
+        self.assertIn('CNAG_00003', list(db.database_df['genotype1']))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,5 +1,34 @@
 import unittest
+import os
+import tempfile
+from unittest.mock import patch
+import pandas as pd
+from rnaseq_tools.BamMetricsObject import BamMetrics
 from rnaseq_tools.QualityAssessmentObject import QualityAssessmentObject
+from rnaseq_tools.CryptoQualityAssessmentObject import CryptoQualityAssessmentObject
+from temp_config import TempConfigTestCase
+
+SAM_TEXT = ('@SQ\tSN:chr1\tLN:1000\n'
+            'r1\t0\tchr1\t101\t255\t50M\t*\t0\t0\t*\t*\tXF:Z:__ambiguous[CKF44_00001+CKF44_00002]\n')
+
+
+def scanSamText(bam_metrics):
+    """ stands in for BamMetrics.scan() -- the test 'bams' are sam text """
+    with open(bam_metrics.bam_path, 'r') as sam_file:
+        return bam_metrics.scanSamLines(sam_file)
+
+
+class BamQualityAssessment(QualityAssessmentObject):
+    """ a QualityAssessmentObject which counts the reads of one gene """
+    metric_version = 1
+
+    def bamMetricsArguments(self, fastq_simple_name):
+        return self.bamPath(fastq_simple_name), {'coverage_interval_dict': {'gene': [('chr1', 100, 200)]}}
+
+
+class Log2cpmQualityAssessment(BamQualityAssessment):
+    """ a BamQualityAssessment whose metric cache key has the inputs of the KN99 metrics """
+    metricKeyInputs = CryptoQualityAssessmentObject.metricKeyInputs
 
 
 class MyTestCase(unittest.TestCase):
@@ -40,5 +69,151 @@ class MyTestCase(unittest.TestCase):
         val = qa.extractLog2cpm(gene, fastq_simple_name, sheet_path)
         print(val)
 
+
+class BamQualityAssessmentTestCase(TempConfigTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.query_path = os.path.join(self.tmp_dir.name, 'query.csv')
+        pd.DataFrame({'fastqFileName': ['sample_%s.fastq.gz' % i for i in range(1, 5)],
+                      'genotype1': ['CNAG_00001'] * 4}).to_csv(self.query_path, index=False)
+
+    def bamQualityAssessment(self, **kwargs):
+        return BamQualityAssessment(config_file=self.config_file, interactive=True, query_path=self.query_path,
+                                    **kwargs)
+
+    def test_scanBamMetrics(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            bam_file_list = [os.path.join(tmp_dir, 'sample_%s.bam' % i) for i in range(1, 5)]
+            # sample_3 has no bam on disk, sample_5 is not in bam_file_list
+            for bam_path in bam_file_list[:2] + bam_file_list[3:]:
+                with open(bam_path, 'w') as bam_file:
+                    bam_file.write(SAM_TEXT)
+            fastq_simple_name_list = ['sample_%s' % i for i in range(1, 6)]
+            with patch.object(BamMetrics, 'scan', scanSamText):
+                for workers in [1, 3]:
+                    qa = self.bamQualityAssessment(bam_file_list=bam_file_list, workers=workers)
+                    qa.scanBamMetrics(fastq_simple_name_list)
+                    self.assertListEqual(list(qa._bam_metrics_dict), bam_file_list)
+                    for bam_path in bam_file_list[:2] + bam_file_list[3:]:
+                        bam_metrics, error = qa._bam_metrics_dict[bam_path]
+                        self.assertIsNone(error)
+                        self.assertEqual(bam_metrics.ambiguous_protein_coding, 1)
+                        self.assertAlmostEqual(bam_metrics.coverageFraction('gene'), .5)
+                        self.assertIsNone(bam_metrics.coverage_cache)
+                        self.assertTrue(os.path.isfile(bam_path + '.coverage.npz'))
+                    self.assertIsInstance(qa._bam_metrics_dict[bam_file_list[2]][1], FileNotFoundError)
+                    # the failure of sample_3 is a QA_ERROR, once, rather than stopping the other samples
+                    qa.recordSampleError('sample_3', 'parse_count_file', qa._bam_metrics_dict[bam_file_list[2]][1])
+                    qual_assess_df = qa.addSampleErrorColumn(pd.DataFrame({'FASTQFILENAME': fastq_simple_name_list[:4]}))
+                    self.assertListEqual(list(qual_assess_df.QA_ERROR.isnull()), [True, True, False, True])
+                    self.assertEqual(qual_assess_df.QA_ERROR[2].count('FileNotFoundError'), 1)
+
+    def test_missingNovoalignLog(self):
+        novoalign_log_path = os.path.join(self.tmp_dir.name, 'sample_1_novoalign.log')
+        qa = self.bamQualityAssessment(novoalign_log_list=[novoalign_log_path])
+        align_df = qa.parseAlignmentLogs()
+        self.assertListEqual(list(align_df.FASTQFILENAME), ['sample_1'])
+        self.assertTrue(align_df.LIBRARY_SIZE.isna().all())
+        qual_assess_df = qa.addSampleErrorColumn(align_df)
+        self.assertTrue(qual_assess_df.QA_ERROR[0].startswith('FileNotFoundError'))
+
+    def test_metricCache(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            input_list_dict = {'bam_file_list': [], 'count_file_list': [], 'novoalign_log_list': []}
+            for i in range(1, 4):
+                for input_list, suffix in [('bam_file_list', '_sorted_aligned_reads.bam'),
+                                           ('count_file_list', '_read_count.tsv'),
+                                           ('novoalign_log_list', '_novoalign.log')]:
+                    input_list_dict[input_list].append(os.path.join(tmp_dir, 'sample_%s%s' % (i, suffix)))
+                    with open(input_list_dict[input_list][-1], 'w') as input_file:
+                        input_file.write('sample_%s\n' % i)
+            metric_cache_path = os.path.join(tmp_dir, 'run_673_sequence_quality_metrics.json')
+            qa = self.bamQualityAssessment(metric_cache_path=metric_cache_path,
+                                           **{input_list: list(path_list) for input_list, path_list in input_list_dict.items()})
+            self.assertListEqual(qa.count_file_list, input_list_dict['count_file_list'])
+            # sample_2 failed, and so is not cached
+            qual_assess_df = qa.mergeCachedMetrics(pd.DataFrame({'FASTQFILENAME': ['sample_1', 'sample_2', 'sample_3'],
+                                                                 'TOTAL_rRNA': [10, None, 30],
+                                                                 'QA_ERROR': [None, 'OSError: truncated bam', None]}))
+            self.assertListEqual(list(qual_assess_df.FASTQFILENAME), ['sample_1', 'sample_2', 'sample_3'])
+            # a re-run assesses only sample_2, and the sample whose bam was rewritten
+            with open(input_list_dict['bam_file_list'][0], 'a') as bam_file:
+                bam_file.write('realigned\n')
+            qa = self.bamQualityAssessment(metric_cache_path=metric_cache_path,
+                                           **{input_list: list(path_list) for input_list, path_list in input_list_dict.items()})
+            for input_list in input_list_dict:
+                self.assertListEqual(getattr(qa, input_list), [input_list_dict[input_list][0], input_list_dict[input_list][1]])
+            qual_assess_df = qa.mergeCachedMetrics(pd.DataFrame({'FASTQFILENAME': ['sample_2', 'sample_1'],
+                                                                 'TOTAL_rRNA': [20, 11], 'QA_ERROR': [None, None]}))
+            self.assertListEqual(list(qual_assess_df.FASTQFILENAME), ['sample_1', 'sample_2', 'sample_3'])
+            self.assertListEqual(list(qual_assess_df.TOTAL_rRNA), [11, 20, 30])
+            # with force, every sample is assessed
+            qa = self.bamQualityAssessment(metric_cache_path=metric_cache_path, force=True,
+                                           **{input_list: list(path_list) for input_list, path_list in input_list_dict.items()})
+            self.assertListEqual(qa.count_file_list, input_list_dict['count_file_list'])
+            # otherwise every sample is now cached
+            qa = self.bamQualityAssessment(metric_cache_path=metric_cache_path,
+                                           **{input_list: list(path_list) for input_list, path_list in input_list_dict.items()})
+            self.assertListEqual(qa.bam_file_list, [])
+            qual_assess_df = qa.mergeCachedMetrics(pd.DataFrame(columns=['FASTQFILENAME']))
+            self.assertListEqual(list(qual_assess_df.TOTAL_rRNA), [11, 20, 30])
+
+    def test_metricCacheKeyedOnLog2cpm(self):
+        count_directory = os.path.join(self.tmp_dir.name, 'run_673_samples', 'count')
+        os.makedirs(count_directory)
+        count_file_list = [os.path.join(count_directory, 'sample_%s_read_count.tsv' % i) for i in range(1, 3)]
+        log2cpm_path = os.path.join(self.tmp_dir.name, 'run_673_samples', 'KN99_log2_cpm.csv')
+        for path in count_file_list + [log2cpm_path]:
+            with open(path, 'w') as input_file:
+                input_file.write('1\n')
+        metric_cache_path = os.path.join(self.tmp_dir.name, 'run_673_sequence_quality_metrics.json')
+        qa = Log2cpmQualityAssessment(config_file=self.config_file, interactive=True, query_path=self.query_path,
+                                      metric_cache_path=metric_cache_path, count_file_list=list(count_file_list),
+                                      novoalign_log_list=[], bam_file_list=[])
+        self.assertIn(os.path.abspath(log2cpm_path), [file_key[0] for file_key in qa._metric_key_dict['sample_1']['files']])
+        self.assertIn('nat_cds_length', qa._metric_key_dict['sample_1']['settings'])
+        qa.mergeCachedMetrics(pd.DataFrame({'FASTQFILENAME': ['sample_1', 'sample_2'], 'NAT_LOG2CPM': [1.0, 2.0]}))
+        qa = Log2cpmQualityAssessment(config_file=self.config_file, interactive=True, query_path=self.query_path,
+                                      metric_cache_path=metric_cache_path, count_file_list=list(count_file_list),
+                                      novoalign_log_list=[], bam_file_list=[])
+        self.assertListEqual(qa.count_file_list, [])
+        # log2_cpm.R rewrites the log2cpm of the run when a sample is added -- every cached row is stale
+        with open(log2cpm_path, 'a') as log2cpm_file:
+            log2cpm_file.write('2\n')
+        qa = Log2cpmQualityAssessment(config_file=self.config_file, interactive=True, query_path=self.query_path,
+                                      metric_cache_path=metric_cache_path, count_file_list=list(count_file_list),
+                                      novoalign_log_list=[], bam_file_list=[])
+        self.assertListEqual(qa.count_file_list, count_file_list)
+        self.assertDictEqual(qa._cached_metric_dict, {})
+
+    def test_metricCacheMatchesExactSampleName(self):
+        input_list_dict = {'bam_file_list': [], 'count_file_list': [], 'novoalign_log_list': []}
+        for sample_name in ['sample_10', 'sample_1']:
+            for input_list, suffix in [('bam_file_list', '_sorted_aligned_reads_with_annote.bam'),
+                                       ('count_file_list', '_read_count.tsv'),
+                                       ('novoalign_log_list', '_novoalign.log')]:
+                input_list_dict[input_list].append(os.path.join(self.tmp_dir.name, sample_name + suffix))
+                with open(input_list_dict[input_list][-1], 'w') as input_file:
+                    input_file.write('%s\n' % sample_name)
+        metric_cache_path = os.path.join(self.tmp_dir.name, 'run_673_sequence_quality_metrics.json')
+        qa = self.bamQualityAssessment(metric_cache_path=metric_cache_path,
+                                       **{input_list: list(path_list) for input_list, path_list in input_list_dict.items()})
+        self.assertEqual(qa.bamPath('sample_1'), input_list_dict['bam_file_list'][1])
+        # only sample_1 is cached. Its bam, and not that of sample_10, is in its key, and is removed from bam_file_list
+        qa.mergeCachedMetrics(pd.DataFrame({'FASTQFILENAME': ['sample_10', 'sample_1'], 'TOTAL_rRNA': [None, 10],
+                                            'QA_ERROR': ['OSError: truncated bam', None]}))
+        qa = self.bamQualityAssessment(metric_cache_path=metric_cache_path,
+                                       **{input_list: list(path_list) for input_list, path_list in input_list_dict.items()})
+        for input_list in input_list_dict:
+            self.assertListEqual(getattr(qa, input_list), [input_list_dict[input_list][0]])
+        # a rewritten bam of sample_10 does not affect the cached metrics of sample_1
+        with open(input_list_dict['bam_file_list'][0], 'a') as bam_file:
+            bam_file.write('realigned\n')
+        qa = self.bamQualityAssessment(metric_cache_path=metric_cache_path,
+                                       **{input_list: list(path_list) for input_list, path_list in input_list_dict.items()})
+        self.assertListEqual(list(qa._cached_metric_dict), ['sample_1'])
+
+
 if __name__ == '__main__':
     unittest.main()
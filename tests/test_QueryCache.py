@@ -0,0 +1,77 @@
+import unittest
+import os
+import json
+import pandas as pd
+from unittest.mock import patch
+from rnaseq_tools.DatabaseObject import DatabaseObject
+from rnaseq_tools.QueryCacheObject import QueryCache
+from temp_config import TempConfigTestCase
+
+# {subdirectory: (header, [rows])} -- see tests/temp_config.py
+DATABASE_SHEET_DICT = {'bioSample': ('harvestDate,harvester,genotype1,timePoint', ['1.1.20,CM,CNAG_00001,30', '1.2.20,CM,CNAG_00002,90']),
+                       'library': ('harvestDate,harvester,libraryDate,libraryPreparer', ['1.1.20,CM,1.6.20,GH', '1.2.20,CM,1.7.20,GH']),
+                       'fastqFiles': ('libraryDate,libraryPreparer,fastqFileName,runNumber', ['1.6.20,GH,sample_1.fastq.gz,1', '1.7.20,GH,sample_2.fastq.gz,2'])}
+
+
+class MyTestCase(TempConfigTestCase):
+    database_sheet_dict = DATABASE_SHEET_DICT
+
+    def setUp(self):
+        super().setUp()
+        self.filter_json_path = os.path.join(self.tmp_dir.name, 'filter.json')
+        with open(self.filter_json_path, 'w') as filter_json_file:
+            json.dump({'timePoint': [90], 'genotype1': ['CNAG_00002']}, filter_json_file)
+
+    def databaseObject(self, **kwargs):
+        return DatabaseObject(config_file=self.config_file, interactive=True, database_files=self.database_files,
+                              database_subdirectories=list(DATABASE_SHEET_DICT), filter_json_path=self.filter_json_path,
+                              **kwargs)
+
+    def test_filterReadFromCache(self):
+        db = self.databaseObject()
+        db.filterDatabaseDataframe()
+        self.assertListEqual(list(db.filtered_database_df['fastqFileName']), ['sample_2.fastq.gz'])
+        # the same filter, with the columns in another order, is read from the cache without merging the database
+        with open(self.filter_json_path, 'w') as filter_json_file:
+            json.dump({'genotype1': ['CNAG_00002'], 'timePoint': [90]}, filter_json_file)
+        db_cached = self.databaseObject()
+        with patch.object(DatabaseObject, 'setDatabaseDataframe') as mock_set_database:
+            db_cached.filterDatabaseDataframe()
+            mock_set_database.assert_not_called()
+        self.assertIsNone(db_cached.database_df)
+        self.assertTrue(db.filtered_database_df.equals(db_cached.filtered_database_df))
+        # as is the sqlite filter
+        db_sqlite = self.databaseObject()
+        db_sqlite.filterDatabaseSqlite()
+        with patch.object(DatabaseObject, 'queryDatabaseSqlite') as mock_query:
+            self.databaseObject().filterDatabaseSqlite()
+            mock_query.assert_not_called()
+        # a change to database_files is a new key
+        with open(os.path.join(self.database_files, 'fastqFiles', 'fastqFiles_1.csv'), 'a') as sheet_file:
+            sheet_file.write('1.7.20,GH,sample_3.fastq.gz,3\n')
+        db_changed = self.databaseObject()
+        db_changed.filterDatabaseDataframe()
+        self.assertListEqual(list(db_changed.filtered_database_df['fastqFileName']),
+                             ['sample_2.fastq.gz', 'sample_3.fastq.gz'])
+        # a database_df which was not merged from database_files is not cached
+        db_passed = self.databaseObject(database_df=db.database_df.copy())
+        self.assertIsNone(db_passed.queryCacheKey('dataframe', {}))
+
+    def test_leastRecentlyUsedEvicted(self):
+        query_cache = QueryCache(os.path.join(self.tmp_dir.name, 'query_cache'))
+        result_df = pd.DataFrame({'fastqFileName': ['sample_%s' % i for i in range(100)]})
+        for query in ['first', 'second']:
+            query_cache.store(QueryCache.queryKey('database_key', 'dataframe', query), result_df)
+        result_size = query_cache.readIndex()[QueryCache.queryKey('database_key', 'dataframe', 'first')]['size']
+        # use the first result, so that the second is the least recently used
+        self.assertTrue(query_cache.load(QueryCache.queryKey('database_key', 'dataframe', 'first')).equals(result_df))
+        query_cache.max_size_bytes = 2 * result_size
+        query_cache.store(QueryCache.queryKey('database_key', 'dataframe', 'third'), result_df)
+        for query, is_cached in [('first', True), ('second', False), ('third', True)]:
+            self.assertEqual(query_cache.load(QueryCache.queryKey('database_key', 'dataframe', query)) is not None,
+                             is_cached)
+        self.assertEqual(len(os.listdir(query_cache.cache_directory)), 4)  # 2 results, the index and its lock
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,50 @@
+import unittest
+import os
+import tempfile
+from rnaseq_tools import utils
+from rnaseq_tools.RunDirectoryIndexObject import RunDirectoryIndex
+
+
+class MyTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.run_directory = os.path.join(self.tmp_dir.name, 'run_0673_samples')
+        # sample_1 is complete, sample_2.txt (an older name, with a . before the fastq extension) has no bam index or
+        # htseq log
+        for subdirectory, artifact_dict in [('align', {'sample_1': ['bam', 'bam_index', 'sorted_bam'], 'sample_2.txt': ['bam']}),
+                                            ('count', {'sample_1': ['count'], 'sample_2.txt': ['count']}),
+                                            ('logs', {'sample_1': ['novoalign_log', 'htseq_log'], 'sample_2.txt': ['novoalign_log']})]:
+            utils.mkdirp(os.path.join(self.run_directory, subdirectory))
+            for sample, artifact_type_list in artifact_dict.items():
+                for artifact_type in artifact_type_list:
+                    with open(os.path.join(self.run_directory, subdirectory,
+                                           sample + utils.ARTIFACT_SUFFIX_DICT[artifact_type]), 'w') as artifact_file:
+                        artifact_file.write('artifact')
+        with open(os.path.join(self.run_directory, 'count', 'KN99_raw_count.csv'), 'w') as other_file:
+            other_file.write('not an artifact')
+        self.query_fastq_list = ['sample_1.fastq.gz', 'sample_2.txt.fastq.gz', 'sample_in_another_run.fastq.gz']
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_completeness(self):
+        run_directory_index = RunDirectoryIndex(self.run_directory)
+        self.assertListEqual(sorted(run_directory_index.sample_dict), ['sample_1', 'sample_2.txt'])
+        self.assertEqual(run_directory_index.artifactPath('/path/to/sample_1.fastq.gz', 'bam_index'),
+                         os.path.join(self.run_directory, 'align', 'sample_1_sorted_aligned_reads_with_annote.bam.bai'))
+        self.assertListEqual(run_directory_index.artifactList('count', self.query_fastq_list),
+                             [os.path.join(self.run_directory, 'count', 'sample_1_read_count.tsv'),
+                              os.path.join(self.run_directory, 'count', 'sample_2.txt_read_count.tsv')])
+        # a sample with no file in the run directory is in another run, and is not reported
+        self.assertDictEqual(run_directory_index.incompleteSamples(self.query_fastq_list),
+                             {'sample_2.txt.fastq.gz': ['bam_index', 'htseq_log']})
+        self.assertDictEqual(run_directory_index.incompleteSamples(self.query_fastq_list, ['bam', 'count', 'novoalign_log']), {})
+        self.assertDictEqual(run_directory_index.completeness()['sample_1'],
+                             dict.fromkeys(RunDirectoryIndex.required_artifact_list, True))
+        with self.assertRaises(NotADirectoryError):
+            RunDirectoryIndex(os.path.join(self.tmp_dir.name, 'run_0000_samples'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,49 @@
+import unittest
+import pandas as pd
+from unittest.mock import patch
+from rnaseq_tools import utils
+from rnaseq_tools.SampleIndexObject import SampleIndex
+from rnaseq_tools.DatabaseObject import DatabaseObject
+
+
+class MyTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.query_df = pd.DataFrame({'fastqFileName': ['run_1_samples/sample_1.fastq.gz', 'sample_2.fastq.gz', None,
+                                                        'run_2_samples/prefix_sample_3.fastq.gz', 'sample_1.fastq.gz'],
+                                      'genotype1': ['CNAG_00001', 'CNAG_00002', 'CNAG_00000', 'CNAG_00003', 'CNAG_00004'],
+                                      'runNumber': [1, 1, 2, 2, 3]})
+
+    def test_lookup(self):
+        sample_index = SampleIndex(self.query_df)
+        # rows with no fastqFileName are dropped, and the first row of a duplicate sample is used
+        self.assertEqual(len(sample_index), 3)
+        self.assertEqual(sample_index.value('sample_1', 'genotype1'), 'CNAG_00001')
+        self.assertEqual(sample_index.record('/some/path/sample_2.fastq.gz')['runNumber'], 1)
+        # a suffix of a sample name matches, as str.contains(sample_name + '.fastq.gz') did
+        self.assertEqual(sample_index.value('sample_3', 'genotype1'), 'CNAG_00003')
+        self.assertNotIn('sample_4', sample_index)
+        with self.assertRaises(IndexError):
+            sample_index.value('sample_4', 'genotype1')
+        with self.assertRaises(KeyError):
+            sample_index.value('sample_1', 'genotype2')
+
+    def test_indexBuiltOncePerDataframe(self):
+        self.assertIs(SampleIndex.forDataframe(self.query_df), SampleIndex.forDataframe(self.query_df))
+        with patch('rnaseq_tools.SampleIndexObject.SampleIndex.__init__', return_value=None) as mock_init:
+            for i in range(10):
+                utils.extractInfoFromQuerySheet(self.query_df, 'sample_2', 'genotype1')
+            mock_init.assert_not_called()
+        self.assertEqual(utils.extractInfoFromQuerySheet(self.query_df, 'sample_2', 'runNumber'), '1')
+        self.assertIsNot(SampleIndex.forDataframe(self.query_df), SampleIndex.forDataframe(self.query_df.copy()))
+
+    def test_extractValueFromStandardizedQuery(self):
+        standardized_df = DatabaseObject.standardizeDatabaseDataframe(self.query_df.dropna())
+        self.assertEqual(DatabaseObject.extractValueFromStandardizedQuery(standardized_df, 'FASTQFILENAME', 'sample_2',
+                                                                          'GENOTYPE1'), 'CNAG_00002')
+        self.assertEqual(DatabaseObject.extractValueFromStandardizedQuery(standardized_df, 'RUNNUMBER', 3,
+                                                                          'GENOTYPE1'), 'CNAG_00004')
+
+
+if __name__ == '__main__':
+    unittest.main()
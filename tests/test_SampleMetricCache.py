@@ -0,0 +1,55 @@
+import unittest
+import os
+import tempfile
+from rnaseq_tools.SampleMetricCacheObject import SampleMetricCache
+
+
+class MyTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.cache_path = os.path.join(self.tmp_dir.name, 'run_673_sequence_quality_metrics.json')
+        self.bam_path = os.path.join(self.tmp_dir.name, 'sample_1_sorted_aligned_reads_with_annote.bam')
+        self.count_path = os.path.join(self.tmp_dir.name, 'sample_1_read_count.tsv')
+        for path in [self.bam_path, self.count_path]:
+            with open(path, 'w') as output_file:
+                output_file.write('sample_1\n')
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def sampleKey(self, genotype1='CNAG_00001', metric_version=1):
+        return SampleMetricCache.sampleKey([self.bam_path, self.count_path, None], annotation_md5='abc',
+                                           query_row_dict={'genotype1': genotype1, 'runNumber': 673},
+                                           metric_version=metric_version)
+
+    def test_metrics(self):
+        metric_cache = SampleMetricCache(self.cache_path)
+        self.assertIsNone(metric_cache.metrics('sample_1', self.sampleKey()))
+        metric_cache.storeMetrics('sample_1', self.sampleKey(), {'FASTQFILENAME': 'sample_1', 'TOTAL_rRNA': 10,
+                                                                 'GENOTYPE2_COVERAGE': None})
+        metric_cache.write()
+        # the key is json, and so compares equal after the cache is read back
+        cached_metric_cache = SampleMetricCache(self.cache_path)
+        self.assertDictEqual(cached_metric_cache.metrics('sample_1', self.sampleKey()),
+                             {'FASTQFILENAME': 'sample_1', 'TOTAL_rRNA': 10, 'GENOTYPE2_COVERAGE': None})
+        self.assertIsNone(cached_metric_cache.metrics('sample_2', self.sampleKey()))
+        # another query row, or metric version, is stale
+        self.assertIsNone(cached_metric_cache.metrics('sample_1', self.sampleKey(genotype1='CNAG_00002')))
+        self.assertIsNone(cached_metric_cache.metrics('sample_1', self.sampleKey(metric_version=2)))
+        # as is a bam which has been rewritten
+        with open(self.bam_path, 'a') as bam_file:
+            bam_file.write('realigned\n')
+        self.assertIsNone(cached_metric_cache.metrics('sample_1', self.sampleKey()))
+
+    def test_otherVersion(self):
+        with open(self.cache_path, 'w') as cache_file:
+            cache_file.write('{"version": 0, "samples": {"sample_1": {}}}')
+        self.assertDictEqual(SampleMetricCache(self.cache_path).sample_dict, {})
+        with open(self.cache_path, 'w') as cache_file:
+            cache_file.write('{"version": ')
+        self.assertDictEqual(SampleMetricCache(self.cache_path).sample_dict, {})
+
+
+if __name__ == '__main__':
+    unittest.main()
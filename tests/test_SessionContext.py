@@ -0,0 +1,163 @@
+import unittest
+import os
+import shutil
+import zipfile
+from unittest.mock import patch
+from rnaseq_tools import utils
+from rnaseq_tools.SessionContextObject import SessionContext
+from rnaseq_tools.StandardDataObject import StandardData
+from rnaseq_tools.OrganismDataObject import OrganismData
+from temp_config import TempConfigTestCase
+
+
+class MyTestCase(TempConfigTestCase):
+
+    def test_sessionIsShared(self):
+        sd_1 = StandardData(config_file=self.config_file, interactive=True)
+        sd_2 = StandardData(config_file=self.config_file, interactive=True)
+        self.assertIs(sd_1._session, sd_2._session)
+
+    def test_pathsResolvedLazily(self):
+        sd = StandardData(config_file=self.config_file, interactive=True)
+        reports_path = os.path.join(self.mblab_scratch, 'test_user', 'rnaseq_pipeline', 'reports')
+        self.assertFalse(os.path.isdir(reports_path))
+        self.assertEqual(sd.reports, reports_path)
+        self.assertTrue(os.path.isdir(reports_path))
+
+    def test_secondConstructionDoesNotTouchFilesystem(self):
+        sd_1 = StandardData(config_file=self.config_file, interactive=True)
+        sd_1.standardDirectoryStructure()
+        with patch('rnaseq_tools.utils.mkdirp') as mock_mkdirp, \
+                patch('rnaseq_tools.utils.executeSubProcess') as mock_subprocess:
+            sd_2 = StandardData(config_file=self.config_file, interactive=True)
+            self.assertEqual(sd_1.log_file_path, sd_2.log_file_path)
+            self.assertEqual(sd_1.genome_files, sd_2.genome_files)
+            mock_mkdirp.assert_not_called()
+            mock_subprocess.assert_not_called()
+
+    def test_instanceAttributeOverridesSession(self):
+        sd = StandardData(config_file=self.config_file, interactive=True, pipeline_version='v2.0')
+        self.assertEqual(sd.pipeline_version, 'v2.0')
+        # the override reaches the session, and so the paths derived from it
+        self.assertEqual(sd._session.pipeline_version, 'v2.0')
+        self.assertEqual(sd._session.sharedGenomeFilesPath(),
+                         os.path.join(self.mblab_scratch, 'mblab.shared', 'genome_files', 'v2.0'))
+        # an object without the override has its own session
+        self.assertEqual(StandardData(config_file=self.config_file, interactive=True)._session.pipeline_version, 'v1.0')
+
+    def test_overriddenPathReachesDerivedPaths(self):
+        rnaseq_tmp = os.path.join(self.tmp_dir.name, 'other_rnaseq_tmp')
+        utils.mkdirp(rnaseq_tmp)
+        sd = StandardData(config_file=self.config_file, interactive=True, rnaseq_tmp=rnaseq_tmp)
+        self.assertEqual(sd._session.rnaseq_tmp, rnaseq_tmp)
+        self.assertEqual(sd.getArtifactCatalog().catalog_path, os.path.join(rnaseq_tmp, 'artifact_catalog.json'))
+        # kwargs which are not session attributes (eg a query path) do not split the session
+        sd_1 = StandardData(config_file=self.config_file, interactive=True, query_path='query_1.csv')
+        sd_2 = StandardData(config_file=self.config_file, interactive=True, query_path='query_2.csv')
+        self.assertIs(sd_1._session, sd_2._session)
+        self.assertNotEqual(sd_1.getArtifactCatalog().catalog_path, sd.getArtifactCatalog().catalog_path)
+
+    def createGenomeFiles(self):
+        genome_files = os.path.join(self.mblab_scratch, 'test_user', 'rnaseq_pipeline', 'genome_files')
+        for organism in SessionContext.configured_organisms_list:
+            utils.mkdirp(os.path.join(genome_files, organism))
+            with open(os.path.join(genome_files, organism, 'OrganismData_config.ini'), 'w') as config_file:
+                config_file.write('[OrganismData]\ngenome = %s.fasta\nfeature_type = gene\n' % organism)
+            with open(os.path.join(genome_files, organism, '%s.fasta' % organism), 'w') as genome_file:
+                genome_file.write('>chr1\nACGT\n')
+        return genome_files
+
+    def test_genomeFilesManifest(self):
+        genome_files = self.createGenomeFiles()
+        sd = StandardData(config_file=self.config_file, interactive=True)
+        sd.checkGenomeFiles()
+        manifest_path = os.path.join(genome_files, SessionContext.genome_files_manifest_filename)
+        self.assertTrue(os.path.isfile(manifest_path))
+        # second check is one manifest read and a stat of each organism subdirectory and config file
+        with patch('rnaseq_tools.utils.fileChecksum') as mock_checksum, \
+                patch('configparser.ConfigParser.read') as mock_config_read:
+            manifest = sd.checkGenomeFiles()
+            mock_checksum.assert_not_called()
+            mock_config_read.assert_not_called()
+        # the default check is of size and mtime -- the files are not hashed on the first check
+        self.assertNotIn('md5', manifest['organisms']['KN99']['files']['genome'])
+        manifest = sd.checkGenomeFiles(verify=True)
+        self.assertEqual(manifest['organisms']['KN99']['files']['genome']['md5'],
+                         utils.fileChecksum(os.path.join(genome_files, 'KN99', 'KN99.fasta')))
+        # a file whose size or mtime has changed is hashed again, rather than losing its checksum
+        with open(os.path.join(genome_files, 'KN99', 'KN99.fasta'), 'a') as genome_file:
+            genome_file.write('>chr2\nTTTT\n')
+        os.utime(os.path.join(genome_files, 'KN99', 'OrganismData_config.ini'))
+        with patch('rnaseq_tools.utils.fileChecksum', wraps=utils.fileChecksum) as mock_checksum:
+            manifest = sd.checkGenomeFiles()
+            mock_checksum.assert_called_once_with(os.path.join(genome_files, 'KN99', 'KN99.fasta'))
+        self.assertEqual(manifest['organisms']['KN99']['files']['genome']['md5'],
+                         utils.fileChecksum(os.path.join(genome_files, 'KN99', 'KN99.fasta')))
+        # removing a file is caught by the directory mtime
+        os.remove(os.path.join(genome_files, 'KN99', 'KN99.fasta'))
+        with self.assertRaises(FileNotFoundError):
+            sd.checkGenomeFiles()
+
+    def test_verifyGenomeFiles(self):
+        genome_files = self.createGenomeFiles()
+        sd = StandardData(config_file=self.config_file, interactive=True)
+        sd.checkGenomeFiles(verify=True)
+        genome_path = os.path.join(genome_files, 'H99', 'H99.fasta')
+        genome_stat = os.stat(genome_path)
+        # same size and mtime, different content
+        with open(genome_path, 'w') as genome_file:
+            genome_file.write('>chr1\nTTTT\n')
+        os.utime(genome_path, ns=(genome_stat.st_atime_ns, genome_stat.st_mtime_ns))
+        sd.checkGenomeFiles()
+        with self.assertRaises(ValueError):
+            sd.checkGenomeFiles(verify=True)
+
+    def test_sharedGenomeFilesCache(self):
+        zip_path = os.path.join(self.tmp_dir.name, 'lts', 'v1.0', 'genome_files.zip')
+        utils.mkdirp(os.path.dirname(zip_path))
+        with zipfile.ZipFile(zip_path, 'w') as zip_file:
+            for organism in SessionContext.configured_organisms_list:
+                zip_file.writestr('genome_files/%s/OrganismData_config.ini' % organism,
+                                  '[OrganismData]\ngenome = %s.fasta\nfeature_type = gene\n' % organism)
+                zip_file.writestr('genome_files/%s/%s.fasta' % (organism, organism), '>chr1\nACGT\n')
+        od = OrganismData(config_file=self.config_file, organism='KN99')
+        shared_genome_files = os.path.join(self.mblab_scratch, 'mblab.shared', 'genome_files', 'v1.0')
+        # only the requested organism is extracted, and the user genome_files holds a link to it
+        self.assertTrue(os.path.isfile(os.path.join(shared_genome_files, 'KN99', 'KN99.fasta')))
+        self.assertFalse(os.path.exists(os.path.join(shared_genome_files, 'H99')))
+        self.assertTrue(os.path.islink(os.path.join(od.genome_files, 'KN99')))
+        self.assertEqual(od.genome, os.path.join(od.genome_files, 'KN99', 'KN99.fasta'))
+        # the shared cache is read only
+        self.assertFalse(os.stat(os.path.join(shared_genome_files, 'KN99', 'KN99.fasta')).st_mode & 0o222)
+        # a second user links to the same cache without extracting again
+        SessionContext.clearSessions()
+        utils.mkdirp(os.path.join(self.mblab_scratch, 'other_user', 'rnaseq_pipeline', 'database_files'))
+        with open(self.config_file) as config_file:
+            config = config_file.read().replace(os.path.join(self.mblab_scratch, 'test_user'),
+                                                os.path.join(self.mblab_scratch, 'other_user'))
+        with open(self.config_file, 'w') as config_file:
+            config_file.write(config)
+        with patch('rnaseq_tools.utils.extractZipSubdirectory') as mock_extract:
+            od_2 = OrganismData(config_file=self.config_file, organism='KN99')
+            mock_extract.assert_not_called()
+        self.assertEqual(os.path.realpath(os.path.join(od_2.genome_files, 'KN99')),
+                         os.path.realpath(os.path.join(shared_genome_files, 'KN99')))
+
+    def test_partialExtractionRemoved(self):
+        # a read only, partially extracted organism is removed without a subprocess
+        tmp_organism_path = os.path.join(self.tmp_dir.name, '.KN99.1.tmp')
+        utils.mkdirp(os.path.join(tmp_organism_path, 'subdir'))
+        with open(os.path.join(tmp_organism_path, 'subdir', 'KN99.fasta'), 'w') as genome_file:
+            genome_file.write('>chr1\n')
+        for path in [os.path.join(tmp_organism_path, 'subdir', 'KN99.fasta'), os.path.join(tmp_organism_path, 'subdir')]:
+            os.chmod(path, 0o555)
+        shutil.rmtree(tmp_organism_path, onerror=SessionContext._removeReadOnly)
+        self.assertFalse(os.path.exists(tmp_organism_path))
+
+    def test_unknownAttribute(self):
+        sd = StandardData(config_file=self.config_file, interactive=True)
+        self.assertFalse(hasattr(sd, 'organism'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+import unittest
+import os
+import tempfile
+from rnaseq_tools import alignment_log_tools
+from rnaseq_tools.QualityAssessmentObject import QualityAssessmentObject
+
+NOVOALIGN_LOG_TEXT = ('# novoalign (V3.08.02 - Build Oct 19 2018 @ 12:30:05)\n'
+                      '# Starting at Mon Jul 20 10:12:10 2020\n'
+                      '# Interpreting input files as Illumina FASTQ, Cassava Pipeline 1.8.\n'
+                      '#     Read Sequences:  %i\n'
+                      '#   Unique Alignment:  %i (91.0%%)\n'
+                      '#       Multi Mapped:   418127 ( 4.3%%)\n'
+                      '#   No Mapping Found:   425843 ( 4.3%%)\n'
+                      '#        Read Length:    33022 ( 0.3%%)\n'
+                      '#   Homopolymer Filter:   9199 ( 0.1%%)\n'
+                      '#  Elapsed Time: 421.882 (sec.)\n')
+
+
+class MyTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.log_path_list = []
+        for sample_number in range(20):
+            log_path = os.path.join(self.tmp_dir.name, 'sample_%i_novoalign.log' % sample_number)
+            with open(log_path, 'w') as novoalign_log:
+                novoalign_log.write(NOVOALIGN_LOG_TEXT % (1000 + sample_number, 900 + sample_number))
+            self.log_path_list.append(log_path)
+        # a log of a run which stopped before the summary
+        self.truncated_log_path = os.path.join(self.tmp_dir.name, 'sample_truncated_novoalign.log')
+        with open(self.truncated_log_path, 'w') as novoalign_log:
+            novoalign_log.write(NOVOALIGN_LOG_TEXT.split('#   Unique')[0] % 1000)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_parseNovoalignLog(self):
+        novoalign_log_record = alignment_log_tools.parseNovoalignLog(self.log_path_list[0])
+        self.assertEqual(novoalign_log_record, ('sample_0', 1000, 900, 418127, 425843, 9199, 33022))
+        self.assertEqual(novoalign_log_record.HOMOPOLY_FILTER, 9199)
+        truncated_log_record = alignment_log_tools.parseNovoalignLog(self.truncated_log_path)
+        self.assertEqual(truncated_log_record.LIBRARY_SIZE, 1000)
+        self.assertEqual(truncated_log_record.UNIQUE_ALIGNMENT, 0)
+        # QualityAssessmentObject.parseAlignmentLog() returns the same fields, without the sample name
+        self.assertDictEqual(QualityAssessmentObject.parseAlignmentLog(None, self.log_path_list[1]),
+                             {'LIBRARY_SIZE': 1001, 'UNIQUE_ALIGNMENT': 901, 'MULTI_MAP': 418127, 'NO_MAP': 425843,
+                              'HOMOPOLY_FILTER': 9199, 'READ_LENGTH_FILTER': 33022})
+
+    def test_novoalignLogDataframe(self):
+        # the records are in the order of the input, whether parsed in threads or not
+        for workers in [1, 8]:
+            with self.subTest(workers=workers):
+                align_df = alignment_log_tools.novoalignLogDataframe(self.log_path_list, workers=workers)
+                self.assertListEqual(list(align_df.columns),
+                                     ['FASTQFILENAME'] + list(alignment_log_tools.NOVOALIGN_LOG_FIELD_DICT.values()))
+                self.assertListEqual(list(align_df['FASTQFILENAME']), ['sample_%i' % i for i in range(20)])
+                self.assertListEqual(list(align_df['LIBRARY_SIZE']), list(range(1000, 1020)))
+        self.assertEqual(len(alignment_log_tools.novoalignLogDataframe([])), 0)
+        with self.assertRaises(FileNotFoundError):
+            alignment_log_tools.parseNovoalignLogs([self.log_path_list[0], os.path.join(self.tmp_dir.name, 'missing.log')])
+        # with an error_callback, a log which cannot be read is reported, and kept with NaN counts
+        error_list = []
+        align_df = alignment_log_tools.novoalignLogDataframe(
+            [os.path.join(self.tmp_dir.name, 'sample_missing_novoalign.log'), self.log_path_list[0]], workers=2,
+            error_callback=lambda sample_name, error: error_list.append((sample_name, type(error))))
+        self.assertListEqual(error_list, [('sample_missing', FileNotFoundError)])
+        self.assertListEqual(list(align_df['FASTQFILENAME']), ['sample_missing', 'sample_0'])
+        self.assertTrue(align_df['LIBRARY_SIZE'].isna()[0])
+        self.assertEqual(align_df['LIBRARY_SIZE'][1], 1000)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+"""
+    import time benchmark for the entry points in tools/. Each tool is run with --help under python -X importtime, and the
+    cumulative import time of its top level imports is compared to a budget. Lightweight tools, which are started by
+    thousands of slurm array tasks, must also not import any of HEAVY_MODULE_LIST.
+    run directly to print a report of every tool:
+        python tests/test_import_time.py --report
+"""
+import unittest
+import os
+import re
+import subprocess
+import sys
+
+REPO_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TOOLS_DIRECTORY = os.path.join(REPO_DIRECTORY, 'tools')
+
+# modules which should be imported only by the functions that need them
+HEAVY_MODULE_LIST = ['pandas', 'numpy', 'yaml', 'Bio', 'configparser', 'subprocess']
+
+# {tool: import time budget in milliseconds}
+LIGHTWEIGHT_TOOL_BUDGET_DICT = {'rsync_copy.py': 250,
+                                'submit_quality_assess_1_batch.py': 250,
+                                'align_count.py': 250,
+                                'raw_count.py': 250,
+                                'check_genome_files.py': 250,
+                                # the --client query needs only the standard library
+                                'queryDB.py': 250}
+# tools which genuinely need pandas at module load
+DEFAULT_TOOL_BUDGET = 1500
+
+
+def measureImportTime(tool_path):
+    """
+        run tool_path --help with python -X importtime
+        :param tool_path: path to a python script in tools/
+        :returns: a tuple (cumulative import time of the top level imports in ms, set of imported module names)
+    """
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([REPO_DIRECTORY, os.environ.get('PYTHONPATH', '')]))
+    completed_process = subprocess.run([sys.executable, '-X', 'importtime', tool_path, '--help'],
+                                       stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, universal_newlines=True, env=env)
+    total_microseconds = 0
+    imported_module_set = set()
+    # eg import time:       585 |     339809 |   pandas -- the indent of the module name is the import depth
+    for line in completed_process.stderr.splitlines():
+        match = re.match(r'import time:\s+(\d+) \|\s+(\d+) \|( +)(\S+)', line)
+        if match:
+            imported_module_set.add(match.group(4))
+            if len(match.group(3)) == 1:
+                total_microseconds += int(match.group(2))
+    return total_microseconds / 1000.0, imported_module_set
+
+
+def toolList():
+    """
+        :returns: list of python scripts in tools/
+    """
+    return sorted(tool for tool in os.listdir(TOOLS_DIRECTORY) if tool.endswith('.py'))
+
+
+class MyTestCase(unittest.TestCase):
+
+    def test_lightweightToolImports(self):
+        for tool, budget in LIGHTWEIGHT_TOOL_BUDGET_DICT.items():
+            with self.subTest(tool=tool):
+                import_time, imported_module_set = measureImportTime(os.path.join(TOOLS_DIRECTORY, tool))
+                self.assertListEqual([], [module for module in HEAVY_MODULE_LIST if module in imported_module_set])
+                self.assertLessEqual(import_time, budget)
+
+    def test_toolImportTimeBudget(self):
+        for tool in toolList():
+            if tool in LIGHTWEIGHT_TOOL_BUDGET_DICT:
+                continue
+            with self.subTest(tool=tool):
+                import_time, _ = measureImportTime(os.path.join(TOOLS_DIRECTORY, tool))
+                self.assertLessEqual(import_time, DEFAULT_TOOL_BUDGET)
+
+
+if __name__ == '__main__':
+    if '--report' in sys.argv:
+        for tool in toolList():
+            import_time, imported_module_set = measureImportTime(os.path.join(TOOLS_DIRECTORY, tool))
+            budget = LIGHTWEIGHT_TOOL_BUDGET_DICT.get(tool, DEFAULT_TOOL_BUDGET)
+            heavy_module_list = [module for module in HEAVY_MODULE_LIST if module in imported_module_set]
+            print('%-35s %8.1f ms (budget %s ms) %s' % (tool, import_time, budget, ' '.join(heavy_module_list)))
+    else:
+        unittest.main()
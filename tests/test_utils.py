@@ -1,6 +1,9 @@
 import unittest
 import io
+import os
 import sys
+import json
+import tempfile
 from unittest.mock import Mock, patch
 from rnaseq_tools import utils
 
@@ -115,6 +118,31 @@ class UtilsTester(unittest.TestCase):
         logger = utils.createLogger('/dev/null', 'loggertest')
         self.assertLogs(logger, 'WARNING')
 
+    def test_queuedLoggingTimedEvent(self):
+        utils.stopQueuedLogging()
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            log_file_path = os.path.join(tmp_dir, 'test.log')
+            json_log_file_path = os.path.join(tmp_dir, 'test.jsonl')
+            logger = utils.createLogger(log_file_path, 'queuedloggertest', 'INFO', json_log_file_path=json_log_file_path)
+            # configured once per process
+            utils.createLogger(os.path.join(tmp_dir, 'other.log'), 'queuedloggertest', 'INFO')
+            with utils.timedEvent(logger, 'parse_novoalign_log', sample='sample_1', path='some/path'):
+                pass
+            with self.assertRaises(ValueError):
+                with utils.timedEvent(logger, 'parse_count_file', sample='sample_2'):
+                    raise ValueError('test')
+            utils.stopQueuedLogging()
+            with open(json_log_file_path) as json_log_file:
+                event_list = [json.loads(line) for line in json_log_file]
+            self.assertEqual([event['event'] for event in event_list], ['parse_novoalign_log', 'parse_count_file'])
+            self.assertEqual(event_list[0]['sample'], 'sample_1')
+            self.assertEqual(event_list[0]['status'], 'ok')
+            self.assertEqual(event_list[1]['status'], 'error')
+            self.assertGreaterEqual(event_list[0]['duration'], 0)
+            with open(log_file_path) as log_file:
+                self.assertIn('event=parse_novoalign_log', log_file.read())
+            self.assertFalse(os.path.exists(os.path.join(tmp_dir, 'other.log')))
+
     def test_getFileListFromDirectory(self):
         pass
 
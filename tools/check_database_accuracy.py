@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+"""
+    check the metadata database against the specifications at https://github.com/BrentLab/database_files/wiki and write
+    the report to rnaseq_pipeline/reports/database_accuracy_check_[date].txt. The check of each sheet is cached, so only
+    the sheets which are new or have changed since they were last checked are re-checked
+
+    usage: check_database_accuracy.py # full report of /scratch/mblab/<user>/rnaseq_pipeline/database_files
+           check_database_accuracy.py --changed-only # print what has appeared or been fixed in the sheets edited since the last check
+"""
+import os
+import sys
+import argparse
+from rnaseq_tools.DatabaseAccuracyObject import DatabaseAccuracyObject
+
+
+def main(argv):
+    # read in cmd line args
+    args = parseArgs(argv)
+    print('...parsing arguments')
+    # store interactive flag
+    try:
+        interactive_flag = args.interactive
+    except AttributeError:
+        interactive_flag = False
+
+    database_path = args.database
+    if database_path is not None and not os.path.exists(database_path):
+        raise FileNotFoundError('DatabaseFileDoesNotExist')
+    accuracy_kwargs = {'database_files': database_path} if database_path is not None else {}
+    dba = DatabaseAccuracyObject(config_file=args.config_file, interactive=interactive_flag, workers=args.workers,
+                                 **accuracy_kwargs)
+    dba.logger.debug('cmd line arguments are: %s' % args)
+
+    if args.changed_only:
+        dba.changedOnlyReport(args.key_columns_only)
+    else:
+        dba.report(args.key_columns_only)
+        print('database accuracy report written to: %s' % dba.accuracy_check_output_file)
+
+
+def parseArgs(argv):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-d', '--database', default=None,
+                        help='[OPTIONAL] Default is database_files in /scratch/mblab/user/rnaseq_pipeline. '
+                             'If entered, use topmost directory of metadata database')
+    parser.add_argument('--changed-only', dest='changed_only', action='store_true',
+                        help='[OPTIONAL] check only the sheets which are new or have changed since they were last checked, and print\n'
+                             'the findings which have appeared (NEW) or been fixed (RESOLVED) in them. The report is not rewritten')
+    parser.add_argument('-k', '--key_columns_only', action='store_true',
+                        help='[OPTIONAL] only report inconsistencies in the key columns')
+    parser.add_argument('-w', '--workers', type=int, default=1,
+                        help='[OPTIONAL] Number of processes in which to check the sheets. Default 1')
+    parser.add_argument('--config_file', default='/see/standard/data/invalid/filepath/set/to/default',
+                        help="[OPTIONAL] default is already configured to handle the invalid default path above in StandardDataObject.\n"
+                             "Use this flag to replace that config file")
+    parser.add_argument('--interactive', action='store_true',
+                        help="[OPTIONAL] set this flag (only --interactive, no input necessary) to tell StandardDataObject not\n"
+                             "to attempt to look in /lts if on a compute node on the cluster")
+
+    return parser.parse_args(argv[1:])
+
+
+if __name__ == '__main__':
+    main(sys.argv)
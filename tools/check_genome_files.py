@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+"""
+    check genome_files in /scratch/mblab/<user>/rnaseq_pipeline against genome_files/genome_files_manifest.json, and
+    (re)write the manifest. By default, genome_files are trusted if the mtimes of the organism subdirectories and
+    their OrganismData_config.ini files match the manifest, and otherwise checked by size and mtime. A file whose size
+    or mtime has changed since the last check is hashed again. Every file is hashed with --verify-genome-files.
+    usage: check_genome_files.py --verify-genome-files
+"""
+import sys
+import argparse
+from rnaseq_tools.StandardDataObject import StandardData
+
+
+def main(argv):
+    # read in cmd line args
+    args = parseArgs(argv)
+    print('...parsing arguments')
+    # store interactive flag
+    try:
+        interactive_flag = args.interactive
+    except AttributeError:
+        interactive_flag = False
+
+    sd = StandardData(config_file=args.config_file, interactive=interactive_flag)
+    print('check_genome_files log can be found at: %s' % sd.log_file_path)
+
+    print('...setting genome_files in %s' % sd.genome_files)
+    sd.setGenomeFiles()
+    print('...checking genome_files in %s' % sd.genome_files)
+    try:
+        manifest = sd.checkGenomeFiles(verify=args.verify_genome_files)
+    except (NotADirectoryError, FileNotFoundError, ValueError) as err:
+        sys.exit('Genome Files are incomplete or corrupt (%s). Delete genome_files completely and re-run StandardDataObject '
+                 'or child to re-download genome_files.\nNote: this cannot be done from an interactive session on HTCF.' % err)
+    else:
+        for organism, organism_manifest in manifest['organisms'].items():
+            print('%s: %s files validated' % (organism, len(organism_manifest['files'])))
+        print('genome_files manifest last validated: %s' % manifest['validated'])
+
+
+def parseArgs(argv):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--verify-genome-files', dest='verify_genome_files', action='store_true',
+                        help='[OPTIONAL] re-hash every file in genome_files and compare to the checksums in the manifest, '
+                             'rather than trusting the mtimes recorded in the manifest')
+    parser.add_argument('--config_file', default='/see/standard/data/invalid/filepath/set/to/default',
+                        help="[OPTIONAL] default is already configured to handle the invalid default path above in StandardDataObject.\n"
+                             "Use this flag to replace that config file")
+    parser.add_argument('--interactive', action='store_true',
+                        help="[OPTIONAL] set this flag (only --interactive, no input necessary) to tell StandardDataObject not\n"
+                             "to attempt to look in /lts if on a compute node on the cluster")
+
+    return parser.parse_args(argv[1:])
+
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -8,16 +8,15 @@ import sys
 import pandas as pd
 import argparse
 from rnaseq_tools import utils
+from rnaseq_tools.ArtifactCatalogObject import ArtifactCatalog
 
 COUNT_LTS = '/lts/mblab/Crypto/rnaseq_data/lts_align_expr'
-# this needs to be here b/c align_counts currently only removes f*q.gz (this was legacy code that I did not catch before running the old data, which has a variety of extensions other than variations of strictly f*q.gz)
-FASTQ_TYPES = [".fastq.gz", ".fq.gz"]
+# note: align_counts only removes f*q.gz from the fastq name (legacy code -- the old data has a variety of extensions
+# other than variations of strictly f*q.gz). RunDirectoryIndex.sampleNames() accounts for this
 
 def main(argv):
-    # store suffixes of the files we wish to move
-    count_suffix = '_read_count.tsv'
-    novoalign_log_suffix = '_novoalign.log'
-    sorted_alignment_suffix = '_sorted_aligned_reads.bam'
+    # artifact types (see utils.ARTIFACT_SUFFIX_DICT) of the files we wish to move
+    artifact_type_list = ['count', 'novoalign_log', 'sorted_bam']
 
     # parse cmd line arguments
     args = parseArgs(argv)
@@ -26,10 +25,14 @@ def main(argv):
             raise ValueError('NotCsv')
     except ValueError:
         sys.exit('%s does not end with a .csv. Are you sure it is a .csv? -qs takes the .csv output of queryDB.py. Check and resubmit.')
-    if args.leading_zero_rn:
-        leading_zero_list = args.leading_zero_rn
-    else:
-        leading_zero_list = ''
+    # run numbers are matched to the run directories without leading zeros -- -lz is needed only for run directories
+    # whose names are not a run number
+    leading_zero_dict = {}
+    for leading_zero_run_num in args.leading_zero_rn or []:
+        try:
+            leading_zero_dict[int(leading_zero_run_num)] = leading_zero_run_num
+        except ValueError:
+            pass
 
     # read in database_df (The path to the result of a query against the metadata base using queryDB)
     database_df = pd.read_csv(args.query_sheet)
@@ -39,14 +42,11 @@ def main(argv):
     cmd = "mkdir -p {}".format(destination_directory)
     utils.executeSubProcess(cmd)
 
-    # get list of count files
-    count_file_list = filepathList(database_df, count_suffix, leading_zero_list)
-    # get list of novoalign logs
-    novoalign_log_list = filepathList(database_df, novoalign_log_suffix, leading_zero_list)
-    # get list of sorted alignment files
-    sorted_alignment_list = filepathList(database_df, sorted_alignment_suffix, leading_zero_list)
-    # concat the lists together
-    file_list = count_file_list + novoalign_log_list + sorted_alignment_list
+    # crawl the run directories of the query in COUNT_LTS once, rather than checking each file
+    artifact_catalog = ArtifactCatalog([COUNT_LTS], run_number_alias_dict=leading_zero_dict)
+    artifact_catalog.refresh(list(database_df['runNumber'].dropna().unique()))
+    # get list of count files, novoalign logs and sorted alignment files
+    file_list = filepathList(database_df, artifact_type_list, artifact_catalog)
 
     # move the files from /lts to the output directory (generally the user's scratch)
     moveFiles(file_list, destination_directory, len(database_df))
@@ -65,47 +65,40 @@ def parseArgs(argv):
                         help='If any of the run numbers in your query have a leading zero, and you tried the script once and it errored on these same run numbers, \
                              try adding this flag. Run numbers should be added sequentially, eg 0641 0537. You may also try the run number with no leading 0, eg 773\
                               if the run number 0773 is giving you trouble. If both of these (eg 0773 and 773) fail, and the file exists in align_expr, you may need to\
-                              get into the code to add a conditional for an unusual run number. This is more common with older runs.')
+                              get into the code to add a conditional for an unusual run number. This is more common with older runs.\
+                              Note: run numbers are now matched without leading zeros, so this is rarely necessary')
     return parser.parse_args(argv[1:])
 
 
-def filepathList(query, file_type, leading_zero_list):
+def filepathList(query, artifact_type_list, artifact_catalog):
     """
-        create filepath from COUNT_LTS, runNumber and fastqFileName
+        look up the files of the given artifact types for each fastq in the query in the artifact catalog of COUNT_LTS.
+        Every missing file is reported before exiting
         :param query: a query sheet describing the experiment files
-        :param file_type: the suffix to attach to the fastqfile basename
-        :param leading_zero_list: list of runs with leading zeros
-        :returns: a list of filepaths of a given file_type according to the query
+        :param artifact_type_list: keys of utils.ARTIFACT_SUFFIX_DICT, eg ['count', 'novoalign_log']
+        :param artifact_catalog: an ArtifactCatalog of COUNT_LTS, refreshed for the runs in the query
+        :returns: a list of filepaths of the artifact types according to the query, by artifact type. Exits if a file
+                  is not found
     """
-    run_num = list(query['runNumber'])
-    # the following is to address the various run number formats with leading 0s eg 0773. There is some inconsistency
-    if leading_zero_list:
-        for i in range(len(run_num)):
-            for leading_zero_run_num in leading_zero_list:
-                if run_num[i] == int(leading_zero_run_num) or run_num[i] == str(leading_zero_run_num):
-                    if not str(leading_zero_run_num).startswith('0'):
-                        run_num[i] = '0' + str(leading_zero_run_num)
-                    else:
-                        run_num[i] = str(leading_zero_run_num)
-
-    base_path = [os.path.join(COUNT_LTS, 'run_{}'.format(x)) for x in run_num]
-
-    fastq_file_basename = [os.path.basename(x) for x in query['fastqFileName']]
-    # remove fastq extensions without removing the .txt extensions that are sometimes placed in the middle of fastq names in older runs
-    # this is to account for legacy code -- see the note at the top
-    for i in range(len(fastq_file_basename)):
-        for ext in FASTQ_TYPES:
-            if fastq_file_basename[i].endswith(ext):
-                fastq_file_basename[i] = fastq_file_basename[i][:-len(ext)]
-
-    read_count_basename = [x + file_type for x in fastq_file_basename]
-
-    if not len(read_count_basename) == len(base_path):
+    if query['runNumber'].isna().any() or query['fastqFileName'].isna().any():
         print('the number of runNumbers and fastqFilePaths is not equal. Please check the query and filter out any lines \
                 without run numbers or fastqFileNames as these do not have associated count files')
         sys.exit(1)
 
-    filepath_list = [os.path.join(x, y) for x, y in zip(base_path, read_count_basename)]
+    filepath_list = []
+    missing_list = []
+    for artifact_type in artifact_type_list:
+        for run_number, fastq_filename in zip(query['runNumber'], query['fastqFileName']):
+            filepath = artifact_catalog.artifactPath(fastq_filename, artifact_type, run_number)
+            if filepath is None:
+                missing_list.append('run %s: %s' % (run_number, utils.convertFastqFilename(fastq_filename, artifact_type)))
+            else:
+                filepath_list.append(filepath)
+    if missing_list:
+        print('The following files cannot be found and therefore can not be moved. '
+              'Please check %s for the directory with the run number in the filename\n\t%s'
+              % (COUNT_LTS, '\n\t'.join(missing_list)))
+        sys.exit(1)
 
     return filepath_list
 
@@ -118,13 +111,8 @@ def moveFiles(file_list, dest_dir, query_len):
         :param query_len: the length of the query (used to check)
     """
     count = 0
+    # the files have been found in the artifact catalog (see filepathList())
     for file in file_list:
-        # throw error/exit if file isn't found in src_dir
-        if not os.path.isfile(file):
-            print('%s cannot be found and therefore can not be moved. '
-                  'Please check %s for the directory with the run number in the filename' % (file, COUNT_LTS))
-            sys.exit(1)
-
         dest_full_path = os.path.join(dest_dir, os.path.basename(file))
         print('...copying {} to {}'.format(os.path.basename(file), dest_full_path))
         cmd = 'rsync -aHv {} {}'.format(file, dest_full_path)
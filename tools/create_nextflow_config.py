@@ -42,22 +42,13 @@ def main(argv):
     db.query_df['libraryDate'] = pd.to_datetime(db.query_df['libraryDate'])
     # create strandedness column based on libraryDate. May change to prep protocol at some point, but for now this is best
     db.query_df['strandedness'] = np.where(db.query_df['libraryDate'] > '2015-10-25', 'reverse', 'no')
-    # add leading zero to runNumber, if necessary -- take care of in loop
-    db.query_df['runNumber'] = db.query_df['runNumber'].astype(str)
-    # new dictionary to store run_directory in dataframe
-    run_directory_list = []
-    for index, row in db.query_df.iterrows():
-        # some early runs have run numbers that start with zero in /lts. 0s are dropped in df b/c they are read in as ints
-        # this step adds the zero and casts the row to str
-        run_num_tmp = int(float(row['runNumber']))# TODO: super ugly, needs to be fixed. Not sure why this is now getting read in as 4422.0, eg as of 20200923
-        if run_num_tmp in db._run_numbers_with_zeros: # TODO: Probably the best way to is to always read runnumbers as strings -- requires changing _run_num_with_zeros keys to strings, and checking the rest of the codebase that uses this
-            run_number = str(db._run_numbers_with_zeros[run_num_tmp])
-        else:
-            run_number = run_num_tmp
-        # create run directory name, eg run_1234_samples
-        run_directory = 'run_' + str(run_number) + '_samples'  # SEE TODO above
-        # add to list
-        run_directory_list.append(run_directory)
+    # run directory names, eg run_0673_samples -- some early runs have run numbers that start with zero in /lts
+    run_directory_list = ['run_%s_samples' % run_number if run_number is not None else None for run_number in
+                          DatabaseObject.runNumberWithZeros(db.query_df['runNumber'], db._run_numbers_with_zeros)]
+    for (index, row), run_directory in zip(db.query_df.iterrows(), run_directory_list):
+        if run_directory is None:
+            print('%s has no runNumber -- skipped' % row['fastqFileName'])
+            continue
         # create fastqfilename path
         try:
             fastq_filename = os.path.basename(row['fastqFileName']).rstrip()
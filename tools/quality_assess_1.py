@@ -6,6 +6,7 @@ import pandas as pd
 from rnaseq_tools.CryptoQualAssessAuditObject import CryptoQualAssessAuditObject
 from rnaseq_tools.S288C_R54QualAssessAuditObject import S288C_R54QualAssessAuditObject
 from rnaseq_tools import utils
+from rnaseq_tools.RunDirectoryIndexObject import RunDirectoryIndex
 
 
 # TODO: CURRENTLY ONLY SET UP FOR CRYPTO. NEED TO WRITE S288C_R64QualityAssessmentObject
@@ -51,20 +52,21 @@ def main(argv):
     query_df = utils.readInDataframe(query_sheet_path)
     query_fastq_list = list(query_df.fastqFileName)
 
-    # extract bam file names
-    bam_list = utils.extractFiles(align_count_path, '.bam')
-    # filter bam_list for files in the query sheet
-    filtered_bam_list = [x for x in bam_list if os.path.basename(x).replace('_sorted_aligned_reads_with_annote.bam', '.fastq.gz') in query_fastq_list]
-    # extract novoalign logs
-    novoalign_logs = utils.extractFiles(align_count_path, 'novoalign.log')
-    filtered_novoalign_logs = [x for x in novoalign_logs if os.path.basename(x).replace('_novoalign.log', '.fastq.gz') in query_fastq_list]
-    # extract count file list
-    count_list = utils.extractFiles(align_count_path, 'read_count.tsv')
-    filtered_count_list =  [x for x in count_list if os.path.basename(x).replace('_read_count.tsv', '.fastq.gz') in query_fastq_list]
-    # from count_list, get convert to a list of fastq.gz names
-    extracted_sample_fastq_list = [os.path.basename(x.replace('_read_count.tsv', '.fastq.gz')) for x in count_list]
-    if len(filtered_bam_list) != len(filtered_count_list) or len(filtered_bam_list) != len(filtered_novoalign_logs):
-        sys.exit('The number of bam_files, count_files and/or log_files does not match. Check file contents')
+    # index the bam, count and log files in the run directory once
+    run_directory_index = RunDirectoryIndex(align_count_path)
+    # report every sample of the query with some, but not all, of its files before any are parsed
+    incomplete_sample_dict = run_directory_index.incompleteSamples(query_fastq_list, ['bam', 'count', 'novoalign_log'])
+    if incomplete_sample_dict:
+        for fastq_filename, missing_artifact_list in incomplete_sample_dict.items():
+            print('%s is missing: %s' % (fastq_filename, ', '.join(missing_artifact_list)))
+        sys.exit('The bam_files, count_files and/or log_files of %s samples are missing (see above). Check file contents'
+                 % len(incomplete_sample_dict))
+    filtered_bam_list = run_directory_index.artifactList('bam', query_fastq_list)
+    filtered_novoalign_logs = run_directory_index.artifactList('novoalign_log', query_fastq_list)
+    filtered_count_list = run_directory_index.artifactList('count', query_fastq_list)
+    # the samples of the query with a count file in the run directory
+    extracted_sample_fastq_list = [fastq_filename for fastq_filename in query_fastq_list
+                                   if run_directory_index.artifactPath(fastq_filename, 'count') is not None]
 
     # all crypto records will have genotype beginning with CNAG_
     crypto_query_df = query_df[~query_df.genotype1.isna() & query_df.genotype1.str.startswith('CNAG') & query_df.fastqFileName.isin(extracted_sample_fastq_list)]
@@ -72,6 +74,8 @@ def main(argv):
 
     # create list to store qual_assess dataframes
     qual_assess_df_list = []
+    # per sample metrics, next to the quality summary. Only the new or changed samples are re-assessed (see --force)
+    metric_cache_path = os.path.join(output_directory, '%s_sequence_quality_metrics.json' % filename_prefix)
 
     if len(crypto_query_df) > 0:
         # if coverage_check is passed in cmd line, include query and coverage_check_flag in constructor (automatically sets some values #TODO make this a function with arugmnets to pass so as not to repeat entire constructor)
@@ -83,7 +87,10 @@ def main(argv):
                                                        coverage_check_flag=True,
                                                        query_df=crypto_query_df,
                                                        config_file=args.config_file,
-                                                       interactive=interactive_flag)
+                                                       interactive=interactive_flag,
+                                                       workers=args.workers,
+                                                       metric_cache_path=metric_cache_path,
+                                                       force=args.force)
 
         # add dataframe to list
         try:
@@ -100,7 +107,8 @@ def main(argv):
                                                            novoalign_log_list=filtered_novoalign_logs,
                                                            query_path=args.query_sheet_path,
                                                            config_file=args.config_file,
-                                                           interactive=interactive_flag)
+                                                           interactive=interactive_flag,
+                                                           workers=args.workers)
         print('...compiling S288C_R64 alignment information')
         # create dataframes storing the relevant alignment and count metadata from the novoalign and htseq logs
         try:
@@ -133,6 +141,12 @@ def parseArgs(argv):
     parser.add_argument('--interactive', action='store_true',
                         help="[OPTIONAL] set this flag (only --interactive, no input necessary) to tell StandardDataObject not\n"
                              "to attempt to look in /lts if on a compute node on the cluster")
+    parser.add_argument('-w', '--workers', '--jobs', dest='workers', type=int, default=1,
+                        help="[OPTIONAL] Number of processes in which to scan the bams of the samples. Default 1.\n"
+                             "A sample which fails is reported in the QA_ERROR column rather than stopping the others")
+    parser.add_argument('--force', action='store_true',
+                        help="[OPTIONAL] set this flag to re-assess every sample rather than read the metrics of unchanged\n"
+                             "samples from <run>_sequence_quality_metrics.json in the align_count_dir")
     args = parser.parse_args(argv[1:])
     return args
 
@@ -1,12 +1,12 @@
 #!/usr/bin/env python
 import sys
 import argparse
-import re
 import pandas as pd
 import numpy as np
 from rnaseq_tools.OrganismDataObject import OrganismData
 from rnaseq_tools.DatabaseObject import DatabaseObject
 from rnaseq_tools import utils
+from rnaseq_tools import alignment_log_tools
 import os
 
 
@@ -231,22 +231,14 @@ def assessMappingQuality(qual_assess_df, experiment_directory, aligner_tool='nov
     to search for log files in the experiment_dir
     :returns: updated quality_assess_df
     """
-    for i, row in qual_assess_df.iterrows():
-        sample = str(row['FASTQFILENAME']) + '_%s.log' % aligner_tool
-        filepath = os.path.join(experiment_directory, sample)
-
-        # read alignment log
-        with open(filepath, 'r') as reader:
-            lines = reader.readlines()
-            for line in lines:
-                reg_total = re.search(r'Read Sequences:( +)(.\d+)', line)
-                reg_uniq = re.search(r'Unique Alignment:( +)(.\d+)', line)
-                if reg_total:
-                    total_reads = int(reg_total.group(2))
-                if reg_uniq:
-                    uniq_mapped_reads = int(reg_uniq.group(2))
-
-        align_pct = uniq_mapped_reads / float(total_reads)
+    log_path_list = [os.path.join(experiment_directory, str(fastq_filename) + '_%s.log' % aligner_tool)
+                     for fastq_filename in qual_assess_df['FASTQFILENAME']]
+    # each log is read once, in a thread pool. see alignment_log_tools
+    novoalign_log_record_list = alignment_log_tools.parseNovoalignLogs(log_path_list)
+    for (i, row), novoalign_log_record in zip(qual_assess_df.iterrows(), novoalign_log_record_list):
+        total_reads = novoalign_log_record.LIBRARY_SIZE
+        # a log without a Read Sequences line is parsed as 0 reads
+        align_pct = novoalign_log_record.UNIQUE_ALIGNMENT / float(total_reads) if total_reads else 0.0
         # set mapping quality
         row['TOTAL'] = total_reads  # read Sequences
         row['ALIGN_PCT'] = align_pct  # Unique Alignment
@@ -13,20 +13,32 @@
 
     from cluster (REMEMBER that this WILL create a directory rnaseq_pipeline in /scratch/mblab/<user>)
     usage: queryDB.py -pf # this will print the full database from /scratch/mblab/<user>/database_files
+           queryDB.py -j /path/to/filter.json # filter json operators: see rnaseq_tools/DatabaseSqliteObject.py
+           queryDB.py --sql "SELECT * FROM database WHERE genotype1 LIKE 'CNAG_05%'"
+           queryDB.py --since HEAD~1 # rows changed by the last commit to database_files
+           queryDB.py --serve & # keep the database in memory, and answer --client queries from it
+           queryDB.py --client -j /path/to/filter.json -o - # filter with the running server, csv to stdout
 """
 
 import os
 import sys
+import json
 import argparse
 from rnaseq_tools import utils
-from rnaseq_tools.DatabaseObject import DatabaseObject
-from rnaseq_tools.StandardDataObject import StandardData
+from rnaseq_tools.DatabaseServerObject import DatabaseServer
 
 
 def main(argv):
     # read in cmd line args
     args = parseArgs(argv)
+    # the client only needs the standard library -- the database (and pandas) is held by the server
+    if args.client:
+        return clientQuery(args)
+    if args.output_directory is None and not args.serve:
+        raise ValueError('OutputDirectoryRequired: -o is required unless --serve or --client')
     print('...parsing arguments')
+    from rnaseq_tools.DatabaseObject import DatabaseObject
+    from rnaseq_tools.StandardDataObject import StandardData
     # store interactive flag
     try:
         interactive_flag = args.interactive
@@ -51,38 +63,126 @@ def main(argv):
     if output_directory is not None and not os.path.exists(output_directory):
         raise FileNotFoundError('OutputDirectoryDoesNotExist')
     print('...compiling database')
-    database_object = DatabaseObject(database_path, filter_json_path=filter_json_path, database_files = database_path, config_file=args.config_file, interactive=interactive_flag)
-    database_object.setDatabaseDataframe()
+    database_object = DatabaseObject(database_path, filter_json_path=filter_json_path, database_files = database_path, config_file=args.config_file, interactive=interactive_flag,
+                                     workers=args.workers)
 
-    # filter database and print to output_directory, if json is present
+    # hold the database in memory, and answer --client queries until queryDB.py --client --shutdown
+    if args.serve:
+        database_server = DatabaseServer(database_object, args.socket)
+        print('serving the database on: %s' % database_server.socket_path)
+        database_server.serve()
+        return
+
+    # filter database and print to output_directory, if json is present. The filter is a query of the sqlite database
     if database_object.filter_json_path is not None:
         print('...filtering database')
-        database_object.filterDatabaseDataframe()
+        database_object.filterDatabaseSqlite()
         output_filename = utils.pathBaseName(database_object.filter_json_path)
         filtered_output_path = os.path.join(output_directory, output_filename + '.csv')
         print('printing filtered database to: %s' % filtered_output_path)
         database_object.filtered_database_df.to_csv(filtered_output_path, index=False)
 
+    # run a sql query against the sqlite database and print to output_directory
+    if args.sql is not None:
+        print('...querying database')
+        sql_output_path = os.path.join(output_directory, 'sql_query_%s_%s.csv' % (utils.yearMonthDay(), utils.hourMinuteSecond()))
+        print('printing sql query result to: %s' % sql_output_path)
+        database_object.queryDatabaseSqlite(args.sql).to_csv(sql_output_path, index=False)
+
+    # print the rows which have changed since a commit of database_files
+    if args.since is not None:
+        print('...finding changes to the database since %s' % args.since)
+        delta_output_path = os.path.join(output_directory, 'database_delta_%s_%s.csv' % (args.since, utils.yearMonthDay()))
+        print('printing database delta to: %s' % delta_output_path)
+        database_object.deltaSince(args.since).to_csv(delta_output_path, index=False)
+
+    # print duplicate and orphaned merge keys
+    if args.key_report:
+        key_report_output_path = os.path.join(output_directory, 'key_integrity_report_%s.csv' % utils.yearMonthDay())
+        print('printing key integrity report to: %s' % key_report_output_path)
+        database_object.keyIntegrityReport().to_csv(key_report_output_path, index=False)
+
     # if user enters -pf, print full database
     if args.print_full:
+        database_object.setDatabaseDataframe()
         year_month_day = utils.yearMonthDay()
         full_database_output_path = os.path.join(output_directory, 'combined_df_{}.csv'.format(year_month_day))
         print('printing full database to: %s' % full_database_output_path)
         database_object.database_df.to_csv(full_database_output_path, index=False)
 
 
+def clientQuery(args):
+    """
+        send the query in args (a filter json, --sql or --shutdown) to the server running on args.socket
+        :param args: the parsed cmd line arguments
+    """
+    socket_path = args.socket or DatabaseServer.defaultSocketPath()
+    if args.shutdown:
+        request_dict = {'command': 'shutdown'}
+    elif args.json is not None:
+        with open(args.json) as filter_json_file:
+            request_dict = {'filter': json.load(filter_json_file)}
+    elif args.sql is not None:
+        request_dict = {'sql': args.sql}
+    else:
+        request_dict = {'command': 'ping'}
+    request_dict['format'] = args.format
+    if 'command' in request_dict:
+        print(DatabaseServer.request(socket_path, request_dict))
+        return
+    if args.output_directory in [None, '-']:
+        DatabaseServer.request(socket_path, request_dict, sys.stdout.buffer)
+        return
+    if not os.path.exists(args.output_directory):
+        raise FileNotFoundError('OutputDirectoryDoesNotExist')
+    output_basename = utils.pathBaseName(args.json) if args.json is not None else \
+        'sql_query_%s_%s' % (utils.yearMonthDay(), utils.hourMinuteSecond())
+    output_path = os.path.join(args.output_directory, '%s.%s' % (output_basename, args.format))
+    with open(output_path, 'wb') as output_file:
+        header_dict = DatabaseServer.request(socket_path, request_dict, output_file)
+    print('printing %s rows of the query result to: %s' % (header_dict['rows'], output_path))
+
+
 def parseArgs(argv):
     parser = argparse.ArgumentParser()
-    parser.add_argument('-o', '--output_directory', required=True,
-                        help='[REQUIRED] Filepath to directory to intended queryDB output')
+    parser.add_argument('-o', '--output_directory', default=None,
+                        help='[REQUIRED] Filepath to directory to intended queryDB output. Not required with --serve. With --client,\n'
+                             '- (or no -o) writes the result to stdout')
     parser.add_argument('-d', '--database', default=None,
                         help='[OPTIONAL] Default is database_files in /scratch/mblab/user/rnaseq_pipeline. '
                              'If entered, use topmost directory of metadata database. On cluster, /scratch/mblab/database-files.')
     parser.add_argument('-j', '--json', default=None,
-                        help='[OPTIONAL] Path to json file used to parse metadata. See https://github.com/BrentLab/rnaseq_pipeline/blob/master/templates/example_json.json')
+                        help='[OPTIONAL] Path to json file used to parse metadata. See https://github.com/BrentLab/rnaseq_pipeline/blob/master/templates/example_json.json.\n'
+                             'In addition to {column: value} and {column: [list, of, values]}, a column may be filtered with\n'
+                             '{column: {operator: value}} where operator is one of in, not in, between, like, not like, =, !=, <, <=, >, >=')
+    parser.add_argument('--sql', default=None,
+                        help='[OPTIONAL] A sql query of the database, eg "SELECT fastqFileName, genotype1 FROM database WHERE runNumber IN (4011, 4040)".\n'
+                             'The merged database is the table database, each database_files subdirectory is a table of the same name (eg fastqFiles).\n'
+                             'The result is written to sql_query_[date]_[time].csv in the output directory')
+    parser.add_argument('--since', default=None,
+                        help='[OPTIONAL] A commit (or eg HEAD~3) of the database_files git repository. The rows of the database which\n'
+                             'have been added or changed since (databaseDelta added) and those removed or changed (databaseDelta removed)\n'
+                             'are written to database_delta_[commit]_[date].csv in the output directory')
+    parser.add_argument('-k', '--key_report', action='store_true',
+                        help='[OPTIONAL] write key_integrity_report_[date].csv to the output directory -- the merge keys which are duplicated\n'
+                             'in a parent sheet (and so inflate the merged database) or orphaned in a child sheet')
     parser.add_argument('-pf', '--print_full', action='store_true',
                         help='[OPTIONAL] Use this in the absence of -j to print out the full metadata database. The name will be combined_df_[date].csv. \
                          Use it in addition to -j to print out both the query and the full database. Note: simply add -pf. No value is necessary')
+    parser.add_argument('-w', '--workers', type=int, default=1,
+                        help='[OPTIONAL] Number of processes in which to parse the database sheets. Default 1. Note: -j is --json')
+    parser.add_argument('--serve', action='store_true',
+                        help='[OPTIONAL] hold the database in memory and answer --client queries on --socket. The database is reloaded\n'
+                             'when a file in database_files changes. Stop with queryDB.py --client --shutdown')
+    parser.add_argument('--client', action='store_true',
+                        help='[OPTIONAL] send -j or --sql to the queryDB.py --serve process, rather than loading the database. With\n'
+                             'neither, check that the server is running')
+    parser.add_argument('--socket', default=None,
+                        help='[OPTIONAL] unix socket of --serve and --client. Default /tmp/queryDB_[user].sock')
+    parser.add_argument('--format', choices=['csv', 'arrow'], default='csv',
+                        help='[OPTIONAL] format of a --client result. arrow (the feather file format) requires pyarrow on the server')
+    parser.add_argument('--shutdown', action='store_true',
+                        help='[OPTIONAL] with --client, stop the server')
     parser.add_argument('--config_file', default='/see/standard/data/invalid/filepath/set/to/default',
                         help="[OPTIONAL] default is already configured to handle the invalid default path above in StandardDataObject.\n"
                              "Use this flag to replace that config file")
@@ -2,8 +2,8 @@
 import sys
 import argparse
 import os
-import glob
 from rnaseq_tools.OrganismDataObject import OrganismData
+from rnaseq_tools.RunDirectoryIndexObject import RunDirectoryIndex
 from rnaseq_tools import utils
 
 # TODO: Update with OrganismData object (no more need to input gene list). Better commeting and explanation of each step
@@ -28,17 +28,23 @@ def main(argv):
         query_sheet_path = args.query_sheet
         query_df = utils.readInDataframe(query_sheet_path)
 
-    # extract count files from count_dir
-    count_dir_file_list = glob.glob(os.path.join(count_dirpath, '*read_count.tsv'))
+    # index the count files in count_dir
+    count_directory_index = RunDirectoryIndex(count_dirpath)
 
     # TODO: SOME ERROR CHECKING ON THE FASTQFILENAME?
     # all crypto records will have genotype beginning with CNAG_, used this to extract list of crypto and yeast samples from query
     crypto_sample_list = list(query_df[query_df.genotype1.str.startswith('CNAG')].fastqFileName) #TODO: after metadata organism column added, update this section
     s288c_r64_sample_list = list(query_df[~query_df.genotype1.str.startswith('CNAG')].fastqFileName)
 
+    # report the samples of the query sheet without a count file (eg a failed htseq-count) before writing the sheets
+    missing_count_list = [fastq_filename for fastq_filename in crypto_sample_list + s288c_r64_sample_list
+                          if count_directory_index.artifactPath(fastq_filename, 'count') is None]
+    if missing_count_list:
+        print('WARNING: no count file in %s for: %s' % (count_dirpath, ', '.join(missing_count_list)))
+
     # split list of count files based on membership in dataframes above
-    count_files_by_organism_dict = {'KN99': [x for x in count_dir_file_list if os.path.basename(x.replace('_read_count.tsv', '.fastq.gz')) in crypto_sample_list],
-                                    'S288C_R64': [x for x in count_dir_file_list if os.path.basename(x.replace('_read_count.tsv', '.fastq.gz')) in s288c_r64_sample_list]}
+    count_files_by_organism_dict = {'KN99': count_directory_index.artifactList('count', crypto_sample_list),
+                                    'S288C_R64': count_directory_index.artifactList('count', s288c_r64_sample_list)}
 
     # create and write out count sheets
     for organism, count_file_list in count_files_by_organism_dict.items():
@@ -82,33 +82,26 @@ def parseArgs(argv):
 
 def validatePaths(sd, run_list, run_path_list):
     """
-        check that run files exist where expected, in rnaseq_pipeline/align_count_results
+        check that run files exist where expected, in rnaseq_pipeline/align_count_results. The run directories are
+        looked up in the artifact catalog (see StandardData.getArtifactCatalog()), which also finds run directories with
+        a leading zero in the name, eg run_0673_samples for run 673
         :param sd: a standard data object
+        :param run_list: the run numbers in run_path_list
         :param run_path_list: a list of full paths from / to run_#####_samples created in main script
         :returns: a validated list
     """
-    # check that the run directories all exist
+    artifact_catalog = sd.getArtifactCatalog(run_list)
     for i in range(len(run_path_list)):
-        path = run_path_list[i]
-        try:
-            if not os.path.isdir(path):
-                try:
-                    run_num_with_leading_zero = sd._run_numbers_with_zeros[run_list[i]]
-                except KeyError:
-                    sd.logger.info('%s not in leading zero run number list')
-                    raise NotADirectoryError('DoesNotExist: %s' %path)
-                else:
-                    path_with_zero = os.path.join(sd.align_count_results, 'run_'+str(run_num_with_leading_zero)+'_samples')
-                    if not os.path.isdir(path_with_zero):
-                        raise NotADirectoryError('DoesNotExist: %s' %path)
-                    else:
-                        run_path_list[i] = path_with_zero
-        except NotADirectoryError:
+        run_directory_path = artifact_catalog.runDirectory(run_list[i], root=sd.align_count_results)
+        if run_directory_path is None:
+            sd.logger.info('DoesNotExist: %s' % run_path_list[i])
             msg='Cant find the run directory. The runnumbers must be subdirectories like so: rnaseq_pipeline/align_count_results/run_####_samples'
             sd.logger.info(msg)
             print(msg)
+        else:
+            run_path_list[i] = run_directory_path
 
-        return run_path_list
+    return run_path_list
 
 def writeSbatchScript(sd, user_name, validated_run_path_list, lookup_output_path, query_path):
     """
@@ -129,7 +122,7 @@ def writeSbatchScript(sd, user_name, validated_run_path_list, lookup_output_path
                       "#SBATCH -J qual_assess_1_batch\n\n" %(user_name, str(sd.year_month_day) + '_' + str(utils.hourMinuteSecond()))
     script = script + 'ml rnaseq_pipeline\n\n'
     script = script + 'read run_path < <( sed -n ${SLURM_ARRAY_TASK_ID}p %s )\n\n' %lookup_output_path
-    script = script + 'quality_assess_1.py -ac ${run_path} -qs %s --interactive\n' %query_path
+    script = script + 'quality_assess_1.py -ac ${run_path} -qs %s --interactive --workers ${SLURM_CPUS_PER_TASK}\n' %query_path
 
     return script
 